@@ -0,0 +1,47 @@
+"""Create background job table and export index of transactions
+
+Revision ID: 0c5b8e2f71a4
+Revises: 3ac479e4b371
+Create Date: 2026-10-19 09:12:40.316802
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0c5b8e2f71a4'
+down_revision = '3ac479e4b371'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('background_job',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.Enum('TRANSACTION_EXPORT', name='jobkind', native_enum=False), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'RUNNING', 'DONE', 'FAILED', name='jobstatus', native_enum=False), nullable=False),
+    sa.Column('parameters', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('cursor', sa.VARCHAR(length=255), nullable=False),
+    sa.Column('processed_rows', sa.Integer(), nullable=False),
+    sa.Column('failed_rows', sa.Integer(), nullable=False),
+    sa.Column('errors', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name=op.f('fk_background_job_user_id_user'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_background_job'))
+    )
+    op.create_index(op.f('ix_background_job_user_id'), 'background_job', ['user_id'], unique=False)
+    op.create_index(
+        'ix_financial_transaction_business_date', 'financial_transaction',
+        ['financial_business_id', 'date', 'id'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_financial_transaction_business_date', table_name='financial_transaction')
+    op.drop_index(op.f('ix_background_job_user_id'), table_name='background_job')
+    op.drop_table('background_job')
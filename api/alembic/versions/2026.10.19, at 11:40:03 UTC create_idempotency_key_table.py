@@ -0,0 +1,43 @@
+"""Create idempotency key table
+
+Revision ID: 5d1e9a7c3b20
+Revises: 0c5b8e2f71a4
+Create Date: 2026-10-19 11:40:03.582114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e9a7c3b20'
+down_revision = '0c5b8e2f71a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_key',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.VARCHAR(length=100), nullable=False),
+    sa.Column('key', sa.VARCHAR(length=255), nullable=False),
+    sa.Column('response', postgresql.JSONB(none_as_null=True, astext_type=sa.Text()), nullable=True),
+    sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name=op.f('fk_idempotency_key_user_id_user'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_idempotency_key'))
+    )
+    op.create_index(op.f('ix_idempotency_key_expires_at'), 'idempotency_key', ['expires_at'], unique=False)
+    op.create_index(
+        'uq_idempotency_key_user_operation_key', 'idempotency_key',
+        ['user_id', 'operation', 'key'], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_idempotency_key_user_operation_key', table_name='idempotency_key')
+    op.drop_index(op.f('ix_idempotency_key_expires_at'), table_name='idempotency_key')
+    op.drop_table('idempotency_key')
@@ -0,0 +1,58 @@
+"""Create category budget tables
+
+Revision ID: 8a4f2c6e9d13
+Revises: 5d1e9a7c3b20
+Create Date: 2026-10-19 13:05:51.204617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4f2c6e9d13'
+down_revision = '5d1e9a7c3b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_budget',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('financial_business_id', sa.Integer(), nullable=False),
+    sa.Column('expense_category_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Enum('WEEK', 'MONTH', name='budgetperiod', native_enum=False), nullable=False),
+    sa.Column('limit_amount', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['expense_category_id'], ['expense_categories.id'], name=op.f('fk_category_budget_expense_category_id_expense_categories'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['financial_business_id'], ['financial_business.id'], name=op.f('fk_category_budget_financial_business_id_financial_business'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_category_budget'))
+    )
+    op.create_index(op.f('ix_category_budget_financial_business_id'), 'category_budget', ['financial_business_id'], unique=False)
+    op.create_index(
+        'uq_category_budget_expense_category_period', 'category_budget',
+        ['expense_category_id', 'period'], unique=True
+    )
+    op.create_table('budget_period_spend',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('budget_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.TIMESTAMP(), nullable=False),
+    sa.Column('spent', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['budget_id'], ['category_budget.id'], name=op.f('fk_budget_period_spend_budget_id_category_budget'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_budget_period_spend'))
+    )
+    op.create_index(
+        'uq_budget_period_spend_budget_period_start', 'budget_period_spend',
+        ['budget_id', 'period_start'], unique=True
+    )
+
+
+def downgrade():
+    op.drop_index('uq_budget_period_spend_budget_period_start', table_name='budget_period_spend')
+    op.drop_table('budget_period_spend')
+    op.drop_index('uq_category_budget_expense_category_period', table_name='category_budget')
+    op.drop_index(op.f('ix_category_budget_financial_business_id'), table_name='category_budget')
+    op.drop_table('category_budget')
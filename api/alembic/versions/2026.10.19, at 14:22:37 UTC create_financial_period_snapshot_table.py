@@ -0,0 +1,76 @@
+"""Create financial period snapshot table and lock of closed periods
+
+Revision ID: b37e05d9a6c1
+Revises: 8a4f2c6e9d13
+Create Date: 2026-10-19 14:22:37.918450
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b37e05d9a6c1'
+down_revision = '8a4f2c6e9d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('financial_business', sa.Column('closed_until', sa.TIMESTAMP(), nullable=True))
+    op.create_table('financial_period_snapshot',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('financial_business_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.TIMESTAMP(), nullable=False),
+    sa.Column('period_end', sa.TIMESTAMP(), nullable=False),
+    sa.Column('opening_balance', sa.Float(), nullable=False),
+    sa.Column('closing_balance', sa.Float(), nullable=False),
+    sa.Column('accruals', sa.Float(), nullable=False),
+    sa.Column('expenses', sa.Float(), nullable=False),
+    sa.Column('category_totals', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('tag_totals', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.ForeignKeyConstraint(['financial_business_id'], ['financial_business.id'], name=op.f('fk_financial_period_snapshot_financial_business_id_financial_business'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_financial_period_snapshot'))
+    )
+    op.create_index(
+        'uq_financial_period_snapshot_business_period_start', 'financial_period_snapshot',
+        ['financial_business_id', 'period_start'], unique=True
+    )
+
+    # Transactions of closed months are frozen in snapshots, so they can not be
+    # inserted or changed by any client of the database
+    op.execute("""
+        CREATE FUNCTION financial_transaction_check_closed_period() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM financial_business
+                WHERE id = NEW.financial_business_id AND NEW.date < closed_until
+            ) THEN
+                RAISE EXCEPTION 'Period of financial transaction % is closed', NEW.hash_id;
+            END IF;
+            IF TG_OP = 'UPDATE' AND EXISTS (
+                SELECT 1 FROM financial_business
+                WHERE id = OLD.financial_business_id AND OLD.date < closed_until
+            ) THEN
+                RAISE EXCEPTION 'Period of financial transaction % is closed', OLD.hash_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER financial_transaction_closed_period
+        BEFORE INSERT OR UPDATE ON financial_transaction
+        FOR EACH ROW EXECUTE FUNCTION financial_transaction_check_closed_period()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER financial_transaction_closed_period ON financial_transaction")
+    op.execute("DROP FUNCTION financial_transaction_check_closed_period()")
+    op.drop_index('uq_financial_period_snapshot_business_period_start', table_name='financial_period_snapshot')
+    op.drop_table('financial_period_snapshot')
+    op.drop_column('financial_business', 'closed_until')
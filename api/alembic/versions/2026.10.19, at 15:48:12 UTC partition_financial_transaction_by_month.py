@@ -0,0 +1,161 @@
+"""Partition financial transaction table by month of date
+
+Revision ID: e91c4b7a2f58
+Revises: b37e05d9a6c1
+Create Date: 2026-10-19 15:48:12.660291
+
+"""
+from alembic import op
+from datetime import datetime
+from services.config import get_settings
+from services.finance.partitions import add_months, get_create_partition_sql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91c4b7a2f58'
+down_revision = 'b37e05d9a6c1'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, created_at, updated_at, financial_business_id, hash_id, transaction_type, "
+    "expense_category_id, accrual_category_id, amount, date, comment"
+)
+
+
+def create_partitions():
+    """
+    Partitions for every month of the existing transactions and
+    `transaction_partitions_ahead_months` months ahead,
+    later months are created by the partition manager of the application
+    """
+    connection = op.get_bind()
+    first_date, last_date = connection.exec_driver_sql(
+        "SELECT min(date), max(date) FROM financial_transaction_plain"
+    ).fetchone()
+    now = datetime.now()
+    month_start = datetime(now.year, now.month, 1)
+    last_month = add_months(month_start, get_settings().transaction_partitions_ahead_months)
+    if first_date is not None:
+        month_start = min(month_start, datetime(first_date.year, first_date.month, 1))
+        last_month = max(last_month, datetime(last_date.year, last_date.month, 1))
+
+    while month_start <= last_month:
+        op.execute(get_create_partition_sql(month_start))
+        month_start = add_months(month_start, 1)
+
+
+def upgrade():
+    op.execute("DROP TRIGGER financial_transaction_closed_period ON financial_transaction")
+    op.execute("ALTER TABLE transaction_tag DROP CONSTRAINT IF EXISTS fk_transaction_tag_transaction_hash_id_financial_transaction")
+    op.execute("ALTER TABLE financial_transaction RENAME TO financial_transaction_plain")
+    op.execute("ALTER SEQUENCE financial_transaction_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE financial_transaction (
+            id INTEGER NOT NULL DEFAULT nextval('financial_transaction_id_seq'),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            financial_business_id INTEGER,
+            hash_id VARCHAR(1024) NOT NULL,
+            transaction_type VARCHAR(7) NOT NULL,
+            expense_category_id INTEGER,
+            accrual_category_id INTEGER,
+            amount FLOAT NOT NULL,
+            date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            comment VARCHAR(255) NOT NULL
+        ) PARTITION BY RANGE (date)
+    """)
+    create_partitions()
+    op.execute(f"INSERT INTO financial_transaction ({COLUMNS}) SELECT {COLUMNS} FROM financial_transaction_plain")
+    op.execute("DROP TABLE financial_transaction_plain")
+    op.execute("ALTER SEQUENCE financial_transaction_id_seq OWNED BY financial_transaction.id")
+
+    op.execute("ALTER TABLE financial_transaction ADD CONSTRAINT pk_financial_transaction PRIMARY KEY (id, date)")
+    op.execute("""
+        ALTER TABLE financial_transaction
+        ADD CONSTRAINT fk_financial_transaction_financial_business_id_financia_f136
+        FOREIGN KEY (financial_business_id) REFERENCES financial_business (id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE financial_transaction
+        ADD CONSTRAINT fk_financial_transaction_expense_category_id_expense_categories
+        FOREIGN KEY (expense_category_id) REFERENCES expense_categories (id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE financial_transaction
+        ADD CONSTRAINT fk_financial_transaction_accrual_category_id_accrual_categories
+        FOREIGN KEY (accrual_category_id) REFERENCES accrual_categories (id) ON DELETE CASCADE
+    """)
+    op.create_index(
+        'ix_financial_transaction_business_date', 'financial_transaction',
+        ['financial_business_id', 'date', 'id'], unique=False
+    )
+    op.create_index(
+        'uq_financial_transaction_hash_id_date', 'financial_transaction',
+        ['hash_id', 'date'], unique=True
+    )
+
+    op.execute("ALTER TABLE transaction_tag ADD COLUMN transaction_date TIMESTAMP WITHOUT TIME ZONE")
+    op.execute("""
+        UPDATE transaction_tag SET transaction_date = financial_transaction.date
+        FROM financial_transaction
+        WHERE financial_transaction.hash_id = transaction_tag.transaction_hash_id
+    """)
+    op.execute("""
+        ALTER TABLE transaction_tag
+        ADD CONSTRAINT fk_transaction_tag_transaction_hash_id_financial_transaction
+        FOREIGN KEY (transaction_hash_id, transaction_date)
+        REFERENCES financial_transaction (hash_id, date) ON DELETE CASCADE ON UPDATE CASCADE
+    """)
+
+    op.execute("""
+        CREATE TRIGGER financial_transaction_closed_period
+        BEFORE INSERT OR UPDATE ON financial_transaction
+        FOR EACH ROW EXECUTE FUNCTION financial_transaction_check_closed_period()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER financial_transaction_closed_period ON financial_transaction")
+    op.execute("ALTER TABLE transaction_tag DROP CONSTRAINT fk_transaction_tag_transaction_hash_id_financial_transaction")
+    op.execute("ALTER TABLE transaction_tag DROP COLUMN transaction_date")
+    op.execute("ALTER TABLE financial_transaction RENAME TO financial_transaction_partitioned")
+    op.execute("ALTER SEQUENCE financial_transaction_id_seq OWNED BY NONE")
+    op.execute("ALTER INDEX ix_financial_transaction_business_date RENAME TO ix_financial_transaction_business_date_partitioned")
+    op.execute("ALTER TABLE financial_transaction_partitioned RENAME CONSTRAINT pk_financial_transaction TO pk_financial_transaction_partitioned")
+
+    op.execute("""
+        CREATE TABLE financial_transaction (
+            id INTEGER NOT NULL DEFAULT nextval('financial_transaction_id_seq'),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            financial_business_id INTEGER REFERENCES financial_business (id) ON DELETE CASCADE,
+            hash_id VARCHAR(1024) NOT NULL,
+            transaction_type VARCHAR(7) NOT NULL,
+            expense_category_id INTEGER REFERENCES expense_categories (id) ON DELETE CASCADE,
+            accrual_category_id INTEGER REFERENCES accrual_categories (id) ON DELETE CASCADE,
+            amount FLOAT NOT NULL,
+            date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            comment VARCHAR(255) NOT NULL,
+            CONSTRAINT pk_financial_transaction PRIMARY KEY (id),
+            CONSTRAINT uq_financial_transaction_hash_id UNIQUE (hash_id)
+        )
+    """)
+    op.execute(f"INSERT INTO financial_transaction ({COLUMNS}) SELECT {COLUMNS} FROM financial_transaction_partitioned")
+    op.execute("DROP TABLE financial_transaction_partitioned")
+    op.execute("ALTER SEQUENCE financial_transaction_id_seq OWNED BY financial_transaction.id")
+    op.create_index(
+        'ix_financial_transaction_business_date', 'financial_transaction',
+        ['financial_business_id', 'date', 'id'], unique=False
+    )
+    op.execute("""
+        ALTER TABLE transaction_tag
+        ADD CONSTRAINT fk_transaction_tag_transaction_hash_id_financial_transaction
+        FOREIGN KEY (transaction_hash_id) REFERENCES financial_transaction (hash_id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        CREATE TRIGGER financial_transaction_closed_period
+        BEFORE INSERT OR UPDATE ON financial_transaction
+        FOR EACH ROW EXECUTE FUNCTION financial_transaction_check_closed_period()
+    """)
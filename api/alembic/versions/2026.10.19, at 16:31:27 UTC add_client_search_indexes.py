@@ -0,0 +1,56 @@
+"""Add client search columns and indexes
+
+Revision ID: 4c8d2a6f1e93
+Revises: e91c4b7a2f58
+Create Date: 2026-10-19 16:31:27.104853
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4c8d2a6f1e93'
+down_revision = 'e91c4b7a2f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('client', sa.Column(
+        'search_text', sa.Text(),
+        sa.Computed("lower(name || ' ' || email || ' ' || phone || ' ' || city)", persisted=True),
+        nullable=True
+    ))
+    op.add_column('client', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed(
+            "to_tsvector('simple'::regconfig, name || ' ' || email || ' ' || phone || ' ' || city)",
+            persisted=True
+        ),
+        nullable=True
+    ))
+    op.create_index('ix_client_user_id', 'client', ['user_id'], unique=False)
+    op.create_index(
+        'ix_client_search_text_trgm', 'client', ['search_text'], unique=False,
+        postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_client_search_vector', 'client', ['search_vector'], unique=False,
+        postgresql_using='gin'
+    )
+    op.create_index(
+        'ix_client_attribute_value_trgm', 'client_attribute', ['attribute_value'], unique=False,
+        postgresql_using='gin', postgresql_ops={'attribute_value': 'gin_trgm_ops'}
+    )
+
+
+def downgrade():
+    op.drop_index('ix_client_attribute_value_trgm', table_name='client_attribute')
+    op.drop_index('ix_client_search_vector', table_name='client')
+    op.drop_index('ix_client_search_text_trgm', table_name='client')
+    op.drop_index('ix_client_user_id', table_name='client')
+    op.drop_column('client', 'search_vector')
+    op.drop_column('client', 'search_text')
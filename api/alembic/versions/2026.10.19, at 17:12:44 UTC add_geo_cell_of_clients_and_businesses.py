@@ -0,0 +1,35 @@
+"""Add geo cell of clients and businesses
+
+Revision ID: 9f2e6b1d7c40
+Revises: 4c8d2a6f1e93
+Create Date: 2026-10-19 17:12:44.318620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from services.business.geo import GEO_CELL_EXPRESSION
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2e6b1d7c40'
+down_revision = '4c8d2a6f1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('business', sa.Column(
+        'geo_cell', sa.Integer(), sa.Computed(GEO_CELL_EXPRESSION, persisted=True), nullable=True
+    ))
+    op.add_column('client', sa.Column(
+        'geo_cell', sa.Integer(), sa.Computed(GEO_CELL_EXPRESSION, persisted=True), nullable=True
+    ))
+    op.create_index('ix_business_user_id_geo_cell', 'business', ['user_id', 'geo_cell'], unique=False)
+    op.create_index('ix_client_user_id_geo_cell', 'client', ['user_id', 'geo_cell'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_client_user_id_geo_cell', table_name='client')
+    op.drop_index('ix_business_user_id_geo_cell', table_name='business')
+    op.drop_column('client', 'geo_cell')
+    op.drop_column('business', 'geo_cell')
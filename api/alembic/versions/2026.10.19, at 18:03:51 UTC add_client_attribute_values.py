@@ -0,0 +1,59 @@
+"""Add client attribute values
+
+Revision ID: 2b7a5e0c9d14
+Revises: 9f2e6b1d7c40
+Create Date: 2026-10-19 18:03:51.947305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from services.business.attributes import AGGREGATE_ATTRIBUTES_SQL
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7a5e0c9d14'
+down_revision = '9f2e6b1d7c40'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_attribute_values():
+    """
+    Clients with rows in `client_attribute` are filled by ranges of id,
+    every range is committed on its own so locks of `client` rows stay short.
+    Filling is idempotent and may be repeated after the deploy
+    """
+    connection = op.get_bind()
+    last_id = connection.exec_driver_sql("SELECT coalesce(max(client_id), 0) FROM client_attribute").scalar()
+    for low in range(0, last_id + 1, BACKFILL_BATCH_SIZE):
+        connection.execute(
+            sa.text(
+                f"UPDATE client SET attribute_values = ({AGGREGATE_ATTRIBUTES_SQL}) "
+                "WHERE client.id IN ("
+                "SELECT DISTINCT client_id FROM client_attribute WHERE client_id >= :low AND client_id < :high"
+                ")"
+            ),
+            {'low': low, 'high': low + BACKFILL_BATCH_SIZE}
+        )
+
+
+def upgrade():
+    # A constant default is stored in the catalog, adding the column does not rewrite the table
+    op.add_column('client', sa.Column(
+        'attribute_values', postgresql.JSONB(astext_type=sa.Text()),
+        server_default='{}', nullable=False
+    ))
+    with op.get_context().autocommit_block():
+        backfill_attribute_values()
+        op.create_index(
+            'ix_client_attribute_values', 'client', ['attribute_values'], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.drop_index('ix_client_attribute_values', table_name='client')
+    op.drop_column('client', 'attribute_values')
@@ -0,0 +1,40 @@
+"""Add normalized contacts of client
+
+Revision ID: 6e3f8c2a4b57
+Revises: 2b7a5e0c9d14
+Create Date: 2026-10-19 19:27:06.402198
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e3f8c2a4b57'
+down_revision = '2b7a5e0c9d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('client', sa.Column(
+        'email_normalized', sa.VARCHAR(length=255),
+        sa.Computed("lower(btrim(email))", persisted=True), nullable=True
+    ))
+    op.add_column('client', sa.Column(
+        'phone_normalized', sa.VARCHAR(length=255),
+        sa.Computed("regexp_replace(phone, '[^0-9]', '', 'g')", persisted=True), nullable=True
+    ))
+    op.create_index(
+        'ix_client_user_id_email_normalized', 'client', ['user_id', 'email_normalized'], unique=False
+    )
+    op.create_index(
+        'ix_client_user_id_phone_normalized', 'client', ['user_id', 'phone_normalized'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_client_user_id_phone_normalized', table_name='client')
+    op.drop_index('ix_client_user_id_email_normalized', table_name='client')
+    op.drop_column('client', 'phone_normalized')
+    op.drop_column('client', 'email_normalized')
@@ -0,0 +1,45 @@
+"""Create client status change table for the client timeline
+
+Revision ID: 7d1a9c3e5f28
+Revises: 6e3f8c2a4b57
+Create Date: 2026-10-19 20:14:38.517302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d1a9c3e5f28'
+down_revision = '6e3f8c2a4b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('client_status_change',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('old_status', sa.Enum('NEW', 'IN_PROGRESS', 'IN_ARCHIVE', name='statususerforbusiness', native_enum=False), nullable=False),
+    sa.Column('new_status', sa.Enum('NEW', 'IN_PROGRESS', 'IN_ARCHIVE', name='statususerforbusiness', native_enum=False), nullable=False),
+    sa.Column('changed_at', sa.TIMESTAMP(), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['client.id'], name=op.f('fk_client_status_change_client_id_client'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_client_status_change'))
+    )
+    op.create_index(
+        'ix_client_status_change_client_id_changed_at', 'client_status_change',
+        ['client_id', 'changed_at', 'id'], unique=False
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_participant_client_id', 'participant', ['client_id', 'event_id'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.drop_index('ix_participant_client_id', table_name='participant')
+    op.drop_index('ix_client_status_change_client_id_changed_at', table_name='client_status_change')
+    op.drop_table('client_status_change')
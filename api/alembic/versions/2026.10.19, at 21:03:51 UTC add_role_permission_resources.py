@@ -0,0 +1,37 @@
+"""Add resources and actions to role permissions
+
+Revision ID: 8b2e4d6f1a39
+Revises: 7d1a9c3e5f28
+Create Date: 2026-10-19 21:03:51.204816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a39'
+down_revision = '7d1a9c3e5f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('role_permissions', sa.Column('resource', sa.Enum('BUSINESS', 'ROLES', 'TEAM', 'EVENTS', 'FINANCE', name='permissionresource', native_enum=False), nullable=True))
+    op.add_column('role_permissions', sa.Column('actions', sa.Integer(), server_default='0', nullable=False))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_role_permissions_role_id', 'role_permissions', ['role_id'], unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_team_member_user_id', 'team_member', ['user_id'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.drop_index('ix_team_member_user_id', table_name='team_member')
+    op.drop_index('ix_role_permissions_role_id', table_name='role_permissions')
+    op.drop_column('role_permissions', 'actions')
+    op.drop_column('role_permissions', 'resource')
@@ -0,0 +1,38 @@
+"""Add indexes of the counters of the business dashboard
+
+Revision ID: 9c4f1b7e2d60
+Revises: 8b2e4d6f1a39
+Create Date: 2026-10-19 21:27:16.840152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4f1b7e2d60'
+down_revision = '8b2e4d6f1a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_team_member_business_id', 'team_member', ['business_id'], unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_calendar_event_business_id_event_date', 'calendar_event', ['business_id', 'event_date'], unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_financial_business_business_id', 'financial_business', ['business_id'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.drop_index('ix_financial_business_business_id', table_name='financial_business')
+    op.drop_index('ix_calendar_event_business_id_event_date', table_name='calendar_event')
+    op.drop_index('ix_team_member_business_id', table_name='team_member')
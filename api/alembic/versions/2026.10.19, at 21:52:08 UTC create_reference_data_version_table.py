@@ -0,0 +1,56 @@
+"""Create reference data version table bumped by triggers of reference tables
+
+Revision ID: a1d5e8f3c7b2
+Revises: 9c4f1b7e2d60
+Create Date: 2026-10-19 21:52:08.113560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d5e8f3c7b2'
+down_revision = '9c4f1b7e2d60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reference_data_version',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('name', sa.VARCHAR(length=255), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_reference_data_version')),
+    sa.UniqueConstraint('name', name=op.f('uq_reference_data_version_name'))
+    )
+    op.execute("""
+        INSERT INTO reference_data_version (created_at, updated_at, name, version)
+        VALUES (now(), now(), 'scope_type_business', 1)
+    """)
+
+    # Every statement changing a reference table bumps its version,
+    # including changes made outside of the application
+    op.execute("""
+        CREATE FUNCTION reference_data_bump_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE reference_data_version
+            SET version = version + 1, updated_at = now()
+            WHERE name = TG_TABLE_NAME;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER scope_type_business_reference_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON scope_type_business
+        FOR EACH STATEMENT EXECUTE FUNCTION reference_data_bump_version()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER scope_type_business_reference_version ON scope_type_business")
+    op.execute("DROP FUNCTION reference_data_bump_version()")
+    op.drop_table('reference_data_version')
@@ -0,0 +1,40 @@
+"""Add seed hash of reference data and unique names of scope types
+
+Revision ID: b3e7a2c9d4f1
+Revises: a1d5e8f3c7b2
+Create Date: 2026-10-19 22:10:45.962817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7a2c9d4f1'
+down_revision = 'a1d5e8f3c7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('reference_data_version', sa.Column('seed_hash', sa.VARCHAR(length=64), nullable=True))
+
+    # Duplicates left by the old seeding are merged into the first type of the name
+    op.execute("""
+        UPDATE business SET scope_type_id = keep.id
+        FROM scope_type_business duplicate
+        JOIN (SELECT name, min(id) AS id FROM scope_type_business GROUP BY name) keep
+            ON keep.name = duplicate.name AND keep.id <> duplicate.id
+        WHERE business.scope_type_id = duplicate.id
+    """)
+    op.execute("""
+        DELETE FROM scope_type_business duplicate
+        USING scope_type_business keep
+        WHERE keep.name = duplicate.name AND keep.id < duplicate.id
+    """)
+    op.create_unique_constraint(op.f('uq_scope_type_business_name'), 'scope_type_business', ['name'])
+
+
+def downgrade():
+    op.drop_constraint(op.f('uq_scope_type_business_name'), 'scope_type_business', type_='unique')
+    op.drop_column('reference_data_version', 'seed_hash')
@@ -0,0 +1,52 @@
+"""Store sha256 digests of refresh tokens with token families
+
+Revision ID: c5f9b3d1e8a4
+Revises: b3e7a2c9d4f1
+Create Date: 2026-10-19 22:41:27.351092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f9b3d1e8a4'
+down_revision = 'b3e7a2c9d4f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('refresh_tokens', sa.Column('token_digest', sa.LargeBinary(length=32), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('previous_digest', sa.LargeBinary(length=32), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('family_id', sa.VARCHAR(length=32), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('revoked_at', sa.TIMESTAMP(), nullable=True))
+
+    # Issued tokens stay valid, every one of them starts its own family
+    op.execute("""
+        UPDATE refresh_tokens
+        SET token_digest = sha256(convert_to(refresh_token, 'UTF8')),
+            family_id = replace(gen_random_uuid()::text, '-', '')
+    """)
+    op.alter_column('refresh_tokens', 'token_digest', nullable=False)
+    op.alter_column('refresh_tokens', 'family_id', nullable=False)
+    op.drop_constraint('uq_refresh_tokens_refresh_token', 'refresh_tokens', type_='unique')
+    op.drop_column('refresh_tokens', 'refresh_token')
+
+    op.create_unique_constraint(op.f('uq_refresh_tokens_token_digest'), 'refresh_tokens', ['token_digest'])
+    op.create_index(op.f('ix_refresh_tokens_previous_digest'), 'refresh_tokens', ['previous_digest'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_family_id'), 'refresh_tokens', ['family_id'], unique=False)
+
+
+def downgrade():
+    # Tokens can not be restored from their digests, every user signs in again
+    op.execute("DELETE FROM refresh_tokens")
+    op.drop_index(op.f('ix_refresh_tokens_family_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_previous_digest'), table_name='refresh_tokens')
+    op.drop_constraint(op.f('uq_refresh_tokens_token_digest'), 'refresh_tokens', type_='unique')
+    op.add_column('refresh_tokens', sa.Column('refresh_token', sa.VARCHAR(length=255), nullable=False))
+    op.create_unique_constraint('uq_refresh_tokens_refresh_token', 'refresh_tokens', ['refresh_token'])
+    op.drop_column('refresh_tokens', 'revoked_at')
+    op.drop_column('refresh_tokens', 'family_id')
+    op.drop_column('refresh_tokens', 'previous_digest')
+    op.drop_column('refresh_tokens', 'token_digest')
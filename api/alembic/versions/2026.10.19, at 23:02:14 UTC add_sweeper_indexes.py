@@ -0,0 +1,33 @@
+"""Add indexes of expired refresh tokens and stale devices for the sweeper
+
+Revision ID: d8a2c6e4f0b7
+Revises: c5f9b3d1e8a4
+Create Date: 2026-10-19 23:02:14.675230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a2c6e4f0b7'
+down_revision = 'c5f9b3d1e8a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            op.f('ix_devices_last_authentication'), 'devices', ['last_authentication'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_devices_last_authentication'), table_name='devices')
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
@@ -0,0 +1,31 @@
+"""Add unique device id for upserts of devices
+
+Revision ID: e2b6d0f8a3c5
+Revises: d8a2c6e4f0b7
+Create Date: 2026-10-19 23:24:50.418733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6d0f8a3c5'
+down_revision = 'd8a2c6e4f0b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only the last seen row of a device is kept
+    op.execute("""
+        DELETE FROM devices duplicate
+        USING devices keep
+        WHERE keep.device_id = duplicate.device_id
+            AND (keep.last_authentication, keep.id) > (duplicate.last_authentication, duplicate.id)
+    """)
+    op.create_unique_constraint(op.f('uq_devices_device_id'), 'devices', ['device_id'])
+
+
+def downgrade():
+    op.drop_constraint(op.f('uq_devices_device_id'), 'devices', type_='unique')
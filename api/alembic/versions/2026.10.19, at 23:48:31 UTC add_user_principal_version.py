@@ -0,0 +1,24 @@
+"""Add principal version of users for claims of access tokens
+
+Revision ID: f4c8e1a6b9d2
+Revises: e2b6d0f8a3c5
+Create Date: 2026-10-19 23:48:31.207154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c8e1a6b9d2'
+down_revision = 'e2b6d0f8a3c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('principal_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('user', 'principal_version')
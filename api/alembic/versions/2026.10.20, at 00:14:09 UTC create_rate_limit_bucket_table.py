@@ -0,0 +1,34 @@
+"""Create unlogged table of rate limit buckets shared by the workers
+
+Revision ID: a7d3f9c2e5b8
+Revises: f4c8e1a6b9d2
+Create Date: 2026-10-20 00:14:09.531862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f9c2e5b8'
+down_revision = 'f4c8e1a6b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Buckets are lost on a crash of Postgres, so their writes skip the WAL
+    op.create_table('rate_limit_bucket',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('key', sa.VARCHAR(length=255), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_rate_limit_bucket')),
+    sa.UniqueConstraint('key', name=op.f('uq_rate_limit_bucket_key')),
+    prefixes=['UNLOGGED']
+    )
+
+
+def downgrade():
+    op.drop_table('rate_limit_bucket')
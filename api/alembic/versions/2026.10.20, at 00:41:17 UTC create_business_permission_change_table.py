@@ -0,0 +1,35 @@
+"""Create table of permission changes polled by the workers
+
+Revision ID: b9e4c7a1d3f6
+Revises: a7d3f9c2e5b8
+Create Date: 2026-10-20 00:41:17.638204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e4c7a1d3f6'
+down_revision = 'a7d3f9c2e5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('business_permission_change',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('business_id', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.TIMESTAMP(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_business_permission_change'))
+    )
+    op.create_index(
+        op.f('ix_business_permission_change_changed_at'), 'business_permission_change', ['changed_at'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_business_permission_change_changed_at'), table_name='business_permission_change')
+    op.drop_table('business_permission_change')
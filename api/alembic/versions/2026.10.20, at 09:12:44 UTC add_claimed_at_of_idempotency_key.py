@@ -0,0 +1,27 @@
+"""Add claim time of idempotency keys for the lease of requests in progress
+
+Revision ID: c3f8a5d2e7b4
+Revises: b9e4c7a1d3f6
+Create Date: 2026-10-20 09:12:44.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a5d2e7b4'
+down_revision = 'b9e4c7a1d3f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'idempotency_key',
+        sa.Column('claimed_at', sa.TIMESTAMP(), server_default=sa.text('LOCALTIMESTAMP'), nullable=False)
+    )
+
+
+def downgrade():
+    op.drop_column('idempotency_key', 'claimed_at')
@@ -0,0 +1,37 @@
+"""Drop the international prefix 00 from normalized phones of clients
+
+Revision ID: d6a1e9c4b2f7
+Revises: c3f8a5d2e7b4
+Create Date: 2026-10-20 09:47:20.173942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a1e9c4b2f7'
+down_revision = 'c3f8a5d2e7b4'
+branch_labels = None
+depends_on = None
+
+
+def replace_phone_normalized(expression: str):
+    # The expression of a generated column can not be altered
+    op.drop_index('ix_client_user_id_phone_normalized', table_name='client')
+    op.drop_column('client', 'phone_normalized')
+    op.add_column('client', sa.Column(
+        'phone_normalized', sa.VARCHAR(length=255),
+        sa.Computed(expression, persisted=True), nullable=True
+    ))
+    op.create_index(
+        'ix_client_user_id_phone_normalized', 'client', ['user_id', 'phone_normalized'], unique=False
+    )
+
+
+def upgrade():
+    replace_phone_normalized(r"regexp_replace(regexp_replace(phone, '^\s*00', ''), '[^0-9]', '', 'g')")
+
+
+def downgrade():
+    replace_phone_normalized("regexp_replace(phone, '[^0-9]', '', 'g')")
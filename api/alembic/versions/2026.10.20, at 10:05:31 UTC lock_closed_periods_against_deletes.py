@@ -0,0 +1,79 @@
+"""Lock transactions of closed periods against deletes
+
+Revision ID: e2b7c5f9a4d8
+Revises: d6a1e9c4b2f7
+Create Date: 2026-10-20 10:05:31.402618
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c5f9a4d8'
+down_revision = 'd6a1e9c4b2f7'
+branch_labels = None
+depends_on = None
+
+
+def replace_check_closed_period(body: str, events: str):
+    op.execute("DROP TRIGGER financial_transaction_closed_period ON financial_transaction")
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION financial_transaction_check_closed_period() RETURNS trigger AS $$
+        BEGIN
+            {body}
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE TRIGGER financial_transaction_closed_period
+        BEFORE {events} ON financial_transaction
+        FOR EACH ROW EXECUTE FUNCTION financial_transaction_check_closed_period()
+    """)
+
+
+def upgrade():
+    # A deleted transaction of a closed month changes its snapshot as much as an
+    # updated one. Deletes cascaded from a deleted financial business pass, the
+    # business row is already gone when they are checked
+    replace_check_closed_period(
+        body="""
+            IF TG_OP <> 'DELETE' AND EXISTS (
+                SELECT 1 FROM financial_business
+                WHERE id = NEW.financial_business_id AND NEW.date < closed_until
+            ) THEN
+                RAISE EXCEPTION 'Period of financial transaction % is closed', NEW.hash_id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND EXISTS (
+                SELECT 1 FROM financial_business
+                WHERE id = OLD.financial_business_id AND OLD.date < closed_until
+            ) THEN
+                RAISE EXCEPTION 'Period of financial transaction % is closed', OLD.hash_id;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            RETURN NEW;
+        """,
+        events='INSERT OR UPDATE OR DELETE'
+    )
+
+
+def downgrade():
+    replace_check_closed_period(
+        body="""
+            IF EXISTS (
+                SELECT 1 FROM financial_business
+                WHERE id = NEW.financial_business_id AND NEW.date < closed_until
+            ) THEN
+                RAISE EXCEPTION 'Period of financial transaction % is closed', NEW.hash_id;
+            END IF;
+            IF TG_OP = 'UPDATE' AND EXISTS (
+                SELECT 1 FROM financial_business
+                WHERE id = OLD.financial_business_id AND OLD.date < closed_until
+            ) THEN
+                RAISE EXCEPTION 'Period of financial transaction % is closed', OLD.hash_id;
+            END IF;
+            RETURN NEW;
+        """,
+        events='INSERT OR UPDATE'
+    )
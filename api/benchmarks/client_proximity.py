@@ -0,0 +1,163 @@
+"""
+Benchmark of radius and nearest-N queries of clients with a plain scan and with
+the geo cell index, requires the database of DATABASE_URL.
+
+    cd api && python -m benchmarks.client_proximity --clients 1000000
+
+Tables are created in the `benchmark` schema and dropped at the end.
+"""
+from services.config import get_settings
+from services.business.geo import GEO_CELL_EXPRESSION, get_cell_ranges, haversine_km
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+import argparse
+import asyncio
+import random
+import time
+
+# Clients are spread around these points, most of them in a city radius
+CITIES = [
+    (55.7558, 37.6173),
+    (59.9343, 30.3351),
+    (50.4501, 30.5234),
+    (52.5200, 13.4050),
+    (40.7128, -74.0060),
+]
+
+HAVERSINE_SQL = (
+    "2 * 6371.0088 * asin(least(1, sqrt("
+    "power(sin(radians(latitude - :latitude) / 2), 2) "
+    "+ cos(radians(:latitude)) * cos(radians(latitude)) * power(sin(radians(longitude - :longitude) / 2), 2)"
+    ")))"
+)
+
+
+async def prepare(connection, clients: int, users: int) -> None:
+    await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+    await connection.execute(text("CREATE SCHEMA benchmark"))
+    await connection.execute(text(
+        "CREATE TABLE benchmark.client ("
+        "id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "latitude FLOAT(20) NOT NULL, longitude FLOAT(20) NOT NULL, "
+        f"geo_cell INTEGER GENERATED ALWAYS AS ({GEO_CELL_EXPRESSION}) STORED)"
+    ))
+    cities = "ARRAY[" + ", ".join(f"ARRAY[{latitude}, {longitude}]" for latitude, longitude in CITIES) + "]"
+    await connection.execute(
+        text(
+            "INSERT INTO benchmark.client (id, user_id, latitude, longitude) "
+            "SELECT i, 1 + (i % :users), "
+            f"greatest(-89.9, least(89.9, ({cities})[1 + i % {len(CITIES)}][1] + (random() - 0.5) * 4)), "
+            f"({cities})[1 + i % {len(CITIES)}][2] + (random() - 0.5) * 6 "
+            "FROM generate_series(1, :clients) AS i"
+        ),
+        {'users': users, 'clients': clients}
+    )
+    await connection.execute(text("CREATE INDEX ix_benchmark_client_user_id ON benchmark.client (user_id)"))
+    await connection.execute(
+        text("CREATE INDEX ix_benchmark_client_user_id_geo_cell ON benchmark.client (user_id, geo_cell)")
+    )
+    await connection.execute(text("ANALYZE benchmark.client"))
+
+
+async def within_radius_scan(connection, user_id: int, latitude: float, longitude: float, radius_km: float) -> list:
+    statement = text(
+        f"SELECT id, {HAVERSINE_SQL} AS distance FROM benchmark.client "
+        f"WHERE user_id = :user_id AND {HAVERSINE_SQL} <= :radius ORDER BY distance"
+    )
+    parameters = {'user_id': user_id, 'latitude': latitude, 'longitude': longitude, 'radius': radius_km}
+    return (await connection.execute(statement, parameters)).fetchall()
+
+
+async def within_radius_cells(connection, user_id: int, latitude: float, longitude: float, radius_km: float) -> list:
+    ranges = get_cell_ranges(latitude=latitude, longitude=longitude, radius_km=radius_km)
+    condition = " OR ".join(f"geo_cell BETWEEN {low} AND {high}" for low, high in ranges)
+    statement = text(
+        f"SELECT id, latitude, longitude FROM benchmark.client WHERE user_id = :user_id AND ({condition})"
+    )
+    rows = (await connection.execute(statement, {'user_id': user_id})).fetchall()
+    nearby = list()
+    for client_id, client_latitude, client_longitude in rows:
+        distance = haversine_km(latitude, longitude, client_latitude, client_longitude)
+        if distance <= radius_km:
+            nearby.append((client_id, distance))
+    return sorted(nearby, key=lambda item: item[1])
+
+
+async def nearest_scan(connection, user_id: int, latitude: float, longitude: float, limit: int) -> list:
+    statement = text(
+        f"SELECT id, {HAVERSINE_SQL} AS distance FROM benchmark.client "
+        "WHERE user_id = :user_id ORDER BY distance LIMIT :limit"
+    )
+    parameters = {'user_id': user_id, 'latitude': latitude, 'longitude': longitude, 'limit': limit}
+    return (await connection.execute(statement, parameters)).fetchall()
+
+
+async def nearest_cells(connection, user_id: int, latitude: float, longitude: float, limit: int) -> list:
+    settings = get_settings()
+    radius_km = settings.geo_nearest_start_radius_km
+    while True:
+        nearby = await within_radius_cells(
+            connection=connection, user_id=user_id, latitude=latitude, longitude=longitude, radius_km=radius_km
+        )
+        if len(nearby) >= limit or radius_km >= settings.geo_nearest_max_radius_km:
+            return nearby[:limit]
+        radius_km = min(radius_km * 2, settings.geo_nearest_max_radius_km)
+
+
+async def measure(function, repeat: int, **kwargs) -> float:
+    timings = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await function(**kwargs)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def run(arguments) -> None:
+    engine = create_async_engine(get_settings().database_url)
+    async with engine.begin() as connection:
+        print(f"loading {arguments.clients} clients of {arguments.users} users")
+        await prepare(connection=connection, clients=arguments.clients, users=arguments.users)
+
+    random.seed(arguments.seed)
+    latitude, longitude = CITIES[0]
+    origin = {
+        'user_id': 1,
+        'latitude': latitude + random.uniform(-0.5, 0.5),
+        'longitude': longitude + random.uniform(-0.5, 0.5),
+    }
+    try:
+        async with engine.connect() as connection:
+            for radius_km in arguments.radius:
+                scan = await measure(
+                    within_radius_scan, arguments.repeat, connection=connection, radius_km=radius_km, **origin
+                )
+                cells = await measure(
+                    within_radius_cells, arguments.repeat, connection=connection, radius_km=radius_km, **origin
+                )
+                print(f"clients within {radius_km} km: scan {scan * 1000:.1f} ms, cells {cells * 1000:.1f} ms")
+
+            scan = await measure(nearest_scan, arguments.repeat, connection=connection, limit=arguments.nearest, **origin)
+            cells = await measure(
+                nearest_cells, arguments.repeat, connection=connection, limit=arguments.nearest, **origin
+            )
+            print(f"nearest {arguments.nearest} clients: scan {scan * 1000:.1f} ms, cells {cells * 1000:.1f} ms")
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--radius', type=float, nargs='+', default=[5, 25, 100])
+    parser.add_argument('--nearest', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark of finance analytics over synthetic transactions.
+
+    cd api && python -m benchmarks.finance_analytics --transactions 1000000
+"""
+from services.finance.analytics import TransactionColumns, compute_finance_analytics
+import numpy as np
+import argparse
+import time
+
+
+def synthetic_columns(transactions: int, days: int, categories: int, seed: int = 7) -> TransactionColumns:
+    generator = np.random.default_rng(seed)
+    day_values = np.sort(generator.integers(19000, 19000 + days, size=transactions))
+    is_expense = generator.random(transactions) < 0.7
+    amounts = np.round(generator.lognormal(mean=3.5, sigma=0.8, size=transactions), 2)
+    return TransactionColumns(
+        ids=np.arange(1, transactions + 1, dtype=np.int64),
+        days=day_values.astype(np.int64),
+        amounts=np.where(is_expense, -amounts, amounts),
+        categories=generator.integers(1, categories + 1, size=transactions).astype(np.int64)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=3 * 365)
+    parser.add_argument('--categories', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args()
+
+    columns = synthetic_columns(
+        transactions=arguments.transactions,
+        days=arguments.days,
+        categories=arguments.categories
+    )
+    today = int(columns.days[-1])
+
+    timings = list()
+    for _ in range(arguments.repeat):
+        started = time.perf_counter()
+        analytics = compute_finance_analytics(columns=columns, today=today, horizon=90)
+        timings.append(time.perf_counter() - started)
+
+    print(f"transactions: {arguments.transactions}")
+    print(f"anomalies: {len(analytics.anomalies)}, trends: {len(analytics.category_trends)}")
+    print(f"best: {min(timings) * 1000:.1f} ms, mean: {sum(timings) / len(timings) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark of refresh throughput with the former flow (collision check, lookup of
+the plain token, user fetch and update) and with the rotation of the digest in
+one statement, requires the database of DATABASE_URL.
+
+    cd api && python -m benchmarks.refresh_tokens --tokens 100000 --workers 20
+
+Tables are created in the `benchmark` schema and dropped at the end.
+"""
+from services.config import get_settings
+from services.base.resolvers import generate_refresh_token, get_token_digest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+import argparse
+import asyncio
+import secrets
+import time
+
+LEGACY_EXISTS = "SELECT 1 FROM benchmark.legacy_token WHERE refresh_token = :token"
+LEGACY_LOOKUP = "SELECT id, user_id FROM benchmark.legacy_token WHERE refresh_token = :token AND expires_at > now()"
+LEGACY_USER = 'SELECT id, email FROM benchmark."user" WHERE id = :user_id'
+LEGACY_UPDATE = (
+    "UPDATE benchmark.legacy_token SET refresh_token = :token, expires_at = now() + interval '30 days' "
+    "WHERE id = :id"
+)
+ROTATE = (
+    'UPDATE benchmark.refresh_tokens SET token_digest = :new_digest, previous_digest = :digest, '
+    "expires_at = now() + interval '30 days' "
+    'FROM benchmark."user" '
+    "WHERE token_digest = :digest AND expires_at > now() AND revoked_at IS NULL "
+    'AND benchmark."user".id = refresh_tokens.user_id '
+    'RETURNING refresh_tokens.user_id, benchmark."user".email, benchmark."user".principal_version'
+)
+
+
+async def prepare(connection, tokens: int, users: int) -> None:
+    await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+    await connection.execute(text("CREATE SCHEMA benchmark"))
+    await connection.execute(text(
+        'CREATE TABLE benchmark."user" ('
+        "id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL, principal_version INTEGER NOT NULL)"
+    ))
+    await connection.execute(text(
+        "CREATE TABLE benchmark.legacy_token ("
+        "id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "refresh_token VARCHAR(255) NOT NULL UNIQUE, expires_at TIMESTAMP NOT NULL)"
+    ))
+    await connection.execute(text(
+        "CREATE TABLE benchmark.refresh_tokens ("
+        "id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "token_digest BYTEA NOT NULL UNIQUE, previous_digest BYTEA, family_id VARCHAR(32) NOT NULL, "
+        "revoked_at TIMESTAMP, expires_at TIMESTAMP NOT NULL)"
+    ))
+    await connection.execute(
+        text(
+            'INSERT INTO benchmark."user" (id, email, principal_version) '
+            "SELECT i, 'user' || i || '@example.com', 0 FROM generate_series(1, :users) AS i"
+        ),
+        {'users': users}
+    )
+    # The token of the row `i` is `token-<i>` in both tables
+    await connection.execute(
+        text(
+            "INSERT INTO benchmark.legacy_token (id, user_id, refresh_token, expires_at) "
+            "SELECT i, 1 + (i % :users), 'token-' || i, now() + interval '30 days' "
+            "FROM generate_series(1, :tokens) AS i"
+        ),
+        {'users': users, 'tokens': tokens}
+    )
+    await connection.execute(
+        text(
+            "INSERT INTO benchmark.refresh_tokens (id, user_id, token_digest, family_id, expires_at) "
+            "SELECT i, 1 + (i % :users), sha256(convert_to('token-' || i, 'UTF8')), md5(i::text), "
+            "now() + interval '30 days' "
+            "FROM generate_series(1, :tokens) AS i"
+        ),
+        {'users': users, 'tokens': tokens}
+    )
+    await connection.execute(
+        text("CREATE INDEX ix_benchmark_refresh_tokens_previous_digest ON benchmark.refresh_tokens (previous_digest)")
+    )
+    for table in ('"user"', 'legacy_token', 'refresh_tokens'):
+        await connection.execute(text(f"ANALYZE benchmark.{table}"))
+
+
+async def refresh_legacy(engine, tokens: list) -> None:
+    for token in tokens:
+        async with engine.begin() as connection:
+            while True:
+                new_token = secrets.token_hex(100)
+                if (await connection.execute(text(LEGACY_EXISTS), {'token': new_token})).first() is None:
+                    break
+            row = (await connection.execute(text(LEGACY_LOOKUP), {'token': token})).first()
+            await connection.execute(text(LEGACY_USER), {'user_id': row.user_id})
+            await connection.execute(text(LEGACY_UPDATE), {'token': new_token, 'id': row.id})
+
+
+async def refresh_rotation(engine, tokens: list) -> None:
+    for token in tokens:
+        async with engine.begin() as connection:
+            parameters = {
+                'digest': get_token_digest(token=token),
+                'new_digest': get_token_digest(token=generate_refresh_token())
+            }
+            row = (await connection.execute(text(ROTATE), parameters)).first()
+            assert row is not None
+
+
+async def measure(function, engine, tokens: int, workers: int) -> float:
+    """
+    Refreshes a second of `workers` clients refreshing their share of the tokens once
+    """
+    shares = [[f"token-{i}" for i in range(1 + worker, tokens + 1, workers)] for worker in range(workers)]
+    started = time.perf_counter()
+    await asyncio.gather(*(function(engine=engine, tokens=share) for share in shares))
+    return tokens / (time.perf_counter() - started)
+
+
+async def run(arguments) -> None:
+    engine = create_async_engine(get_settings().database_url, pool_size=arguments.workers, max_overflow=0)
+    async with engine.begin() as connection:
+        print(f"loading {arguments.tokens} tokens of {arguments.users} users")
+        await prepare(connection=connection, tokens=arguments.tokens, users=arguments.users)
+
+    try:
+        legacy = await measure(refresh_legacy, engine=engine, tokens=arguments.tokens, workers=arguments.workers)
+        rotation = await measure(refresh_rotation, engine=engine, tokens=arguments.tokens, workers=arguments.workers)
+        print(f"{arguments.workers} workers: legacy {legacy:.0f} refreshes/s, rotation {rotation:.0f} refreshes/s")
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
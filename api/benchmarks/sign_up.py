@@ -0,0 +1,156 @@
+"""
+Benchmark of sign-up throughput with the former flow (a commit after the user,
+its profile and credentials, then device, invites, token collision check and
+token) and with `sign_up_user`, one statement of data-modifying CTEs,
+requires the migrated database of DATABASE_URL.
+
+    cd api && python -m benchmarks.sign_up --users 20000 --workers 20
+
+Copies of the tables are created in the `benchmark` schema and dropped at the end,
+passwords are hashed once beforehand, hashing costs the same in both flows.
+"""
+from services.config import get_settings
+from services.base.models import User, ThirdPartyAuthentication, RefreshToken, Devices, TeamMember, define_expire
+from services.base.passwords import hash_password_sync
+from services.base.resolvers import generate_refresh_token, get_token_digest
+from services.base.work_with_db import sign_up_user
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+from datetime import datetime
+import argparse
+import asyncio
+import time
+import uuid
+
+TABLES = [User, ThirdPartyAuthentication, RefreshToken, Devices, TeamMember]
+
+
+async def prepare(connection, users: int, invites: int) -> None:
+    await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+    await connection.execute(text("CREATE SCHEMA benchmark"))
+    for model in TABLES:
+        table = f'"{model.__tablename__}"'
+        # Copies do not share the sequences of the originals
+        await connection.execute(text(f"CREATE TABLE benchmark.{table} (LIKE public.{table} INCLUDING ALL)"))
+        await connection.execute(text(
+            f"ALTER TABLE benchmark.{table} ALTER COLUMN id DROP DEFAULT, "
+            "ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY"
+        ))
+    # A pending invite for every `users / invites` sign-up of both flows
+    await connection.execute(
+        text(
+            "INSERT INTO benchmark.team_member "
+            "(email, date_from, date_to, description, member_type, member_status, created_at, updated_at) "
+            "SELECT flow || '-' || i || '@example.com', now(), now(), '', 'STAFF', false, now(), now() "
+            "FROM generate_series(1, :users, greatest(1, :users / :invites)) AS i, "
+            "unnest(ARRAY['legacy', 'cte']) AS flow"
+        ),
+        {'users': users, 'invites': max(invites, 1)}
+    )
+    await connection.execute(text("ANALYZE benchmark.team_member"))
+
+
+def get_user_data(email: str, password: str) -> dict:
+    return {'email': email, 'password': password}
+
+
+async def sign_up_legacy(engine, emails: list, password: str) -> None:
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(schema_translate_map={None: 'benchmark'})
+        for email in emails:
+            now = datetime.now()
+            user_id = (
+                await connection.execute(
+                    insert(User.__table__).values(**get_user_data(email=email, password=password)).returning(User.id)
+                )
+            ).scalar()
+            await connection.commit()
+            await connection.execute(
+                update(User.__table__).where(User.id == user_id).values(first_name='First', second_name='Second')
+            )
+            await connection.commit()
+            await connection.execute(insert(ThirdPartyAuthentication.__table__).values(user_id=user_id, google_uid=''))
+            await connection.commit()
+            await connection.execute(
+                insert_postgresql(Devices.__table__)
+                .values(user_id=user_id, device_id=uuid.uuid4().hex, last_authentication=now)
+                .on_conflict_do_update(
+                    index_elements=[Devices.device_id], set_={'user_id': user_id, 'last_authentication': now}
+                )
+            )
+            await connection.execute(
+                update(TeamMember.__table__).where(TeamMember.email == email).values(user_id=user_id)
+            )
+            while True:
+                token_digest = get_token_digest(token=generate_refresh_token())
+                exists = (
+                    await connection.execute(select(RefreshToken.id).where(RefreshToken.token_digest == token_digest))
+                ).first()
+                if exists is None:
+                    break
+            await connection.execute(
+                insert(RefreshToken.__table__).values(
+                    user_id=user_id, token_digest=token_digest, family_id=uuid.uuid4().hex, expires_at=define_expire()
+                )
+            )
+            await connection.commit()
+
+
+async def sign_up_cte(engine, emails: list, password: str) -> None:
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(schema_translate_map={None: 'benchmark'})
+        for email in emails:
+            user = await sign_up_user(
+                db=connection, user_data=get_user_data(email=email, password=password), google_uid='',
+                token_digest=get_token_digest(token=generate_refresh_token())
+            )
+            assert user is not None
+            await connection.commit()
+
+
+async def measure(function, engine, flow: str, users: int, workers: int, password: str) -> float:
+    """
+    Sign-ups a second of `workers` clients signing up their share of the users
+    """
+    shares = [
+        [f"{flow}-{i}@example.com" for i in range(1 + worker, users + 1, workers)] for worker in range(workers)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(function(engine=engine, emails=share, password=password) for share in shares))
+    return users / (time.perf_counter() - started)
+
+
+async def run(arguments) -> None:
+    engine = create_async_engine(get_settings().database_url, pool_size=arguments.workers, max_overflow=0)
+    async with engine.begin() as connection:
+        print(f"copying tables for {arguments.users} sign-ups of each flow")
+        await prepare(connection=connection, users=arguments.users, invites=arguments.invites)
+
+    password = hash_password_sync(password='benchmark')
+    try:
+        legacy = await measure(
+            sign_up_legacy, engine=engine, flow='legacy', users=arguments.users,
+            workers=arguments.workers, password=password
+        )
+        cte = await measure(
+            sign_up_cte, engine=engine, flow='cte', users=arguments.users,
+            workers=arguments.workers, password=password
+        )
+        print(f"{arguments.workers} workers: legacy {legacy:.0f} sign-ups/s, cte {cte:.0f} sign-ups/s")
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--invites', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of hot-range queries of transactions on a plain and a monthly
+partitioned table with the same rows, requires the database of DATABASE_URL.
+
+    cd api && python -m benchmarks.transaction_partitions --transactions 5000000
+
+Tables are created in the `benchmark` schema and dropped at the end.
+"""
+from services.config import get_settings
+from services.finance.partitions import add_months
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import time
+
+COLUMNS = """
+    id INTEGER NOT NULL,
+    financial_business_id INTEGER NOT NULL,
+    hash_id VARCHAR(1024) NOT NULL,
+    transaction_type VARCHAR(7) NOT NULL,
+    amount FLOAT NOT NULL,
+    date TIMESTAMP WITHOUT TIME ZONE NOT NULL
+"""
+
+QUERIES = {
+    'history of last month': (
+        "SELECT * FROM {table} WHERE financial_business_id = :business "
+        "AND date >= :month_start AND date < :month_end ORDER BY date DESC, id DESC"
+    ),
+    'totals of last 3 months': (
+        "SELECT transaction_type, sum(amount) FROM {table} WHERE financial_business_id = :business "
+        "AND date >= :quarter_start AND date < :month_end GROUP BY transaction_type"
+    ),
+    'all accounts of last week': (
+        "SELECT count(*), sum(amount) FROM {table} WHERE date >= :week_start AND date < :month_end"
+    ),
+}
+
+
+async def prepare(connection, transactions: int, businesses: int, months: int, first_month: datetime) -> None:
+    await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+    await connection.execute(text("CREATE SCHEMA benchmark"))
+    await connection.execute(text(f"CREATE TABLE benchmark.plain ({COLUMNS}, PRIMARY KEY (id))"))
+    await connection.execute(
+        text(f"CREATE TABLE benchmark.partitioned ({COLUMNS}, PRIMARY KEY (id, date)) PARTITION BY RANGE (date)")
+    )
+    for index in range(months):
+        month_start = add_months(first_month, index)
+        await connection.execute(text(
+            f"CREATE TABLE benchmark.partitioned_{index} PARTITION OF benchmark.partitioned "
+            f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{add_months(month_start, 1).isoformat()}')"
+        ))
+
+    await connection.execute(
+        text(
+            "INSERT INTO benchmark.plain "
+            "SELECT i, 1 + (i % :businesses), md5(i::text), "
+            "CASE WHEN random() < 0.7 THEN 'EXPENSE' ELSE 'ACCRUAL' END, "
+            "round((random() * 1000)::numeric, 2), "
+            "CAST(:first_month AS timestamp) "
+            "+ random() * (CAST(:end_month AS timestamp) - CAST(:first_month AS timestamp)) "
+            "FROM generate_series(1, :transactions) AS i"
+        ),
+        {
+            'businesses': businesses,
+            'transactions': transactions,
+            'first_month': first_month,
+            'end_month': add_months(first_month, months),
+        }
+    )
+    await connection.execute(text("INSERT INTO benchmark.partitioned SELECT * FROM benchmark.plain"))
+    for table in ('plain', 'partitioned'):
+        await connection.execute(
+            text(f"CREATE INDEX ix_{table}_business_date ON benchmark.{table} (financial_business_id, date, id)")
+        )
+        await connection.execute(text(f"ANALYZE benchmark.{table}"))
+
+
+async def measure(connection, query: str, parameters: dict, repeat: int) -> float:
+    timings = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await connection.execute(text(query), parameters)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def run(arguments) -> None:
+    engine = create_async_engine(get_settings().database_url)
+    now = datetime.now()
+    last_month = datetime(now.year, now.month, 1)
+    first_month = add_months(last_month, -arguments.months + 1)
+    parameters = {
+        'business': 1,
+        'month_start': last_month,
+        'month_end': add_months(last_month, 1),
+        'quarter_start': add_months(last_month, -2),
+        'week_start': add_months(last_month, 1) - timedelta(days=7),
+    }
+
+    async with engine.begin() as connection:
+        print(f"loading {arguments.transactions} transactions of {arguments.months} months")
+        await prepare(
+            connection=connection, transactions=arguments.transactions,
+            businesses=arguments.businesses, months=arguments.months, first_month=first_month
+        )
+
+    try:
+        async with engine.connect() as connection:
+            for name, query in QUERIES.items():
+                plain = await measure(
+                    connection=connection, query=query.format(table='benchmark.plain'),
+                    parameters=parameters, repeat=arguments.repeat
+                )
+                partitioned = await measure(
+                    connection=connection, query=query.format(table='benchmark.partitioned'),
+                    parameters=parameters, repeat=arguments.repeat
+                )
+                print(f"{name}: plain {plain * 1000:.1f} ms, partitioned {partitioned * 1000:.1f} ms")
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text("DROP SCHEMA IF EXISTS benchmark CASCADE"))
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--transactions', type=int, default=5000000)
+    parser.add_argument('--businesses', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--repeat', type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+from services.config import get_settings
+from starlette.types import Message, Receive, Scope
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+from urllib.parse import parse_qs
+import graphql
+import ipaddress
+import json
+
+# Top fields of GraphQL operations that hash passwords
+LOGIN_FIELDS = {'registrationUser', 'authenticationUser', 'thirdPartyAuthentication'}
+AUTH_FIELDS = LOGIN_FIELDS | {'refreshToken'}
+# Top fields and routes that scan many rows or write files
+HEAVY_FIELDS = {
+    'getHistoryTransactions', 'getFinanceAnalytics', 'getFinancialReport',
+    'findDuplicateClients', 'createTransactionExport', 'resumeTransactionExport'
+}
+HEAVY_PATHS = ('/finance/export', '/business/clients/import')
+
+
+class GraphQLOperations(NamedTuple):
+    # `query`, `mutation` or `subscription` of every operation of the document
+    types: Set[str]
+    fields: Set[str]
+
+
+NO_OPERATIONS = GraphQLOperations(types=set(), fields=set())
+
+
+def get_header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+@lru_cache()
+def get_trusted_proxies() -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    settings = get_settings()
+    return [
+        ipaddress.ip_network(proxy.strip(), strict=False)
+        for proxy in settings.trusted_proxies.split(',') if proxy.strip()
+    ]
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in get_trusted_proxies())
+
+
+def get_client_ip(scope: Scope) -> str:
+    """
+    Address of the peer, or when the peer is a trusted proxy the last address of
+    `X-Forwarded-For` that is not one, addresses added before it can be forged
+    """
+    ip = scope['client'][0] if scope.get('client') else 'unknown'
+    if not is_trusted_proxy(ip):
+        return ip
+
+    forwarded_for = get_header(scope, b'x-forwarded-for') or ''
+    for address in reversed([address.strip() for address in forwarded_for.split(',') if address.strip()]):
+        ip = address
+        if not is_trusted_proxy(address):
+            break
+    return ip
+
+
+def get_top_fields(
+        selection_set: graphql.SelectionSetNode,
+        fragments: Dict[str, graphql.FragmentDefinitionNode], expanded: Set[str]
+) -> Set[str]:
+    """
+    Fields of the selection with the ones of its inline fragments and fragment
+    spreads, every fragment is expanded once so cycles and repeated spreads are cheap
+    """
+    fields = set()
+    for selection in selection_set.selections:
+        if isinstance(selection, graphql.FieldNode):
+            fields.add(selection.name.value)
+        elif isinstance(selection, graphql.InlineFragmentNode):
+            fields |= get_top_fields(selection_set=selection.selection_set, fragments=fragments, expanded=expanded)
+        elif isinstance(selection, graphql.FragmentSpreadNode):
+            name = selection.name.value
+            if name in fragments and name not in expanded:
+                expanded.add(name)
+                fields |= get_top_fields(
+                    selection_set=fragments[name].selection_set, fragments=fragments, expanded=expanded
+                )
+    return fields
+
+
+def get_operations(query: Optional[str]) -> GraphQLOperations:
+    """
+    Operations of a GraphQL document with their top fields, also the ones
+    selected through fragments. An invalid document has none and is rejected
+    by the schema later
+    """
+    if not query:
+        return NO_OPERATIONS
+    try:
+        document = graphql.parse(query)
+    except graphql.GraphQLError:
+        return NO_OPERATIONS
+
+    definitions = [
+        definition for definition in document.definitions
+        if isinstance(definition, graphql.OperationDefinitionNode)
+    ]
+    fragments = {
+        definition.name.value: definition for definition in document.definitions
+        if isinstance(definition, graphql.FragmentDefinitionNode)
+    }
+    fields = set()
+    for definition in definitions:
+        fields |= get_top_fields(selection_set=definition.selection_set, fragments=fragments, expanded=set())
+    return GraphQLOperations(types={definition.operation.value for definition in definitions}, fields=fields)
+
+
+async def read_graphql_operations(scope: Scope, receive: Receive) -> Tuple[GraphQLOperations, Receive]:
+    """
+    Operations of a GraphQL request. The body is read once and replayed to the
+    application by the returned `receive`, the operations are kept in the state
+    of the request for the next middleware
+    """
+    state = scope.setdefault('state', dict())
+    if 'graphql_operations' in state:
+        return state['graphql_operations'], receive
+
+    if scope['method'] == 'GET':
+        query = parse_qs(scope['query_string'].decode('latin-1')).get('query', [None])[0]
+        state['graphql_operations'] = get_operations(query)
+        return state['graphql_operations'], receive
+
+    messages: List[Message] = list()
+    body = b''
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message['type'] != 'http.request':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            break
+
+    async def replay() -> Message:
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    operations = GraphQLOperations(types=set(), fields=set())
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+
+    # A batch of operations is a list of requests
+    for item in payload if isinstance(payload, list) else [payload]:
+        if isinstance(item, dict):
+            item_operations = get_operations(item.get('query'))
+            operations.types.update(item_operations.types)
+            operations.fields.update(item_operations.fields)
+
+    state['graphql_operations'] = operations
+    return operations, replay
@@ -1,6 +1,48 @@
 from typing import Type, Optional, Union, Awaitable, Any, Dict, List
 from strawberry.field import StrawberryField
+from starlette.requests import Request
+from starlette.websockets import WebSocket
 from services.base.schema import ErrorNode
+from services.base.models import User
+from services.base.work_with_db import get_user
+from services.base.tokens import Principal, decode_access_token, get_principal_version
+from services.database import get_db
+import logging
+import jwt
+
+
+async def authenticate_request(request: Union[Request, WebSocket]) -> Optional[Principal]:
+    """
+    Resolve the user of the `Authorization: JWT <token>` header from the claims
+    of the token and the cached version of the user,
+    None when the header is missing or the token is not valid
+    """
+    principal = None
+
+    headers = request.headers
+    token_is_present = headers.get('authorization', False)
+    if token_is_present:
+        db = get_db()
+        jwt_token = token_is_present.replace('JWT ', '')
+        try:
+            claims = decode_access_token(token=jwt_token) or dict()
+            if claims.get('sub'):
+                user_id = int(claims['sub'])
+                if await get_principal_version(db=db, user_id=user_id) == claims.get('pv'):
+                    principal = Principal(id=user_id, email=claims.get('email'), version=claims['pv'])
+            elif claims.get('email'):
+                # Tokens issued before the user id was added to the claims
+                user_instance = await get_user(db=db, field=User.email, value=claims['email'])
+                if user_instance:
+                    user = user_instance[0]
+                    principal = Principal(id=user.id, email=user.email, version=user.principal_version)
+        except (jwt.exceptions.InvalidTokenError, ValueError) as jwt_error:
+            logging.warning(jwt_error)
+            await db.rollback()
+
+        await db.close()
+
+    return principal
 
 
 class AuthenticationRequiredField(StrawberryField):
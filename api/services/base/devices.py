@@ -0,0 +1,95 @@
+from services.base.models import Devices
+from services.database import AsyncSessionLocal
+from services.config import get_settings
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+
+# device_id: (user_id, seen at), only the last touch of a device is kept
+pending_devices: Dict[str, Tuple[int, datetime]] = dict()
+flush_lock = asyncio.Lock()
+device_flusher_task: Optional[asyncio.Task] = None
+
+
+def touch_device(user_id: int, device_id: str) -> None:
+    """
+    Remember that the device is seen, the touches are written by the next flush
+    """
+    settings = get_settings()
+    pending_devices[device_id] = (user_id, datetime.now())
+    if len(pending_devices) >= settings.device_flush_size and not flush_lock.locked():
+        asyncio.create_task(flush_devices())
+
+
+async def flush_devices() -> int:
+    """
+    All pending touches in one upsert per `device_flush_size` rows, rows are sorted
+    by device id so concurrent flushes of the workers lock them in the same order.
+
+    Touches are the last seen time only, so a failed flush drops them
+    instead of retrying a batch that may fail again
+    """
+    global pending_devices
+    async with flush_lock:
+        if not pending_devices:
+            return 0
+
+        touches, pending_devices = pending_devices, dict()
+        now = datetime.now()
+        rows = [
+            {
+                'device_id': device_id, 'user_id': user_id, 'last_authentication': seen_at,
+                'created_at': now, 'updated_at': now
+            }
+            for device_id, (user_id, seen_at) in sorted(touches.items())
+        ]
+        settings = get_settings()
+        statements = list()
+        for start in range(0, len(rows), settings.device_flush_size):
+            statement = insert(Devices).values(rows[start:start + settings.device_flush_size])
+            statements.append(
+                statement.on_conflict_do_update(
+                    index_elements=[Devices.device_id],
+                    set_={
+                        'user_id': statement.excluded.user_id,
+                        'last_authentication': statement.excluded.last_authentication,
+                        'updated_at': statement.excluded.updated_at
+                    },
+                    where=Devices.last_authentication < statement.excluded.last_authentication
+                )
+            )
+
+        db = AsyncSessionLocal()
+        try:
+            for statement in statements:
+                await db.execute(statement)
+            await db.commit()
+        except Exception as e:
+            logging.warning(f"Flush of {len(rows)} devices failed: {e}")
+            await db.rollback()
+            return 0
+        finally:
+            await db.close()
+
+        return len(rows)
+
+
+async def run_device_flusher() -> None:
+    settings = get_settings()
+    while True:
+        await asyncio.sleep(settings.device_flush_seconds)
+        await flush_devices()
+
+
+async def start_device_flusher() -> None:
+    global device_flusher_task
+    if device_flusher_task is None or device_flusher_task.done():
+        device_flusher_task = asyncio.create_task(run_device_flusher())
+
+
+async def stop_device_flusher() -> None:
+    if device_flusher_task is not None:
+        device_flusher_task.cancel()
+    await flush_devices()
@@ -1,12 +1,14 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import (
-    Column, Integer, ForeignKey, VARCHAR, Enum, TIMESTAMP
+    Column, Integer, ForeignKey, VARCHAR, Enum, TIMESTAMP, Index, LargeBinary, Float
 )
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from services.database import BaseModel
 from .enums import StatusUserAccount
 from datetime import datetime, timedelta
 from services.config import get_settings
+from services.base.passwords import hash_password_sync, verify_password_sync
 
 from services.business.models import Business, Client, TeamMember
 from services.event_calendar.models import CalendarEvent
@@ -18,6 +20,12 @@ def define_expire() -> datetime:
     return expire_at
 
 
+def define_idempotency_expire() -> datetime:
+    settings = get_settings()
+    expire_at = datetime.now() + timedelta(minutes=settings.idempotency_key_expire_minutes)
+    return expire_at
+
+
 class User(BaseModel):
     __tablename__ = 'user'
     __tableargs__ = {
@@ -37,6 +45,8 @@ class User(BaseModel):
         nullable=False,
         default=StatusUserAccount.NOT_ACTIVE
     )
+    # Bumped when issued access tokens of the user must stop working
+    principal_version = Column(Integer, nullable=False, default=0, server_default='0')
 
     businesses = relationship(lambda: Business, lazy='selectin', back_populates="owner", uselist=True)
     events = relationship(lambda: CalendarEvent, lazy='selectin', back_populates="owner", uselist=True)
@@ -52,13 +62,16 @@ class User(BaseModel):
 
     @staticmethod
     def set_password(password: str) -> str:
-        password = generate_password_hash(password=password)
+        """
+        Blocking, resolvers use `services.base.passwords.hash_password`
+        """
+        password = hash_password_sync(password=password)
 
         return password
 
     @staticmethod
     def check_password(password: str, hash_password: str) -> bool:
-        return check_password_hash(pwhash=hash_password, password=password)
+        return verify_password_sync(password=password, password_hash=hash_password)
 
 
 class ThirdPartyAuthentication(BaseModel):
@@ -87,10 +100,18 @@ class RefreshToken(BaseModel):
     }
 
     user_id = Column(Integer, ForeignKey('user.id'), primary_key=True)
-    refresh_token = Column(VARCHAR(255), nullable=False, unique=True)
+    # Only the sha256 of the token is stored, the row is rotated in place and keeps
+    # the digest of the previous token to detect its reuse. Only one generation is
+    # kept, a token rotated twice or more is unknown and its reuse is not detected
+    token_digest = Column(LargeBinary(32), nullable=False, unique=True)
+    previous_digest = Column(LargeBinary(32), nullable=True, index=True)
+    # Every token issued by rotation of the token of a login shares its family
+    family_id = Column(VARCHAR(32), nullable=False, index=True)
+    revoked_at = Column(TIMESTAMP, nullable=True)
     expires_at = Column(TIMESTAMP,
                         nullable=False,
-                        default=define_expire)
+                        default=define_expire,
+                        index=True)
 
     user = relationship('User', cascade="all,delete")
 
@@ -102,9 +123,54 @@ class Devices(BaseModel):
     }
 
     user_id = Column(Integer, ForeignKey('user.id'))
-    device_id = Column(VARCHAR(255), nullable=False)
+    device_id = Column(VARCHAR(255), nullable=False, unique=True)
     last_authentication = Column(TIMESTAMP,
                                  nullable=False,
-                                 default=datetime.now)
+                                 default=datetime.now,
+                                 index=True)
 
     user = relationship('User', cascade="all,delete", back_populates='devices')
+
+
+class IdempotencyKey(BaseModel):
+    __tablename__ = 'idempotency_key'
+    __tableargs__ = {
+        'comment': "Table of responses of create mutations by idempotency key of client"
+    }
+
+    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    operation = Column(VARCHAR(100), nullable=False)
+    key = Column(VARCHAR(255), nullable=False)
+    response = Column(JSONB(none_as_null=True), nullable=True)
+    # A key without response claimed longer than `idempotency_lease_seconds` ago
+    # was left by a cancelled request or a stopped worker and is claimed again
+    claimed_at = Column(TIMESTAMP, nullable=False, default=datetime.now, server_default=func.localtimestamp())
+    expires_at = Column(TIMESTAMP,
+                        nullable=False,
+                        default=define_idempotency_expire,
+                        index=True)
+
+    def __repr__(self):
+        return f'UserID: {self.user_id} | {self.operation}: {self.key}'
+
+
+class RateLimitBucket(BaseModel):
+    __tablename__ = 'rate_limit_bucket'
+    __tableargs__ = {
+        'comment': "Token buckets of rate limits shared by the workers, the table is unlogged"
+    }
+
+    key = Column(VARCHAR(255), nullable=False, unique=True)
+    tokens = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f'{self.key}: {self.tokens}'
+
+
+Index(
+    'uq_idempotency_key_user_operation_key',
+    IdempotencyKey.user_id,
+    IdempotencyKey.operation,
+    IdempotencyKey.key,
+    unique=True
+)
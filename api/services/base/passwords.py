@@ -0,0 +1,170 @@
+from services.config import get_settings
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+import asyncio
+import hashlib
+import hmac
+import secrets
+import threading
+
+try:
+    import argon2
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:  # pragma: no cover - optional dependency
+    argon2 = None
+
+SALT_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+SALT_LENGTH = 16
+
+
+class PasswordPoolStats(NamedTuple):
+    workers: int
+    queued: int
+    running: int
+    completed: int
+    max_queue: int
+
+
+class PasswordPool:
+    """
+    Hashing and verification of passwords in threads, hashlib and argon2 release
+    the GIL, so the event loop keeps serving other requests meanwhile.
+
+    At most `max_queue` calls wait for a thread, the next callers wait on the loop
+    without holding memory of the executor
+    """
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._counters_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+
+    def _run(self, function, *args):
+        with self._counters_lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return function(*args)
+        finally:
+            with self._counters_lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, function, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='passwords')
+            self._slots = asyncio.Semaphore(self.workers + self.max_queue)
+
+        async with self._slots:
+            with self._counters_lock:
+                self.queued += 1
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._run, function, *args)
+
+    def stats(self) -> PasswordPoolStats:
+        return PasswordPoolStats(
+            workers=self.workers, queued=self.queued, running=self.running,
+            completed=self.completed, max_queue=self.max_queue
+        )
+
+
+settings = get_settings()
+password_pool = PasswordPool(workers=settings.password_hash_workers, max_queue=settings.password_hash_max_queue)
+
+
+def get_salt() -> str:
+    return ''.join(secrets.choice(SALT_CHARS) for _ in range(SALT_LENGTH))
+
+
+def get_current_method() -> str:
+    """
+    Method of new hashes by the profile of the settings,
+    the format of pbkdf2 and scrypt hashes is the one of werkzeug
+    """
+    if settings.password_hash_scheme == 'pbkdf2':
+        return f"pbkdf2:sha256:{settings.password_pbkdf2_iterations}"
+    if settings.password_hash_scheme == 'scrypt':
+        return f"scrypt:{settings.password_scrypt_n}:{settings.password_scrypt_r}:{settings.password_scrypt_p}"
+    if settings.password_hash_scheme == 'argon2':
+        return 'argon2'
+    raise ValueError(f"Unknown password hash scheme {settings.password_hash_scheme}")
+
+
+def get_argon2_hasher() -> "argon2.PasswordHasher":
+    if argon2 is None:
+        raise ValueError("argon2 password hashes require the `argon2-cffi` package")
+    return argon2.PasswordHasher(
+        time_cost=settings.password_argon2_time_cost,
+        memory_cost=settings.password_argon2_memory_cost,
+        parallelism=settings.password_argon2_parallelism
+    )
+
+
+def hash_internal(method: str, salt: str, password: str) -> str:
+    scheme, *parameters = method.split(':')
+    if scheme == 'pbkdf2':
+        hash_name, iterations = parameters
+        return hashlib.pbkdf2_hmac(hash_name, password.encode('utf-8'), salt.encode('utf-8'), int(iterations)).hex()
+    if scheme == 'scrypt':
+        n, r, p = (int(parameter) for parameter in parameters)
+        return hashlib.scrypt(
+            password.encode('utf-8'), salt=salt.encode('utf-8'),
+            n=n, r=r, p=p, maxmem=132 * n * r * p
+        ).hex()
+    raise ValueError(f"Unknown password hash method {method}")
+
+
+def is_salted_hash(password_hash: str) -> bool:
+    return password_hash.count('$') == 2 and password_hash.split(':')[0] in ('pbkdf2', 'scrypt')
+
+
+def hash_password_sync(password: str) -> str:
+    method = get_current_method()
+    if method == 'argon2':
+        return get_argon2_hasher().hash(password)
+
+    salt = get_salt()
+    return f"{method}${salt}${hash_internal(method=method, salt=salt, password=password)}"
+
+
+def verify_password_sync(password: str, password_hash: str) -> bool:
+    """
+    Passwords saved before hashing was added are plain text,
+    they are compared in constant time and rehashed on the next login
+    """
+    if password_hash.startswith('$argon2'):
+        try:
+            return get_argon2_hasher().verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    if not is_salted_hash(password_hash):
+        return hmac.compare_digest(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    method, salt, expected = password_hash.split('$')
+    return hmac.compare_digest(hash_internal(method=method, salt=salt, password=password), expected)
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    method = get_current_method()
+    if password_hash.startswith('$argon2'):
+        return method != 'argon2' or get_argon2_hasher().check_needs_rehash(password_hash)
+    return not is_salted_hash(password_hash) or password_hash.split('$')[0] != method
+
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(hash_password_sync, password)
+
+
+async def verify_password(password: str, password_hash: Optional[str]) -> bool:
+    """
+    Without a hash the password is hashed anyway,
+    so a missing user takes as long as a wrong password
+    """
+    if password_hash is None:
+        await password_pool.run(hash_password_sync, password)
+        return False
+    return await password_pool.run(verify_password_sync, password, password_hash)
@@ -24,49 +24,44 @@ from services.base.schema import (
 )
 from services.base.models import (
     User,
-    ThirdPartyAuthentication,
-    RefreshToken
+    ThirdPartyAuthentication
 )
 from services.base.work_with_db import (
-    add_user,
     get_user,
-    refresh_token_exists,
     create_refresh_token,
-    update_refresh_token,
+    rotate_refresh_token,
+    get_refresh_token_by_digest,
+    revoke_refresh_token_family,
+    bump_principal_version,
     update_user_info,
     update_device_of_user,
-    fill_in_related_services_by_user
+    sign_up_user
 )
+from services.base.passwords import hash_password, verify_password, password_needs_rehash
+from services.base.tokens import encode_access_token
 from services.config import get_settings
-from datetime import datetime, timedelta
-from time import mktime
+import hashlib
 import secrets
-import jwt
 
 
-def get_access_token(email: str) -> str:
-    jwt_setting = get_settings()
-    exp_token = datetime.now() + timedelta(minutes=jwt_setting.access_token_expire_minutes)
-    payload = {
-        "email": email,
-        "exp": mktime(exp_token.timetuple())
-    }
-    token = jwt.encode(payload=payload, key=jwt_setting.secret_key,
-                       algorithm=jwt_setting.algorithm)
-
-    return token
+def get_access_token(user: User) -> str:
+    return encode_access_token(user_id=user.id, email=user.email, principal_version=user.principal_version)
 
 
-async def generate_refresh_token(db: scoped_session) -> str:
+def generate_refresh_token() -> str:
+    """
+    256 random bits, a collision is not checked
+    """
     jwt_setting = get_settings()
-    token_refresh = secrets.token_hex(nbytes=jwt_setting.bytes_refresh_token)
-
-    while await refresh_token_exists(db=db, token=token_refresh):
-        token_refresh = secrets.token_hex(nbytes=jwt_setting.bytes_refresh_token)
+    token_refresh = secrets.token_urlsafe(nbytes=jwt_setting.bytes_refresh_token)
 
     return token_refresh
 
 
+def get_token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
 async def registration_user_resolver(
         info: Info, input_data: RegistrationInputData
 ) -> RegistrationNode:
@@ -78,51 +73,30 @@ async def registration_user_resolver(
     token = None
     token_refresh = None
 
-    email_is_already_taken = (
-        await get_objects_by_field(
-            db=context.db, model=User,
-            field=User.email, value=instance.email
+    new_token_refresh = generate_refresh_token()
+    user_data = reform_third_party_input_data_to_dict(instance=instance,
+                                                      exclude={'email', 'password', 'uid', 'device_id', 'display_name'})
+    user_data['email'] = instance.email
+    user_data['password'] = await hash_password(password=instance.password)
+
+    user = (
+        await sign_up_user(
+            db=context.db, user_data=user_data,
+            google_uid=instance.uid or "",
+            token_digest=get_token_digest(token=new_token_refresh)
         )
     )
-    if not email_is_already_taken:
-        user = User(email=instance.email, password=instance.password)
-        context.db.add(user)
-        await context.db.commit()
+    await context.db.commit()
 
+    if user:
         success = True
-
-        new_data = reform_third_party_input_data_to_dict(instance=instance,
-                                                         exclude={'email', 'password', 'uid', 'device_id'})
-
-        if new_data:
-            await update_user_info(
-                db=context.db,
-                user=user,
-                instance=new_data
-            )
-            await context.db.commit()
-
-        third_party_object = ThirdPartyAuthentication(
-            user_id=user.id, google_uid=instance.uid
-        )
-        context.db.add(third_party_object)
-        await context.db.commit()
-
+        token_refresh = new_token_refresh
         await update_device_of_user(
             db=context.db,
             user=user,
             device_id=instance.device_id
         )
-
-        await fill_in_related_services_by_user(db=context.db, user=user)
-
-        token_refresh = await generate_refresh_token(db=context.db)
-        await create_refresh_token(
-            db=context.db,
-            user_id=user.id,
-            refresh_token=token_refresh
-        )
-        token = get_access_token(email=user.email)
+        token = get_access_token(user=user)
 
         # activate_code = await create_email_code(db=context.db, user_id=user.id, model=ActivateCode)
         # await context.db.commit()
@@ -132,7 +106,7 @@ async def registration_user_resolver(
         # if result:
         #     code_sent = True
 
-    elif email_is_already_taken:
+    else:
         error = RegistrationError(
             code=RegistrationError.RegistrationErrorCode.EMAIL_TAKEN,
             message="Email is taken",
@@ -161,16 +135,26 @@ async def authentication_user_resolver(
         )
     )
 
+    user = user[0] if user else None
+    password_is_valid = (
+        await verify_password(
+            password=instance.password,
+            password_hash=user.password if user else None
+        )
+    )
+
     if user:
-        user = user[0]
-        if user.password == instance.password:
-            token_refresh = await generate_refresh_token(db=context.db)
+        if password_is_valid:
+            if password_needs_rehash(password_hash=user.password):
+                user.password = await hash_password(password=instance.password)
+
+            token_refresh = generate_refresh_token()
             await create_refresh_token(
                 db=context.db,
                 user_id=user.id,
-                refresh_token=token_refresh
+                token_digest=get_token_digest(token=token_refresh)
             )
-            token = get_access_token(email=user.email)
+            token = get_access_token(user=user)
             auth_success = True
 
         else:
@@ -190,13 +174,13 @@ async def authentication_user_resolver(
 
 
 async def create_access_tokens(db: scoped_session, user: User):
-    token_refresh = await generate_refresh_token(db=db)
+    token_refresh = generate_refresh_token()
     await create_refresh_token(
         db=db,
         user_id=user.id,
-        refresh_token=token_refresh
+        token_digest=get_token_digest(token=token_refresh)
     )
-    token = get_access_token(email=user.email)
+    token = get_access_token(user=user)
 
     return token_refresh, token
 
@@ -267,26 +251,31 @@ async def third_party_authentication_resolver(
             )
     else:
         if not uid_is_already_taken:
-            new_data = reform_third_party_input_data_to_dict(instance=instance)
-
-            user = await add_user(db=context.db, instance=new_data)
-            await context.db.commit()
-
-            third_party_object = ThirdPartyAuthentication(
-                user_id=user.id, google_uid=instance.uid
+            new_token_refresh = generate_refresh_token()
+            user = (
+                await sign_up_user(
+                    db=context.db,
+                    user_data=reform_third_party_input_data_to_dict(instance=instance),
+                    google_uid=instance.uid,
+                    token_digest=get_token_digest(token=new_token_refresh)
+                )
             )
-            context.db.add(third_party_object)
             await context.db.commit()
 
-            await update_device_of_user(
-                db=context.db,
-                user=user,
-                device_id=instance.device_id
-            )
-
-            await fill_in_related_services_by_user(db=context.db, user=user)
-            token_refresh, token = await create_access_tokens(db=context.db, user=user)
-            status = True
+            if user:
+                await update_device_of_user(
+                    db=context.db,
+                    user=user,
+                    device_id=instance.device_id
+                )
+                token_refresh = new_token_refresh
+                token = get_access_token(user=user)
+                status = True
+            else:
+                error = ThirdPartyAuthenticationError(
+                    code=ThirdPartyAuthenticationError.ThirdPartyAuthenticationErrorCode.WRONG_CREDENTIALS,
+                    message="Wrong credentials",
+                )
 
         else:
             error = ThirdPartyAuthenticationError(
@@ -303,40 +292,59 @@ async def refresh_token_resolver(info: Info, input_data: RefreshTokenInputData)
     access_token = None
     refresh_token_str = None
     error = None
-    token_is_already = await get_objects_by_field(
-        db=context.db, model=RefreshToken,
-        field=RefreshToken.refresh_token, value=instance.token
+
+    token_digest = get_token_digest(token=instance.token)
+    new_refresh_token = generate_refresh_token()
+    rotated = (
+        await rotate_refresh_token(
+            db=context.db, token_digest=token_digest,
+            new_token_digest=get_token_digest(token=new_refresh_token)
+        )
     )
-    if token_is_already:
-        object_token = token_is_already[0]
-        now = datetime.now()
-        if now <= object_token.expires_at:
-            refresh_token_str = await generate_refresh_token(db=context.db)
-            user = await get_objects_by_field(db=context.db, model=User, field=User.id,
-                                              value=object_token.user_id)
-            user = user[0]
-            refresh_token_object = await update_refresh_token(db=context.db,
-                                                              id_token=object_token.id,
-                                                              new_refresh_token=refresh_token_str)
-            refresh_token_str = refresh_token_object.refresh_token
-            access_token = get_access_token(email=user.email)
+
+    if rotated:
+        user_id, email, principal_version = rotated
+        refresh_token_str = new_refresh_token
+        access_token = encode_access_token(user_id=user_id, email=email, principal_version=principal_version)
+
+    else:
+        object_token = await get_refresh_token_by_digest(db=context.db, token_digest=token_digest)
+
+        # Only the last rotated token of a family is known, an older one is invalid
+        # and does not revoke the family
+        if object_token is None:
+            error = RefreshTokenError(
+                code=RefreshTokenError.RefreshTokenErrorCode.INVALID,
+                message="Refresh token is invalid",
+            )
+        elif object_token.token_digest != token_digest:
+            # The token was already rotated, so it is used by someone else than
+            # the owner of its family, every token of the family is revoked
+            await revoke_refresh_token_family(db=context.db, family_id=object_token.family_id)
+            await bump_principal_version(db=context.db, user_id=object_token.user_id)
+            await context.db.commit()
+            error = RefreshTokenError(
+                code=RefreshTokenError.RefreshTokenErrorCode.REUSED,
+                message="Refresh token is reused",
+            )
+        elif object_token.revoked_at is not None:
+            error = RefreshTokenError(
+                code=RefreshTokenError.RefreshTokenErrorCode.INVALID,
+                message="Refresh token is invalid",
+            )
         else:
             error = RefreshTokenError(
                 code=RefreshTokenError.RefreshTokenErrorCode.EXPIRED,
                 message="Refresh token expired",
             )
-    else:
-        error = RefreshTokenError(
-            code=RefreshTokenError.RefreshTokenErrorCode.INVALID,
-            message="Refresh token is invalid",
-        )
 
     return RefreshTokenNode(error=error, access_token=access_token, refresh_token=refresh_token_str)
 
 
 async def get_me_resolver(info: Info) -> GetMeNode:
-    user = info.context.user
-    return GetMeNode(user=user, error=None)
+    context = info.context
+    user = await get_user(db=context.db, field=User.id, value=context.user.id)
+    return GetMeNode(user=user[0], error=None)
 
 
 async def update_user_resolver(
@@ -74,6 +74,7 @@ class RefreshTokenError(ErrorNode):
     class RefreshTokenErrorCode(enum.Enum):
         EXPIRED = "expired"
         INVALID = "invalid"
+        REUSED = "reused"
 
     code: RefreshTokenErrorCode
 
@@ -0,0 +1,170 @@
+from services.database import engine
+from services.base.models import RefreshToken, Devices
+from services.business.models import BusinessPermissionChange
+from services.config import get_settings
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+import time
+
+# Any constant shared by the workers, only one of them sweeps at a time
+SWEEPER_LOCK_KEY = 482917
+
+sweeper_task: Optional[asyncio.Task] = None
+
+
+class SweeperRun(NamedTuple):
+    started_at: datetime
+    duration_seconds: float
+    deleted: Dict[str, int]
+    batches: int
+    finished: bool
+
+
+class SweeperStats(NamedTuple):
+    runs: int
+    skipped_runs: int
+    failed_runs: int
+    deleted: Dict[str, int]
+    last_run: Optional[SweeperRun]
+
+
+runs = 0
+skipped_runs = 0
+failed_runs = 0
+deleted_total: Dict[str, int] = dict()
+last_run: Optional[SweeperRun] = None
+
+
+def get_sweep_statements() -> Dict[str, Tuple[text, dict]]:
+    """
+    One bounded batch of every table with its parameters, rows are picked
+    by ctid so a batch is deleted without a second lookup of the index
+    """
+    settings = get_settings()
+    return {
+        RefreshToken.__tablename__: (
+            text(
+                f"DELETE FROM {RefreshToken.__tablename__} WHERE ctid IN ("
+                f"SELECT ctid FROM {RefreshToken.__tablename__} "
+                f"WHERE expires_at < now() LIMIT :batch_size)"
+            ),
+            {'batch_size': settings.sweeper_batch_size}
+        ),
+        Devices.__tablename__: (
+            text(
+                f"DELETE FROM {Devices.__tablename__} WHERE ctid IN ("
+                f"SELECT ctid FROM {Devices.__tablename__} "
+                f"WHERE last_authentication < now() - make_interval(days => :stale_days) LIMIT :batch_size)"
+            ),
+            {'batch_size': settings.sweeper_batch_size, 'stale_days': settings.device_stale_days}
+        ),
+        BusinessPermissionChange.__tablename__: (
+            text(
+                f"DELETE FROM {BusinessPermissionChange.__tablename__} WHERE ctid IN ("
+                f"SELECT ctid FROM {BusinessPermissionChange.__tablename__} "
+                f"WHERE changed_at < localtimestamp - make_interval(hours => :retention_hours) LIMIT :batch_size)"
+            ),
+            {'batch_size': settings.sweeper_batch_size, 'retention_hours': settings.permission_change_retention_hours}
+        ),
+    }
+
+
+async def sweep_table(
+        connection: AsyncConnection, statement: text, parameters: dict, deadline: float
+) -> Tuple[int, int]:
+    """
+    Batches are committed one by one with a pause between them,
+    the sweep of the table stops at the deadline of the run
+    """
+    settings = get_settings()
+    deleted = 0
+    batches = 0
+    while time.monotonic() < deadline:
+        result = await connection.execute(statement, parameters)
+        await connection.commit()
+        deleted += result.rowcount
+        batches += 1
+        if result.rowcount < parameters['batch_size']:
+            break
+        await asyncio.sleep(settings.sweeper_batch_pause_seconds)
+    return deleted, batches
+
+
+async def sweep_expired_rows() -> Optional[SweeperRun]:
+    global runs, skipped_runs, failed_runs, last_run
+    settings = get_settings()
+    started_at = datetime.now()
+    started = time.monotonic()
+    deadline = started + settings.sweeper_max_run_seconds
+
+    try:
+        async with engine.connect() as connection:
+            locked = (
+                await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': SWEEPER_LOCK_KEY})
+            ).scalar()
+            await connection.commit()
+            if not locked:
+                skipped_runs += 1
+                return None
+
+            try:
+                deleted = dict()
+                batches = 0
+                for table, (statement, parameters) in get_sweep_statements().items():
+                    deleted[table], table_batches = await sweep_table(
+                        connection=connection, statement=statement, parameters=parameters, deadline=deadline
+                    )
+                    batches += table_batches
+            finally:
+                # A failed batch aborts the transaction, the unlock would fail in it and
+                # the connection would go back to the pool still holding the lock
+                await connection.rollback()
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': SWEEPER_LOCK_KEY})
+                await connection.commit()
+    except Exception as e:
+        failed_runs += 1
+        logging.warning(f"Sweeper failed: {e}")
+        return None
+
+    runs += 1
+    for table, count in deleted.items():
+        deleted_total[table] = deleted_total.get(table, 0) + count
+    last_run = SweeperRun(
+        started_at=started_at,
+        duration_seconds=time.monotonic() - started,
+        deleted=deleted,
+        batches=batches,
+        finished=time.monotonic() < deadline
+    )
+    if any(deleted.values()):
+        logging.warning(f"Sweeper deleted {deleted} in {batches} batches")
+    return last_run
+
+
+def get_sweeper_stats() -> SweeperStats:
+    return SweeperStats(
+        runs=runs, skipped_runs=skipped_runs, failed_runs=failed_runs,
+        deleted=dict(deleted_total), last_run=last_run
+    )
+
+
+async def run_sweeper() -> None:
+    settings = get_settings()
+    while True:
+        await sweep_expired_rows()
+        await asyncio.sleep(settings.sweeper_check_seconds)
+
+
+async def start_sweeper() -> None:
+    global sweeper_task
+    if sweeper_task is None or sweeper_task.done():
+        sweeper_task = asyncio.create_task(run_sweeper())
+
+
+async def stop_sweeper() -> None:
+    if sweeper_task is not None:
+        sweeper_task.cancel()
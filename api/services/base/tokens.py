@@ -0,0 +1,77 @@
+from services.base.models import User
+from services.config import get_settings
+from services.cache import TTLCache
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+from datetime import datetime, timedelta
+from time import mktime
+from typing import Dict, NamedTuple, Optional
+import jwt
+
+settings = get_settings()
+principal_versions = TTLCache(
+    ttl=settings.principal_version_cache_seconds, max_size=settings.principal_version_cache_size
+)
+
+
+class Principal(NamedTuple):
+    """
+    Authenticated user of a request, taken from the claims of its access token
+    """
+    id: int
+    email: Optional[str]
+    version: int
+
+
+def get_keyset() -> Dict[str, str]:
+    """
+    Keys of access tokens by their `kid`. The active key signs new tokens,
+    the other ones only verify tokens signed before the rotation
+    """
+    return {settings.jwt_active_kid: settings.secret_key, **settings.jwt_keys}
+
+
+def encode_access_token(user_id: int, email: str, principal_version: int) -> str:
+    exp_token = datetime.now() + timedelta(minutes=settings.access_token_expire_minutes)
+    payload = {
+        "sub": str(user_id),
+        "pv": principal_version,
+        "email": email,
+        "exp": mktime(exp_token.timetuple())
+    }
+    return jwt.encode(
+        payload=payload, key=get_keyset()[settings.jwt_active_kid],
+        algorithm=settings.algorithm, headers={'kid': settings.jwt_active_kid}
+    )
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """
+    Claims of a valid token, None when its key is unknown. Tokens issued before
+    key ids were added have no `kid` and are signed by `secret_key`.
+
+    Raises `jwt.exceptions.InvalidTokenError` on a wrong signature or an expired token
+    """
+    kid = jwt.get_unverified_header(token).get('kid')
+    key = settings.secret_key if kid is None else get_keyset().get(kid)
+    if key is None:
+        return None
+    return jwt.decode(token, key, algorithms=[settings.algorithm])
+
+
+async def get_principal_version(db: scoped_session, user_id: int) -> Optional[int]:
+    """
+    Current version of the user, cached for `principal_version_cache_seconds`.
+    None when the user does not exist
+    """
+    version = principal_versions.get(user_id)
+    if version is None:
+        statement = select(User.principal_version).where(User.id == user_id)
+        version = (await db.execute(statement)).scalar()
+        if version is not None:
+            principal_versions.set(user_id, version)
+    return version
+
+
+def forget_principal_version(user_id: int) -> None:
+    principal_versions.invalidate(user_id)
@@ -1,9 +1,16 @@
-from services.base.models import User, RefreshToken, Devices, TeamMember
+from services.base.models import (
+    User, ThirdPartyAuthentication, RefreshToken, TeamMember, IdempotencyKey,
+    define_idempotency_expire, define_expire
+)
 from services.event_calendar.models import Participant
-from sqlalchemy import insert, select, update, exists
+from services.base.devices import touch_device
+from services.base.tokens import forget_principal_version
+from sqlalchemy import insert, select, update, delete, and_, or_, func, literal, LargeBinary
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
 from sqlalchemy.orm import scoped_session
-from services.config import get_settings
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import uuid
 
 
 async def get_user(db: scoped_session, field, value):
@@ -13,54 +20,97 @@ async def get_user(db: scoped_session, field, value):
     return user.scalars().all()
 
 
-async def refresh_token_exists(db: scoped_session, token: str) -> bool:
-    statement = exists(RefreshToken).where(RefreshToken.refresh_token == token).select()
-    exists_result = (await db.execute(statement)).scalars().one()
-    return exists_result
-
-
-async def create_refresh_token(db: scoped_session, user_id: int, refresh_token: str) -> RefreshToken:
-    statement = insert(RefreshToken).values(user_id=user_id,
-                                            refresh_token=refresh_token).returning(RefreshToken)
+async def create_refresh_token(db: scoped_session, user_id: int, token_digest: bytes) -> RefreshToken:
+    """
+    Token of a new login, the first one of its family
+    """
+    statement = insert(RefreshToken).values(
+        user_id=user_id,
+        token_digest=token_digest,
+        family_id=uuid.uuid4().hex,
+        expires_at=define_expire()
+    ).returning(RefreshToken)
     result = await db.execute(statement)
     refresh_token_object = result.fetchall()[0]
     return refresh_token_object
 
 
-async def update_refresh_token(db: scoped_session, id_token: int, new_refresh_token: str) -> RefreshToken:
-    jwt_setting = get_settings()
-    expires_at = datetime.now() + timedelta(
-                    minutes=jwt_setting.refresh_token_expire_minutes
-                )
-    statement = update(RefreshToken).where(RefreshToken.id == id_token).values(
-        refresh_token=new_refresh_token,
-        expires_at=expires_at
-    ).returning(RefreshToken)
-    result = await db.execute(statement)
-    refresh_token_object = result.fetchall()[0]
-
-    return refresh_token_object
+async def rotate_refresh_token(
+        db: scoped_session, token_digest: bytes, new_token_digest: bytes
+) -> Optional[Tuple[int, str, int]]:
+    """
+    Replace a valid token with the next one of its family in one statement,
+    returns the user id, email and principal version of the token,
+    None when the token is not valid. Only the digest of the replaced token is
+    kept, so reuse is detected for one generation of the family
+    """
+    statement = (
+        update(RefreshToken)
+        .where(
+            and_(
+                RefreshToken.token_digest == token_digest,
+                RefreshToken.expires_at > func.now(),
+                RefreshToken.revoked_at.is_(None),
+                User.id == RefreshToken.user_id
+            )
+        )
+        .values(
+            token_digest=new_token_digest,
+            previous_digest=token_digest,
+            expires_at=define_expire(),
+            updated_at=datetime.now()
+        )
+        .returning(RefreshToken.user_id, User.email, User.principal_version)
+        .execution_options(synchronize_session=False)
+    )
+    return (await db.execute(statement)).first()
 
 
-async def update_device_of_user(db: scoped_session, user: User, device_id: str):
-    statement = select(Devices).where(Devices.device_id == device_id)
-    result = (await db.execute(statement)).scalars().all()
-    if not result:
-        device = Devices(
-            user_id=user.id,
-            device_id=device_id
+async def get_refresh_token_by_digest(db: scoped_session, token_digest: bytes) -> Optional[RefreshToken]:
+    statement = select(RefreshToken).where(
+        or_(
+            RefreshToken.token_digest == token_digest,
+            RefreshToken.previous_digest == token_digest
         )
-        db.add(device)
-    else:
-        update_statement = (
-            update(Devices)
-            .where(Devices.device_id == device_id)
-            .values(
-                user_id=user.id,
-                last_authentication=datetime.now()
+    )
+    return (await db.execute(statement)).scalars().first()
+
+
+async def revoke_refresh_token_family(db: scoped_session, family_id: str) -> None:
+    statement = (
+        update(RefreshToken)
+        .where(
+            and_(
+                RefreshToken.family_id == family_id,
+                RefreshToken.revoked_at.is_(None)
             )
         )
-        await db.execute(update_statement)
+        .values(revoked_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(statement)
+
+
+async def bump_principal_version(db: scoped_session, user_id: int) -> None:
+    """
+    Access tokens issued to the user before stop working, at once in this worker
+    and after `principal_version_cache_seconds` in the other ones
+    """
+    statement = (
+        update(User)
+        .where(User.id == user_id)
+        .values(principal_version=User.principal_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(statement)
+    forget_principal_version(user_id=user_id)
+
+
+async def update_device_of_user(db: scoped_session, user: User, device_id: str):
+    """
+    The device is written by the next flush of `services.base.devices`
+    """
+    touch_device(user_id=user.id, device_id=device_id)
 
 
 async def update_user_info(db: scoped_session, user: User, instance: dict) -> User:
@@ -75,21 +125,136 @@ async def update_user_info(db: scoped_session, user: User, instance: dict) -> Us
     return result.fetchall()[0]
 
 
-async def add_user(db: scoped_session, instance: dict) -> User:
+async def sign_up_user(
+        db: scoped_session, user_data: dict, google_uid: str, token_digest: bytes
+) -> Optional[User]:
+    """
+    User, its credentials and refresh token are inserted and pending invites of
+    its email are linked by one statement of data-modifying CTEs, so sign-up is
+    atomic without a transaction of several round trips.
+
+    None when the email is taken, then nothing is inserted
+    """
+    now = datetime.now()
+    # Statements of tables, ORM statements drop the CTEs added by `add_cte`
+    new_user = (
+        insert_postgresql(User.__table__)
+        .values(**user_data, created_at=now, updated_at=now)
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(*User.__table__.c)
+        .cte('new_user')
+    )
+    new_credentials = (
+        insert(ThirdPartyAuthentication.__table__)
+        .from_select(
+            ['user_id', 'google_uid', 'created_at', 'updated_at'],
+            select(new_user.c.id, literal(google_uid), literal(now), literal(now))
+        )
+        .cte('new_credentials')
+    )
+    new_token = (
+        insert(RefreshToken.__table__)
+        .from_select(
+            ['user_id', 'token_digest', 'family_id', 'expires_at', 'created_at', 'updated_at'],
+            select(
+                new_user.c.id, literal(token_digest, LargeBinary), literal(uuid.uuid4().hex),
+                literal(define_expire()), literal(now), literal(now)
+            )
+        )
+        .cte('new_token')
+    )
+    invites = (
+        update(TeamMember.__table__)
+        .where(TeamMember.email == new_user.c.email)
+        .values(user_id=new_user.c.id)
+        .cte('invites')
+    )
     statement = (
-        insert(User)
-        .values(**instance)
-        .returning(User)
+        select(*new_user.c)
+        .add_cte(new_credentials)
+        .add_cte(new_token)
+        .add_cte(invites)
     )
-    result = await db.execute(statement)
 
-    return result.fetchall()[0]
+    row = (await db.execute(statement)).first()
+    if row is None:
+        return None
+    return User(**row._mapping)
+
+
+async def claim_idempotency_key(
+        db: scoped_session, user_id: int, operation: str, key: str, lease_seconds: int
+) -> bool:
+    """
+    Insert the key without response. False when the key is already taken
+    by a not expired request. An expired key is taken again, so is a key
+    without response whose lease of `lease_seconds` is over
+    """
+    statement = insert_postgresql(IdempotencyKey).values(
+        user_id=user_id,
+        operation=operation,
+        key=key,
+        claimed_at=func.localtimestamp(),
+        expires_at=define_idempotency_expire()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.operation, IdempotencyKey.key],
+        set_={
+            'response': None,
+            'claimed_at': statement.excluded.claimed_at,
+            'expires_at': statement.excluded.expires_at,
+            'updated_at': datetime.now()
+        },
+        where=or_(
+            IdempotencyKey.expires_at < func.now(),
+            and_(
+                IdempotencyKey.response.is_(None),
+                IdempotencyKey.claimed_at < func.localtimestamp() - timedelta(seconds=lease_seconds)
+            )
+        )
+    ).returning(IdempotencyKey.id)
+    result = (await db.execute(statement)).fetchall()
+    return bool(result)
+
+
+def idempotency_key_condition(user_id: int, operation: str, key: str):
+    return and_(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.operation == operation,
+        IdempotencyKey.key == key
+    )
+
+
+async def get_idempotency_response(
+        db: scoped_session, user_id: int, operation: str, key: str
+) -> Optional[dict]:
+    statement = select(IdempotencyKey.response).where(
+        idempotency_key_condition(user_id=user_id, operation=operation, key=key)
+    )
+    result = (await db.execute(statement)).scalars().all()
+    if result:
+        return result[0]
+    return None
 
 
-async def fill_in_related_services_by_user(db: scoped_session, user: User):
-    statement_team_member = (
-        update(TeamMember)
-        .where(TeamMember.email == user.email)
-        .values(user_id=user.id)
+async def store_idempotency_response(
+        db: scoped_session, user_id: int, operation: str, key: str, response: dict
+) -> None:
+    statement = (
+        update(IdempotencyKey)
+        .where(idempotency_key_condition(user_id=user_id, operation=operation, key=key))
+        .values(response=response, updated_at=datetime.now())
+    )
+    await db.execute(statement)
+
+
+async def release_idempotency_key(
+        db: scoped_session, user_id: int, operation: str, key: str
+) -> None:
+    statement = delete(IdempotencyKey).where(
+        and_(
+            idempotency_key_condition(user_id=user_id, operation=operation, key=key),
+            IdempotencyKey.response.is_(None)
+        )
     )
-    await db.execute(statement_team_member)
+    await db.execute(statement)
@@ -0,0 +1,128 @@
+from services.business.models import Client, ClientAttribute
+from sqlalchemy import select, update, delete, insert, func, column, literal, text, and_, tuple_, Integer, Text
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, array
+from sqlalchemy.orm import scoped_session
+from typing import Dict, List, Optional
+
+# Shared with the migration that fills `client.attribute_values` from the rows of `client_attribute`,
+# the row added last wins when a client has a key twice
+AGGREGATE_ATTRIBUTES_SQL = (
+    "SELECT coalesce(jsonb_object_agg(attribute_key, attribute_value ORDER BY id), '{}'::jsonb) "
+    "FROM client_attribute WHERE client_attribute.client_id = client.id"
+)
+
+
+def get_attributes_condition(
+        attributes: Optional[Dict[str, str]] = None,
+        has_keys: Optional[List[str]] = None,
+        has_any_keys: Optional[List[str]] = None
+):
+    """
+    Containment of all `attributes` and existence of all `has_keys` and any of `has_any_keys`,
+    every operator is served by the GIN index on `attribute_values`
+    """
+    conditions = list()
+    if attributes:
+        conditions.append(Client.attribute_values.contains(attributes))
+    if has_keys:
+        conditions.append(Client.attribute_values.has_all(array(has_keys)))
+    if has_any_keys:
+        conditions.append(Client.attribute_values.has_any(array(has_any_keys)))
+    return and_(*conditions)
+
+
+async def get_clients_by_attributes(
+        db: scoped_session, user_id: int,
+        attributes: Optional[Dict[str, str]] = None,
+        has_keys: Optional[List[str]] = None,
+        has_any_keys: Optional[List[str]] = None
+) -> List[Client]:
+    statement = select(Client).where(
+        and_(
+            Client.user_id == user_id,
+            get_attributes_condition(attributes=attributes, has_keys=has_keys, has_any_keys=has_any_keys)
+        )
+    )
+    return (await db.execute(statement)).scalars().all()
+
+
+async def sync_client_attribute_values(db: scoped_session, client_ids: List[int]) -> None:
+    """
+    Rebuild `attribute_values` of the clients from their `client_attribute` rows
+    """
+    statement = text(
+        f"UPDATE client SET attribute_values = ({AGGREGATE_ATTRIBUTES_SQL}) WHERE client.id = ANY(:client_ids)"
+    )
+    await db.execute(statement, {'client_ids': list(client_ids)})
+
+
+async def set_client_attributes(
+        db: scoped_session, user_id: int,
+        changes: Dict[int, Dict[str, str]], removed_keys: Dict[int, List[str]]
+) -> List[Client]:
+    """
+    Merge `changes` into `attribute_values` and drop `removed_keys` of many clients
+    with one UPDATE, rows of `client_attribute` are kept in sync for old readers
+    """
+    client_ids = sorted(set(changes) | set(removed_keys))
+    payload = [
+        {
+            'client_id': client_id,
+            'changes': changes.get(client_id, dict()),
+            'removed_keys': removed_keys.get(client_id, list())
+        }
+        for client_id in client_ids
+    ]
+    rows = (
+        func.jsonb_to_recordset(literal(payload, type_=JSONB))
+        .table_valued(
+            column('client_id', Integer),
+            column('changes', JSONB),
+            column('removed_keys', ARRAY(Text))
+        )
+        .render_derived(name='payload', with_types=True)
+    )
+    statement = (
+        update(Client)
+        .where(
+            and_(
+                Client.id == rows.c.client_id,
+                Client.user_id == user_id
+            )
+        )
+        .values(attribute_values=(
+            Client.attribute_values.op('-')(rows.c.removed_keys).op('||')(rows.c.changes)
+        ))
+        .returning(Client.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated_ids = (await db.execute(statement)).scalars().all()
+    if not updated_ids:
+        return list()
+
+    touched = [
+        (client_id, key)
+        for client_id in updated_ids
+        for key in list(changes.get(client_id, dict())) + removed_keys.get(client_id, list())
+    ]
+    if touched:
+        await db.execute(
+            delete(ClientAttribute)
+            .where(tuple_(ClientAttribute.client_id, ClientAttribute.attribute_key).in_(touched))
+            .execution_options(synchronize_session=False)
+        )
+    new_rows = [
+        {'client_id': client_id, 'attribute_key': key, 'attribute_value': value}
+        for client_id in updated_ids
+        for key, value in changes.get(client_id, dict()).items()
+    ]
+    if new_rows:
+        await db.execute(insert(ClientAttribute), new_rows)
+
+    statement = (
+        select(Client)
+        .where(Client.id.in_(updated_ids))
+        .order_by(Client.id)
+        .execution_options(populate_existing=True)
+    )
+    return (await db.execute(statement)).scalars().all()
@@ -0,0 +1,157 @@
+from services.business.models import Business, TeamMember, Client
+from services.business.enums import StatusUserForBusiness
+from services.event_calendar.models import CalendarEvent
+from services.finance.models import FinancialBusiness, FinancialTransaction, FinancialPeriodSnapshot
+from services.finance.enums import TransactionType
+from services.finance.periods import signed_amount, get_month_start, get_next_month
+from services.config import get_settings
+from services.cache import TTLCache
+from sqlalchemy import select, func, and_, or_, true
+from sqlalchemy.orm import scoped_session
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+settings = get_settings()
+business_dashboards = TTLCache(ttl=settings.dashboard_cache_seconds, max_size=settings.dashboard_cache_size)
+
+
+class BusinessDashboard(NamedTuple):
+    business_id: int
+    team_size: int
+    clients_by_status: Dict[StatusUserForBusiness, int]
+    upcoming_events: int
+    month_accruals: float
+    month_expenses: float
+    balance: float
+
+
+def get_dashboard_statement(business_id: int, moment: datetime):
+    """
+    Every counter of the dashboard is an aggregate CTE of one row, so the
+    statement returns one row when the business exists and none otherwise.
+
+    The balance is the closing balance of the last closed month of every
+    financial account plus its transactions since, the current month is never
+    closed, so its totals come from the same scan
+    """
+    month_start = get_month_start(moment)
+    next_month = get_next_month(month_start)
+    today = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    business = (
+        select(Business.id, Business.user_id)
+        .where(Business.id == business_id)
+        .cte('dashboard_business')
+    )
+    team = (
+        select(func.count().label('team_size'))
+        .where(TeamMember.business_id == business_id)
+        .cte('dashboard_team')
+    )
+    clients = (
+        select(*[
+            func.count().filter(Client.status == status).label(status.name.lower())
+            for status in StatusUserForBusiness
+        ])
+        .where(Client.user_id == select(business.c.user_id).scalar_subquery())
+        .cte('dashboard_clients')
+    )
+    events = (
+        select(func.count().label('upcoming_events'))
+        .where(
+            and_(
+                CalendarEvent.business_id == business_id,
+                CalendarEvent.event_date >= today
+            )
+        )
+        .cte('dashboard_events')
+    )
+    accounts = (
+        select(FinancialBusiness.id, FinancialBusiness.closed_until)
+        .where(FinancialBusiness.business_id == business_id)
+        .cte('dashboard_accounts')
+    )
+    closed = (
+        select(func.coalesce(func.sum(FinancialPeriodSnapshot.closing_balance), 0).label('closed_balance'))
+        .select_from(accounts)
+        .join(
+            FinancialPeriodSnapshot,
+            and_(
+                FinancialPeriodSnapshot.financial_business_id == accounts.c.id,
+                FinancialPeriodSnapshot.period_end == accounts.c.closed_until
+            )
+        )
+        .cte('dashboard_closed')
+    )
+    in_month = and_(FinancialTransaction.date >= month_start, FinancialTransaction.date < next_month)
+    live = (
+        select(
+            func.coalesce(func.sum(signed_amount()), 0).label('live_balance'),
+            func.coalesce(
+                func.sum(FinancialTransaction.amount).filter(
+                    and_(in_month, FinancialTransaction.transaction_type == TransactionType.ACCRUAL)
+                ),
+                0
+            ).label('month_accruals'),
+            func.coalesce(
+                func.sum(FinancialTransaction.amount).filter(
+                    and_(in_month, FinancialTransaction.transaction_type == TransactionType.EXPENSE)
+                ),
+                0
+            ).label('month_expenses')
+        )
+        .select_from(accounts)
+        .join(FinancialTransaction, FinancialTransaction.financial_business_id == accounts.c.id)
+        .where(
+            or_(
+                accounts.c.closed_until.is_(None),
+                FinancialTransaction.date >= accounts.c.closed_until
+            )
+        )
+        .cte('dashboard_live')
+    )
+
+    return (
+        select(
+            business.c.id,
+            team.c.team_size,
+            *[clients.c[status.name.lower()] for status in StatusUserForBusiness],
+            events.c.upcoming_events,
+            live.c.month_accruals,
+            live.c.month_expenses,
+            (closed.c.closed_balance + live.c.live_balance).label('balance')
+        )
+        .select_from(business)
+        .join(team, true())
+        .join(clients, true())
+        .join(events, true())
+        .join(closed, true())
+        .join(live, true())
+    )
+
+
+async def get_business_dashboard(db: scoped_session, business_id: int) -> Optional[BusinessDashboard]:
+    """
+    Summary of the business for its home screen in one round trip,
+    cached for `dashboard_cache_seconds`
+    """
+    dashboard = business_dashboards.get(business_id)
+    if dashboard is not None:
+        return dashboard
+
+    row = (await db.execute(get_dashboard_statement(business_id=business_id, moment=datetime.now()))).first()
+    if row is None:
+        return None
+
+    row = row._mapping
+    dashboard = BusinessDashboard(
+        business_id=row['id'],
+        team_size=row['team_size'],
+        clients_by_status={status: row[status.name.lower()] for status in StatusUserForBusiness},
+        upcoming_events=row['upcoming_events'],
+        month_accruals=float(row['month_accruals']),
+        month_expenses=float(row['month_expenses']),
+        balance=float(row['balance'])
+    )
+    business_dashboards.set(business_id, dashboard)
+    return dashboard
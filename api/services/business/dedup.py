@@ -0,0 +1,309 @@
+from services.business.models import Client, ClientAttribute, ClientStatusChange
+from services.business.attributes import sync_client_attribute_values
+from services.event_calendar.models import Participant
+from sqlalchemy import select, update, delete, exists, func, and_, case
+from sqlalchemy.orm import scoped_session, aliased
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+import asyncio
+import re
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+PHONE_SUFFIX_DIGITS = 7
+# Mailboxes of these domains ignore dots in the local part
+DOTLESS_DOMAINS = {'gmail.com', 'googlemail.com'}
+# Empty fields of the kept client are filled from the merged ones
+MERGED_FIELDS = ('region', 'city', 'address', 'email', 'phone', 'description')
+
+
+class ClientContacts(NamedTuple):
+    id: int
+    name: str
+    email: str
+    phone: str
+    city: str
+
+
+class DuplicatePair(NamedTuple):
+    client_id: int
+    duplicate_id: int
+    score: float
+    reasons: List[str]
+
+
+def get_words(text: str) -> List[str]:
+    return re.findall(r'[^\W_]+', text.lower())
+
+
+def soundex(word: str) -> str:
+    letters = [letter for letter in word.lower() if letter.isascii() and letter.isalpha()]
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+        if letter not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def get_trigrams(text: str) -> Set[str]:
+    """
+    Trigrams of the words as pg_trgm builds them
+    """
+    trigrams = set()
+    for word in get_words(text):
+        padded = f"  {word} "
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def trigram_similarity(trigrams: Set[str], other_trigrams: Set[str]) -> float:
+    if not trigrams or not other_trigrams:
+        return 0.0
+    shared = len(trigrams & other_trigrams)
+    return shared / (len(trigrams) + len(other_trigrams) - shared)
+
+
+def canonical_email(email: str) -> str:
+    local, _, domain = email.partition('@')
+    if not domain:
+        return ''
+    local = local.split('+')[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace('.', '')
+        domain = 'gmail.com'
+    return f"{local}@{domain}"
+
+
+class ClientKeys(NamedTuple):
+    """
+    Parts of the contacts compared by the scoring, computed once per client
+    """
+    email: str
+    phone_suffix: str
+    city: str
+    trigrams: Set[str]
+    name_key: str
+
+
+def get_client_keys(client: ClientContacts) -> ClientKeys:
+    words = get_words(client.name)
+    name_key = ''
+    if words:
+        name_key = soundex(words[0]) + soundex(words[-1]) if len(words) > 1 else soundex(words[0])
+    return ClientKeys(
+        email=canonical_email(client.email),
+        phone_suffix=client.phone[-PHONE_SUFFIX_DIGITS:] if len(client.phone) >= PHONE_SUFFIX_DIGITS else '',
+        city=client.city.lower(),
+        trigrams=get_trigrams(client.name),
+        name_key=name_key
+    )
+
+
+def get_blocking_keys(keys: ClientKeys) -> Iterator[Tuple[str, str]]:
+    """
+    Clients sharing any key are compared with each other
+    """
+    if keys.phone_suffix:
+        yield 'phone', keys.phone_suffix
+    if keys.email:
+        yield 'email', keys.email
+    if keys.name_key:
+        yield 'name', keys.name_key
+
+
+def score_pair(keys: ClientKeys, other_keys: ClientKeys) -> Tuple[float, List[str]]:
+    reasons = list()
+    score = 0.0
+
+    if keys.email and keys.email == other_keys.email:
+        score += 0.5
+        reasons.append('email')
+
+    if keys.phone_suffix and keys.phone_suffix == other_keys.phone_suffix:
+        score += 0.4
+        reasons.append('phone')
+
+    name_similarity = trigram_similarity(keys.trigrams, other_keys.trigrams)
+    if name_similarity >= 0.3:
+        score += 0.4 * name_similarity
+        reasons.append('name')
+        if keys.city and keys.city == other_keys.city:
+            score += 0.1
+            reasons.append('city')
+
+    return min(score, 1.0), reasons
+
+
+def find_duplicate_pairs(
+        clients: List[ClientContacts], min_score: float, limit: int, max_block_size: int
+) -> List[DuplicatePair]:
+    """
+    Score only the pairs sharing a blocking key: the work is linear in the number of
+    clients and quadratic only in the size of blocks, blocks larger than
+    `max_block_size` are too common to tell anything and are skipped
+    """
+    client_keys = [get_client_keys(client) for client in clients]
+    blocks: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for index, keys in enumerate(client_keys):
+        for key in get_blocking_keys(keys):
+            blocks[key].append(index)
+
+    candidates = set()
+    for indexes in blocks.values():
+        if 1 < len(indexes) <= max_block_size:
+            for position, index in enumerate(indexes):
+                for other_index in indexes[position + 1:]:
+                    candidates.add((index, other_index))
+
+    pairs = list()
+    for index, other_index in candidates:
+        score, reasons = score_pair(client_keys[index], client_keys[other_index])
+        if score >= min_score:
+            client_id, duplicate_id = sorted((clients[index].id, clients[other_index].id))
+            pairs.append(DuplicatePair(client_id=client_id, duplicate_id=duplicate_id, score=score, reasons=reasons))
+
+    pairs.sort(key=lambda pair: (-pair.score, pair.client_id, pair.duplicate_id))
+    return pairs[:limit]
+
+
+async def find_duplicate_clients(
+        db: scoped_session, user_id: int, min_score: float, limit: int, max_block_size: int
+) -> List[DuplicatePair]:
+    statement = select(
+        Client.id, Client.name, Client.email_normalized, Client.phone_normalized, Client.city
+    ).where(Client.user_id == user_id)
+    clients = [
+        ClientContacts(id=row[0], name=row[1], email=row[2] or '', phone=row[3] or '', city=row[4])
+        for row in (await db.execute(statement)).fetchall()
+    ]
+    # Scoring is CPU bound, the event loop keeps serving other requests meanwhile
+    return await asyncio.get_running_loop().run_in_executor(
+        None, find_duplicate_pairs, clients, min_score, limit, max_block_size
+    )
+
+
+async def merge_clients(
+        db: scoped_session, user_id: int, client_id: int, duplicate_ids: List[int]
+) -> Optional[Client]:
+    """
+    Move participants, attributes and status history of the duplicates to the client
+    and delete the duplicates.
+
+    The rows of all clients are locked first, so concurrent merges of the same clients
+    are serialized. Return None when any of the clients is not a client of the user
+    """
+    client_ids = sorted({client_id, *duplicate_ids})
+    statement = (
+        select(Client.id)
+        .where(
+            and_(
+                Client.id.in_(client_ids),
+                Client.user_id == user_id
+            )
+        )
+        .order_by(Client.id)
+        .with_for_update()
+    )
+    if len((await db.execute(statement)).scalars().all()) != len(client_ids):
+        return None
+
+    kept = aliased(Participant)
+    await db.execute(
+        update(Participant)
+        .where(Participant.client_id.in_(duplicate_ids))
+        .values(client_id=client_id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(Participant)
+        .where(
+            and_(
+                Participant.client_id == client_id,
+                exists().where(
+                    and_(
+                        kept.client_id == client_id,
+                        kept.event_id == Participant.event_id,
+                        kept.id < Participant.id
+                    )
+                )
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    own_attribute = aliased(ClientAttribute)
+    await db.execute(
+        delete(ClientAttribute)
+        .where(
+            and_(
+                ClientAttribute.client_id.in_(duplicate_ids),
+                exists().where(
+                    and_(
+                        own_attribute.client_id == client_id,
+                        own_attribute.attribute_key == ClientAttribute.attribute_key
+                    )
+                )
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(ClientAttribute)
+        .where(ClientAttribute.client_id.in_(duplicate_ids))
+        .values(client_id=client_id)
+        .execution_options(synchronize_session=False)
+    )
+    await sync_client_attribute_values(db=db, client_ids=[client_id])
+
+    await db.execute(
+        update(ClientStatusChange)
+        .where(ClientStatusChange.client_id.in_(duplicate_ids))
+        .values(client_id=client_id)
+        .execution_options(synchronize_session=False)
+    )
+
+    duplicate = aliased(Client)
+    values = dict()
+    for field in MERGED_FIELDS:
+        column = getattr(Client, field)
+        duplicate_column = getattr(duplicate, field)
+        first_filled = (
+            select(duplicate_column)
+            .where(
+                and_(
+                    duplicate.id.in_(duplicate_ids),
+                    duplicate_column != ''
+                )
+            )
+            .order_by(duplicate.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        values[field] = case((column == '', func.coalesce(first_filled, '')), else_=column)
+    await db.execute(
+        update(Client)
+        .where(Client.id == client_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    await db.execute(
+        delete(Client)
+        .where(Client.id.in_(duplicate_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+    statement = select(Client).where(Client.id == client_id).execution_options(populate_existing=True)
+    return (await db.execute(statement)).scalars().first()
@@ -55,3 +55,54 @@ class StatusUserForBusiness(enum.Enum):
     NEW = 'new'
     IN_PROGRESS = 'in_progress'
     IN_ARCHIVE = 'in_archive'
+
+
+@strawberry.enum
+class ClientSearchMode(enum.Enum):
+    """
+    FUZZY: ranked trigram search by any part of the words, tolerates typos
+    PREFIX: every word of the query is a prefix of a word of the client, for type-ahead
+    """
+    FUZZY = 'fuzzy'
+    PREFIX = 'prefix'
+
+
+@strawberry.enum
+class ClientImportFormat(enum.Enum):
+    """
+    Format of the file of client import
+    """
+    CSV = 'csv'
+    VCARD = 'vcard'
+
+
+@strawberry.enum
+class ClientTimelineItemType(enum.Enum):
+    """
+    Source of the item of the client timeline
+    """
+    EVENT = 'event'
+    STATUS_CHANGE = 'status_change'
+
+
+@strawberry.enum
+class PermissionResource(enum.Enum):
+    """
+    Parts of a business that are granted to roles of its team
+    """
+    BUSINESS = 'business'
+    ROLES = 'roles'
+    TEAM = 'team'
+    EVENTS = 'events'
+    FINANCE = 'finance'
+
+
+@strawberry.enum
+class PermissionAction(enum.Enum):
+    """
+    Actions on a resource of a business
+    """
+    READ = 'read'
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
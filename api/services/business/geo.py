@@ -0,0 +1,141 @@
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import scoped_session
+from typing import List, NamedTuple, Tuple
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Cells of 1/20 degree (~5.5 km of latitude), numbered row by row from the south-west,
+# so the cells of a latitude row are a contiguous range of numbers
+CELLS_PER_DEGREE = 20
+CELLS_IN_ROW = 360 * CELLS_PER_DEGREE
+CELLS_IN_COLUMN = 180 * CELLS_PER_DEGREE
+# Shared with the generated `geo_cell` columns of the models and their migration
+GEO_CELL_EXPRESSION = (
+    f"CAST(floor((least(CAST(latitude AS DOUBLE PRECISION), 89.999999) + 90) * {CELLS_PER_DEGREE}) AS INTEGER) "
+    f"* {CELLS_IN_ROW} "
+    f"+ CAST(floor((least(CAST(longitude AS DOUBLE PRECISION), 179.999999) + 180) * {CELLS_PER_DEGREE}) AS INTEGER)"
+)
+
+
+class NearbyObject(NamedTuple):
+    object: object
+    distance_km: float
+
+
+def haversine_km(latitude: float, longitude: float, other_latitude: float, other_longitude: float) -> float:
+    latitude, other_latitude = math.radians(latitude), math.radians(other_latitude)
+    delta_latitude = other_latitude - latitude
+    delta_longitude = math.radians(other_longitude - longitude)
+    a = (
+        math.sin(delta_latitude / 2) ** 2
+        + math.cos(latitude) * math.cos(other_latitude) * math.sin(delta_longitude / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def get_row(latitude: float) -> int:
+    return min(int(math.floor((latitude + 90) * CELLS_PER_DEGREE)), CELLS_IN_COLUMN - 1)
+
+
+def get_column(longitude: float) -> int:
+    return min(int(math.floor((longitude + 180) * CELLS_PER_DEGREE)), CELLS_IN_ROW - 1)
+
+
+def get_cell_ranges(latitude: float, longitude: float, radius_km: float) -> List[Tuple[int, int]]:
+    """
+    Inclusive ranges of cells covering the bounding box of the circle,
+    ranges of neighbouring rows are merged when the box spans all longitudes
+    """
+    delta_latitude = radius_km / KM_PER_DEGREE
+    south = max(latitude - delta_latitude, -90.0)
+    north = min(latitude + delta_latitude, 90.0)
+    widest_latitude = max(abs(south), abs(north))
+
+    columns: List[Tuple[int, int]]
+    if widest_latitude >= 90.0:
+        columns = [(0, CELLS_IN_ROW - 1)]
+    else:
+        delta_longitude = delta_latitude / math.cos(math.radians(widest_latitude))
+        if delta_longitude >= 180.0:
+            columns = [(0, CELLS_IN_ROW - 1)]
+        else:
+            west = longitude - delta_longitude
+            east = longitude + delta_longitude
+            if west < -180.0:
+                columns = [(0, get_column(east)), (get_column(west + 360.0), CELLS_IN_ROW - 1)]
+            elif east >= 180.0:
+                columns = [(0, get_column(east - 360.0)), (get_column(west), CELLS_IN_ROW - 1)]
+            else:
+                columns = [(get_column(west), get_column(east))]
+
+    ranges: List[Tuple[int, int]] = list()
+    for row in range(get_row(south), get_row(north) + 1):
+        for first_column, last_column in columns:
+            low, high = row * CELLS_IN_ROW + first_column, row * CELLS_IN_ROW + last_column
+            if ranges and ranges[-1][1] + 1 == low:
+                ranges[-1] = (ranges[-1][0], high)
+            else:
+                ranges.append((low, high))
+
+    return sorted(ranges)
+
+
+def located(model):
+    """
+    0, 0 is the default of the coordinates, such rows have no location
+    """
+    return or_(model.latitude != 0, model.longitude != 0)
+
+
+async def get_within_radius(
+        db: scoped_session, model, condition,
+        latitude: float, longitude: float, radius_km: float, limit: int
+) -> List[NearbyObject]:
+    """
+    Rows of `model` matching `condition` within `radius_km` ordered by distance.
+
+    Postgres reads the cells of the bounding box with range scans of the index
+    on `geo_cell`, the exact distance filters and orders the candidates here
+    """
+    ranges = get_cell_ranges(latitude=latitude, longitude=longitude, radius_km=radius_km)
+    statement = select(model).where(
+        and_(
+            condition,
+            located(model),
+            or_(*[model.geo_cell.between(low, high) for low, high in ranges])
+        )
+    )
+    candidates = (await db.execute(statement)).scalars().all()
+
+    nearby = list()
+    for candidate in candidates:
+        distance_km = haversine_km(latitude, longitude, candidate.latitude, candidate.longitude)
+        if distance_km <= radius_km:
+            nearby.append(NearbyObject(object=candidate, distance_km=distance_km))
+
+    nearby.sort(key=lambda item: (item.distance_km, item.object.id))
+    return nearby[:limit]
+
+
+async def get_nearest(
+        db: scoped_session, model, condition,
+        latitude: float, longitude: float, limit: int,
+        start_radius_km: float, max_radius_km: float
+) -> List[NearbyObject]:
+    """
+    `limit` nearest rows of `model` matching `condition`: the radius is doubled
+    until it holds enough rows, rows within the radius are exactly the nearest ones
+    """
+    radius_km = start_radius_km
+    while True:
+        nearby = (
+            await get_within_radius(
+                db=db, model=model, condition=condition,
+                latitude=latitude, longitude=longitude,
+                radius_km=radius_km, limit=limit
+            )
+        )
+        if len(nearby) >= limit or radius_km >= max_radius_km:
+            return nearby
+        radius_km = min(radius_km * 2, max_radius_km)
@@ -0,0 +1,425 @@
+from services.business.models import Client
+from services.business.enums import ClientImportFormat, UserTypeForBusiness, StatusUserForBusiness
+from services.business.segments import invalidate_client_segments
+from services.jobs.models import BackgroundJob
+from services.jobs.work_with_db import update_job
+from services.config import get_settings
+from sqlalchemy import text, bindparam, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import scoped_session
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, TextIO, Tuple
+import csv
+import json
+import os
+import re
+
+# Any constant, imports of one user are serialized by the lock on (key, user id)
+IMPORT_LOCK_KEY = 913374
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+MIN_PHONE_DIGITS = 5
+
+STRING_LIMITS = {
+    'name': 255,
+    'region': 255,
+    'city': 255,
+    'address': 255,
+    'email': 255,
+    'phone': 255,
+    'description': 4000,
+}
+ATTRIBUTE_LIMIT = 255
+
+CSV_COLUMNS = {
+    'name': 'name',
+    'full name': 'name',
+    'fullname': 'name',
+    'email': 'email',
+    'e-mail': 'email',
+    'phone': 'phone',
+    'telephone': 'phone',
+    'tel': 'phone',
+    'mobile': 'phone',
+    'region': 'region',
+    'city': 'city',
+    'address': 'address',
+    'description': 'description',
+    'note': 'description',
+    'birthday': 'birthday',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+}
+
+STAGING_COLUMNS = (
+    'row_number', 'name', 'region', 'city', 'address', 'email', 'phone',
+    'email_normalized', 'phone_normalized', 'latitude', 'longitude',
+    'description', 'birthday', 'attribute_values'
+)
+
+CREATE_STAGING_SQL = """
+CREATE TEMPORARY TABLE client_import_staging (
+    row_number INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    region VARCHAR NOT NULL,
+    city VARCHAR NOT NULL,
+    address VARCHAR NOT NULL,
+    email VARCHAR NOT NULL,
+    phone VARCHAR NOT NULL,
+    email_normalized VARCHAR NOT NULL,
+    phone_normalized VARCHAR NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    description VARCHAR NOT NULL,
+    birthday TIMESTAMP NOT NULL,
+    attribute_values JSONB NOT NULL
+) ON COMMIT DROP
+"""
+
+# Rows with the email or the phone of an earlier row of the batch or of an existing client
+# of the user are skipped, ids are taken in advance to insert attributes in the same statement
+LOAD_STAGING_SQL = """
+WITH ranked AS (
+    SELECT
+        staging.*,
+        CASE WHEN email_normalized = '' THEN row_number
+             ELSE min(row_number) OVER (PARTITION BY email_normalized) END AS first_by_email,
+        CASE WHEN phone_normalized = '' THEN row_number
+             ELSE min(row_number) OVER (PARTITION BY phone_normalized) END AS first_by_phone
+    FROM client_import_staging AS staging
+),
+new AS (
+    SELECT ranked.*, nextval(pg_get_serial_sequence('client', 'id')) AS client_id
+    FROM ranked
+    WHERE row_number = first_by_email
+      AND row_number = first_by_phone
+      AND NOT EXISTS (
+          SELECT 1 FROM client
+          WHERE client.user_id = :user_id
+            AND (
+                (ranked.email_normalized <> '' AND client.email_normalized = ranked.email_normalized)
+                OR (ranked.phone_normalized <> '' AND client.phone_normalized = ranked.phone_normalized)
+            )
+      )
+),
+inserted_clients AS (
+    INSERT INTO client (
+        id, created_at, updated_at, user_id, name, user_type, status,
+        region, city, address, email, phone, latitude, longitude,
+        description, birthday, attribute_values
+    )
+    SELECT
+        client_id, now(), now(), :user_id, name, :user_type, :status,
+        region, city, address, email, phone, latitude, longitude,
+        description, birthday, attribute_values
+    FROM new
+),
+inserted_attributes AS (
+    INSERT INTO client_attribute (created_at, updated_at, client_id, attribute_key, attribute_value)
+    SELECT now(), now(), new.client_id, attribute.key, attribute.value
+    FROM new, jsonb_each_text(new.attribute_values) AS attribute
+)
+SELECT row_number FROM new
+"""
+
+
+class ImportRecord(NamedTuple):
+    row_number: int
+    values: Dict[str, str]
+    attributes: Dict[str, str]
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def normalize_email(email: str) -> str:
+    email = email.strip().lower()
+    if email and not EMAIL_PATTERN.match(email):
+        raise ImportRowError(f"email '{email}' is not valid")
+    return email
+
+
+def normalize_phone(phone: str) -> Tuple[str, str]:
+    """
+    Phone to store and its digits without the international prefix `00`,
+    the digits are compared with `client.phone_normalized` that drops the prefix the same way
+    """
+    phone = phone.strip()
+    digits = re.sub(r'[^0-9]', '', phone)
+    if phone and len(digits) < MIN_PHONE_DIGITS:
+        raise ImportRowError(f"phone '{phone}' is not valid")
+    if phone.startswith('00'):
+        digits = digits[2:]
+    if not digits:
+        return '', ''
+    return f"+{digits}" if phone.startswith(('+', '00')) else digits, digits
+
+
+def parse_birthday(value: str) -> datetime:
+    value = value.strip()
+    for date_format in ('%Y-%m-%d', '%Y%m%d', '%d.%m.%Y', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ImportRowError(f"birthday '{value}' is not a date")
+
+
+def parse_coordinate(value: str, name: str, limit: float) -> float:
+    try:
+        coordinate = float(value)
+    except ValueError:
+        raise ImportRowError(f"{name} '{value}' is not a number")
+    if not -limit <= coordinate <= limit:
+        raise ImportRowError(f"{name} '{value}' is out of range")
+    return coordinate
+
+
+def get_staging_row(record: ImportRecord) -> tuple:
+    """
+    Validated and normalized row of the staging table, raise ImportRowError
+    """
+    values = {key: value.strip() for key, value in record.values.items() if value is not None}
+    for key, limit in STRING_LIMITS.items():
+        if len(values.get(key, '')) > limit:
+            raise ImportRowError(f"{key} is longer than {limit} characters")
+    for key, value in record.attributes.items():
+        if len(key) > ATTRIBUTE_LIMIT or len(value) > ATTRIBUTE_LIMIT:
+            raise ImportRowError(f"attribute {key[:50]} is longer than {ATTRIBUTE_LIMIT} characters")
+
+    if not values.get('name'):
+        raise ImportRowError("name is empty")
+
+    email = normalize_email(values.get('email', ''))
+    phone, phone_digits = normalize_phone(values.get('phone', ''))
+    birthday = parse_birthday(values['birthday']) if values.get('birthday') else datetime.now()
+    latitude = parse_coordinate(values['latitude'], 'latitude', 90) if values.get('latitude') else 0.0
+    longitude = parse_coordinate(values['longitude'], 'longitude', 180) if values.get('longitude') else 0.0
+
+    return (
+        record.row_number,
+        values['name'],
+        values.get('region', ''),
+        values.get('city', ''),
+        values.get('address', ''),
+        email,
+        phone,
+        email,
+        phone_digits,
+        latitude,
+        longitude,
+        values.get('description', ''),
+        birthday,
+        json.dumps(record.attributes)
+    )
+
+
+def iterate_csv_records(file: TextIO) -> Iterator[ImportRecord]:
+    """
+    Known columns are fields of the client, other columns are its attributes
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column.strip() for column in header]
+
+    for row_number, row in enumerate(reader, start=1):
+        values = dict()
+        attributes = dict()
+        for column, value in zip(columns, row):
+            field = CSV_COLUMNS.get(column.lower())
+            if field is not None:
+                values[field] = value
+            elif column and value.strip():
+                attributes[column] = value.strip()
+        yield ImportRecord(row_number=row_number, values=values, attributes=attributes)
+
+
+def unescape_vcard_value(value: str) -> str:
+    return (
+        value.replace('\\n', '\n').replace('\\N', '\n')
+        .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+    )
+
+
+def iterate_vcard_lines(file: TextIO) -> Iterator[str]:
+    """
+    Lines of the file with folded continuation lines joined back
+    """
+    current = None
+    for line in file:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def apply_vcard_property(record: ImportRecord, name: str, value: str) -> None:
+    values, attributes = record.values, record.attributes
+    if name == 'FN':
+        values['name'] = unescape_vcard_value(value)
+    elif name == 'N' and not values.get('name'):
+        parts = [unescape_vcard_value(part) for part in value.split(';')]
+        values['name'] = ' '.join(part for part in (parts[1:2] + parts[:1]) if part)
+    elif name == 'EMAIL' and not values.get('email'):
+        values['email'] = value
+    elif name == 'TEL' and not values.get('phone'):
+        values['phone'] = value[4:] if value.lower().startswith('tel:') else value
+    elif name == 'ADR' and not values.get('address'):
+        parts = [unescape_vcard_value(part) for part in value.split(';')] + [''] * 7
+        values['address'], values['city'], values['region'] = parts[2], parts[3], parts[4]
+    elif name == 'BDAY':
+        values['birthday'] = value
+    elif name == 'NOTE':
+        values['description'] = unescape_vcard_value(value)
+    elif name == 'GEO':
+        coordinates = value[4:] if value.lower().startswith('geo:') else value
+        latitude, _, longitude = coordinates.replace(';', ',').partition(',')
+        values['latitude'], values['longitude'] = latitude, longitude
+    elif name in ('ORG', 'TITLE', 'URL') or name.startswith('X-'):
+        key = name[2:] if name.startswith('X-') else name
+        attributes[key.lower()] = unescape_vcard_value(value).strip(';')
+
+
+def iterate_vcard_records(file: TextIO) -> Iterator[ImportRecord]:
+    record = None
+    row_number = 0
+    for line in iterate_vcard_lines(file):
+        name, _, value = line.partition(':')
+        name = name.split(';')[0].split('.')[-1].upper()
+        if name == 'BEGIN' and value.strip().upper() == 'VCARD':
+            row_number += 1
+            record = ImportRecord(row_number=row_number, values=dict(), attributes=dict())
+        elif name == 'END' and record is not None:
+            yield record
+            record = None
+        elif record is not None and value:
+            apply_vcard_property(record=record, name=name, value=value)
+
+
+def iterate_import_records(file: TextIO, file_format: ClientImportFormat) -> Iterator[ImportRecord]:
+    if file_format is ClientImportFormat.VCARD:
+        return iterate_vcard_records(file)
+    return iterate_csv_records(file)
+
+
+async def load_client_batch(db: scoped_session, user_id: int, rows: List[tuple]) -> List[int]:
+    """
+    COPY the rows into a staging table and insert new clients with their
+    attributes by one statement, return row numbers of inserted clients
+    """
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(:key, :user_id)"),
+        {'key': IMPORT_LOCK_KEY, 'user_id': user_id}
+    )
+    await db.execute(text(CREATE_STAGING_SQL))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        'client_import_staging', records=rows, columns=STAGING_COLUMNS
+    )
+
+    statement = text(LOAD_STAGING_SQL).bindparams(
+        bindparam('user_type', type_=Client.__table__.c.user_type.type),
+        bindparam('status', type_=Client.__table__.c.status.type)
+    )
+    result = await db.execute(
+        statement,
+        {
+            'user_id': user_id,
+            'user_type': UserTypeForBusiness.INDIVIDUAL,
+            'status': StatusUserForBusiness.NEW
+        }
+    )
+    return [row[0] for row in result.fetchall()]
+
+
+async def save_import_progress(
+        db: scoped_session, job: BackgroundJob, last_row_number: int,
+        processed_rows: int, failed_rows: int, errors: List[str]
+) -> None:
+    await update_job(
+        db=db, job_id=job.id, cursor=str(last_row_number),
+        processed_rows=processed_rows, failed_rows=failed_rows,
+        errors=BackgroundJob.errors.op('||')(literal(errors, type_=JSONB))
+    )
+    await db.commit()
+
+
+async def run_client_import_job(db: scoped_session, job: BackgroundJob) -> None:
+    """
+    Import clients from the uploaded file by batches of `client_import_batch_size` rows.
+
+    The file is read as a stream, every batch is committed with the progress of the job.
+    The file is removed when the job ends, also on a failure, so a failed import is not
+    resumed and the rows committed before the failure stay imported. Rows that fail
+    validation and duplicates are counted in `failed_rows`, the first
+    `client_import_max_errors` of them are described in `errors`
+    """
+    settings = get_settings()
+    parameters = job.parameters
+    file_format = ClientImportFormat(parameters['file_format'])
+    path = os.path.join(settings.import_dir, parameters['file_name'])
+    skip_rows = int(job.cursor or 0)
+    processed_rows = job.processed_rows
+    failed_rows = job.failed_rows
+    reported_errors = len(job.errors)
+
+    def report(errors: List[str], message: str) -> None:
+        nonlocal reported_errors
+        if reported_errors < settings.client_import_max_errors:
+            errors.append(message)
+            reported_errors += 1
+
+    rows = list()
+    errors = list()
+    pending_records = 0
+    last_row_number = skip_rows
+
+    async def load_pending_rows() -> None:
+        nonlocal rows, errors, pending_records, processed_rows, failed_rows
+        if rows:
+            loaded = set(await load_client_batch(db=db, user_id=job.user_id, rows=rows))
+            for row in rows:
+                if row[0] not in loaded:
+                    failed_rows += 1
+                    report(errors, f"row {row[0]}: client with this email or phone already exists")
+            processed_rows += len(loaded)
+
+        await save_import_progress(
+            db=db, job=job, last_row_number=last_row_number,
+            processed_rows=processed_rows, failed_rows=failed_rows, errors=errors
+        )
+        if rows:
+            # Bitmaps of the batch are rebuilt by the next segment query instead of one by one
+            invalidate_client_segments(user_id=job.user_id)
+        rows, errors, pending_records = list(), list(), 0
+
+    try:
+        with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as file:
+            for record in iterate_import_records(file=file, file_format=file_format):
+                if record.row_number <= skip_rows:
+                    continue
+
+                last_row_number = record.row_number
+                pending_records += 1
+                try:
+                    rows.append(get_staging_row(record))
+                except ImportRowError as e:
+                    failed_rows += 1
+                    report(errors, f"row {record.row_number}: {e}")
+
+                if pending_records >= settings.client_import_batch_size:
+                    await load_pending_rows()
+
+            await load_pending_rows()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
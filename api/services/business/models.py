@@ -1,12 +1,14 @@
 from sqlalchemy import (
     Column, Integer, ForeignKey, VARCHAR, Boolean,
-    String, Enum, TIMESTAMP, Float
+    String, Enum, TIMESTAMP, Float, Text, Computed, Index
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
+from sqlalchemy.orm import relationship, deferred
 from services.database import BaseModel
+from services.business.geo import GEO_CELL_EXPRESSION
 from datetime import datetime
 from services.business.enums import (
-    BusinessStatus, RolePrivileges, MemberType, UserTypeForBusiness, StatusUserForBusiness
+    BusinessStatus, RolePrivileges, MemberType, UserTypeForBusiness, StatusUserForBusiness, PermissionResource
 )
 from services.event_calendar.models import Participant
 
@@ -20,7 +22,7 @@ class ScopeTypeBusiness(BaseModel):
         'comment': "Table for description of scope type business"
     }
 
-    name = Column(VARCHAR(255), nullable=False, default="")
+    name = Column(VARCHAR(255), nullable=False, default="", unique=True)
     description = Column(String(3000), nullable=False, default="")
     hide = Column(Boolean, default=False)
 
@@ -28,6 +30,25 @@ class ScopeTypeBusiness(BaseModel):
         return f"Business: {self.name} | Hide status: {self.hide}"
 
 
+class ReferenceDataVersion(BaseModel):
+    """
+    Version of every table of reference data, bumped by a trigger on each change
+    of the table, workers poll it to refresh their snapshots
+    """
+    __tablename__ = 'reference_data_version'
+    __tableargs__ = {
+        'comment': "Table of versions of reference data"
+    }
+
+    name = Column(VARCHAR(255), nullable=False, unique=True)
+    version = Column(Integer, nullable=False, default=1)
+    # sha256 of the seed file of the table, see `services.settings_db.filling`
+    seed_hash = Column(VARCHAR(64), nullable=True)
+
+    def __repr__(self):
+        return f"ReferenceDataVersion of {self.name}: {self.version}"
+
+
 class Business(BaseModel):
     __tablename__ = 'business'
     __tableargs__ = {
@@ -64,6 +85,8 @@ class Business(BaseModel):
     city = Column(VARCHAR(255), nullable=False, default="")
     latitude = Column(Float(precision=20), nullable=False, default=0)
     longitude = Column(Float(precision=20), nullable=False, default=0)
+    # Cell of the location maintained by Postgres for `services.business.geo`
+    geo_cell = Column(Integer, Computed(GEO_CELL_EXPRESSION, persisted=True))
     email = Column(VARCHAR(255), nullable=False, default="")
     phone = Column(VARCHAR(255), nullable=False, default="")
     website = Column(VARCHAR(255), nullable=False, default="")
@@ -82,6 +105,9 @@ class Business(BaseModel):
         return f'UserID: {self.user_id} | Business: {self.title}'
 
 
+Index('ix_business_user_id_geo_cell', Business.user_id, Business.geo_cell)
+
+
 class BusinessRoles(BaseModel):
     __tablename__ = 'business_roles'
     __tableargs__ = {
@@ -111,6 +137,27 @@ class RolePermissions(BaseModel):
         nullable=False,
         default=RolePrivileges.READ_ONLY
     )
+    # Without a resource the row grants `full_access` to every resource,
+    # otherwise `actions` of the resource, a mask of `services.business.permissions.ACTION_BITS`
+    resource = Column(Enum(PermissionResource, native_enum=False), nullable=True)
+    actions = Column(Integer, nullable=False, default=0, server_default='0')
+
+
+Index('ix_role_permissions_role_id', RolePermissions.role_id)
+
+
+class BusinessPermissionChange(BaseModel):
+    __tablename__ = 'business_permission_change'
+    __tableargs__ = {
+        'comment': "Changes of roles and team members polled by every worker to drop its compiled permissions"
+    }
+
+    # Not a foreign key, the change of a deleted business is polled too
+    business_id = Column(Integer, nullable=False)
+    changed_at = Column(TIMESTAMP, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"Permissions of business ID: {self.business_id} changed at {self.changed_at}"
 
 
 class TeamMember(BaseModel):
@@ -158,6 +205,10 @@ class TeamMember(BaseModel):
         return f"Member of team business ID: {self.business_id} | UserID: {self.user_id}"
 
 
+Index('ix_team_member_user_id', TeamMember.user_id)
+Index('ix_team_member_business_id', TeamMember.business_id)
+
+
 class Client(BaseModel):
     __tablename__ = 'client'
     __tableargs__ = {
@@ -186,12 +237,35 @@ class Client(BaseModel):
     phone = Column(VARCHAR(255), nullable=False, default="")
     latitude = Column(Float(precision=20), nullable=False, default=0)
     longitude = Column(Float(precision=20), nullable=False, default=0)
+    geo_cell = Column(Integer, Computed(GEO_CELL_EXPRESSION, persisted=True))
     client_user_id = Column(
         Integer,
         ForeignKey('user.id', ondelete='CASCADE')
     )
     description = Column(VARCHAR(4000), nullable=False, default="")
     birthday = Column(TIMESTAMP, nullable=False, default=datetime.now())
+    # Key-value attributes filtered by `services.business.attributes`,
+    # rows of `client_attribute` are written alongside for `attributes`
+    attribute_values = Column(JSONB, nullable=False, default=dict, server_default='{}')
+    # Contacts compared by imports and deduplication, maintained by Postgres
+    email_normalized = deferred(Column(VARCHAR(255), Computed("lower(btrim(email))", persisted=True)))
+    # Digits of the phone without the international prefix `00`, as `imports.normalize_phone`
+    phone_normalized = deferred(Column(
+        VARCHAR(255),
+        Computed(r"regexp_replace(regexp_replace(phone, '^\s*00', ''), '[^0-9]', '', 'g')", persisted=True)
+    ))
+    # Maintained by Postgres for `services.business.search`, never loaded with the client
+    search_text = deferred(Column(
+        Text,
+        Computed("lower(name || ' ' || email || ' ' || phone || ' ' || city)", persisted=True)
+    ))
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('simple'::regconfig, name || ' ' || email || ' ' || phone || ' ' || city)",
+            persisted=True
+        )
+    ))
 
     attributes = relationship("ClientAttribute", lazy='selectin', foreign_keys='[ClientAttribute.client_id]')
     owner = relationship("User", lazy='selectin', foreign_keys=[user_id], back_populates="clients")
@@ -201,6 +275,20 @@ class Client(BaseModel):
         return f"Client user ID: {self.client_user_id} of UserID: {self.user_id}"
 
 
+Index('ix_client_user_id', Client.user_id)
+Index('ix_client_user_id_geo_cell', Client.user_id, Client.geo_cell)
+Index('ix_client_user_id_email_normalized', Client.user_id, Client.email_normalized)
+Index('ix_client_user_id_phone_normalized', Client.user_id, Client.phone_normalized)
+Index(
+    'ix_client_search_text_trgm',
+    Client.search_text,
+    postgresql_using='gin',
+    postgresql_ops={'search_text': 'gin_trgm_ops'}
+)
+Index('ix_client_search_vector', Client.search_vector, postgresql_using='gin')
+Index('ix_client_attribute_values', Client.attribute_values, postgresql_using='gin')
+
+
 class ClientAttribute(BaseModel):
     __tablename__ = 'client_attribute'
     __tableargs__ = {
@@ -218,3 +306,36 @@ class ClientAttribute(BaseModel):
 
     def __repr__(self):
         return f"Client user ID: {self.client_user_id} attribute: {self.attribute_key}: {self.attribute_value}"
+
+
+Index(
+    'ix_client_attribute_value_trgm',
+    ClientAttribute.attribute_value,
+    postgresql_using='gin',
+    postgresql_ops={'attribute_value': 'gin_trgm_ops'}
+)
+
+
+class ClientStatusChange(BaseModel):
+    __tablename__ = 'client_status_change'
+    __tableargs__ = {
+        'comment': "History of statuses of clients for the client timeline"
+    }
+
+    client_id = Column(
+        Integer,
+        ForeignKey('client.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    old_status = Column(Enum(StatusUserForBusiness, native_enum=False), nullable=False)
+    new_status = Column(Enum(StatusUserForBusiness, native_enum=False), nullable=False)
+    changed_at = Column(TIMESTAMP, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"Status of client ID: {self.client_id}: {self.old_status} -> {self.new_status}"
+
+
+Index(
+    'ix_client_status_change_client_id_changed_at',
+    ClientStatusChange.client_id, ClientStatusChange.changed_at, ClientStatusChange.id
+)
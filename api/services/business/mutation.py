@@ -14,7 +14,10 @@ from services.business.schema import (
     DeleteClientInputData, DeleteClientNode,
     AddClientAttributeInputData, AddClientAttributeNode,
     UpdateInfoClientAttributeInputData, UpdateInfoClientAttributeNode,
-    DeleteClientAttributeInputData, DeleteClientAttributeNode
+    DeleteClientAttributeInputData, DeleteClientAttributeNode,
+    SetClientAttributesInputData, SetClientAttributesNode,
+    MergeClientsInputData, MergeClientsNode,
+    SetRolePermissionsInputData, SetRolePermissionsNode
 )
 from services.business.resolvers import (
     create_business_resolver,
@@ -27,13 +30,21 @@ from services.business.resolvers import (
     update_info_team_member_resolver,
     delete_team_member_resolver,
     add_client_resolver,
+    add_client_replay,
     update_info_client_resolver,
     delete_client_resolver,
     add_client_attribute_resolver,
     update_info_client_attribute_resolver,
-    delete_client_attribute_resolver
+    delete_client_attribute_resolver,
+    set_client_attributes_resolver,
+    merge_clients_resolver,
+    set_role_permissions_resolver
 )
+from services.business.permissions import PermissionRequiredField
+from services.business.enums import PermissionResource, PermissionAction
+from services.idempotency import run_idempotent
 from strawberry.types import Info
+from typing import Optional
 import strawberry
 
 
@@ -95,9 +106,14 @@ class Mutation:
 
     @AuthenticationRequiredField()
     async def add_client(
-            self, info: Info, input_data: AddClientInputData
+            self, info: Info, input_data: AddClientInputData,
+            idempotency_key: Optional[str] = None
     ) -> AddClientNode:
-        return await add_client_resolver(info=info, input_data=input_data)
+        return await run_idempotent(
+            info=info, operation='add_client', key=idempotency_key,
+            execute=lambda: add_client_resolver(info=info, input_data=input_data),
+            replay=add_client_replay
+        )
 
     @AuthenticationRequiredField()
     async def update_info_client(
@@ -128,3 +144,21 @@ class Mutation:
             self, info: Info, input_data: DeleteClientAttributeInputData
     ) -> DeleteClientAttributeNode:
         return await delete_client_attribute_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def set_client_attributes(
+            self, info: Info, input_data: SetClientAttributesInputData
+    ) -> SetClientAttributesNode:
+        return await set_client_attributes_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def merge_clients(
+            self, info: Info, input_data: MergeClientsInputData
+    ) -> MergeClientsNode:
+        return await merge_clients_resolver(info=info, input_data=input_data)
+
+    @PermissionRequiredField(resource=PermissionResource.ROLES, action=PermissionAction.UPDATE)
+    async def set_role_permissions(
+            self, info: Info, input_data: SetRolePermissionsInputData
+    ) -> SetRolePermissionsNode:
+        return await set_role_permissions_resolver(info=info, input_data=input_data)
@@ -0,0 +1,294 @@
+from services.authorization import AuthenticationRequiredField
+from services.business.models import (
+    Business, BusinessRoles, RolePermissions, TeamMember, BusinessPermissionChange
+)
+from services.business.enums import PermissionResource, PermissionAction, RolePrivileges
+from services.finance.models import FinancialBusiness
+from services.config import get_settings
+from services.cache import TTLCache
+from services.database import AsyncSessionLocal
+from sqlalchemy import select, delete, insert, func, TIMESTAMP
+from sqlalchemy.orm import scoped_session
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+import asyncio
+import itertools
+import logging
+
+RESOURCES = list(PermissionResource)
+ACTIONS = list(PermissionAction)
+# Bits of the actions in the mask stored in `RolePermissions.actions`
+ACTION_BITS = {action: 1 << index for index, action in enumerate(ACTIONS)}
+ALL_ACTIONS = (1 << len(ACTIONS)) - 1
+# A compiled matrix is one int, the actions of every resource take `len(ACTIONS)` bits of it
+PERMISSION_BITS = {
+    (resource, action): 1 << (resource_index * len(ACTIONS) + action_index)
+    for resource_index, resource in enumerate(RESOURCES)
+    for action_index, action in enumerate(ACTIONS)
+}
+ALL_PERMISSIONS = (1 << (len(RESOURCES) * len(ACTIONS))) - 1
+READ_PERMISSIONS = sum(PERMISSION_BITS[(resource, PermissionAction.READ)] for resource in RESOURCES)
+
+settings = get_settings()
+user_permissions = TTLCache(ttl=settings.permission_cache_seconds, max_size=settings.permission_cache_size)
+# Matrices compiled before the last change of the business are stale, the counter
+# orders compilations and changes within the worker
+change_counter = itertools.count(1)
+business_changed_at: Dict[int, int] = dict()
+# Changes of the other workers, see `poll_business_permission_changes`
+permission_changes_polled_at: Optional[datetime] = None
+# Ids of the changes read in the overlap with their timestamps
+seen_permission_changes: Dict[int, datetime] = dict()
+permission_poller_task: Optional[asyncio.Task] = None
+
+
+class UserPermissions(NamedTuple):
+    compiled_at: int
+    businesses: Dict[int, int]
+
+
+def get_actions_mask(actions: Iterable[PermissionAction]) -> int:
+    mask = 0
+    for action in actions:
+        mask |= ACTION_BITS[action]
+    return mask
+
+
+def get_mask_actions(mask: int) -> List[PermissionAction]:
+    return [action for action in ACTIONS if mask & ACTION_BITS[action]]
+
+
+def get_grant_permissions(
+        full_access: RolePrivileges, resource: Optional[PermissionResource], actions: int
+) -> int:
+    """
+    Bits of the compiled matrix granted by one row of `role_permissions`
+    """
+    if resource is None:
+        return ALL_PERMISSIONS if full_access == RolePrivileges.ALL_ACCESS else READ_PERMISSIONS
+    return (actions & ALL_ACTIONS) << (RESOURCES.index(resource) * len(ACTIONS))
+
+
+def get_resource_actions(permissions: int, resource: PermissionResource) -> List[PermissionAction]:
+    return get_mask_actions(permissions >> (RESOURCES.index(resource) * len(ACTIONS)))
+
+
+async def compile_user_permissions(db: scoped_session, user_id: int) -> Dict[int, int]:
+    """
+    Matrix of every business of the user: owned businesses are fully granted,
+    grants of all roles of the user in a team are merged
+    """
+    businesses: Dict[int, int] = dict()
+
+    statement = select(Business.id).where(Business.user_id == user_id)
+    for business_id in (await db.execute(statement)).scalars().all():
+        businesses[business_id] = ALL_PERMISSIONS
+
+    statement = (
+        select(TeamMember.business_id, RolePermissions.full_access, RolePermissions.resource, RolePermissions.actions)
+        .join(RolePermissions, RolePermissions.role_id == TeamMember.role_id)
+        .where(TeamMember.user_id == user_id)
+    )
+    for business_id, full_access, resource, actions in (await db.execute(statement)).fetchall():
+        businesses[business_id] = (
+            businesses.get(business_id, 0) | get_grant_permissions(full_access, resource, actions)
+        )
+
+    return businesses
+
+
+async def get_user_permissions(db: scoped_session, user_id: int, business_id: int) -> int:
+    """
+    Compiled matrix of the user in the business, 0 when the user has nothing there
+    """
+    cached = user_permissions.get(user_id)
+    if cached is None or business_changed_at.get(business_id, 0) > cached.compiled_at:
+        compiled_at = next(change_counter)
+        cached = UserPermissions(
+            compiled_at=compiled_at,
+            businesses=await compile_user_permissions(db=db, user_id=user_id)
+        )
+        user_permissions.set(user_id, cached)
+    return cached.businesses.get(business_id, 0)
+
+
+def invalidate_business_permissions(business_id: Optional[int]) -> None:
+    if business_id is not None:
+        business_changed_at[business_id] = next(change_counter)
+
+
+async def mark_business_permissions_changed(db: scoped_session, business_id: Optional[int]) -> None:
+    """
+    Called on changes of roles, their permissions and team members of the business.
+    Matrices of this worker are dropped at once, the other workers drop theirs
+    by the next poll of `business_permission_change` after the commit
+    """
+    if business_id is None:
+        return
+    invalidate_business_permissions(business_id=business_id)
+    await db.execute(
+        insert(BusinessPermissionChange)
+        .values(business_id=business_id, changed_at=func.clock_timestamp().cast(TIMESTAMP))
+    )
+
+
+async def poll_business_permission_changes(db: scoped_session) -> None:
+    """
+    Changes are read with an overlap of `permission_poll_overlap_seconds`, since a change
+    is committed after its timestamp. Every change not seen yet by its id invalidates
+    its business, timestamps and ids do not follow the order of commits
+    """
+    global permission_changes_polled_at
+    polled_at = (await db.execute(select(func.localtimestamp()))).scalar()
+    if permission_changes_polled_at is not None:
+        statement = (
+            select(
+                BusinessPermissionChange.id,
+                BusinessPermissionChange.business_id,
+                BusinessPermissionChange.changed_at
+            )
+            .where(
+                BusinessPermissionChange.changed_at > (
+                    permission_changes_polled_at - timedelta(seconds=settings.permission_poll_overlap_seconds)
+                )
+            )
+        )
+        for change_id, business_id, changed_at in (await db.execute(statement)).fetchall():
+            if change_id not in seen_permission_changes:
+                seen_permission_changes[change_id] = changed_at
+                invalidate_business_permissions(business_id=business_id)
+
+    # Changes out of the overlap are never read again
+    horizon = polled_at - timedelta(seconds=settings.permission_poll_overlap_seconds * 2)
+    for change_id, changed_at in list(seen_permission_changes.items()):
+        if changed_at < horizon:
+            del seen_permission_changes[change_id]
+    permission_changes_polled_at = polled_at
+
+
+async def run_permission_poller() -> None:
+    while True:
+        await asyncio.sleep(settings.permission_poll_seconds)
+        db = AsyncSessionLocal()
+        try:
+            await poll_business_permission_changes(db=db)
+        except Exception as e:
+            logging.warning(f"Permission poller failed: {e}")
+        finally:
+            await db.close()
+
+
+async def start_permission_poller() -> None:
+    global permission_poller_task
+    if permission_poller_task is None or permission_poller_task.done():
+        permission_poller_task = asyncio.create_task(run_permission_poller())
+
+
+async def stop_permission_poller() -> None:
+    if permission_poller_task is not None:
+        permission_poller_task.cancel()
+
+
+async def get_business_id_of(
+        db: scoped_session,
+        business_id: Optional[int] = None, team_member_id: Optional[int] = None,
+        financial_business_id: Optional[int] = None, role_id: Optional[int] = None
+) -> Optional[int]:
+    if business_id:
+        return business_id
+
+    if team_member_id:
+        statement = select(TeamMember.business_id).where(TeamMember.id == team_member_id)
+    elif financial_business_id:
+        statement = select(FinancialBusiness.business_id).where(FinancialBusiness.id == financial_business_id)
+    elif role_id:
+        statement = select(BusinessRoles.business_id).where(BusinessRoles.id == role_id)
+    else:
+        return None
+
+    return (await db.execute(statement)).scalars().first()
+
+
+async def check_user_permission(
+        db: scoped_session, user_id: int,
+        resource: PermissionResource, action: PermissionAction,
+        business_id: Optional[int] = None, team_member_id: Optional[int] = None,
+        financial_business_id: Optional[int] = None, role_id: Optional[int] = None
+) -> bool:
+    """
+    Whether the user may do `action` on `resource` of the business
+    given directly or by its team member, financial account or role
+    """
+    business_id = (
+        await get_business_id_of(
+            db=db, business_id=business_id, team_member_id=team_member_id,
+            financial_business_id=financial_business_id, role_id=role_id
+        )
+    )
+    if business_id is None:
+        return False
+
+    permissions = await get_user_permissions(db=db, user_id=user_id, business_id=business_id)
+    return bool(permissions & PERMISSION_BITS[(resource, action)])
+
+
+class PermissionRequiredField(AuthenticationRequiredField):
+    """
+    Field of an authenticated user with a permission in the business of `input_data`,
+    the business is taken from its `business_id`, `financial_business_id`,
+    `role_id` or `team_member_id`
+    """
+    def __init__(self, resource: PermissionResource, action: PermissionAction, **kwargs):
+        super().__init__(**kwargs)
+        self.resource = resource
+        self.action = action
+
+    async def get_result(self, source: Any, info: Any, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        if info.context.user:
+            input_data = kwargs.get('input_data')
+            permitted = (
+                await check_user_permission(
+                    db=info.context.db, user_id=info.context.user.id,
+                    resource=self.resource, action=self.action,
+                    business_id=getattr(input_data, 'business_id', None),
+                    team_member_id=getattr(input_data, 'team_member_id', None),
+                    financial_business_id=getattr(input_data, 'financial_business_id', None),
+                    role_id=getattr(input_data, 'role_id', None)
+                )
+            )
+            if not permitted:
+                raise ValueError(f"Permission {self.resource.name} {self.action.name} is required")
+
+        return await super().get_result(source=source, info=info, args=args, kwargs=kwargs)
+
+
+async def set_role_permissions(
+        db: scoped_session, role_id: int,
+        full_access: Optional[RolePrivileges], resources: Dict[PermissionResource, int]
+) -> List[RolePermissions]:
+    """
+    Replace the permissions of the role with `full_access` to every resource
+    and `actions` masks of single resources
+    """
+    await db.execute(
+        delete(RolePermissions)
+        .where(RolePermissions.role_id == role_id)
+        .execution_options(synchronize_session=False)
+    )
+    rows = list()
+    if full_access is not None:
+        rows.append({'role_id': role_id, 'full_access': full_access, 'resource': None, 'actions': 0})
+    rows.extend(
+        {'role_id': role_id, 'full_access': RolePrivileges.READ_ONLY, 'resource': resource, 'actions': actions}
+        for resource, actions in resources.items()
+    )
+    if rows:
+        await db.execute(insert(RolePermissions), rows)
+
+    statement = (
+        select(RolePermissions)
+        .where(RolePermissions.role_id == role_id)
+        .order_by(RolePermissions.id)
+        .execution_options(populate_existing=True)
+    )
+    return (await db.execute(statement)).scalars().all()
@@ -1,16 +1,34 @@
 from services.authorization import AuthenticationRequiredField
 import strawberry
-from typing import List
+from typing import List, Optional
 from strawberry.types import Info
 from services.business.resolvers import (
     get_scoped_business_types_resolver,
     get_business_team_resolver,
-    get_clients_resolver
+    get_clients_resolver,
+    search_clients_resolver,
+    get_clients_nearby_resolver,
+    get_nearest_clients_resolver,
+    get_nearest_businesses_resolver,
+    find_duplicate_clients_resolver,
+    get_client_segment_resolver,
+    client_timeline_resolver,
+    get_business_permissions_resolver,
+    business_dashboard_resolver
 )
 from services.business.schema import (
     ScopedTypeNode,
     GetBusinessTeamInputData, GetBusinessTeamNode,
-    ClientNode
+    ClientNode,
+    SearchClientsInputData, SearchClientsNode,
+    ClientsNearbyInputData, NearestClientsInputData, NearestBusinessesInputData,
+    NearbyClientsNode, NearbyBusinessesNode,
+    GetClientsInputData,
+    FindDuplicateClientsInputData, FindDuplicateClientsNode,
+    ClientSegmentInputData, ClientSegmentNode,
+    ClientTimelineInputData, ClientTimelineNode,
+    BusinessPermissionsInputData, BusinessPermissionsNode,
+    BusinessDashboardInputData, BusinessDashboardNode
 )
 
 
@@ -27,5 +45,61 @@ class Query:
         return await get_business_team_resolver(info=info, input_data=input_data)
 
     @AuthenticationRequiredField()
-    async def get_clients(self, info: Info) -> List[ClientNode]:
-        return await get_clients_resolver(info=info)
+    async def get_clients(
+            self, info: Info, input_data: Optional[GetClientsInputData] = None
+    ) -> List[ClientNode]:
+        return await get_clients_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def search_clients(
+            self, info: Info, input_data: SearchClientsInputData
+    ) -> SearchClientsNode:
+        return await search_clients_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_clients_nearby(
+            self, info: Info, input_data: ClientsNearbyInputData
+    ) -> NearbyClientsNode:
+        return await get_clients_nearby_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_nearest_clients(
+            self, info: Info, input_data: NearestClientsInputData
+    ) -> NearbyClientsNode:
+        return await get_nearest_clients_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_nearest_businesses(
+            self, info: Info, input_data: NearestBusinessesInputData
+    ) -> NearbyBusinessesNode:
+        return await get_nearest_businesses_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def find_duplicate_clients(
+            self, info: Info, input_data: Optional[FindDuplicateClientsInputData] = None
+    ) -> FindDuplicateClientsNode:
+        return await find_duplicate_clients_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_client_segment(
+            self, info: Info, input_data: ClientSegmentInputData
+    ) -> ClientSegmentNode:
+        return await get_client_segment_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def client_timeline(
+            self, info: Info, input_data: ClientTimelineInputData
+    ) -> ClientTimelineNode:
+        return await client_timeline_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_business_permissions(
+            self, info: Info, input_data: BusinessPermissionsInputData
+    ) -> BusinessPermissionsNode:
+        return await get_business_permissions_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def business_dashboard(
+            self, info: Info, input_data: BusinessDashboardInputData
+    ) -> BusinessDashboardNode:
+        return await business_dashboard_resolver(info=info, input_data=input_data)
@@ -0,0 +1,113 @@
+from services.business.models import ScopeTypeBusiness, ReferenceDataVersion
+from services.database import AsyncSessionLocal
+from services.config import get_settings
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session
+from typing import FrozenSet, List, NamedTuple, Optional
+import asyncio
+import hashlib
+import json
+import logging
+
+SCOPE_TYPES = ScopeTypeBusiness.__tablename__
+
+
+class ScopeType(NamedTuple):
+    id: int
+    name: str
+    description: str
+
+
+class ScopeTypesSnapshot(NamedTuple):
+    """
+    Immutable copy of `scope_type_business` of the worker, replaced as a whole
+    when the version of the table changes
+    """
+    version: int
+    types: List[ScopeType]
+    ids: FrozenSet[int]
+    body: bytes
+    etag: str
+
+
+scope_types_snapshot: Optional[ScopeTypesSnapshot] = None
+scope_types_lock = asyncio.Lock()
+reference_poller_task: Optional[asyncio.Task] = None
+
+
+async def get_reference_version(db: scoped_session, name: str) -> int:
+    statement = select(ReferenceDataVersion.version).where(ReferenceDataVersion.name == name)
+    return (await db.execute(statement)).scalars().first() or 0
+
+
+async def load_scope_types(db: scoped_session) -> ScopeTypesSnapshot:
+    version = await get_reference_version(db=db, name=SCOPE_TYPES)
+    statement = (
+        select(ScopeTypeBusiness.id, ScopeTypeBusiness.name, ScopeTypeBusiness.description)
+        .order_by(ScopeTypeBusiness.id)
+    )
+    types = [ScopeType(*row) for row in (await db.execute(statement)).fetchall()]
+    body = json.dumps([scope_type._asdict() for scope_type in types], ensure_ascii=False).encode('utf-8')
+
+    return ScopeTypesSnapshot(
+        version=version,
+        types=types,
+        ids=frozenset(scope_type.id for scope_type in types),
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    )
+
+
+async def refresh_scope_types(db: scoped_session, force: bool = False) -> ScopeTypesSnapshot:
+    """
+    Reload the snapshot when the version of the table is not the version of the snapshot,
+    one version query when nothing has changed
+    """
+    global scope_types_snapshot
+    async with scope_types_lock:
+        snapshot = scope_types_snapshot
+        if snapshot is None or force or snapshot.version != await get_reference_version(db=db, name=SCOPE_TYPES):
+            snapshot = await load_scope_types(db=db)
+            scope_types_snapshot = snapshot
+    return snapshot
+
+
+async def get_scope_types(db: scoped_session) -> ScopeTypesSnapshot:
+    snapshot = scope_types_snapshot
+    if snapshot is None:
+        snapshot = await refresh_scope_types(db=db)
+    return snapshot
+
+
+async def scope_type_exists(db: scoped_session, scope_type_id: int) -> bool:
+    """
+    A type added after the last poll is not in the snapshot yet,
+    so a miss checks the version before it is trusted
+    """
+    if scope_type_id in (await get_scope_types(db=db)).ids:
+        return True
+    return scope_type_id in (await refresh_scope_types(db=db)).ids
+
+
+async def run_reference_poller() -> None:
+    settings = get_settings()
+    while True:
+        await asyncio.sleep(settings.reference_data_poll_seconds)
+        db = AsyncSessionLocal()
+        try:
+            await refresh_scope_types(db=db)
+        except Exception as e:
+            logging.warning(f"Reference data poller failed: {e}")
+        finally:
+            await db.close()
+
+
+async def start_reference_poller() -> None:
+    global reference_poller_task
+    if reference_poller_task is None or reference_poller_task.done():
+        reference_poller_task = asyncio.create_task(run_reference_poller())
+
+
+async def stop_reference_poller() -> None:
+    if reference_poller_task is not None:
+        reference_poller_task.cancel()
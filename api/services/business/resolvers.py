@@ -17,38 +17,84 @@ from services.business.schema import (
     UpdateInfoTeamMemberInputData, UpdateInfoTeamMemberNode, UpdateInfoTeamMemberErrorNode,
     GetBusinessTeamInputData, GetBusinessTeamNode, GetBusinessTeamErrorNode,
     DeleteTeamMemberInputData, DeleteTeamMemberNode, DeleteTeamMemberErrorNode,
-    AddClientInputData, AddClientNode,
+    AddClientInputData, AddClientNode, AddClientErrorNode,
     UpdateInfoClientInputData, UpdateInfoClientNode, UpdateInfoClientErrorNode,
     DeleteClientInputData, DeleteClientNode, DeleteClientErrorNode,
     AddClientAttributeInputData, AddClientAttributeNode, AddClientAttributeErrorNode,
     UpdateInfoClientAttributeInputData, UpdateInfoClientAttributeNode, UpdateInfoClientAttributeErrorNode,
-    DeleteClientAttributeInputData, DeleteClientAttributeNode, DeleteClientAttributeErrorNode
+    DeleteClientAttributeInputData, DeleteClientAttributeNode, DeleteClientAttributeErrorNode,
+    SearchClientsInputData, SearchClientsNode, SearchClientsErrorNode,
+    ClientsNearbyInputData, NearestClientsInputData, NearestBusinessesInputData,
+    NearbyClientsNode, NearbyClientNode, NearbyBusinessesNode, NearbyBusinessNode, NearbyErrorNode,
+    GetClientsInputData,
+    SetClientAttributesInputData, SetClientAttributesNode, SetClientAttributesErrorNode,
+    FindDuplicateClientsInputData, FindDuplicateClientsNode, FindDuplicateClientsErrorNode, DuplicateClientsNode,
+    MergeClientsInputData, MergeClientsNode, MergeClientsErrorNode,
+    ClientSegmentInputData, ClientSegmentNode, ClientSegmentErrorNode,
+    ClientTimelineInputData, ClientTimelineNode, ClientTimelineErrorNode, ClientTimelineItemNode,
+    RolePermissionNode, ResourcePermissionsNode, BusinessPermissionsNode, BusinessPermissionsInputData,
+    SetRolePermissionsInputData, SetRolePermissionsNode, SetRolePermissionsErrorNode,
+    BusinessDashboardInputData, BusinessDashboardNode, BusinessDashboardErrorNode, ClientStatusCountNode
 )
 from services.business.models import (
     Business,
-    ScopeTypeBusiness,
     BusinessRoles,
     TeamMember,
     Client,
-    ClientAttribute
+    ClientAttribute,
+    ClientStatusChange
 )
 from services.base.models import (
     User
 )
 from services.business.work_with_db import (
     update_info_business,
-    get_scoped_business_types_from_db,
-    check_user_that_he_is_owner,
-    check_user_that_he_is_owner_role,
     check_team_member_exists,
     get_business_team,
     client_belongs_to_user_check,
-    get_clients_from_db
+    get_clients_from_db,
+    get_business_of_user,
+    get_client_of_user_by_id,
+    count_clients_of_user,
+    get_clients_of_user_by_ids
 )
+from services.business.search import search_clients
+from services.business.geo import get_within_radius, get_nearest
+from services.business.attributes import (
+    get_clients_by_attributes,
+    sync_client_attribute_values,
+    set_client_attributes
+)
+from services.business.dedup import find_duplicate_clients, merge_clients
+from services.business.segments import (
+    SegmentSyntaxError,
+    parse_segment,
+    get_segment_page,
+    refresh_client_segments,
+    remove_client_segments
+)
+from services.business.timeline import get_client_timeline, decode_timeline_cursor
+from services.business.dashboard import get_business_dashboard
+from services.business.reference import get_scope_types, scope_type_exists
+from services.business.permissions import (
+    RESOURCES,
+    check_user_permission,
+    get_business_id_of,
+    get_user_permissions,
+    get_actions_mask,
+    get_mask_actions,
+    get_resource_actions,
+    mark_business_permissions_changed,
+    user_permissions,
+    set_role_permissions
+)
+from services.config import get_settings
+from services.business.enums import ClientSearchMode, PermissionResource, PermissionAction
 from services.base.work_with_db import (
     get_user
 )
-from typing import List
+from services.idempotency import ReplayNode
+from typing import List, Optional, Tuple
 
 
 async def create_business_resolver(
@@ -61,9 +107,8 @@ async def create_business_resolver(
     error = None
 
     scope_type_exits = (
-        await get_objects_by_field(
-            db=context.db, model=ScopeTypeBusiness,
-            field=ScopeTypeBusiness.id, value=instance.scope_type_id
+        await scope_type_exists(
+            db=context.db, scope_type_id=instance.scope_type_id
         )
     )
 
@@ -75,6 +120,8 @@ async def create_business_resolver(
         )
         context.db.add(new_business)
         await context.db.commit()
+        # The matrix of the owner was compiled without the new business
+        user_permissions.invalidate(context.user.id)
         await update_info_business(
             db=context.db, business_id=new_business.id,
             input_data=instance.dict(
@@ -101,11 +148,11 @@ async def create_business_resolver(
 
 async def get_scoped_business_types_resolver(info: Info) -> List[ScopedTypeNode]:
     context = info.context
-    result = (
-        await get_scoped_business_types_from_db(db=context.db)
+    snapshot = (
+        await get_scope_types(db=context.db)
     )
 
-    return result
+    return snapshot.types
 
 
 async def update_data_business_resolver(
@@ -118,9 +165,10 @@ async def update_data_business_resolver(
     error = None
 
     user_is_owner = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.BUSINESS, action=PermissionAction.UPDATE,
             business_id=instance.business_id
         )
     )
@@ -160,9 +208,10 @@ async def delete_business_resolver(
     error = None
 
     user_is_owner = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.BUSINESS, action=PermissionAction.DELETE,
             business_id=instance.business_id
         )
     )
@@ -174,6 +223,8 @@ async def delete_business_resolver(
                 object_id=instance.business_id
             )
         )
+        await mark_business_permissions_changed(db=context.db, business_id=instance.business_id)
+        await context.db.commit()
         if not deleted:
             error = DeleteBusinessErrorNode(
                 code=DeleteBusinessErrorNode.DeleteBusinessErrorCode.NOT_DELETED,
@@ -199,9 +250,10 @@ async def create_role_resolver(
     role = None
 
     user_is_owner = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.ROLES, action=PermissionAction.CREATE,
             business_id=instance.business_id
         )
     )
@@ -243,9 +295,10 @@ async def update_info_role_resolver(
     role = None
 
     user_is_owner = (
-        await check_user_that_he_is_owner_role(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.ROLES, action=PermissionAction.UPDATE,
             role_id=instance.role_id
         )
     )
@@ -288,20 +341,26 @@ async def delete_role_resolver(
     error = None
 
     user_is_owner = (
-        await check_user_that_he_is_owner_role(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.ROLES, action=PermissionAction.DELETE,
             role_id=instance.role_id
         )
     )
 
     if user_is_owner:
+        await mark_business_permissions_changed(
+            db=context.db,
+            business_id=await get_business_id_of(db=context.db, role_id=instance.role_id)
+        )
         deleted = (
             await delete_from_database(
                 db=context.db, model=BusinessRoles,
                 object_id=instance.role_id
             )
         )
+        await context.db.commit()
 
     else:
         error = DeleteRoleErrorNode(
@@ -326,20 +385,18 @@ async def add_team_member_resolver(
     }
 
     user_is_owner = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.TEAM, action=PermissionAction.CREATE,
             business_id=instance.business_id
         )
     )
 
+    # Roles of other businesses can not be given to the team
     user_is_owner_role = (
-        await check_user_that_he_is_owner_role(
-            db=context.db,
-            user_id=context.user.id,
-            role_id=instance.role_id
-        )
-    )
+        await get_business_id_of(db=context.db, role_id=instance.role_id)
+    ) == instance.business_id
 
     user_exists = (
         await get_user(
@@ -400,6 +457,8 @@ async def add_team_member_resolver(
                 object_id=new_team_member.id
             )
         )
+        await mark_business_permissions_changed(db=context.db, business_id=instance.business_id)
+        await context.db.commit()
         added = True
 
     elif not user_is_owner:
@@ -427,9 +486,10 @@ async def update_info_team_member_resolver(
     team_member = None
 
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.TEAM, action=PermissionAction.UPDATE,
             team_member_id=instance.team_member_id
         )
     )
@@ -443,13 +503,13 @@ async def update_info_team_member_resolver(
             )
         )
 
-    user_is_owner_role = (
-        await check_user_that_he_is_owner_role(
-            db=context.db,
-            user_id=context.user.id,
-            team_member_id=instance.team_member_id
-        )
-    )
+    business_id = await get_business_id_of(db=context.db, team_member_id=instance.team_member_id)
+    user_is_owner_role = True
+    if instance.role_id:
+        # Roles of other businesses can not be given to the team
+        user_is_owner_role = (
+            await get_business_id_of(db=context.db, role_id=instance.role_id)
+        ) == business_id
 
     if user_is_owner_business and user_exists and user_is_owner_role:
         instance_data = instance.dict(
@@ -463,6 +523,7 @@ async def update_info_team_member_resolver(
                 object_id=instance.team_member_id,
                 input_data=instance_data
             )
+            await mark_business_permissions_changed(db=context.db, business_id=business_id)
             await context.db.commit()
             team_member = (
                 await get_object_by_id(
@@ -508,9 +569,10 @@ async def get_business_team_resolver(
     team = None
 
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.TEAM, action=PermissionAction.READ,
             business_id=instance.business_id
         )
     )
@@ -546,20 +608,26 @@ async def delete_team_member_resolver(
     error = None
 
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.TEAM, action=PermissionAction.DELETE,
             team_member_id=instance.team_member_id
         )
     )
 
     if user_is_owner_business:
+        await mark_business_permissions_changed(
+            db=context.db,
+            business_id=await get_business_id_of(db=context.db, team_member_id=instance.team_member_id)
+        )
         deleted = (
             await delete_from_database(
                 db=context.db, model=TeamMember,
                 object_id=instance.team_member_id
             )
         )
+        await context.db.commit()
 
     else:
         error = DeleteTeamMemberErrorNode(
@@ -570,6 +638,16 @@ async def delete_team_member_resolver(
     return DeleteTeamMemberNode(deleted=deleted, error=error)
 
 
+add_client_replay = ReplayNode(
+    node=AddClientNode,
+    flag='added',
+    field='client',
+    model=Client,
+    error=AddClientErrorNode,
+    error_code=AddClientErrorNode.AddClientErrorCode
+)
+
+
 async def add_client_resolver(
         info: Info, input_data: AddClientInputData
 ) -> AddClientNode:
@@ -596,6 +674,7 @@ async def add_client_resolver(
             field=Client.id, value=new_client.id
         )
     )[0]
+    await refresh_client_segments(db=context.db, user_id=context.user.id, client_ids=[client.id])
     added = True
 
     return AddClientNode(added=added, client=client, error=error)
@@ -630,6 +709,7 @@ async def update_info_client_resolver(
             exclude={'client_id'}
         )
         if update_input_data:
+            old_status = client_exists[0].status
             client = (
                 await update_info(
                     db=context.db, model=Client,
@@ -637,6 +717,14 @@ async def update_info_client_resolver(
                     input_data=update_input_data
                 )
             )
+            if update_input_data.get('status', old_status) != old_status:
+                context.db.add(ClientStatusChange(
+                    client_id=instance.client_id,
+                    old_status=old_status,
+                    new_status=update_input_data['status']
+                ))
+            await context.db.commit()
+            await refresh_client_segments(db=context.db, user_id=context.user.id, client_ids=[instance.client_id])
             updated = True
 
         else:
@@ -689,6 +777,8 @@ async def delete_client_resolver(
                 object_id=instance.client_id
             )
         )
+        await context.db.commit()
+        remove_client_segments(user_id=context.user.id, client_ids=[instance.client_id])
 
     elif not client_exists:
         error = DeleteClientErrorNode(
@@ -735,6 +825,8 @@ async def add_client_attribute_resolver(
             attribute_value=instance.attribute_value
         )
         context.db.add(new_client_attribute)
+        await context.db.flush()
+        await sync_client_attribute_values(db=context.db, client_ids=[instance.client_id])
         await context.db.commit()
         client = (
             await get_object_by_id(
@@ -743,6 +835,8 @@ async def add_client_attribute_resolver(
                 object_id=instance.client_id
             )
         )
+        await context.db.refresh(client)
+        await refresh_client_segments(db=context.db, user_id=context.user.id, client_ids=[instance.client_id])
         added = True
 
     elif not client_exists:
@@ -796,15 +890,20 @@ async def update_info_client_attribute_resolver(
                 object_id=instance.client_attribute_id,
                 input_data=update_input_data
             )
+            await sync_client_attribute_values(db=context.db, client_ids=[client_attribute.client_id])
             await context.db.commit()
             updated = True
             client = (
                 await get_object_by_id(
                     db=context.db,
                     model=Client,
-                    object_id=instance.client_id
+                    object_id=client_attribute.client_id
                 )
             )
+            await context.db.refresh(client)
+            await refresh_client_segments(
+                db=context.db, user_id=context.user.id, client_ids=[client_attribute.client_id]
+            )
 
         elif not client_belongs_to_user:
             error = UpdateInfoClientAttributeErrorNode(
@@ -858,6 +957,12 @@ async def delete_client_attribute_resolver(
                     object_id=instance.client_attribute_id
                 )
             )
+            await context.db.flush()
+            await sync_client_attribute_values(db=context.db, client_ids=[client_attribute.client_id])
+            await context.db.commit()
+            await refresh_client_segments(
+                db=context.db, user_id=context.user.id, client_ids=[client_attribute.client_id]
+            )
 
         else:
             error = DeleteClientAttributeErrorNode(
@@ -874,11 +979,539 @@ async def delete_client_attribute_resolver(
     return DeleteClientAttributeNode(deleted=deleted, error=error)
 
 
-async def get_clients_resolver(info: Info) -> List[ClientNode]:
+async def get_clients_resolver(
+        info: Info, input_data: Optional[GetClientsInputData] = None
+) -> List[ClientNode]:
     context = info.context
-    clients = (
-        await get_clients_from_db(
-            db=context.db, user_id=context.user.id
+    instance = input_data.to_pydantic() if input_data is not None else None
+
+    if instance is None or not (instance.attributes or instance.has_attributes or instance.has_any_attributes):
+        clients = (
+            await get_clients_from_db(
+                db=context.db, user_id=context.user.id
+            )
+        )
+    else:
+        clients = (
+            await get_clients_by_attributes(
+                db=context.db, user_id=context.user.id,
+                attributes={item.key: item.value for item in instance.attributes or list()},
+                has_keys=instance.has_attributes,
+                has_any_keys=instance.has_any_attributes
+            )
         )
-    )
     return clients
+
+
+async def search_clients_resolver(
+        info: Info, input_data: SearchClientsInputData
+) -> SearchClientsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    clients = list()
+    next_cursor = None
+    error = None
+
+    try:
+        result = (
+            await search_clients(
+                db=context.db,
+                user_id=context.user.id,
+                query=instance.query,
+                mode=instance.mode or ClientSearchMode.FUZZY,
+                limit=instance.limit or 20,
+                after=instance.after
+            )
+        )
+        clients = result.clients
+        next_cursor = result.next_cursor
+    except ValueError:
+        error = SearchClientsErrorNode(
+            code=SearchClientsErrorNode.SearchClientsErrorCode.WRONG_CURSOR,
+            message="Cursor is damaged"
+        )
+
+    return SearchClientsNode(clients=clients, next_cursor=next_cursor, error=error)
+
+
+async def get_nearby_origin(
+        info: Info, latitude: Optional[float], longitude: Optional[float],
+        business_id: Optional[int] = None, client_id: Optional[int] = None
+) -> Tuple[Optional[float], Optional[float], Optional[NearbyErrorNode]]:
+    """
+    Location of the business or of the client of the user, otherwise the given point
+    """
+    context = info.context
+    error = None
+
+    if business_id is not None:
+        business = await get_business_of_user(db=context.db, business_id=business_id, user_id=context.user.id)
+        if business is None:
+            error = NearbyErrorNode(
+                code=NearbyErrorNode.NearbyErrorCode.BUSINESS_NOT_FOUND,
+                message='Business not found'
+            )
+        else:
+            latitude, longitude = business.latitude, business.longitude
+
+    elif client_id is not None:
+        client = await get_client_of_user_by_id(db=context.db, client_id=client_id, user_id=context.user.id)
+        if client is None:
+            error = NearbyErrorNode(
+                code=NearbyErrorNode.NearbyErrorCode.CLIENT_NOT_FOUND,
+                message='Client not found'
+            )
+        else:
+            latitude, longitude = client.latitude, client.longitude
+
+    if error is None:
+        if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+            error = NearbyErrorNode(
+                code=NearbyErrorNode.NearbyErrorCode.LOCATION_IS_NOT_SET,
+                message='Location is not set'
+            )
+        elif not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            error = NearbyErrorNode(
+                code=NearbyErrorNode.NearbyErrorCode.WRONG_COORDINATES,
+                message='Latitude must be between -90 and 90, longitude between -180 and 180'
+            )
+
+    return latitude, longitude, error
+
+
+async def get_clients_nearby_resolver(
+        info: Info, input_data: ClientsNearbyInputData
+) -> NearbyClientsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    clients = list()
+
+    latitude, longitude, error = (
+        await get_nearby_origin(
+            info=info, latitude=instance.latitude,
+            longitude=instance.longitude, business_id=instance.business_id
+        )
+    )
+    if error is None and instance.radius_km <= 0:
+        error = NearbyErrorNode(
+            code=NearbyErrorNode.NearbyErrorCode.RADIUS_IS_NOT_POSITIVE,
+            message='Radius must be positive'
+        )
+
+    if error is None:
+        nearby = (
+            await get_within_radius(
+                db=context.db, model=Client, condition=Client.user_id == context.user.id,
+                latitude=latitude, longitude=longitude, radius_km=instance.radius_km,
+                limit=instance.limit or settings.geo_nearby_default_limit
+            )
+        )
+        clients = [NearbyClientNode(client=item.object, distance_km=item.distance_km) for item in nearby]
+
+    return NearbyClientsNode(clients=clients, error=error)
+
+
+async def get_nearest_clients_resolver(
+        info: Info, input_data: NearestClientsInputData
+) -> NearbyClientsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    clients = list()
+
+    latitude, longitude, error = (
+        await get_nearby_origin(
+            info=info, latitude=instance.latitude,
+            longitude=instance.longitude, business_id=instance.business_id
+        )
+    )
+
+    if error is None:
+        nearest = (
+            await get_nearest(
+                db=context.db, model=Client, condition=Client.user_id == context.user.id,
+                latitude=latitude, longitude=longitude,
+                limit=instance.limit or settings.geo_nearby_default_limit,
+                start_radius_km=settings.geo_nearest_start_radius_km,
+                max_radius_km=settings.geo_nearest_max_radius_km
+            )
+        )
+        clients = [NearbyClientNode(client=item.object, distance_km=item.distance_km) for item in nearest]
+
+    return NearbyClientsNode(clients=clients, error=error)
+
+
+async def get_nearest_businesses_resolver(
+        info: Info, input_data: NearestBusinessesInputData
+) -> NearbyBusinessesNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    businesses = list()
+
+    latitude, longitude, error = (
+        await get_nearby_origin(
+            info=info, latitude=instance.latitude,
+            longitude=instance.longitude, client_id=instance.client_id
+        )
+    )
+
+    if error is None:
+        nearest = (
+            await get_nearest(
+                db=context.db, model=Business, condition=Business.user_id == context.user.id,
+                latitude=latitude, longitude=longitude,
+                limit=instance.limit or settings.geo_nearby_default_limit,
+                start_radius_km=settings.geo_nearest_start_radius_km,
+                max_radius_km=settings.geo_nearest_max_radius_km
+            )
+        )
+        businesses = [
+            NearbyBusinessNode(business=item.object, distance_km=item.distance_km) for item in nearest
+        ]
+
+    return NearbyBusinessesNode(businesses=businesses, error=error)
+
+
+async def set_client_attributes_resolver(
+        info: Info, input_data: SetClientAttributesInputData
+) -> SetClientAttributesNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    updated = False
+    clients = list()
+    error = None
+
+    changes = dict()
+    removed_keys = dict()
+    for item in instance.clients:
+        changes.setdefault(item.client_id, dict()).update(
+            {attribute.key: attribute.value for attribute in item.attributes or list()}
+        )
+        removed_keys.setdefault(item.client_id, list()).extend(item.removed_keys or list())
+
+    if len(changes) > settings.set_client_attributes_max_clients:
+        error = SetClientAttributesErrorNode(
+            code=SetClientAttributesErrorNode.SetClientAttributesErrorCode.TOO_MANY_CLIENTS,
+            message=f'No more than {settings.set_client_attributes_max_clients} clients at once'
+        )
+
+    elif not any(changes.values()) and not any(removed_keys.values()):
+        error = SetClientAttributesErrorNode(
+            code=SetClientAttributesErrorNode.SetClientAttributesErrorCode.NOTHING_TO_SET,
+            message='Nothing to set'
+        )
+
+    elif await count_clients_of_user(db=context.db, user_id=context.user.id, client_ids=list(changes)) != len(changes):
+        error = SetClientAttributesErrorNode(
+            code=SetClientAttributesErrorNode.SetClientAttributesErrorCode.CLIENT_NOT_FOUND,
+            message='Client not found'
+        )
+
+    else:
+        clients = (
+            await set_client_attributes(
+                db=context.db, user_id=context.user.id,
+                changes=changes, removed_keys=removed_keys
+            )
+        )
+        await context.db.commit()
+        await refresh_client_segments(
+            db=context.db, user_id=context.user.id, client_ids=[client.id for client in clients]
+        )
+        updated = True
+
+    return SetClientAttributesNode(updated=updated, clients=clients, error=error)
+
+
+async def find_duplicate_clients_resolver(
+        info: Info, input_data: Optional[FindDuplicateClientsInputData] = None
+) -> FindDuplicateClientsNode:
+    instance = input_data.to_pydantic() if input_data is not None else None
+    context = info.context
+    settings = get_settings()
+    duplicates = list()
+    error = None
+
+    min_score = settings.dedup_default_min_score
+    limit = settings.dedup_default_limit
+    if instance is not None:
+        if instance.min_score is not None:
+            min_score = instance.min_score
+        limit = instance.limit or limit
+
+    if not 0 < min_score <= 1:
+        error = FindDuplicateClientsErrorNode(
+            code=FindDuplicateClientsErrorNode.FindDuplicateClientsErrorCode.MIN_SCORE_IS_WRONG,
+            message='Min score must be greater than 0 and not greater than 1'
+        )
+
+    else:
+        pairs = (
+            await find_duplicate_clients(
+                db=context.db, user_id=context.user.id,
+                min_score=min_score, limit=limit,
+                max_block_size=settings.dedup_max_block_size
+            )
+        )
+        client_ids = {pair.client_id for pair in pairs} | {pair.duplicate_id for pair in pairs}
+        clients = {
+            client.id: client
+            for client in await get_clients_of_user_by_ids(
+                db=context.db, user_id=context.user.id, client_ids=list(client_ids)
+            )
+        }
+        duplicates = [
+            DuplicateClientsNode(
+                client=clients[pair.client_id], duplicate=clients[pair.duplicate_id],
+                score=pair.score, reasons=pair.reasons
+            )
+            for pair in pairs
+            if pair.client_id in clients and pair.duplicate_id in clients
+        ]
+
+    return FindDuplicateClientsNode(duplicates=duplicates, error=error)
+
+
+async def merge_clients_resolver(
+        info: Info, input_data: MergeClientsInputData
+) -> MergeClientsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    merged = False
+    client = None
+    error = None
+
+    duplicate_ids = sorted(set(instance.duplicate_ids) - {instance.client_id})
+
+    if not duplicate_ids:
+        error = MergeClientsErrorNode(
+            code=MergeClientsErrorNode.MergeClientsErrorCode.NOTHING_TO_MERGE,
+            message='Nothing to merge'
+        )
+
+    elif len(duplicate_ids) > settings.merge_clients_max_duplicates:
+        error = MergeClientsErrorNode(
+            code=MergeClientsErrorNode.MergeClientsErrorCode.TOO_MANY_DUPLICATES,
+            message=f'No more than {settings.merge_clients_max_duplicates} duplicates at once'
+        )
+
+    else:
+        client = (
+            await merge_clients(
+                db=context.db, user_id=context.user.id,
+                client_id=instance.client_id, duplicate_ids=duplicate_ids
+            )
+        )
+        if client is None:
+            error = MergeClientsErrorNode(
+                code=MergeClientsErrorNode.MergeClientsErrorCode.CLIENT_NOT_FOUND,
+                message='Client not found'
+            )
+        else:
+            await context.db.commit()
+            remove_client_segments(user_id=context.user.id, client_ids=duplicate_ids)
+            await refresh_client_segments(db=context.db, user_id=context.user.id, client_ids=[client.id])
+            merged = True
+
+    return MergeClientsNode(merged=merged, client=client, error=error)
+
+
+async def get_client_segment_resolver(
+        info: Info, input_data: ClientSegmentInputData
+) -> ClientSegmentNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    count = 0
+    client_ids = list()
+    next_cursor = None
+    error = None
+
+    try:
+        segment = parse_segment(instance.segment)
+    except SegmentSyntaxError as e:
+        segment = None
+        error = ClientSegmentErrorNode(
+            code=ClientSegmentErrorNode.ClientSegmentErrorCode.WRONG_SEGMENT,
+            message=str(e)
+        )
+
+    if segment is not None:
+        page = (
+            await get_segment_page(
+                db=context.db, user_id=context.user.id, segment=segment,
+                limit=settings.segment_default_limit if instance.limit is None else instance.limit,
+                after=instance.after
+            )
+        )
+        count, client_ids, next_cursor = page.count, page.client_ids, page.next_cursor
+
+    return ClientSegmentNode(count=count, client_ids=client_ids, next_cursor=next_cursor, error=error)
+
+
+async def client_timeline_resolver(
+        info: Info, input_data: ClientTimelineInputData
+) -> ClientTimelineNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    settings = get_settings()
+    items = list()
+    next_cursor = None
+    error = None
+    after = None
+
+    client = await get_client_of_user_by_id(db=context.db, user_id=context.user.id, client_id=instance.client_id)
+
+    if instance.after:
+        try:
+            after = decode_timeline_cursor(instance.after)
+        except ValueError:
+            error = ClientTimelineErrorNode(
+                code=ClientTimelineErrorNode.ClientTimelineErrorCode.WRONG_CURSOR,
+                message='Cursor is wrong'
+            )
+
+    if client is None:
+        error = ClientTimelineErrorNode(
+            code=ClientTimelineErrorNode.ClientTimelineErrorCode.CLIENT_NOT_FOUND,
+            message='Client not found'
+        )
+
+    elif error is None:
+        page = (
+            await get_client_timeline(
+                db=context.db, client_id=client.id,
+                limit=instance.limit or settings.client_timeline_default_limit,
+                after=after
+            )
+        )
+        items = [
+            ClientTimelineItemNode(
+                kind=item.kind, occurred_at=item.occurred_at,
+                event=item.event, status_change=item.status_change
+            )
+            for item in page.items
+        ]
+        next_cursor = page.next_cursor
+
+    return ClientTimelineNode(items=items, next_cursor=next_cursor, error=error)
+
+
+async def set_role_permissions_resolver(
+        info: Info, input_data: SetRolePermissionsInputData
+) -> SetRolePermissionsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    updated = False
+    permissions = list()
+    error = None
+
+    resources = {item.resource: get_actions_mask(item.actions) for item in instance.permissions or list()}
+
+    if len(resources) != len(instance.permissions or list()):
+        error = SetRolePermissionsErrorNode(
+            code=SetRolePermissionsErrorNode.SetRolePermissionsErrorCode.RESOURCE_IS_REPEATED,
+            message='Every resource is set once'
+        )
+
+    else:
+        role_permissions = (
+            await set_role_permissions(
+                db=context.db, role_id=instance.role_id,
+                full_access=instance.full_access, resources=resources
+            )
+        )
+        await mark_business_permissions_changed(
+            db=context.db,
+            business_id=await get_business_id_of(db=context.db, role_id=instance.role_id)
+        )
+        await context.db.commit()
+        permissions = [
+            RolePermissionNode(
+                id=role_permission.id, full_access=role_permission.full_access,
+                resource=role_permission.resource, actions=get_mask_actions(role_permission.actions)
+            )
+            for role_permission in role_permissions
+        ]
+        updated = True
+
+    return SetRolePermissionsNode(updated=updated, permissions=permissions, error=error)
+
+
+async def get_business_permissions_resolver(
+        info: Info, input_data: BusinessPermissionsInputData
+) -> BusinessPermissionsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+
+    compiled = (
+        await get_user_permissions(
+            db=context.db, user_id=context.user.id,
+            business_id=instance.business_id
+        )
+    )
+    permissions = [
+        ResourcePermissionsNode(resource=resource, actions=get_resource_actions(compiled, resource))
+        for resource in RESOURCES
+        if get_resource_actions(compiled, resource)
+    ]
+
+    return BusinessPermissionsNode(business_id=instance.business_id, permissions=permissions)
+
+
+async def business_dashboard_resolver(
+        info: Info, input_data: BusinessDashboardInputData
+) -> BusinessDashboardNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    dashboard = None
+    error = None
+
+    can_read_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.BUSINESS, action=PermissionAction.READ,
+            business_id=instance.business_id
+        )
+    )
+    can_read_finance = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+            business_id=instance.business_id
+        )
+    )
+
+    if can_read_business:
+        dashboard = await get_business_dashboard(db=context.db, business_id=instance.business_id)
+
+    if dashboard is None:
+        error = BusinessDashboardErrorNode(
+            code=BusinessDashboardErrorNode.BusinessDashboardErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message='User is not owner business'
+        )
+        return BusinessDashboardNode(
+            business_id=instance.business_id, team_size=None, clients_count=None, clients_by_status=None,
+            upcoming_events=None, month_accruals=None, month_expenses=None, balance=None, error=error
+        )
+
+    return BusinessDashboardNode(
+        business_id=dashboard.business_id,
+        team_size=dashboard.team_size,
+        clients_count=sum(dashboard.clients_by_status.values()),
+        clients_by_status=[
+            ClientStatusCountNode(status=status, count=count)
+            for status, count in dashboard.clients_by_status.items()
+        ],
+        upcoming_events=dashboard.upcoming_events,
+        month_accruals=dashboard.month_accruals if can_read_finance else None,
+        month_expenses=dashboard.month_expenses if can_read_finance else None,
+        balance=dashboard.balance if can_read_finance else None,
+        error=error
+    )
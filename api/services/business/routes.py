@@ -0,0 +1,98 @@
+from starlette.requests import Request
+from starlette.responses import Response, JSONResponse
+from services.authorization import authenticate_request
+from services.database import AsyncSessionLocal
+from services.config import get_settings
+from services.business.enums import ClientImportFormat
+from services.business.imports import run_client_import_job
+from services.business.reference import get_scope_types
+from services.jobs.enums import JobKind
+from services.jobs.models import BackgroundJob
+from services.jobs.runner import start_job
+from datetime import datetime
+import os
+import uuid
+
+CONTENT_TYPES = {
+    'text/csv': ClientImportFormat.CSV,
+    'text/vcard': ClientImportFormat.VCARD,
+    'text/x-vcard': ClientImportFormat.VCARD,
+}
+
+
+async def import_clients_endpoint(request: Request) -> Response:
+    """
+    POST /business/clients/import?file_format=csv - body of the request is the file
+
+    The upload is streamed to disk and imported by a background job,
+    its progress and row errors are read with `getJob`
+    """
+    user = await authenticate_request(request=request)
+    if user is None:
+        return JSONResponse({'error': 'Token is invalid'}, status_code=401)
+
+    settings = get_settings()
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    try:
+        file_format = ClientImportFormat(
+            request.query_params.get('file_format') or CONTENT_TYPES.get(content_type, ClientImportFormat.CSV).value
+        )
+    except ValueError:
+        return JSONResponse({'error': 'Wrong parameters'}, status_code=400)
+
+    os.makedirs(settings.import_dir, exist_ok=True)
+    file_name = f"clients_{user.id}_{uuid.uuid4().hex}.{file_format.value}"
+    path = os.path.join(settings.import_dir, file_name)
+    size = 0
+    with open(path, 'wb') as file:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.client_import_max_bytes:
+                break
+            file.write(chunk)
+
+    if size > settings.client_import_max_bytes:
+        os.remove(path)
+        return JSONResponse({'error': 'File is too large'}, status_code=413)
+
+    if not size:
+        os.remove(path)
+        return JSONResponse({'error': 'File is empty'}, status_code=400)
+
+    db = AsyncSessionLocal()
+    try:
+        new_job = BackgroundJob(
+            user_id=user.id,
+            kind=JobKind.CLIENT_IMPORT,
+            parameters={'file_name': file_name, 'file_format': file_format.value},
+            # The default is the start of the worker, the job would look stale
+            created_at=datetime.now(),
+            updated_at=datetime.now()
+        )
+        db.add(new_job)
+        await db.commit()
+    finally:
+        await db.close()
+
+    start_job(job_id=new_job.id, handler=run_client_import_job)
+    return JSONResponse({'job_id': new_job.id}, status_code=202)
+
+
+async def scope_types_endpoint(request: Request) -> Response:
+    """
+    GET /business/scope-types - public list of scope types of businesses
+
+    The body is serialized once per version of the table,
+    a request with its ETag in If-None-Match gets 304 without a body
+    """
+    db = AsyncSessionLocal()
+    try:
+        snapshot = await get_scope_types(db=db)
+    finally:
+        await db.close()
+
+    headers = {'ETag': snapshot.etag, 'Cache-Control': 'no-cache'}
+    if snapshot.etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+
+    return Response(snapshot.body, media_type='application/json', headers=headers)
@@ -5,9 +5,12 @@ from services.config import get_settings
 
 import strawberry
 from services.schema import ErrorNode
-from pydantic import BaseModel, constr, EmailStr
+from pydantic import BaseModel, constr, conint, EmailStr
 from datetime import datetime
-from services.business.enums import UserTypeForBusiness, MemberType
+from services.business.enums import (
+    UserTypeForBusiness, MemberType, ClientSearchMode, StatusUserForBusiness, ClientTimelineItemType,
+    RolePrivileges, PermissionResource, PermissionAction
+)
 from services.finance.schema import FinanceAccount
 
 
@@ -48,6 +51,12 @@ class ClientAttributeNode:
     attribute_value: str
 
 
+@strawberry.type
+class ClientAttributeValueNode:
+    key: str
+    value: str
+
+
 @strawberry.type
 class ClientNode:
     id: int
@@ -64,6 +73,236 @@ class ClientNode:
     birthday: Optional[datetime]
     attributes: Optional[List[ClientAttributeNode]]
 
+    @strawberry.field
+    def attribute_values(self) -> List[ClientAttributeValueNode]:
+        return [
+            ClientAttributeValueNode(key=key, value=value)
+            for key, value in sorted((self.attribute_values or dict()).items())
+        ]
+
+
+@strawberry.type
+class SearchClientsErrorNode(ErrorNode):
+    @strawberry.enum
+    class SearchClientsErrorCode(enum.Enum):
+        WRONG_CURSOR = 'wrong_cursor'
+
+    code: SearchClientsErrorCode
+
+
+@strawberry.type
+class SearchClientsNode:
+    clients: List[ClientNode]
+    next_cursor: Optional[str]
+    error: Optional[SearchClientsErrorNode]
+
+
+@strawberry.type
+class SetClientAttributesErrorNode(ErrorNode):
+    @strawberry.enum
+    class SetClientAttributesErrorCode(enum.Enum):
+        CLIENT_NOT_FOUND = 'client_not_found'
+        NOTHING_TO_SET = 'nothing_to_set'
+        TOO_MANY_CLIENTS = 'too_many_clients'
+
+    code: SetClientAttributesErrorCode
+
+
+@strawberry.type
+class SetClientAttributesNode:
+    updated: bool
+    clients: List[ClientNode]
+    error: Optional[SetClientAttributesErrorNode]
+
+
+@strawberry.type
+class NearbyErrorNode(ErrorNode):
+    @strawberry.enum
+    class NearbyErrorCode(enum.Enum):
+        LOCATION_IS_NOT_SET = 'location_is_not_set'
+        WRONG_COORDINATES = 'wrong_coordinates'
+        RADIUS_IS_NOT_POSITIVE = 'radius_is_not_positive'
+        BUSINESS_NOT_FOUND = 'business_not_found'
+        CLIENT_NOT_FOUND = 'client_not_found'
+
+    code: NearbyErrorCode
+
+
+@strawberry.type
+class NearbyClientNode:
+    client: ClientNode
+    distance_km: float
+
+
+@strawberry.type
+class NearbyClientsNode:
+    clients: List[NearbyClientNode]
+    error: Optional[NearbyErrorNode]
+
+
+@strawberry.type
+class DuplicateClientsNode:
+    client: ClientNode
+    duplicate: ClientNode
+    score: float
+    reasons: List[str]
+
+
+@strawberry.type
+class FindDuplicateClientsErrorNode(ErrorNode):
+    @strawberry.enum
+    class FindDuplicateClientsErrorCode(enum.Enum):
+        MIN_SCORE_IS_WRONG = 'min_score_is_wrong'
+
+    code: FindDuplicateClientsErrorCode
+
+
+@strawberry.type
+class FindDuplicateClientsNode:
+    duplicates: List[DuplicateClientsNode]
+    error: Optional[FindDuplicateClientsErrorNode]
+
+
+@strawberry.type
+class MergeClientsErrorNode(ErrorNode):
+    @strawberry.enum
+    class MergeClientsErrorCode(enum.Enum):
+        CLIENT_NOT_FOUND = 'client_not_found'
+        NOTHING_TO_MERGE = 'nothing_to_merge'
+        TOO_MANY_DUPLICATES = 'too_many_duplicates'
+
+    code: MergeClientsErrorCode
+
+
+@strawberry.type
+class MergeClientsNode:
+    merged: bool
+    client: Optional[ClientNode]
+    error: Optional[MergeClientsErrorNode]
+
+
+@strawberry.type
+class ClientSegmentErrorNode(ErrorNode):
+    @strawberry.enum
+    class ClientSegmentErrorCode(enum.Enum):
+        WRONG_SEGMENT = 'wrong_segment'
+
+    code: ClientSegmentErrorCode
+
+
+@strawberry.type
+class ClientSegmentNode:
+    count: int
+    client_ids: List[int]
+    next_cursor: Optional[int]
+    error: Optional[ClientSegmentErrorNode]
+
+
+@strawberry.type
+class TimelineEventNode:
+    id: int
+    event_name: str
+    event_description: str
+    event_date: datetime
+    business_id: Optional[int]
+
+
+@strawberry.type
+class ClientStatusChangeNode:
+    id: int
+    old_status: StatusUserForBusiness
+    new_status: StatusUserForBusiness
+    changed_at: datetime
+
+
+@strawberry.type
+class ClientTimelineItemNode:
+    kind: ClientTimelineItemType
+    occurred_at: datetime
+    event: Optional[TimelineEventNode]
+    status_change: Optional[ClientStatusChangeNode]
+
+
+@strawberry.type
+class ClientTimelineErrorNode(ErrorNode):
+    @strawberry.enum
+    class ClientTimelineErrorCode(enum.Enum):
+        CLIENT_NOT_FOUND = 'client_not_found'
+        WRONG_CURSOR = 'wrong_cursor'
+
+    code: ClientTimelineErrorCode
+
+
+@strawberry.type
+class ClientTimelineNode:
+    items: List[ClientTimelineItemNode]
+    next_cursor: Optional[str]
+    error: Optional[ClientTimelineErrorNode]
+
+
+@strawberry.type
+class RolePermissionNode:
+    id: int
+    full_access: RolePrivileges
+    resource: Optional[PermissionResource]
+    actions: List[PermissionAction]
+
+
+@strawberry.type
+class ResourcePermissionsNode:
+    resource: PermissionResource
+    actions: List[PermissionAction]
+
+
+@strawberry.type
+class BusinessPermissionsNode:
+    business_id: int
+    permissions: List[ResourcePermissionsNode]
+
+
+@strawberry.type
+class SetRolePermissionsErrorNode(ErrorNode):
+    @strawberry.enum
+    class SetRolePermissionsErrorCode(enum.Enum):
+        RESOURCE_IS_REPEATED = 'resource_is_repeated'
+
+    code: SetRolePermissionsErrorCode
+
+
+@strawberry.type
+class SetRolePermissionsNode:
+    updated: bool
+    permissions: List[RolePermissionNode]
+    error: Optional[SetRolePermissionsErrorNode]
+
+
+@strawberry.type
+class ClientStatusCountNode:
+    status: StatusUserForBusiness
+    count: int
+
+
+@strawberry.type
+class BusinessDashboardErrorNode(ErrorNode):
+    @strawberry.enum
+    class BusinessDashboardErrorCode(enum.Enum):
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+
+    code: BusinessDashboardErrorCode
+
+
+@strawberry.type
+class BusinessDashboardNode:
+    business_id: int
+    team_size: Optional[int]
+    clients_count: Optional[int]
+    clients_by_status: Optional[List[ClientStatusCountNode]]
+    upcoming_events: Optional[int]
+    month_accruals: Optional[float]
+    month_expenses: Optional[float]
+    balance: Optional[float]
+    error: Optional[BusinessDashboardErrorNode]
+
 
 @strawberry.type
 class TeamMember:
@@ -101,6 +340,18 @@ class BusinessNode:
     teams: Optional[List[TeamMember]]
 
 
+@strawberry.type
+class NearbyBusinessNode:
+    business: BusinessNode
+    distance_km: float
+
+
+@strawberry.type
+class NearbyBusinessesNode:
+    businesses: List[NearbyBusinessNode]
+    error: Optional[NearbyErrorNode]
+
+
 @strawberry.type
 class CreateBusinessErrorNode(ErrorNode):
     @strawberry.enum
@@ -211,6 +462,7 @@ class AddClientErrorNode(ErrorNode):
     @strawberry.enum
     class AddClientErrorCode(enum.Enum):
         NOT_ADDED_CLIENT = 'not_added_client'
+        IDEMPOTENCY_KEY_IS_TOO_LONG = 'idempotency_key_is_too_long'
 
     code: AddClientErrorCode
 
@@ -675,3 +927,233 @@ class UpdateInfoClientAttributeInputData:
 ])
 class DeleteClientAttributeInputData:
     pass
+
+
+class SearchClientsData(BaseModel):
+    query: constr(min_length=1, max_length=255)
+    mode: Optional[ClientSearchMode]
+    limit: Optional[conint(ge=1, le=100)]
+    after: Optional[str]
+
+
+@strawberry.experimental.pydantic.input(model=SearchClientsData, fields=[
+    "query",
+    "mode",
+    "limit",
+    "after"
+])
+class SearchClientsInputData:
+    pass
+
+
+class ClientsNearbyData(BaseModel):
+    business_id: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    radius_km: float
+    limit: Optional[conint(ge=1, le=500)]
+
+
+class NearestClientsData(BaseModel):
+    business_id: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    limit: Optional[conint(ge=1, le=500)]
+
+
+class NearestBusinessesData(BaseModel):
+    client_id: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    limit: Optional[conint(ge=1, le=500)]
+
+
+@strawberry.experimental.pydantic.input(model=ClientsNearbyData, fields=[
+    "business_id",
+    "latitude",
+    "longitude",
+    "radius_km",
+    "limit"
+])
+class ClientsNearbyInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=NearestClientsData, fields=[
+    "business_id",
+    "latitude",
+    "longitude",
+    "limit"
+])
+class NearestClientsInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=NearestBusinessesData, fields=[
+    "client_id",
+    "latitude",
+    "longitude",
+    "limit"
+])
+class NearestBusinessesInputData:
+    pass
+
+
+class ClientAttributeValueData(BaseModel):
+    key: constr(min_length=1, max_length=50)
+    value: constr(max_length=100)
+
+
+class ClientAttributesChangeData(BaseModel):
+    client_id: int
+    attributes: Optional[List[ClientAttributeValueData]]
+    removed_keys: Optional[List[str]]
+
+
+class SetClientAttributesData(BaseModel):
+    clients: List[ClientAttributesChangeData]
+
+
+class GetClientsData(BaseModel):
+    attributes: Optional[List[ClientAttributeValueData]]
+    has_attributes: Optional[List[str]]
+    has_any_attributes: Optional[List[str]]
+
+
+@strawberry.experimental.pydantic.input(model=ClientAttributeValueData, fields=[
+    "key",
+    "value"
+])
+class ClientAttributeValueInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=ClientAttributesChangeData, fields=[
+    "client_id",
+    "attributes",
+    "removed_keys"
+])
+class ClientAttributesChangeInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=SetClientAttributesData, fields=[
+    "clients"
+])
+class SetClientAttributesInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=GetClientsData, fields=[
+    "attributes",
+    "has_attributes",
+    "has_any_attributes"
+])
+class GetClientsInputData:
+    pass
+
+
+class FindDuplicateClientsData(BaseModel):
+    min_score: Optional[float]
+    limit: Optional[conint(ge=1, le=1000)]
+
+
+class MergeClientsData(BaseModel):
+    client_id: int
+    duplicate_ids: List[int]
+
+
+@strawberry.experimental.pydantic.input(model=FindDuplicateClientsData, fields=[
+    "min_score",
+    "limit"
+])
+class FindDuplicateClientsInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=MergeClientsData, fields=[
+    "client_id",
+    "duplicate_ids"
+])
+class MergeClientsInputData:
+    pass
+
+
+class ClientSegmentData(BaseModel):
+    segment: constr(min_length=1, max_length=2000)
+    limit: Optional[conint(ge=0, le=10000)]
+    after: Optional[int]
+
+
+@strawberry.experimental.pydantic.input(model=ClientSegmentData, fields=[
+    "segment",
+    "limit",
+    "after"
+])
+class ClientSegmentInputData:
+    pass
+
+
+class ClientTimelineData(BaseModel):
+    client_id: int
+    limit: Optional[conint(ge=1, le=100)]
+    after: Optional[str]
+
+
+@strawberry.experimental.pydantic.input(model=ClientTimelineData, fields=[
+    "client_id",
+    "limit",
+    "after"
+])
+class ClientTimelineInputData:
+    pass
+
+
+class ResourcePermissionsData(BaseModel):
+    resource: PermissionResource
+    actions: List[PermissionAction]
+
+
+class SetRolePermissionsData(BaseModel):
+    role_id: int
+    full_access: Optional[RolePrivileges]
+    permissions: Optional[List[ResourcePermissionsData]]
+
+
+class BusinessPermissionsData(BaseModel):
+    business_id: int
+
+
+@strawberry.experimental.pydantic.input(model=ResourcePermissionsData, fields=[
+    "resource",
+    "actions"
+])
+class ResourcePermissionsInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=SetRolePermissionsData, fields=[
+    "role_id",
+    "full_access",
+    "permissions"
+])
+class SetRolePermissionsInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=BusinessPermissionsData, fields=[
+    "business_id"
+])
+class BusinessPermissionsInputData:
+    pass
+
+
+class BusinessDashboardData(BaseModel):
+    business_id: int
+
+
+@strawberry.experimental.pydantic.input(model=BusinessDashboardData, fields=[
+    "business_id"
+])
+class BusinessDashboardInputData:
+    pass
@@ -0,0 +1,120 @@
+from services.business.models import Client, ClientAttribute
+from services.business.enums import ClientSearchMode
+from sqlalchemy import select, func, literal, cast, or_, tuple_, Float
+from sqlalchemy.orm import scoped_session
+from typing import List, NamedTuple, Optional, Tuple
+import base64
+import re
+
+
+class ClientSearchResult(NamedTuple):
+    clients: List[Client]
+    next_cursor: Optional[str]
+
+
+def encode_search_cursor(rank: float, client_id: int) -> str:
+    raw = f"{rank!r}|{client_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """
+    Raise ValueError when the cursor is damaged
+    """
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    rank, client_id = raw.split('|')
+    return float(rank), int(client_id)
+
+
+def get_prefix_query(query: str) -> Optional[str]:
+    """
+    'Ann Smi' -> 'ann:* & smi:*', only word characters get into tsquery
+    """
+    tokens = re.findall(r'\w+', query.lower())
+    if not tokens:
+        return None
+    return ' & '.join(f"{token}:*" for token in tokens)
+
+
+def get_fuzzy_statement(user_id: int, query: str):
+    """
+    Word similarity of the query to name, email, phone and city of the client
+    or to any of its attributes, both are served by GIN trigram indexes
+    """
+    query = query.lower()
+    clients_of_user = select(Client.id).where(Client.user_id == user_id)
+    attribute_rank = (
+        select(
+            ClientAttribute.client_id.label('client_id'),
+            func.max(func.word_similarity(query, ClientAttribute.attribute_value)).label('rank')
+        )
+        .where(
+            ClientAttribute.client_id.in_(clients_of_user),
+            literal(query).op('<%')(ClientAttribute.attribute_value)
+        )
+        .group_by(ClientAttribute.client_id)
+        .subquery()
+    )
+    rank = cast(
+        func.greatest(
+            func.word_similarity(query, Client.search_text),
+            func.coalesce(attribute_rank.c.rank, 0)
+        ),
+        Float
+    )
+    statement = (
+        select(Client, rank)
+        .outerjoin(attribute_rank, attribute_rank.c.client_id == Client.id)
+        .where(
+            Client.user_id == user_id,
+            or_(
+                literal(query).op('<%')(Client.search_text),
+                Client.search_text.contains(query, autoescape=True),
+                attribute_rank.c.client_id.isnot(None)
+            )
+        )
+    )
+    return statement, rank
+
+
+def get_prefix_statement(user_id: int, query: str):
+    ts_query = func.to_tsquery('simple', get_prefix_query(query) or '')
+    rank = cast(func.ts_rank(Client.search_vector, ts_query), Float)
+    statement = (
+        select(Client, rank)
+        .where(
+            Client.user_id == user_id,
+            Client.search_vector.op('@@')(ts_query)
+        )
+    )
+    return statement, rank
+
+
+async def search_clients(
+        db: scoped_session, user_id: int, query: str,
+        mode: ClientSearchMode, limit: int, after: Optional[str] = None
+) -> ClientSearchResult:
+    """
+    Clients of the user ordered by rank, the cursor of the last client
+    continues the search with the next page
+    """
+    if mode is ClientSearchMode.PREFIX:
+        if get_prefix_query(query) is None:
+            return ClientSearchResult(clients=list(), next_cursor=None)
+        statement, rank = get_prefix_statement(user_id=user_id, query=query)
+    else:
+        statement, rank = get_fuzzy_statement(user_id=user_id, query=query)
+
+    if after:
+        after_rank, after_id = decode_search_cursor(after)
+        statement = statement.where(tuple_(rank, Client.id) < tuple_(after_rank, after_id))
+
+    statement = statement.order_by(rank.desc(), Client.id.desc()).limit(limit + 1)
+    rows = (await db.execute(statement)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(rank=rows[-1][1], client_id=rows[-1][0].id)
+
+    return ClientSearchResult(clients=[row[0] for row in rows], next_cursor=next_cursor)
@@ -0,0 +1,457 @@
+from services.business.models import Client
+from services.business.enums import StatusUserForBusiness, UserTypeForBusiness
+from services.event_calendar.models import CalendarEvent, Participant
+from services.config import get_settings
+from services.cache import TTLCache
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import scoped_session
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+import asyncio
+import re
+
+# Values of a container are the low bits of the ids, as in roaring bitmaps
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+LOW_MASK = CONTAINER_SIZE - 1
+
+ENUM_FIELDS = {
+    'status': StatusUserForBusiness,
+    'user_type': UserTypeForBusiness,
+}
+ATTRIBUTE_PREFIX = 'attribute.'
+EVENT_WITHIN_FIELD = 'event_within'
+KEYWORDS = {'AND', 'OR', 'NOT', 'IN'}
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<string>"(?:[^"\\]|\\.)*")|(?P<operator>!=|=|\(|\)|,)|(?P<word>[^\s=!(),"]+))')
+
+settings = get_settings()
+segment_indexes = TTLCache(ttl=settings.segment_index_seconds, max_size=settings.segment_index_cache_size)
+building_locks: Dict[int, asyncio.Lock] = dict()
+
+
+class SegmentSyntaxError(ValueError):
+    pass
+
+
+class Bitmap:
+    """
+    Set of client ids split by the high bits into containers of 65536 ids,
+    every container is an int bitset of the low bits and empty containers are not stored,
+    so AND/OR/NOT cost a few machine words per 64 clients
+    """
+    __slots__ = ('containers',)
+
+    def __init__(self, containers: Optional[Dict[int, int]] = None):
+        self.containers = containers if containers is not None else dict()
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "Bitmap":
+        chunks: Dict[int, bytearray] = dict()
+        for value in ids:
+            chunk = chunks.get(value >> CONTAINER_BITS)
+            if chunk is None:
+                chunk = chunks[value >> CONTAINER_BITS] = bytearray(CONTAINER_SIZE // 8)
+            low = value & LOW_MASK
+            chunk[low >> 3] |= 1 << (low & 7)
+        return cls({key: int.from_bytes(chunk, 'little') for key, chunk in chunks.items()})
+
+    def add(self, value: int) -> None:
+        key = value >> CONTAINER_BITS
+        self.containers[key] = self.containers.get(key, 0) | (1 << (value & LOW_MASK))
+
+    def discard(self, value: int) -> None:
+        key = value >> CONTAINER_BITS
+        container = self.containers.get(key, 0) & ~(1 << (value & LOW_MASK))
+        if container:
+            self.containers[key] = container
+        else:
+            self.containers.pop(key, None)
+
+    def __contains__(self, value: int) -> bool:
+        return bool(self.containers.get(value >> CONTAINER_BITS, 0) >> (value & LOW_MASK) & 1)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        smaller, larger = sorted((self.containers, other.containers), key=len)
+        containers = dict()
+        for key, container in smaller.items():
+            shared = container & larger.get(key, 0)
+            if shared:
+                containers[key] = shared
+        return Bitmap(containers)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        containers = dict(self.containers)
+        for key, container in other.containers.items():
+            containers[key] = containers.get(key, 0) | container
+        return Bitmap(containers)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        containers = dict()
+        for key, container in self.containers.items():
+            left = container & ~other.containers.get(key, 0)
+            if left:
+                containers[key] = left
+        return Bitmap(containers)
+
+    def __len__(self) -> int:
+        return sum(container.bit_count() for container in self.containers.values())
+
+    def iterate(self, after: Optional[int] = None) -> Iterator[int]:
+        """
+        Ids in ascending order, greater than `after` when it is set
+        """
+        for key in sorted(self.containers):
+            container = self.containers[key]
+            if after is not None:
+                if key < after >> CONTAINER_BITS:
+                    continue
+                if key == after >> CONTAINER_BITS:
+                    container = container >> ((after & LOW_MASK) + 1) << ((after & LOW_MASK) + 1)
+            base = key << CONTAINER_BITS
+            while container:
+                lowest = container & -container
+                yield base + lowest.bit_length() - 1
+                container ^= lowest
+
+
+class Facet(NamedTuple):
+    field: str
+    value: str
+
+
+class ClientSegments(NamedTuple):
+    facets: Tuple[Facet, ...]
+    event_days: Tuple[int, ...]
+
+
+def normalize_city(city: str) -> str:
+    return ' '.join(city.lower().split())
+
+
+def get_client_facets(
+        status: StatusUserForBusiness, user_type: UserTypeForBusiness,
+        city: str, attribute_values: Optional[Dict[str, str]]
+) -> Tuple[Facet, ...]:
+    facets = [
+        Facet('status', status.name),
+        Facet('user_type', user_type.name),
+    ]
+    if normalize_city(city):
+        facets.append(Facet('city', normalize_city(city)))
+    facets.extend(
+        Facet(ATTRIBUTE_PREFIX + key, str(value))
+        for key, value in (attribute_values or dict()).items()
+    )
+    return tuple(facets)
+
+
+class SegmentIndex:
+    """
+    Bitmaps of the clients of one user per facet value and per day of their events
+    """
+    def __init__(self):
+        self.clients = Bitmap()
+        self.facets: Dict[Facet, Bitmap] = dict()
+        self.event_days: Dict[int, Bitmap] = dict()
+        self.client_segments: Dict[int, ClientSegments] = dict()
+
+    @classmethod
+    def build(cls, client_segments: Dict[int, ClientSegments]) -> "SegmentIndex":
+        index = cls()
+        facet_ids: Dict[Facet, List[int]] = defaultdict(list)
+        day_ids: Dict[int, List[int]] = defaultdict(list)
+        for client_id, segments in client_segments.items():
+            for facet in segments.facets:
+                facet_ids[facet].append(client_id)
+            for day in segments.event_days:
+                day_ids[day].append(client_id)
+
+        index.clients = Bitmap.from_ids(client_segments)
+        index.facets = {facet: Bitmap.from_ids(ids) for facet, ids in facet_ids.items()}
+        index.event_days = {day: Bitmap.from_ids(ids) for day, ids in day_ids.items()}
+        index.client_segments = client_segments
+        return index
+
+    def remove_client(self, client_id: int) -> None:
+        segments = self.client_segments.pop(client_id, None)
+        if segments is None:
+            return
+        self.clients.discard(client_id)
+        for facet in segments.facets:
+            self.facets[facet].discard(client_id)
+            if not self.facets[facet].containers:
+                del self.facets[facet]
+        for day in segments.event_days:
+            self.event_days[day].discard(client_id)
+            if not self.event_days[day].containers:
+                del self.event_days[day]
+
+    def set_client(self, client_id: int, segments: ClientSegments) -> None:
+        self.remove_client(client_id)
+        self.client_segments[client_id] = segments
+        self.clients.add(client_id)
+        for facet in segments.facets:
+            self.facets.setdefault(facet, Bitmap()).add(client_id)
+        for day in segments.event_days:
+            self.event_days.setdefault(day, Bitmap()).add(client_id)
+
+    def get_facet(self, facet: Facet) -> Bitmap:
+        return self.facets.get(facet, Bitmap())
+
+    def get_event_within(self, days: int) -> Bitmap:
+        last_day = date.today().toordinal()
+        first_day = last_day - days
+        result = Bitmap()
+        for day, bitmap in self.event_days.items():
+            if first_day <= day <= last_day:
+                result = result | bitmap
+        return result
+
+    def evaluate(self, node: tuple) -> Bitmap:
+        kind = node[0]
+        if kind == 'facet':
+            return self.get_facet(node[1])
+        if kind == 'event_within':
+            return self.get_event_within(node[1])
+        if kind == 'not':
+            return self.clients - self.evaluate(node[1])
+        operands = [self.evaluate(operand) for operand in node[1]]
+        if kind == 'and':
+            # The operand of fewest containers first keeps intermediate bitmaps small
+            operands.sort(key=lambda bitmap: len(bitmap.containers))
+            result = operands[0]
+            for operand in operands[1:]:
+                result = result & operand
+        else:
+            result = operands[0]
+            for operand in operands[1:]:
+                result = result | operand
+        return result
+
+
+def tokenize(segment: str) -> List[Tuple[str, str]]:
+    tokens = list()
+    position = 0
+    segment = segment.rstrip()
+    while position < len(segment):
+        match = TOKEN_PATTERN.match(segment, position)
+        if match is None or match.end() == position:
+            raise SegmentSyntaxError(f'Unexpected symbol at {position}')
+        position = match.end()
+        if match.group('string') is not None:
+            tokens.append(('value', re.sub(r'\\(.)', r'\1', match.group('string')[1:-1])))
+        elif match.group('operator') is not None:
+            tokens.append(('operator', match.group('operator')))
+        elif match.group('word').upper() in KEYWORDS:
+            tokens.append(('keyword', match.group('word').upper()))
+        else:
+            tokens.append(('value', match.group('word')))
+    return tokens
+
+
+class SegmentParser:
+    """
+    Recursive descent parser of segments:
+
+        segment   := and ("OR" and)*
+        and       := not ("AND" not)*
+        not       := "NOT" not | "(" segment ")" | condition
+        condition := field ("=" | "!=") value | field "IN" "(" value ("," value)* ")"
+
+    Fields are `status`, `user_type`, `city`, `attribute.<key>` and `event_within`,
+    `event_within = 30` matches clients with an event in the last 30 days
+    """
+    def __init__(self, segment: str):
+        self.tokens = tokenize(segment)
+        self.position = 0
+
+    def parse(self) -> tuple:
+        node = self.parse_or()
+        if self.position != len(self.tokens):
+            raise SegmentSyntaxError(f'Unexpected "{self.tokens[self.position][1]}"')
+        return node
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, kind: str, value: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or token[0] != kind or (value is not None and token[1] != value):
+            expected = value or kind
+            raise SegmentSyntaxError(f'Expected {expected}, got {token[1] if token else "end of segment"}')
+        self.position += 1
+        return token[1]
+
+    def parse_or(self) -> tuple:
+        operands = [self.parse_and()]
+        while self.peek() == ('keyword', 'OR'):
+            self.position += 1
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else ('or', operands)
+
+    def parse_and(self) -> tuple:
+        operands = [self.parse_not()]
+        while self.peek() == ('keyword', 'AND'):
+            self.position += 1
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else ('and', operands)
+
+    def parse_not(self) -> tuple:
+        if self.peek() == ('keyword', 'NOT'):
+            self.position += 1
+            return 'not', self.parse_not()
+        if self.peek() == ('operator', '('):
+            self.position += 1
+            node = self.parse_or()
+            self.take('operator', ')')
+            return node
+        return self.parse_condition()
+
+    def parse_condition(self) -> tuple:
+        field = self.take('value')
+        token = self.peek()
+        if token == ('keyword', 'IN'):
+            self.position += 1
+            self.take('operator', '(')
+            values = [self.take('value')]
+            while self.peek() == ('operator', ','):
+                self.position += 1
+                values.append(self.take('value'))
+            self.take('operator', ')')
+            nodes = [get_condition(field, value) for value in values]
+            return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+        if token in (('operator', '='), ('operator', '!=')):
+            self.position += 1
+            node = get_condition(field, self.take('value'))
+            return ('not', node) if token[1] == '!=' else node
+
+        raise SegmentSyntaxError(f'Expected "=", "!=" or IN after {field}')
+
+
+def get_condition(field: str, value: str) -> tuple:
+    if field in ENUM_FIELDS:
+        names = ENUM_FIELDS[field].__members__
+        if value.upper() not in names:
+            raise SegmentSyntaxError(f'Unknown {field} {value}, expected one of {", ".join(names)}')
+        return 'facet', Facet(field, value.upper())
+
+    if field == 'city':
+        return 'facet', Facet(field, normalize_city(value))
+
+    if field.startswith(ATTRIBUTE_PREFIX) and len(field) > len(ATTRIBUTE_PREFIX):
+        return 'facet', Facet(field, value)
+
+    if field == EVENT_WITHIN_FIELD:
+        if not value.isdigit():
+            raise SegmentSyntaxError(f'{EVENT_WITHIN_FIELD} is a number of days')
+        return 'event_within', int(value)
+
+    raise SegmentSyntaxError(f'Unknown field {field}')
+
+
+def parse_segment(segment: str) -> tuple:
+    return SegmentParser(segment).parse()
+
+
+async def get_client_segments(
+        db: scoped_session, user_id: int, client_ids: Optional[List[int]] = None
+) -> Dict[int, ClientSegments]:
+    conditions = [Client.user_id == user_id]
+    if client_ids is not None:
+        conditions.append(Client.id.in_(client_ids))
+
+    statement = select(
+        Client.id, Client.status, Client.user_type, Client.city, Client.attribute_values
+    ).where(and_(*conditions))
+    clients = (await db.execute(statement)).fetchall()
+
+    statement = (
+        select(Participant.client_id, func.date(CalendarEvent.event_date))
+        .join(CalendarEvent, CalendarEvent.id == Participant.event_id)
+        .join(Client, Client.id == Participant.client_id)
+        .where(and_(*conditions))
+        .distinct()
+    )
+    client_days: Dict[int, Set[int]] = defaultdict(set)
+    for client_id, event_day in (await db.execute(statement)).fetchall():
+        client_days[client_id].add(event_day.toordinal())
+
+    return {
+        client_id: ClientSegments(
+            facets=get_client_facets(
+                status=status, user_type=user_type, city=city, attribute_values=attribute_values
+            ),
+            event_days=tuple(sorted(client_days.get(client_id, ())))
+        )
+        for client_id, status, user_type, city, attribute_values in clients
+    }
+
+
+async def get_segment_index(db: scoped_session, user_id: int) -> SegmentIndex:
+    index = segment_indexes.get(user_id)
+    if index is not None:
+        return index
+
+    # Concurrent requests of the user wait for one build instead of loading the clients again
+    lock = building_locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        index = segment_indexes.get(user_id)
+        if index is None:
+            client_segments = await get_client_segments(db=db, user_id=user_id)
+            index = await asyncio.get_running_loop().run_in_executor(None, SegmentIndex.build, client_segments)
+            segment_indexes.set(user_id, index)
+    building_locks.pop(user_id, None)
+    return index
+
+
+async def refresh_client_segments(db: scoped_session, user_id: int, client_ids: List[int]) -> None:
+    """
+    Update the loaded index of the user after changes of the clients,
+    clients that are gone are removed from the index
+    """
+    index = segment_indexes.get(user_id)
+    if index is None:
+        return
+
+    client_segments = await get_client_segments(db=db, user_id=user_id, client_ids=client_ids)
+    for client_id in client_ids:
+        if client_id in client_segments:
+            index.set_client(client_id, client_segments[client_id])
+        else:
+            index.remove_client(client_id)
+
+
+def remove_client_segments(user_id: int, client_ids: List[int]) -> None:
+    index = segment_indexes.get(user_id)
+    if index is not None:
+        for client_id in client_ids:
+            index.remove_client(client_id)
+
+
+def invalidate_client_segments(user_id: int) -> None:
+    segment_indexes.invalidate(user_id)
+
+
+class SegmentPage(NamedTuple):
+    count: int
+    client_ids: List[int]
+    next_cursor: Optional[int]
+
+
+async def get_segment_page(
+        db: scoped_session, user_id: int, segment: tuple, limit: int, after: Optional[int] = None
+) -> SegmentPage:
+    index = await get_segment_index(db=db, user_id=user_id)
+    result = index.evaluate(segment)
+
+    client_ids = list()
+    next_cursor = None
+    for client_id in result.iterate(after=after) if limit else ():
+        if len(client_ids) == limit:
+            next_cursor = client_ids[-1]
+            break
+        client_ids.append(client_id)
+
+    return SegmentPage(count=len(result), client_ids=client_ids, next_cursor=next_cursor)
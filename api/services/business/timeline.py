@@ -0,0 +1,186 @@
+from services.business.models import ClientStatusChange
+from services.business.enums import ClientTimelineItemType
+from services.event_calendar.models import CalendarEvent, Participant
+from sqlalchemy import select, and_, true, tuple_
+from sqlalchemy.orm import scoped_session
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Tuple
+import base64
+import heapq
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class TimelineItem(NamedTuple):
+    kind: ClientTimelineItemType
+    occurred_at: datetime
+    item_id: int
+    event: Optional[Any] = None
+    status_change: Optional[Any] = None
+
+
+class TimelineCursor(NamedTuple):
+    """
+    Items are ordered by time, then by rank of their source and id, newest first
+    """
+    occurred_at: datetime
+    rank: int
+    item_id: int
+
+
+class ClientTimelinePage(NamedTuple):
+    items: List[TimelineItem]
+    next_cursor: Optional[str]
+
+
+def encode_timeline_cursor(cursor: TimelineCursor) -> str:
+    raw = f"{cursor.occurred_at.isoformat()}|{cursor.rank}|{cursor.item_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_timeline_cursor(cursor: str) -> TimelineCursor:
+    """
+    Raise ValueError when the cursor is damaged
+    """
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    occurred_at, rank, item_id = raw.split('|')
+    return TimelineCursor(occurred_at=datetime.fromisoformat(occurred_at), rank=int(rank), item_id=int(item_id))
+
+
+def get_keyset_condition(rank: int, occurred_at, item_id, after: Optional[TimelineCursor]):
+    """
+    Items of the source of `rank` that go after the cursor in the merged order
+    """
+    if after is None:
+        return true()
+    if rank < after.rank:
+        return occurred_at <= after.occurred_at
+    if rank > after.rank:
+        return occurred_at < after.occurred_at
+    return tuple_(occurred_at, item_id) < tuple_(after.occurred_at, after.item_id)
+
+
+class EventSource:
+    """
+    Events the client participates in, an item per participation
+    """
+    kind = ClientTimelineItemType.EVENT
+    rank = 0
+
+    @classmethod
+    def get_statement(cls, client_id: int, after: Optional[TimelineCursor], limit: int):
+        return (
+            select(
+                Participant.id.label('participant_id'),
+                CalendarEvent.id, CalendarEvent.event_name, CalendarEvent.event_description,
+                CalendarEvent.event_date, CalendarEvent.business_id
+            )
+            .join(CalendarEvent, CalendarEvent.id == Participant.event_id)
+            .where(
+                and_(
+                    Participant.client_id == client_id,
+                    get_keyset_condition(cls.rank, CalendarEvent.event_date, Participant.id, after)
+                )
+            )
+            .order_by(CalendarEvent.event_date.desc(), Participant.id.desc())
+            .limit(limit)
+        )
+
+    @classmethod
+    def get_item(cls, row) -> TimelineItem:
+        return TimelineItem(kind=cls.kind, occurred_at=row.event_date, item_id=row.participant_id, event=row)
+
+
+class StatusChangeSource:
+    kind = ClientTimelineItemType.STATUS_CHANGE
+    rank = 1
+
+    @classmethod
+    def get_statement(cls, client_id: int, after: Optional[TimelineCursor], limit: int):
+        return (
+            select(
+                ClientStatusChange.id, ClientStatusChange.old_status,
+                ClientStatusChange.new_status, ClientStatusChange.changed_at
+            )
+            .where(
+                and_(
+                    ClientStatusChange.client_id == client_id,
+                    get_keyset_condition(cls.rank, ClientStatusChange.changed_at, ClientStatusChange.id, after)
+                )
+            )
+            .order_by(ClientStatusChange.changed_at.desc(), ClientStatusChange.id.desc())
+            .limit(limit)
+        )
+
+    @classmethod
+    def get_item(cls, row) -> TimelineItem:
+        return TimelineItem(kind=cls.kind, occurred_at=row.changed_at, item_id=row.id, status_change=row)
+
+
+# Sources of the timeline, transactions join them once they are linked to clients
+TIMELINE_SOURCES = (EventSource, StatusChangeSource)
+
+
+def get_heap_key(source, item: TimelineItem) -> Tuple[int, int, int]:
+    """
+    heapq pops the smallest key first, so the components are negated for newest first order
+    """
+    return -((item.occurred_at - EPOCH) // MICROSECOND), -source.rank, -item.item_id
+
+
+async def iterate_source(
+        db: scoped_session, source, client_id: int, after: Optional[TimelineCursor], batch_size: int
+) -> AsyncIterator[TimelineItem]:
+    """
+    Items of the source newest first, read by batches with the keyset of the last item
+    """
+    while True:
+        rows = (await db.execute(source.get_statement(client_id=client_id, after=after, limit=batch_size))).all()
+        for row in rows:
+            yield source.get_item(row)
+        if len(rows) < batch_size:
+            return
+        last_item = source.get_item(rows[-1])
+        after = TimelineCursor(occurred_at=last_item.occurred_at, rank=source.rank, item_id=last_item.item_id)
+
+
+async def get_client_timeline(
+        db: scoped_session, client_id: int, limit: int, after: Optional[TimelineCursor] = None
+) -> ClientTimelinePage:
+    """
+    K-way merge of the sources: every source is an ordered cursor over its index,
+    only the head item of each of them is kept in the heap, so a page reads
+    at most `limit` + 1 rows of every source
+    """
+    iterators = [
+        (source, iterate_source(db=db, source=source, client_id=client_id, after=after, batch_size=limit + 1))
+        for source in TIMELINE_SOURCES
+    ]
+    heap = list()
+    for index, (source, iterator) in enumerate(iterators):
+        item = await anext(iterator, None)
+        if item is not None:
+            heap.append((get_heap_key(source, item), index, item))
+    heapq.heapify(heap)
+
+    items = list()
+    next_cursor = None
+    while heap:
+        _, index, item = heapq.heappop(heap)
+        if len(items) == limit:
+            last_item, last_source = items[-1]
+            next_cursor = encode_timeline_cursor(
+                TimelineCursor(occurred_at=last_item.occurred_at, rank=last_source.rank, item_id=last_item.item_id)
+            )
+            break
+        source, iterator = iterators[index]
+        items.append((item, source))
+        following = await anext(iterator, None)
+        if following is not None:
+            heapq.heappush(heap, (get_heap_key(source, following), index, following))
+
+    for _, iterator in iterators:
+        await iterator.aclose()
+
+    return ClientTimelinePage(items=[item for item, _ in items], next_cursor=next_cursor)
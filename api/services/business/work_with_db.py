@@ -9,7 +9,7 @@ from services.finance.models import (
     FinancialBusiness
 )
 from services.database import BaseModel
-from sqlalchemy import select, update, join, exists, and_
+from sqlalchemy import select, update, join, exists, func, and_
 from sqlalchemy.orm import scoped_session
 from typing import List, Optional
 
@@ -149,3 +149,43 @@ async def client_belongs_to_user_check(
     ).select()
     result = (await db.execute(statement)).scalars().one()
     return result
+
+
+async def get_business_of_user(db: scoped_session, business_id: int, user_id: int) -> Optional[Business]:
+    statement = select(Business).where(
+        and_(
+            Business.id == business_id,
+            Business.user_id == user_id
+        )
+    )
+    return (await db.execute(statement)).scalars().first()
+
+
+async def get_client_of_user_by_id(db: scoped_session, client_id: int, user_id: int) -> Optional[Client]:
+    statement = select(Client).where(
+        and_(
+            Client.id == client_id,
+            Client.user_id == user_id
+        )
+    )
+    return (await db.execute(statement)).scalars().first()
+
+
+async def count_clients_of_user(db: scoped_session, user_id: int, client_ids: List[int]) -> int:
+    statement = select(func.count(Client.id)).where(
+        and_(
+            Client.id.in_(client_ids),
+            Client.user_id == user_id
+        )
+    )
+    return (await db.execute(statement)).scalars().one()
+
+
+async def get_clients_of_user_by_ids(db: scoped_session, user_id: int, client_ids: List[int]) -> List[Client]:
+    statement = select(Client).where(
+        and_(
+            Client.id.in_(client_ids),
+            Client.user_id == user_id
+        )
+    )
+    return (await db.execute(statement)).scalars().all()
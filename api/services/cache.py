@@ -0,0 +1,44 @@
+from typing import Any, Hashable, Optional
+from collections import OrderedDict
+import time
+
+
+class TTLCache:
+    """
+    In-process cache of the worker with expiration of entries.
+
+    The cache is not shared between gunicorn workers, so the values must be
+    either safe to be stale for `ttl` seconds or invalidated by the worker
+    that changes them
+    """
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
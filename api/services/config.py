@@ -1,5 +1,7 @@
 from pydantic import BaseSettings
 from functools import lru_cache
+from typing import Dict, Optional
+import json
 import os
 
 print(os.environ)
@@ -19,10 +21,106 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = os.environ.get(key='ACCESS_TOKEN_EXPIRE_MINUTES', default=30)
     refresh_token_expire_minutes: int = os.environ.get(key='REFRESH_TOKEN_EXPIRE_MINUTES', default=43200)
     algorithm: str = os.environ.get(key='ALGORITHM', default='HS256')
-    bytes_refresh_token: int = int(os.environ.get(key='BYTES_REFRESH_TOKEN', default=100))
+    jwt_active_kid: str = os.environ.get(key='JWT_ACTIVE_KID', default='default')
+    jwt_keys: Dict[str, str] = json.loads(os.environ.get(key='JWT_KEYS', default='{}'))
+    principal_version_cache_seconds: int = int(os.environ.get(key='PRINCIPAL_VERSION_CACHE_SECONDS', default=30))
+    principal_version_cache_size = 100000
+    bytes_refresh_token: int = int(os.environ.get(key='BYTES_REFRESH_TOKEN', default=32))
     length_google_uid = 40
     limit_entropy = 0.5
     length_device_id = 100
+    export_dir: str = os.environ.get(key='EXPORT_DIR', default='/tmp/gainsystem_exports')
+    export_chunk_size: int = int(os.environ.get(key='EXPORT_CHUNK_SIZE', default=5000))
+    export_rows_per_part: int = int(os.environ.get(key='EXPORT_ROWS_PER_PART', default=1000000))
+    # Jobs of a live worker are touched every heartbeat, pending and running jobs
+    # untouched for `job_stale_seconds` were left by a stopped worker and are failed
+    job_heartbeat_seconds: int = int(os.environ.get(key='JOB_HEARTBEAT_SECONDS', default=30))
+    job_stale_seconds: int = int(os.environ.get(key='JOB_STALE_SECONDS', default=5 * 60))
+    analytics_cache_seconds: int = int(os.environ.get(key='ANALYTICS_CACHE_SECONDS', default=600))
+    analytics_cache_size: int = int(os.environ.get(key='ANALYTICS_CACHE_SIZE', default=100))
+    analytics_forecast_window_days = 90
+    analytics_trend_months = 6
+    analytics_anomaly_z_score = 3.0
+    analytics_anomaly_min_count = 5
+    analytics_anomaly_limit = 100
+    idempotency_key_expire_minutes: int = int(os.environ.get(key='IDEMPOTENCY_KEY_EXPIRE_MINUTES', default=1440))
+    # Length of `IdempotencyKey.key`
+    idempotency_key_max_length = 255
+    idempotency_cache_seconds = 600
+    # Longer than any create mutation, a key left without response is claimed again after it
+    idempotency_lease_seconds = 60
+    idempotency_wait_seconds = 10
+    transaction_partitions_ahead_months: int = int(os.environ.get(key='TRANSACTION_PARTITIONS_AHEAD_MONTHS', default=3))
+    transaction_partitions_retention_months: int = int(
+        os.environ.get(key='TRANSACTION_PARTITIONS_RETENTION_MONTHS', default=0)
+    )
+    transaction_partitions_check_seconds = 6 * 60 * 60
+    # Creation of a missing partition by a request waits no longer for the lock of the table
+    transaction_partitions_lock_timeout = '5s'
+    history_transactions_default_months = 12
+    geo_nearest_start_radius_km = 5.0
+    geo_nearest_max_radius_km = 20040.0
+    geo_nearby_default_limit = 50
+    set_client_attributes_max_clients = 1000
+    import_dir: str = os.environ.get(key='IMPORT_DIR', default='/tmp/gainsystem_imports')
+    client_import_max_bytes: int = int(os.environ.get(key='CLIENT_IMPORT_MAX_BYTES', default=200 * 1024 * 1024))
+    client_import_batch_size: int = int(os.environ.get(key='CLIENT_IMPORT_BATCH_SIZE', default=10000))
+    client_import_max_errors = 1000
+    dedup_max_block_size = 50
+    dedup_default_min_score = 0.5
+    dedup_default_limit = 100
+    merge_clients_max_duplicates = 100
+    segment_index_seconds: int = int(os.environ.get(key='SEGMENT_INDEX_SECONDS', default=600))
+    segment_index_cache_size: int = int(os.environ.get(key='SEGMENT_INDEX_CACHE_SIZE', default=200))
+    segment_default_limit = 100
+    client_timeline_default_limit = 20
+    permission_cache_seconds: int = int(os.environ.get(key='PERMISSION_CACHE_SECONDS', default=60))
+    permission_cache_size = 10000
+    permission_poll_seconds: int = int(os.environ.get(key='PERMISSION_POLL_SECONDS', default=2))
+    # Changes committed later than their timestamp by up to this many seconds are still seen
+    permission_poll_overlap_seconds = 10
+    permission_change_retention_hours = 24
+    dashboard_cache_seconds: int = int(os.environ.get(key='DASHBOARD_CACHE_SECONDS', default=30))
+    dashboard_cache_size = 10000
+    reference_data_poll_seconds: int = int(os.environ.get(key='REFERENCE_DATA_POLL_SECONDS', default=30))
+    password_hash_scheme: str = os.environ.get(key='PASSWORD_HASH_SCHEME', default='pbkdf2')
+    password_pbkdf2_iterations: int = int(os.environ.get(key='PASSWORD_PBKDF2_ITERATIONS', default=600000))
+    password_scrypt_n: int = int(os.environ.get(key='PASSWORD_SCRYPT_N', default=32768))
+    password_scrypt_r: int = int(os.environ.get(key='PASSWORD_SCRYPT_R', default=8))
+    password_scrypt_p: int = int(os.environ.get(key='PASSWORD_SCRYPT_P', default=1))
+    password_argon2_time_cost: int = int(os.environ.get(key='PASSWORD_ARGON2_TIME_COST', default=3))
+    password_argon2_memory_cost: int = int(os.environ.get(key='PASSWORD_ARGON2_MEMORY_COST', default=65536))
+    password_argon2_parallelism: int = int(os.environ.get(key='PASSWORD_ARGON2_PARALLELISM', default=1))
+    password_hash_workers: int = int(os.environ.get(key='PASSWORD_HASH_WORKERS', default=2))
+    password_hash_max_queue: int = int(os.environ.get(key='PASSWORD_HASH_MAX_QUEUE', default=64))
+    sweeper_check_seconds: int = int(os.environ.get(key='SWEEPER_CHECK_SECONDS', default=60 * 60))
+    sweeper_batch_size: int = int(os.environ.get(key='SWEEPER_BATCH_SIZE', default=1000))
+    sweeper_batch_pause_seconds: float = float(os.environ.get(key='SWEEPER_BATCH_PAUSE_SECONDS', default=0.2))
+    sweeper_max_run_seconds = 5 * 60
+    device_stale_days: int = int(os.environ.get(key='DEVICE_STALE_DAYS', default=180))
+    rate_limit_enabled: bool = True if os.environ.get(key='RATE_LIMIT_ENABLED') == 'True' else False
+    # Addresses or networks of reverse proxies, comma separated, whose `X-Forwarded-For` is trusted
+    trusted_proxies: str = os.environ.get(key='TRUSTED_PROXIES', default='')
+    rate_limit_store: str = os.environ.get(key='RATE_LIMIT_STORE', default='memory')
+    rate_limit_user_rate: float = float(os.environ.get(key='RATE_LIMIT_USER_RATE', default=10))
+    rate_limit_user_burst: int = int(os.environ.get(key='RATE_LIMIT_USER_BURST', default=40))
+    rate_limit_ip_rate: float = float(os.environ.get(key='RATE_LIMIT_IP_RATE', default=20))
+    rate_limit_ip_burst: int = int(os.environ.get(key='RATE_LIMIT_IP_BURST', default=80))
+    rate_limit_login_rate: float = float(os.environ.get(key='RATE_LIMIT_LOGIN_RATE', default=0.2))
+    rate_limit_login_burst: int = int(os.environ.get(key='RATE_LIMIT_LOGIN_BURST', default=5))
+    rate_limit_heavy_rate: float = float(os.environ.get(key='RATE_LIMIT_HEAVY_RATE', default=0.2))
+    rate_limit_heavy_burst: int = int(os.environ.get(key='RATE_LIMIT_HEAVY_BURST', default=3))
+    rate_limit_max_wait_seconds: float = float(os.environ.get(key='RATE_LIMIT_MAX_WAIT_SECONDS', default=0.5))
+    rate_limit_buckets_size = 100000
+    overload_enabled: bool = False if os.environ.get(key='OVERLOAD_ENABLED') == 'False' else True
+    overload_sample_seconds: float = float(os.environ.get(key='OVERLOAD_SAMPLE_SECONDS', default=0.5))
+    overload_loop_lag_seconds: float = float(os.environ.get(key='OVERLOAD_LOOP_LAG_SECONDS', default=0.2))
+    overload_pool_wait_seconds: float = float(os.environ.get(key='OVERLOAD_POOL_WAIT_SECONDS', default=0.5))
+    overload_retry_after_seconds = 5
+    # Without the token /metrics answers only loopback and private addresses
+    metrics_token: Optional[str] = os.environ.get(key='METRICS_TOKEN')
+    device_flush_seconds: float = float(os.environ.get(key='DEVICE_FLUSH_SECONDS', default=5))
+    device_flush_size: int = int(os.environ.get(key='DEVICE_FLUSH_SIZE', default=500))
 
 
 @lru_cache()
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, ForeignKey, VARCHAR, TIMESTAMP, TIME
+    Column, Integer, ForeignKey, VARCHAR, TIMESTAMP, TIME, Index
 )
 from sqlalchemy.orm import relationship
 from services.database import BaseModel
@@ -38,6 +38,9 @@ class CalendarEvent(BaseModel):
         return f"Event of user ID: {self.user_id}"
 
 
+Index('ix_calendar_event_business_id_event_date', CalendarEvent.business_id, CalendarEvent.event_date)
+
+
 class Participant(BaseModel):
     __tablename__ = 'participant'
     __tableargs__ = {
@@ -61,3 +64,6 @@ class Participant(BaseModel):
 
     def __repr__(self):
         return f"Participant of client ID: {self.client_id} | {self.client_email}"
+
+
+Index('ix_participant_client_id', Participant.client_id, Participant.event_id)
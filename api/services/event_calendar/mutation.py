@@ -7,11 +7,14 @@ from services.event_calendar.schema import (
 )
 from services.event_calendar.resolvers import (
     create_event_resolver,
+    create_event_replay,
     update_info_event_resolver,
     delete_event_resolver,
     delete_participant_resolver
 )
+from services.idempotency import run_idempotent
 from strawberry.types import Info
+from typing import Optional
 import strawberry
 
 
@@ -19,9 +22,14 @@ import strawberry
 class Mutation:
     @AuthenticationRequiredField()
     async def create_event(
-            self, info: Info, input_data: CreateEventInputData
+            self, info: Info, input_data: CreateEventInputData,
+            idempotency_key: Optional[str] = None
     ) -> CreateEventNode:
-        return await create_event_resolver(info=info, input_data=input_data)
+        return await run_idempotent(
+            info=info, operation='create_event', key=idempotency_key,
+            execute=lambda: create_event_resolver(info=info, input_data=input_data),
+            replay=create_event_replay
+        )
 
     @AuthenticationRequiredField()
     async def update_info_event(
@@ -13,10 +13,13 @@ from services.event_calendar.schema import (
     GetEventsInputData, GetEventsNode, EventListByDateNode
 )
 from services.event_calendar.models import CalendarEvent, Participant
+from services.idempotency import ReplayNode
 from services.business.work_with_db import (
-    check_user_that_he_is_owner,
     get_client_of_user
 )
+from services.business.permissions import check_user_permission
+from services.business.enums import PermissionResource, PermissionAction
+from services.business.segments import invalidate_client_segments
 from services.event_calendar.work_with_db import (
     check_event_exists,
     check_belong_participant_to_user,
@@ -24,6 +27,16 @@ from services.event_calendar.work_with_db import (
 )
 
 
+create_event_replay = ReplayNode(
+    node=CreateEventNode,
+    flag='created',
+    field='event',
+    model=CalendarEvent,
+    error=CreateEventErrorNode,
+    error_code=CreateEventErrorNode.CreateEventErrorCode
+)
+
+
 async def create_event_resolver(
         info: Info, input_data: CreateEventInputData
 ) -> CreateEventNode:
@@ -35,9 +48,10 @@ async def create_event_resolver(
 
     if instance.business_id:
         user_is_owner_business = (
-            await check_user_that_he_is_owner(
+            await check_user_permission(
                 db=context.db,
                 user_id=context.user.id,
+                resource=PermissionResource.EVENTS, action=PermissionAction.CREATE,
                 business_id=instance.business_id
             )
         )
@@ -65,6 +79,7 @@ async def create_event_resolver(
                 user_client = await get_client_of_user(db=context.db, client_id=client_id, user_id=context.user.id)
                 if user_client:
                     new_participant = Participant(
+                        event_id=new_event.id,
                         client_id=client_id
                     )
                     context.db.add(new_participant)
@@ -82,6 +97,8 @@ async def create_event_resolver(
                 object_id=new_event.id
             )
         )
+        if instance.clients_id:
+            invalidate_client_segments(user_id=context.user.id)
         created = True
 
     return CreateEventNode(created=created, event=event, error=error)
@@ -121,6 +138,8 @@ async def update_info_event_resolver(
                     object_id=instance.event_id
                 )
             )
+            if 'event_date' in update_data:
+                invalidate_client_segments(user_id=context.user.id)
 
         else:
             error = UpdateInfoEventErrorNode(
@@ -159,6 +178,7 @@ async def delete_event_resolver(
                 object_id=instance.event_id
             )
         )
+        invalidate_client_segments(user_id=context.user.id)
     else:
         error = DeleteEventErrorNode(
             code=DeleteEventErrorNode.DeleteEventErrorCode.EVENT_NOT_EXISTS,
@@ -197,6 +217,7 @@ async def delete_participant_resolver(
                 object_id=instance.participant_id
             )
         )
+        invalidate_client_segments(user_id=context.user.id)
 
     elif not participant_exists:
         error = DeleteParticipantErrorNode(
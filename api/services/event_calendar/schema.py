@@ -40,6 +40,7 @@ class CreateEventErrorNode(ErrorNode):
         BUSINESS_NOT_EXISTS = 'business_not_exists'
         PARTICIPANT_NOT_EXISTS = 'participant_not_exists'
         PARTICIPANT_FIELDS_ARE_EMPTY = 'participants_fields_are_empty'
+        IDEMPOTENCY_KEY_IS_TOO_LONG = 'idempotency_key_is_too_long'
 
     code: CreateEventErrorCode
 
@@ -0,0 +1,334 @@
+from services.finance.models import FinancialTransaction
+from services.finance.enums import TransactionType
+from services.config import get_settings
+from services.cache import TTLCache
+from sqlalchemy import select, case, func, cast, BigInteger
+from sqlalchemy.orm import scoped_session
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+EPOCH = date(1970, 1, 1)
+
+settings = get_settings()
+analytics_cache = TTLCache(ttl=settings.analytics_cache_seconds, max_size=settings.analytics_cache_size)
+
+
+class TransactionColumns(NamedTuple):
+    """
+    Columns of transactions of the account ordered by date.
+
+    days: days since 1970-01-01
+    amounts: signed amounts, accruals are positive and expenses are negative
+    categories: id of expense or accrual category, -1 when it is empty
+    """
+    ids: "np.ndarray"
+    days: "np.ndarray"
+    amounts: "np.ndarray"
+    categories: "np.ndarray"
+
+    @property
+    def is_expense(self) -> "np.ndarray":
+        return self.amounts < 0
+
+
+class ForecastPoint(NamedTuple):
+    date: date
+    balance: float
+    lower: float
+    upper: float
+
+
+class CategoryTrend(NamedTuple):
+    category_id: int
+    monthly_totals: List[float]
+    moving_average: List[float]
+    slope: float
+
+
+class SpendingAnomaly(NamedTuple):
+    transaction_id: int
+    date: date
+    amount: float
+    category_id: int
+    z_score: float
+
+
+class FinanceAnalytics(NamedTuple):
+    balance: float
+    forecast: List[ForecastPoint]
+    weekday_profile: List[float]
+    category_trends: List[CategoryTrend]
+    anomalies: List[SpendingAnomaly]
+
+
+def analytics_is_available() -> bool:
+    return np is not None
+
+
+def empty_columns() -> TransactionColumns:
+    return TransactionColumns(
+        ids=np.empty(0, dtype=np.int64),
+        days=np.empty(0, dtype=np.int64),
+        amounts=np.empty(0, dtype=np.float64),
+        categories=np.empty(0, dtype=np.int64)
+    )
+
+
+async def load_transaction_columns(
+        db: scoped_session, financial_business_id: int
+) -> TransactionColumns:
+    """
+    Every value is prepared by Postgres as a number, so each fetched chunk
+    is converted to arrays in one call without touching ORM objects
+    """
+    statement = (
+        select(
+            FinancialTransaction.id,
+            cast(func.floor(func.extract('epoch', FinancialTransaction.date) / 86400), BigInteger),
+            case(
+                (FinancialTransaction.transaction_type == TransactionType.EXPENSE, -FinancialTransaction.amount),
+                else_=FinancialTransaction.amount
+            ),
+            func.coalesce(
+                FinancialTransaction.expense_category_id,
+                FinancialTransaction.accrual_category_id,
+                -1
+            )
+        )
+        .where(FinancialTransaction.financial_business_id == financial_business_id)
+        .order_by(FinancialTransaction.date, FinancialTransaction.id)
+    )
+    result = await db.stream(
+        statement.execution_options(stream_results=True, max_row_buffer=settings.export_chunk_size)
+    )
+
+    chunks = list()
+    async for rows in result.partitions(settings.export_chunk_size):
+        chunks.append(np.array(rows, dtype=np.float64).reshape(-1, 4))
+
+    if not chunks:
+        return empty_columns()
+
+    matrix = np.concatenate(chunks)
+    return TransactionColumns(
+        ids=matrix[:, 0].astype(np.int64),
+        days=matrix[:, 1].astype(np.int64),
+        amounts=matrix[:, 2],
+        categories=matrix[:, 3].astype(np.int64)
+    )
+
+
+def daily_net_flow(columns: TransactionColumns, until_day: int) -> "np.ndarray":
+    """
+    Net flow of every day from the first transaction to `until_day`,
+    days without transactions have zero flow
+    """
+    first_day = int(columns.days[0])
+    length = max(until_day - first_day + 1, 0)
+    return np.bincount(
+        columns.days - first_day,
+        weights=columns.amounts,
+        minlength=length
+    )[:length]
+
+
+def moving_average(series: "np.ndarray", window: int) -> "np.ndarray":
+    """
+    Trailing mean of `window` values, the first values use the shorter window
+    """
+    if not len(series):
+        return series
+    cumulative = np.concatenate(([0.0], np.cumsum(series)))
+    ends = np.arange(1, len(series) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def weekdays(first_day: int, length: int) -> "np.ndarray":
+    # 1970-01-01 is Thursday, Monday is 0
+    return (first_day + np.arange(length) + 3) % 7
+
+
+def weekday_profile(flow: "np.ndarray", first_day: int) -> "np.ndarray":
+    """
+    Mean deviation of the flow of every weekday from the mean flow
+    """
+    if not len(flow):
+        return np.zeros(7)
+    days_of_week = weekdays(first_day=first_day, length=len(flow))
+    totals = np.bincount(days_of_week, weights=flow, minlength=7)
+    counts = np.maximum(np.bincount(days_of_week, minlength=7), 1)
+    return totals / counts - flow.mean()
+
+
+def forecast_balance(
+        columns: TransactionColumns, today: int, horizon: int, window: int
+) -> List[ForecastPoint]:
+    """
+    Balance for the next `horizon` days: mean daily flow of the last `window`
+    days plus the weekday seasonality, the band is one standard deviation
+    of the daily flow growing as a random walk
+    """
+    balance = float(columns.amounts.sum())
+    future_days = today + 1 + np.arange(horizon)
+
+    flow = daily_net_flow(columns=columns, until_day=today) if len(columns.days) else None
+    if flow is not None and len(flow):
+        recent_first_day = today - min(window, len(flow)) + 1
+        recent = flow[-window:]
+        seasonal = weekday_profile(flow=recent, first_day=recent_first_day)
+        future_flow = recent.mean() + seasonal[weekdays(first_day=today + 1, length=horizon)]
+        deviation = recent.std() * np.sqrt(np.arange(1, horizon + 1))
+    else:
+        future_flow = np.zeros(horizon)
+        deviation = np.zeros(horizon)
+
+    balances = balance + np.cumsum(future_flow)
+    return [
+        ForecastPoint(
+            date=EPOCH + timedelta(days=day),
+            balance=value,
+            lower=value - band,
+            upper=value + band
+        )
+        for day, value, band in zip(future_days.tolist(), balances.tolist(), deviation.tolist())
+    ]
+
+
+def category_trends(columns: TransactionColumns, today: int, months: int, window: int) -> List[CategoryTrend]:
+    """
+    Monthly expenses of every category for the last `months` months with
+    moving average and slope of the least squares line
+    """
+    expense = columns.is_expense
+    month_of_day = columns.days[expense].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    current_month = np.array(today, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    month_index = month_of_day - (current_month - months + 1)
+    in_range = (month_index >= 0) & (month_index < months)
+    if not in_range.any():
+        return list()
+
+    category_ids, category_index = np.unique(columns.categories[expense][in_range], return_inverse=True)
+    totals = np.bincount(
+        category_index * months + month_index[in_range],
+        weights=-columns.amounts[expense][in_range],
+        minlength=len(category_ids) * months
+    ).reshape(len(category_ids), months)
+
+    x = np.arange(months) - (months - 1) / 2
+    slopes = totals @ x / max(float(x @ x), 1.0)
+
+    return [
+        CategoryTrend(
+            category_id=category_id,
+            monthly_totals=row.tolist(),
+            moving_average=moving_average(row, window=window).tolist(),
+            slope=slope
+        )
+        for category_id, row, slope in zip(category_ids.tolist(), totals, slopes.tolist())
+    ]
+
+
+def spending_anomalies(
+        columns: TransactionColumns, threshold: float, min_count: int, limit: int
+) -> List[SpendingAnomaly]:
+    """
+    Expenses with z-score of amount inside of their category above `threshold`,
+    the most unusual go first
+    """
+    expense = np.flatnonzero(columns.is_expense)
+    if not len(expense):
+        return list()
+
+    amounts = -columns.amounts[expense]
+    category_ids, category_index = np.unique(columns.categories[expense], return_inverse=True)
+    counts = np.bincount(category_index)
+    means = np.bincount(category_index, weights=amounts) / counts
+    variances = np.bincount(category_index, weights=amounts ** 2) / counts - means ** 2
+    deviations = np.sqrt(np.maximum(variances, 0))
+
+    scores = np.zeros(len(amounts))
+    valid = (deviations[category_index] > 0) & (counts[category_index] >= min_count)
+    scores[valid] = (amounts[valid] - means[category_index][valid]) / deviations[category_index][valid]
+    flagged = np.flatnonzero(scores > threshold)
+    flagged = flagged[np.argsort(-scores[flagged])][:limit]
+
+    return [
+        SpendingAnomaly(
+            transaction_id=transaction_id,
+            date=EPOCH + timedelta(days=day),
+            amount=amount,
+            category_id=category_id,
+            z_score=score
+        )
+        for transaction_id, day, amount, category_id, score in zip(
+            columns.ids[expense][flagged].tolist(),
+            columns.days[expense][flagged].tolist(),
+            amounts[flagged].tolist(),
+            category_ids[category_index[flagged]].tolist(),
+            scores[flagged].tolist()
+        )
+    ]
+
+
+def compute_finance_analytics(
+        columns: TransactionColumns, today: int, horizon: int
+) -> FinanceAnalytics:
+    profile = np.zeros(7)
+    if len(columns.days):
+        flow = daily_net_flow(columns=columns, until_day=today)
+        profile = weekday_profile(flow=flow, first_day=int(columns.days[0]))
+
+    return FinanceAnalytics(
+        balance=float(columns.amounts.sum()),
+        forecast=forecast_balance(
+            columns=columns, today=today, horizon=horizon,
+            window=settings.analytics_forecast_window_days
+        ),
+        weekday_profile=profile.tolist(),
+        category_trends=category_trends(
+            columns=columns, today=today,
+            months=settings.analytics_trend_months, window=3
+        ),
+        anomalies=spending_anomalies(
+            columns=columns,
+            threshold=settings.analytics_anomaly_z_score,
+            min_count=settings.analytics_anomaly_min_count,
+            limit=settings.analytics_anomaly_limit
+        )
+    )
+
+
+async def get_finance_analytics(
+        db: scoped_session, financial_business_id: int,
+        horizon: int, today: Optional[date] = None
+) -> FinanceAnalytics:
+    """
+    Transactions of the account are pulled once into columnar arrays and
+    cached, every report is computed from the arrays without loops over rows
+    """
+    today_index = ((today or date.today()) - EPOCH).days
+    cached = analytics_cache.get(financial_business_id)
+    if cached is None:
+        cached = {
+            'columns': await load_transaction_columns(db=db, financial_business_id=financial_business_id),
+            'results': dict()
+        }
+        analytics_cache.set(financial_business_id, cached)
+
+    key = (today_index, horizon)
+    if key not in cached['results']:
+        cached['results'][key] = compute_finance_analytics(
+            columns=cached['columns'], today=today_index, horizon=horizon
+        )
+
+    return cached['results'][key]
+
+
+def invalidate_finance_analytics(financial_business_id: int) -> None:
+    analytics_cache.invalidate(financial_business_id)
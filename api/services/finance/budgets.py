@@ -0,0 +1,206 @@
+from services.finance.models import (
+    FinancialTransaction,
+    CategoryBudget,
+    BudgetPeriodSpend
+)
+from services.finance.enums import BudgetPeriod, BudgetAlertLevel, TransactionType
+from services.config import get_settings
+from services.pubsub import PubSub
+from sqlalchemy import select, case, and_, func, literal
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from sqlalchemy.orm import scoped_session
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+settings = get_settings()
+budget_alerts = PubSub()
+
+ALERT_THRESHOLDS = (
+    (BudgetAlertLevel.EXCEEDED, 1.0),
+    (BudgetAlertLevel.WARNING, 0.8),
+)
+
+
+class BudgetAlert(NamedTuple):
+    budget_id: int
+    financial_business_id: int
+    expense_category_id: int
+    period: BudgetPeriod
+    period_start: datetime
+    level: BudgetAlertLevel
+    limit_amount: float
+    spent: float
+
+
+class BudgetStatus(NamedTuple):
+    budget_id: int
+    expense_category_id: int
+    period: BudgetPeriod
+    period_start: datetime
+    limit_amount: float
+    spent: float
+    level: Optional[BudgetAlertLevel]
+
+
+def get_period_start(period: BudgetPeriod, moment: datetime) -> datetime:
+    day = datetime(moment.year, moment.month, moment.day)
+    if period is BudgetPeriod.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def get_period_end(period: BudgetPeriod, period_start: datetime) -> datetime:
+    if period is BudgetPeriod.WEEK:
+        return period_start + timedelta(days=7)
+    if period_start.month == 12:
+        return period_start.replace(year=period_start.year + 1, month=1)
+    return period_start.replace(month=period_start.month + 1)
+
+
+def get_alert_level(spent: float, limit_amount: float) -> Optional[BudgetAlertLevel]:
+    for level, ratio in ALERT_THRESHOLDS:
+        if spent >= limit_amount * ratio:
+            return level
+    return None
+
+
+async def record_budget_spend(
+        db: scoped_session, financial_business_id: int, expense_category_id: int,
+        amount: float, moment: datetime
+) -> List[BudgetAlert]:
+    """
+    Add the expense to the counters of its periods in one upsert.
+
+    Returns alerts of thresholds crossed by this expense in the current periods,
+    they are published by `publish_budget_alerts` after the commit
+    """
+    statement = select(CategoryBudget.id, CategoryBudget.period, CategoryBudget.limit_amount).where(
+        CategoryBudget.expense_category_id == expense_category_id
+    )
+    budgets = {row[0]: row for row in (await db.execute(statement)).fetchall()}
+    if not budgets:
+        return list()
+
+    period_starts = {
+        budget_id: get_period_start(period=period, moment=moment)
+        for budget_id, period, _ in budgets.values()
+    }
+    statement = insert_postgresql(BudgetPeriodSpend).values([
+        {'budget_id': budget_id, 'period_start': period_start, 'spent': amount}
+        for budget_id, period_start in period_starts.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[BudgetPeriodSpend.budget_id, BudgetPeriodSpend.period_start],
+        set_={
+            'spent': BudgetPeriodSpend.spent + statement.excluded.spent,
+            'updated_at': datetime.now()
+        }
+    ).returning(BudgetPeriodSpend.budget_id, BudgetPeriodSpend.spent)
+    counters = (await db.execute(statement)).fetchall()
+
+    now = datetime.now()
+    alerts = list()
+    for budget_id, spent in counters:
+        _, period, limit_amount = budgets[budget_id]
+        if period_starts[budget_id] != get_period_start(period=period, moment=now):
+            continue
+
+        level = get_alert_level(spent=spent, limit_amount=limit_amount)
+        if level is not None and level != get_alert_level(spent=spent - amount, limit_amount=limit_amount):
+            alerts.append(
+                BudgetAlert(
+                    budget_id=budget_id,
+                    financial_business_id=financial_business_id,
+                    expense_category_id=expense_category_id,
+                    period=period,
+                    period_start=period_starts[budget_id],
+                    level=level,
+                    limit_amount=limit_amount,
+                    spent=spent
+                )
+            )
+
+    return alerts
+
+
+def publish_budget_alerts(alerts: List[BudgetAlert]) -> None:
+    for alert in alerts:
+        budget_alerts.publish(alert.financial_business_id, alert)
+
+
+async def seed_budget_spend(db: scoped_session, budget: CategoryBudget) -> None:
+    """
+    The counter of the current period of a new budget is filled once
+    from the existing expenses, later expenses are added by `record_budget_spend`
+    """
+    period_start = get_period_start(period=budget.period, moment=datetime.now())
+    period_end = get_period_end(period=budget.period, period_start=period_start)
+    spent = (
+        select(
+            literal(budget.id),
+            literal(period_start),
+            func.coalesce(func.sum(FinancialTransaction.amount), 0)
+        )
+        .where(
+            and_(
+                FinancialTransaction.financial_business_id == budget.financial_business_id,
+                FinancialTransaction.date >= period_start,
+                FinancialTransaction.date < period_end,
+                FinancialTransaction.expense_category_id == budget.expense_category_id,
+                FinancialTransaction.transaction_type == TransactionType.EXPENSE
+            )
+        )
+    )
+    statement = insert_postgresql(BudgetPeriodSpend).from_select(
+        ['budget_id', 'period_start', 'spent'], spent
+    ).on_conflict_do_nothing(
+        index_elements=[BudgetPeriodSpend.budget_id, BudgetPeriodSpend.period_start]
+    )
+    await db.execute(statement)
+
+
+async def get_budget_statuses(
+        db: scoped_session, financial_business_id: int, moment: Optional[datetime] = None
+) -> List[BudgetStatus]:
+    """
+    Budgets of the account with the counters of their current periods in one read
+    """
+    moment = moment or datetime.now()
+    week_start = get_period_start(period=BudgetPeriod.WEEK, moment=moment)
+    month_start = get_period_start(period=BudgetPeriod.MONTH, moment=moment)
+    period_start = case(
+        (CategoryBudget.period == BudgetPeriod.WEEK, week_start),
+        else_=month_start
+    )
+    statement = (
+        select(
+            CategoryBudget.id,
+            CategoryBudget.expense_category_id,
+            CategoryBudget.period,
+            CategoryBudget.limit_amount,
+            func.coalesce(BudgetPeriodSpend.spent, 0)
+        )
+        .outerjoin(
+            BudgetPeriodSpend,
+            and_(
+                BudgetPeriodSpend.budget_id == CategoryBudget.id,
+                BudgetPeriodSpend.period_start == period_start
+            )
+        )
+        .where(CategoryBudget.financial_business_id == financial_business_id)
+        .order_by(CategoryBudget.expense_category_id, CategoryBudget.period)
+    )
+    rows = (await db.execute(statement)).fetchall()
+
+    return [
+        BudgetStatus(
+            budget_id=budget_id,
+            expense_category_id=expense_category_id,
+            period=period,
+            period_start=week_start if period is BudgetPeriod.WEEK else month_start,
+            limit_amount=limit_amount,
+            spent=spent,
+            level=get_alert_level(spent=spent, limit_amount=limit_amount)
+        )
+        for budget_id, expense_category_id, period, limit_amount, spent in rows
+    ]
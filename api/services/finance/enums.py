@@ -23,3 +23,44 @@ class TransactionType(enum.Enum):
     """
     EXPENSE = 'expense'
     ACCRUAL = 'accrual'
+
+
+@strawberry.enum
+class ExportFormat(enum.Enum):
+    """
+    File formats of transaction exports
+    """
+    CSV = 'csv'
+    PARQUET = 'parquet'
+
+
+@strawberry.enum
+class ExportCompression(enum.Enum):
+    """
+    Compression of transaction exports
+
+    For CSV the whole stream is compressed,
+    for PARQUET the codec is applied to the column chunks
+    """
+    NONE = 'none'
+    GZIP = 'gzip'
+    ZSTD = 'zstd'
+
+
+@strawberry.enum
+class BudgetPeriod(enum.Enum):
+    """
+    Periods of category budgets, week starts on Monday
+    """
+    WEEK = 'week'
+    MONTH = 'month'
+
+
+@strawberry.enum
+class BudgetAlertLevel(enum.Enum):
+    """
+    Alerts of category budgets
+    WARNING: spent 80% of the limit, EXCEEDED: spent 100% of the limit
+    """
+    WARNING = 'warning'
+    EXCEEDED = 'exceeded'
@@ -0,0 +1,379 @@
+from services.finance.models import (
+    FinancialTransaction,
+    ExpenseCategories,
+    AccrualCategories,
+    FinancialTag,
+    TransactionTag
+)
+from services.finance.enums import ExportFormat, ExportCompression
+from services.jobs.models import BackgroundJob
+from services.jobs.work_with_db import update_job
+from services.config import get_settings
+from sqlalchemy import select, join, outerjoin, func, literal_column, tuple_, and_
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import scoped_session
+from typing import AsyncGenerator, List, Optional, Tuple
+from datetime import datetime
+import base64
+import csv
+import io
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+EXPORT_COLUMNS = (
+    'id', 'hash_id', 'date', 'transaction_type', 'amount',
+    'expense_category', 'accrual_category', 'tags', 'comment'
+)
+
+FILE_EXTENSIONS = {
+    (ExportFormat.CSV, ExportCompression.NONE): 'csv',
+    (ExportFormat.CSV, ExportCompression.GZIP): 'csv.gz',
+    (ExportFormat.CSV, ExportCompression.ZSTD): 'csv.zst',
+    (ExportFormat.PARQUET, ExportCompression.NONE): 'parquet',
+    (ExportFormat.PARQUET, ExportCompression.GZIP): 'parquet',
+    (ExportFormat.PARQUET, ExportCompression.ZSTD): 'parquet',
+}
+
+MEDIA_TYPES = {
+    ExportCompression.NONE: 'text/csv',
+    ExportCompression.GZIP: 'application/gzip',
+    ExportCompression.ZSTD: 'application/zstd',
+}
+
+
+def encode_export_cursor(date: datetime, transaction_id: int) -> str:
+    raw = f"{date.isoformat()}|{transaction_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_export_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raise ValueError when the cursor is damaged
+    """
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    date, transaction_id = raw.split('|')
+    return datetime.fromisoformat(date), int(transaction_id)
+
+
+def get_transaction_export_statement(financial_business_id: int, after: Optional[str] = None):
+    """
+    Flat rows of transactions with names of category and tags.
+
+    Rows are ordered by (date, id) - the same order as the index
+    `ix_financial_transaction_business_date`, so the export is a single
+    index range scan and can be continued after any row with the cursor
+    """
+    tags = (
+        select(
+            func.string_agg(
+                FinancialTag.name,
+                aggregate_order_by(literal_column("','"), FinancialTag.name)
+            )
+        )
+        .select_from(join(TransactionTag, FinancialTag, TransactionTag.tag_id == FinancialTag.id))
+        .where(
+            and_(
+                TransactionTag.transaction_hash_id == FinancialTransaction.hash_id,
+                TransactionTag.transaction_date == FinancialTransaction.date
+            )
+        )
+        .scalar_subquery()
+    )
+    statement = (
+        select(
+            FinancialTransaction.id,
+            FinancialTransaction.hash_id,
+            FinancialTransaction.date,
+            FinancialTransaction.transaction_type,
+            FinancialTransaction.amount,
+            ExpenseCategories.title,
+            AccrualCategories.title,
+            tags,
+            FinancialTransaction.comment
+        )
+        .select_from(
+            outerjoin(
+                outerjoin(
+                    FinancialTransaction, ExpenseCategories,
+                    FinancialTransaction.expense_category_id == ExpenseCategories.id
+                ),
+                AccrualCategories,
+                FinancialTransaction.accrual_category_id == AccrualCategories.id
+            )
+        )
+        .where(FinancialTransaction.financial_business_id == financial_business_id)
+        .order_by(FinancialTransaction.date, FinancialTransaction.id)
+    )
+
+    if after:
+        after_date, after_id = decode_export_cursor(after)
+        statement = statement.where(
+            tuple_(FinancialTransaction.date, FinancialTransaction.id) > tuple_(after_date, after_id)
+        )
+
+    return statement
+
+
+async def iterate_transaction_rows(
+        db: scoped_session, financial_business_id: int,
+        after: Optional[str] = None, limit: Optional[int] = None
+) -> AsyncGenerator[List[tuple], None]:
+    """
+    Yield rows of export by chunks from a server-side cursor,
+    so only one chunk is kept in memory
+    """
+    settings = get_settings()
+    statement = get_transaction_export_statement(
+        financial_business_id=financial_business_id, after=after
+    )
+    if limit:
+        statement = statement.limit(limit)
+
+    result = await db.stream(
+        statement.execution_options(stream_results=True, max_row_buffer=settings.export_chunk_size)
+    )
+    async for rows in result.partitions(settings.export_chunk_size):
+        yield [
+            (
+                row[0], row[1], row[2], row[3].value, row[4],
+                row[5] or "", row[6] or "", row[7] or "", row[8]
+            )
+            for row in rows
+        ]
+
+
+async def get_export_next_cursor(
+        db: scoped_session, financial_business_id: int,
+        after: Optional[str], limit: int
+) -> Optional[str]:
+    """
+    Cursor of the last row of the chunk `after`..`after + limit`,
+    None when the chunk is the last one
+    """
+    statement = (
+        get_transaction_export_statement(financial_business_id=financial_business_id, after=after)
+        .with_only_columns([FinancialTransaction.date, FinancialTransaction.id])
+        .offset(limit)
+        .limit(1)
+    )
+    next_row_exists = (await db.execute(statement)).fetchall()
+    if not next_row_exists:
+        return None
+
+    statement = (
+        get_transaction_export_statement(financial_business_id=financial_business_id, after=after)
+        .with_only_columns([FinancialTransaction.date, FinancialTransaction.id])
+        .offset(limit - 1)
+        .limit(1)
+    )
+    last_row = (await db.execute(statement)).fetchall()[0]
+    return encode_export_cursor(date=last_row[0], transaction_id=last_row[1])
+
+
+class StreamCompressor:
+    def __init__(self, compression: ExportCompression):
+        self._compressor = None
+        if compression is ExportCompression.GZIP:
+            self._compressor = zlib.compressobj(wbits=31)
+        elif compression is ExportCompression.ZSTD:
+            if zstandard is None:
+                raise ValueError("zstd compression requires the `zstandard` package")
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if self._compressor is None:
+            return data
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self._compressor is None:
+            return b""
+        return self._compressor.flush()
+
+
+class CsvEncoder:
+    def __init__(self, compression: ExportCompression):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._compressor = StreamCompressor(compression=compression)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode('utf-8')
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return self._compressor.compress(data)
+
+    def header(self) -> bytes:
+        self._writer.writerow(EXPORT_COLUMNS)
+        return self._drain()
+
+    def encode(self, rows: List[tuple]) -> bytes:
+        self._writer.writerows(
+            (row[:2] + (row[2].isoformat(),) + row[3:]) for row in rows
+        )
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class DrainableSink(io.RawIOBase):
+    """
+    File object for pyarrow that keeps only bytes written after the last drain
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks = list()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """
+    Every encoded chunk becomes one row group of the parquet file
+    """
+    def __init__(self, compression: ExportCompression):
+        if pyarrow is None:
+            raise ValueError("Parquet export requires the `pyarrow` package")
+        self._schema = pyarrow.schema([
+            ('id', pyarrow.int64()),
+            ('hash_id', pyarrow.string()),
+            ('date', pyarrow.timestamp('us')),
+            ('transaction_type', pyarrow.string()),
+            ('amount', pyarrow.float64()),
+            ('expense_category', pyarrow.string()),
+            ('accrual_category', pyarrow.string()),
+            ('tags', pyarrow.string()),
+            ('comment', pyarrow.string()),
+        ])
+        self._sink = DrainableSink()
+        self._writer = pyarrow.parquet.ParquetWriter(
+            self._sink, self._schema, compression=compression.value
+        )
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: List[tuple]) -> bytes:
+        columns = list(zip(*rows))
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        )
+        self._writer.write_table(table, row_group_size=len(rows))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def export_is_available(file_format: ExportFormat, compression: ExportCompression) -> bool:
+    if file_format is ExportFormat.PARQUET:
+        return pyarrow is not None
+    if compression is ExportCompression.ZSTD:
+        return zstandard is not None
+    return True
+
+
+def get_export_encoder(file_format: ExportFormat, compression: ExportCompression):
+    if file_format is ExportFormat.PARQUET:
+        return ParquetEncoder(compression=compression)
+    return CsvEncoder(compression=compression)
+
+
+async def stream_transaction_export(
+        db: scoped_session, financial_business_id: int,
+        file_format: ExportFormat, compression: ExportCompression,
+        after: Optional[str] = None, limit: Optional[int] = None
+) -> AsyncGenerator[bytes, None]:
+    encoder = get_export_encoder(file_format=file_format, compression=compression)
+    yield encoder.header()
+    async for rows in iterate_transaction_rows(
+            db=db, financial_business_id=financial_business_id,
+            after=after, limit=limit
+    ):
+        yield encoder.encode(rows)
+    yield encoder.finish()
+
+
+async def run_transaction_export_job(db: scoped_session, job: BackgroundJob) -> None:
+    """
+    Write the export into files of `export_rows_per_part` rows.
+
+    After every finished file the job saves the cursor of its last row,
+    so a failed or interrupted job continues from the next file
+    """
+    settings = get_settings()
+    parameters = job.parameters
+    file_format = ExportFormat(parameters['file_format'])
+    compression = ExportCompression(parameters['compression'])
+    extension = FILE_EXTENSIONS[(file_format, compression)]
+    os.makedirs(settings.export_dir, exist_ok=True)
+
+    cursor = job.cursor or None
+    result = list(job.result)
+    processed_rows = job.processed_rows
+
+    while True:
+        file_name = f"transactions_{job.id}_{len(result)}.{extension}"
+        path = os.path.join(settings.export_dir, file_name)
+        encoder = get_export_encoder(file_format=file_format, compression=compression)
+        written_rows = 0
+        last_row = None
+
+        with open(path, 'wb') as file:
+            file.write(encoder.header())
+            async for rows in iterate_transaction_rows(
+                    db=db, financial_business_id=parameters['financial_business_id'],
+                    after=cursor, limit=settings.export_rows_per_part
+            ):
+                file.write(encoder.encode(rows))
+                written_rows += len(rows)
+                last_row = rows[-1]
+            file.write(encoder.finish())
+
+        if not written_rows and result:
+            os.remove(path)
+            break
+
+        result.append(file_name)
+        processed_rows += written_rows
+        if last_row is not None:
+            cursor = encode_export_cursor(date=last_row[2], transaction_id=last_row[0])
+
+        await update_job(
+            db=db, job_id=job.id, cursor=cursor or "",
+            processed_rows=processed_rows, result=result
+        )
+        await db.commit()
+
+        if written_rows < settings.export_rows_per_part:
+            break
@@ -1,10 +1,11 @@
 from sqlalchemy import (
-    Column, Integer, ForeignKey, Float, VARCHAR, Enum, TIMESTAMP
+    Column, Integer, ForeignKey, ForeignKeyConstraint, Float, VARCHAR, Enum, TIMESTAMP, Index
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from services.database import BaseModel
 from datetime import datetime
-from services.finance.enums import ColorActions, TransactionType
+from services.finance.enums import ColorActions, TransactionType, BudgetPeriod
 
 
 class FinancialBusiness(BaseModel):
@@ -18,6 +19,7 @@ class FinancialBusiness(BaseModel):
         ForeignKey('business.id', ondelete='CASCADE')
     )
     total_amount = Column(Float, nullable=False, default=0)
+    closed_until = Column(TIMESTAMP, nullable=True)
 
     accrual_categories = relationship(
         "AccrualCategories",
@@ -54,6 +56,9 @@ class FinancialBusiness(BaseModel):
         return f"FinancialBusiness of {self.business_id} | ID: {self.id}"
 
 
+Index('ix_financial_business_business_id', FinancialBusiness.business_id)
+
+
 class AccrualCategories(BaseModel):
     __tablename__ = 'accrual_categories'
     __tableargs__ = {
@@ -152,12 +157,17 @@ class FinancialTransaction(BaseModel):
     __tableargs__ = {
         'comment': "Table of finance transactions"
     }
+    # Monthly partitions are created by `services.finance.partitions`,
+    # the partition key is a part of the primary key and of every unique index
+    __table_args__ = {
+        'postgresql_partition_by': 'RANGE (date)'
+    }
 
     financial_business_id = Column(
         Integer,
         ForeignKey('financial_business.id', ondelete='CASCADE')
     )
-    hash_id = Column(VARCHAR(1024), nullable=False, default="", unique=True)
+    hash_id = Column(VARCHAR(1024), nullable=False, default="")
     transaction_type = Column(
         Enum(TransactionType, native_enum=False),
         nullable=False,
@@ -172,7 +182,7 @@ class FinancialTransaction(BaseModel):
         ForeignKey('accrual_categories.id', ondelete='CASCADE')
     )
     amount = Column(Float, nullable=False, default=0)
-    date = Column(TIMESTAMP, nullable=False, default=datetime.now)
+    date = Column(TIMESTAMP, nullable=False, default=datetime.now, primary_key=True)
     comment = Column(VARCHAR(255), nullable=False, default="")
 
     financial_business = relationship(
@@ -184,7 +194,7 @@ class FinancialTransaction(BaseModel):
     transactions_tags = relationship(
         "TransactionTag",
         lazy='selectin',
-        foreign_keys='[TransactionTag.transaction_hash_id]',
+        foreign_keys='[TransactionTag.transaction_hash_id, TransactionTag.transaction_date]',
         uselist=True
     )
     expense = relationship(
@@ -204,16 +214,36 @@ class FinancialTransaction(BaseModel):
         return f"FinancialTransaction of {self.financial_business_id} | ID: {self.id}"
 
 
+Index(
+    'ix_financial_transaction_business_date',
+    FinancialTransaction.financial_business_id,
+    FinancialTransaction.date,
+    FinancialTransaction.id
+)
+Index(
+    'uq_financial_transaction_hash_id_date',
+    FinancialTransaction.hash_id,
+    FinancialTransaction.date,
+    unique=True
+)
+
+
 class TransactionTag(BaseModel):
     __tablename__ = 'transaction_tag'
     __tableargs__ = {
         'comment': "Table of chosen transaction tags"
     }
-
-    transaction_hash_id = Column(
-        VARCHAR,
-        ForeignKey('financial_transaction.hash_id', ondelete='CASCADE')
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ['transaction_hash_id', 'transaction_date'],
+            ['financial_transaction.hash_id', 'financial_transaction.date'],
+            ondelete='CASCADE',
+            onupdate='CASCADE'
+        ),
     )
+
+    transaction_hash_id = Column(VARCHAR)
+    transaction_date = Column(TIMESTAMP)
     tag_id = Column(
         Integer,
         ForeignKey('financial_tag.id', ondelete='CASCADE')
@@ -222,7 +252,7 @@ class TransactionTag(BaseModel):
     transaction = relationship(
         "FinancialTransaction",
         lazy='selectin',
-        foreign_keys=[transaction_hash_id],
+        foreign_keys=[transaction_hash_id, transaction_date],
         back_populates="transactions_tags"
     )
     tag = relationship(
@@ -234,3 +264,104 @@ class TransactionTag(BaseModel):
 
     def __repr__(self):
         return f"TransactionTag of {self.transaction_hash_id} | ID: {self.id}"
+
+
+class CategoryBudget(BaseModel):
+    __tablename__ = 'category_budget'
+    __tableargs__ = {
+        'comment': "Table of weekly and monthly budgets of expense categories"
+    }
+
+    financial_business_id = Column(
+        Integer,
+        ForeignKey('financial_business.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    expense_category_id = Column(
+        Integer,
+        ForeignKey('expense_categories.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    period = Column(
+        Enum(BudgetPeriod, native_enum=False),
+        nullable=False,
+        default=BudgetPeriod.MONTH
+    )
+    limit_amount = Column(Float, nullable=False, default=0)
+
+    expense = relationship(
+        "ExpenseCategories",
+        lazy='selectin',
+        foreign_keys=[expense_category_id],
+        uselist=False
+    )
+
+    def __repr__(self):
+        return f"CategoryBudget of {self.expense_category_id} | ID: {self.id}"
+
+
+Index(
+    'uq_category_budget_expense_category_period',
+    CategoryBudget.expense_category_id,
+    CategoryBudget.period,
+    unique=True
+)
+
+
+class BudgetPeriodSpend(BaseModel):
+    __tablename__ = 'budget_period_spend'
+    __tableargs__ = {
+        'comment': "Table of spend counters of budgets by period"
+    }
+
+    budget_id = Column(
+        Integer,
+        ForeignKey('category_budget.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    period_start = Column(TIMESTAMP, nullable=False)
+    spent = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"BudgetPeriodSpend of {self.budget_id} | {self.period_start}: {self.spent}"
+
+
+Index(
+    'uq_budget_period_spend_budget_period_start',
+    BudgetPeriodSpend.budget_id,
+    BudgetPeriodSpend.period_start,
+    unique=True
+)
+
+
+class FinancialPeriodSnapshot(BaseModel):
+    __tablename__ = 'financial_period_snapshot'
+    __tableargs__ = {
+        'comment': "Table of frozen totals of closed months of finance business"
+    }
+
+    financial_business_id = Column(
+        Integer,
+        ForeignKey('financial_business.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    period_start = Column(TIMESTAMP, nullable=False)
+    period_end = Column(TIMESTAMP, nullable=False)
+    opening_balance = Column(Float, nullable=False, default=0)
+    closing_balance = Column(Float, nullable=False, default=0)
+    accruals = Column(Float, nullable=False, default=0)
+    expenses = Column(Float, nullable=False, default=0)
+    category_totals = Column(JSONB, nullable=False, default=list)
+    tag_totals = Column(JSONB, nullable=False, default=list)
+
+    def __repr__(self):
+        return f"FinancialPeriodSnapshot of {self.financial_business_id} | {self.period_start}"
+
+
+Index(
+    'uq_financial_period_snapshot_business_period_start',
+    FinancialPeriodSnapshot.financial_business_id,
+    FinancialPeriodSnapshot.period_start,
+    unique=True
+)
@@ -3,15 +3,30 @@ from services.finance.schema import (
     CreateMoneyMovementInputData, CreateMoneyMovementNode,
     CreateFinancialTagInputData, CreateFinancialTagNode,
     UpdateFinancialTagInputData, UpdateFinancialTagNode,
-    DeleteFinancialTagInputData, DeleteFinancialTagNode
+    DeleteFinancialTagInputData, DeleteFinancialTagNode,
+    CreateTransactionExportInputData, CreateTransactionExportNode,
+    ResumeTransactionExportInputData, ResumeTransactionExportNode,
+    CreateCategoryBudgetInputData, CreateCategoryBudgetNode,
+    UpdateCategoryBudgetInputData, UpdateCategoryBudgetNode,
+    DeleteCategoryBudgetInputData, DeleteCategoryBudgetNode,
+    CloseFinancialPeriodInputData, CloseFinancialPeriodNode
 )
 from services.finance.resolvers import (
     create_money_movement_resolver,
+    create_money_movement_replay,
     create_financial_tag_resolver,
     update_financial_tag_resolver,
-    delete_financial_tag_resolver
+    delete_financial_tag_resolver,
+    create_transaction_export_resolver,
+    resume_transaction_export_resolver,
+    create_category_budget_resolver,
+    update_category_budget_resolver,
+    delete_category_budget_resolver,
+    close_financial_period_resolver
 )
+from services.idempotency import run_idempotent
 from strawberry.types import Info
+from typing import Optional
 import strawberry
 
 
@@ -19,9 +34,14 @@ import strawberry
 class Mutation:
     @AuthenticationRequiredField()
     async def create_money_movement(
-            self, info: Info, input_data: CreateMoneyMovementInputData
+            self, info: Info, input_data: CreateMoneyMovementInputData,
+            idempotency_key: Optional[str] = None
     ) -> CreateMoneyMovementNode:
-        return await create_money_movement_resolver(info=info, input_data=input_data)
+        return await run_idempotent(
+            info=info, operation='create_money_movement', key=idempotency_key,
+            execute=lambda: create_money_movement_resolver(info=info, input_data=input_data),
+            replay=create_money_movement_replay
+        )
 
     @AuthenticationRequiredField()
     async def create_financial_tag(
@@ -40,3 +60,39 @@ class Mutation:
             self, info: Info, input_data: DeleteFinancialTagInputData
     ) -> DeleteFinancialTagNode:
         return await delete_financial_tag_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def create_transaction_export(
+            self, info: Info, input_data: CreateTransactionExportInputData
+    ) -> CreateTransactionExportNode:
+        return await create_transaction_export_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def resume_transaction_export(
+            self, info: Info, input_data: ResumeTransactionExportInputData
+    ) -> ResumeTransactionExportNode:
+        return await resume_transaction_export_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def create_category_budget(
+            self, info: Info, input_data: CreateCategoryBudgetInputData
+    ) -> CreateCategoryBudgetNode:
+        return await create_category_budget_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def update_category_budget(
+            self, info: Info, input_data: UpdateCategoryBudgetInputData
+    ) -> UpdateCategoryBudgetNode:
+        return await update_category_budget_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def delete_category_budget(
+            self, info: Info, input_data: DeleteCategoryBudgetInputData
+    ) -> DeleteCategoryBudgetNode:
+        return await delete_category_budget_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def close_financial_period(
+            self, info: Info, input_data: CloseFinancialPeriodInputData
+    ) -> CloseFinancialPeriodNode:
+        return await close_financial_period_resolver(info=info, input_data=input_data)
@@ -0,0 +1,180 @@
+from services.database import AsyncSessionLocal
+from services.config import get_settings
+from sqlalchemy import text
+from sqlalchemy.orm import scoped_session
+from datetime import datetime
+from typing import List, Optional, Set
+import asyncio
+import logging
+
+PARENT_TABLE = 'financial_transaction'
+ARCHIVE_SCHEMA = 'finance_archive'
+# Any constant shared by the workers, only one of them manages partitions at a time
+PARTITION_LOCK_KEY = 726481
+
+partition_manager_task: Optional[asyncio.Task] = None
+# Partitions of the parent table seen by this worker, they are never dropped, only archived
+known_partitions: Set[str] = set()
+
+
+def add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def get_partition_name(month_start: datetime) -> str:
+    return f"{PARENT_TABLE}_y{month_start.year:04d}m{month_start.month:02d}"
+
+
+def get_partition_month(partition_name: str) -> Optional[datetime]:
+    suffix = partition_name[len(PARENT_TABLE) + 1:]
+    try:
+        return datetime(int(suffix[1:5]), int(suffix[6:8]), 1)
+    except ValueError:
+        return None
+
+
+def get_create_partition_sql(month_start: datetime) -> str:
+    """
+    Shared with the migration that partitions the table
+    """
+    return (
+        f"CREATE TABLE IF NOT EXISTS {get_partition_name(month_start)} "
+        f"PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{add_months(month_start, 1).isoformat()}')"
+    )
+
+
+async def get_partitions(db: scoped_session) -> List[str]:
+    statement = text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :parent ORDER BY child.relname"
+    )
+    result = await db.execute(statement, {'parent': PARENT_TABLE})
+    return [row[0] for row in result.fetchall()]
+
+
+async def create_future_partitions(db: scoped_session, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+    now = now or datetime.now()
+    current_month = datetime(now.year, now.month, 1)
+    existing = set(await get_partitions(db=db))
+
+    created = list()
+    for months in range(months_ahead + 1):
+        month_start = add_months(current_month, months)
+        if get_partition_name(month_start) not in existing:
+            await db.execute(text(get_create_partition_sql(month_start)))
+            created.append(get_partition_name(month_start))
+
+    return created
+
+
+def is_archived_month(moment: datetime, retention_months: int, now: Optional[datetime] = None) -> bool:
+    if retention_months <= 0:
+        return False
+    now = now or datetime.now()
+    return datetime(moment.year, moment.month, 1) < add_months(datetime(now.year, now.month, 1), -retention_months)
+
+
+async def ensure_transaction_partition(moment: datetime) -> bool:
+    """
+    Create the partition of the month of `moment` when it is missing, in its own
+    transaction so it does not wait for the partition manager. Backdated and far
+    planned transactions have no partition otherwise.
+    False when the partition could not be created in `transaction_partitions_lock_timeout`
+    """
+    month_start = datetime(moment.year, moment.month, 1)
+    partition_name = get_partition_name(month_start)
+    if partition_name in known_partitions:
+        return True
+
+    settings = get_settings()
+    db = AsyncSessionLocal()
+    try:
+        await db.execute(text(f"SET LOCAL lock_timeout = '{settings.transaction_partitions_lock_timeout}'"))
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': PARTITION_LOCK_KEY})
+        partitions = set(await get_partitions(db=db))
+        if partition_name not in partitions:
+            await db.execute(text(get_create_partition_sql(month_start)))
+            logging.warning(f"Partition {partition_name} of {PARENT_TABLE} is created on demand")
+        await db.commit()
+    except Exception as e:
+        logging.warning(f"Partition {partition_name} of {PARENT_TABLE} is not created: {e}")
+        await db.rollback()
+        return False
+    finally:
+        await db.close()
+
+    known_partitions.update(partitions | {partition_name})
+    return True
+
+
+async def archive_old_partitions(db: scoped_session, retention_months: int, now: Optional[datetime] = None) -> List[str]:
+    """
+    Detach partitions older than `retention_months` and move them to the archive schema,
+    rows of archived months are still available with a direct query to the archived table
+    """
+    if retention_months <= 0:
+        return list()
+
+    now = now or datetime.now()
+    oldest_month = add_months(datetime(now.year, now.month, 1), -retention_months)
+    archived = list()
+    await db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+    for partition_name in await get_partitions(db=db):
+        month_start = get_partition_month(partition_name)
+        if month_start is None or month_start >= oldest_month:
+            continue
+
+        await db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition_name}"))
+        await db.execute(text(f"ALTER TABLE {partition_name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        archived.append(partition_name)
+
+    return archived
+
+
+async def manage_transaction_partitions() -> None:
+    settings = get_settings()
+    db = AsyncSessionLocal()
+    try:
+        locked = (
+            await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': PARTITION_LOCK_KEY})
+        ).scalar()
+        if not locked:
+            await db.rollback()
+            return
+
+        created = await create_future_partitions(db=db, months_ahead=settings.transaction_partitions_ahead_months)
+        archived = await archive_old_partitions(db=db, retention_months=settings.transaction_partitions_retention_months)
+        await db.commit()
+        if created or archived:
+            logging.warning(f"Partitions of {PARENT_TABLE}: created {created}, archived {archived}")
+    except Exception as e:
+        logging.warning(f"Partition manager failed: {e}")
+        await db.rollback()
+    finally:
+        await db.close()
+
+
+async def run_partition_manager() -> None:
+    settings = get_settings()
+    while True:
+        await manage_transaction_partitions()
+        await asyncio.sleep(settings.transaction_partitions_check_seconds)
+
+
+async def start_partition_manager() -> None:
+    global partition_manager_task
+    if partition_manager_task is None or partition_manager_task.done():
+        partition_manager_task = asyncio.create_task(run_partition_manager())
+
+
+async def stop_partition_manager() -> None:
+    if partition_manager_task is not None:
+        partition_manager_task.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(manage_transaction_partitions())
@@ -0,0 +1,317 @@
+from services.finance.models import (
+    FinancialBusiness,
+    FinancialTransaction,
+    FinancialPeriodSnapshot,
+    TransactionTag
+)
+from services.finance.enums import BudgetPeriod, TransactionType
+from services.finance.budgets import get_period_start, get_period_end
+from sqlalchemy import select, update, join, case, func, and_
+from sqlalchemy.orm import scoped_session
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+
+class CategoryTotal(NamedTuple):
+    category_id: int
+    transaction_type: TransactionType
+    total: float
+
+
+class TagTotal(NamedTuple):
+    tag_id: int
+    accruals: float
+    expenses: float
+
+
+class PeriodTotals(NamedTuple):
+    period_start: datetime
+    period_end: datetime
+    closed: bool
+    opening_balance: float
+    closing_balance: float
+    accruals: float
+    expenses: float
+    category_totals: List[CategoryTotal]
+    tag_totals: List[TagTotal]
+
+
+def get_month_start(moment: datetime) -> datetime:
+    return get_period_start(period=BudgetPeriod.MONTH, moment=moment)
+
+
+def get_next_month(month_start: datetime) -> datetime:
+    return get_period_end(period=BudgetPeriod.MONTH, period_start=month_start)
+
+
+def signed_amount():
+    return case(
+        (FinancialTransaction.transaction_type == TransactionType.EXPENSE, -FinancialTransaction.amount),
+        else_=FinancialTransaction.amount
+    )
+
+
+def transactions_between(financial_business_id: int, date_from: Optional[datetime], date_to: datetime):
+    condition = and_(
+        FinancialTransaction.financial_business_id == financial_business_id,
+        FinancialTransaction.date < date_to
+    )
+    if date_from is not None:
+        condition = and_(condition, FinancialTransaction.date >= date_from)
+    return condition
+
+
+async def get_closed_until(db: scoped_session, financial_business_id: int, for_update: bool = False) -> Optional[datetime]:
+    statement = select(FinancialBusiness.closed_until).where(FinancialBusiness.id == financial_business_id)
+    if for_update:
+        statement = statement.with_for_update()
+    return (await db.execute(statement)).scalars().first()
+
+
+async def get_opening_balance(
+        db: scoped_session, financial_business_id: int,
+        moment: datetime, closed_until: Optional[datetime]
+) -> float:
+    """
+    Balance before `moment`: closing balance of the last closed month plus
+    the transactions of open months before `moment`
+    """
+    balance = 0.0
+    since = None
+    if closed_until is not None and closed_until <= moment:
+        statement = select(FinancialPeriodSnapshot.closing_balance).where(
+            and_(
+                FinancialPeriodSnapshot.financial_business_id == financial_business_id,
+                FinancialPeriodSnapshot.period_end == closed_until
+            )
+        )
+        balance = (await db.execute(statement)).scalars().first() or 0.0
+        since = closed_until
+
+    if since is None or since < moment:
+        statement = select(func.coalesce(func.sum(signed_amount()), 0)).where(
+            transactions_between(financial_business_id=financial_business_id, date_from=since, date_to=moment)
+        )
+        balance += (await db.execute(statement)).scalars().one()
+
+    return balance
+
+
+async def aggregate_months(
+        db: scoped_session, financial_business_id: int,
+        date_from: datetime, date_to: datetime, opening_balance: float
+) -> List[PeriodTotals]:
+    """
+    Totals of every month from `date_from` to `date_to` computed from transactions,
+    two grouped scans of the index range of the account
+    """
+    month = func.date_trunc('month', FinancialTransaction.date)
+    condition = transactions_between(
+        financial_business_id=financial_business_id, date_from=date_from, date_to=date_to
+    )
+
+    statement = (
+        select(
+            month,
+            FinancialTransaction.transaction_type,
+            func.coalesce(FinancialTransaction.expense_category_id, FinancialTransaction.accrual_category_id),
+            func.sum(FinancialTransaction.amount)
+        )
+        .where(condition)
+        .group_by(
+            month,
+            FinancialTransaction.transaction_type,
+            FinancialTransaction.expense_category_id,
+            FinancialTransaction.accrual_category_id
+        )
+    )
+    categories: Dict[datetime, List[CategoryTotal]] = defaultdict(list)
+    for period_start, transaction_type, category_id, total in (await db.execute(statement)).fetchall():
+        categories[period_start].append(
+            CategoryTotal(category_id=category_id, transaction_type=transaction_type, total=total)
+        )
+
+    statement = (
+        select(
+            month,
+            TransactionTag.tag_id,
+            func.sum(case((FinancialTransaction.transaction_type == TransactionType.ACCRUAL, FinancialTransaction.amount), else_=0)),
+            func.sum(case((FinancialTransaction.transaction_type == TransactionType.EXPENSE, FinancialTransaction.amount), else_=0))
+        )
+        .select_from(
+            join(
+                FinancialTransaction, TransactionTag,
+                and_(
+                    TransactionTag.transaction_hash_id == FinancialTransaction.hash_id,
+                    TransactionTag.transaction_date == FinancialTransaction.date
+                )
+            )
+        )
+        .where(condition)
+        .group_by(month, TransactionTag.tag_id)
+    )
+    tags: Dict[datetime, List[TagTotal]] = defaultdict(list)
+    for period_start, tag_id, accruals, expenses in (await db.execute(statement)).fetchall():
+        tags[period_start].append(TagTotal(tag_id=tag_id, accruals=accruals, expenses=expenses))
+
+    periods = list()
+    period_start = date_from
+    balance = opening_balance
+    while period_start < date_to:
+        period_end = get_next_month(period_start)
+        category_totals = categories.get(period_start, list())
+        accruals = sum(item.total for item in category_totals if item.transaction_type is TransactionType.ACCRUAL)
+        expenses = sum(item.total for item in category_totals if item.transaction_type is TransactionType.EXPENSE)
+        periods.append(
+            PeriodTotals(
+                period_start=period_start,
+                period_end=period_end,
+                closed=False,
+                opening_balance=balance,
+                closing_balance=balance + accruals - expenses,
+                accruals=accruals,
+                expenses=expenses,
+                category_totals=category_totals,
+                tag_totals=tags.get(period_start, list())
+            )
+        )
+        balance += accruals - expenses
+        period_start = period_end
+
+    return periods
+
+
+def snapshot_to_totals(snapshot: FinancialPeriodSnapshot) -> PeriodTotals:
+    return PeriodTotals(
+        period_start=snapshot.period_start,
+        period_end=snapshot.period_end,
+        closed=True,
+        opening_balance=snapshot.opening_balance,
+        closing_balance=snapshot.closing_balance,
+        accruals=snapshot.accruals,
+        expenses=snapshot.expenses,
+        category_totals=[
+            CategoryTotal(
+                category_id=item['category_id'],
+                transaction_type=TransactionType(item['transaction_type']),
+                total=item['total']
+            )
+            for item in snapshot.category_totals
+        ],
+        tag_totals=[TagTotal(**item) for item in snapshot.tag_totals]
+    )
+
+
+async def close_financial_periods(
+        db: scoped_session, financial_business_id: int, until: datetime
+) -> List[FinancialPeriodSnapshot]:
+    """
+    Freeze every open month before `until`.
+
+    The row of the account is locked, so concurrent closes are serialized,
+    and `closed_until` is moved in the same transaction as the snapshots are written.
+    An account closed for the first time gets snapshots from its first transaction,
+    at least the snapshot of the last month, empty without transactions
+    """
+    closed_until = await get_closed_until(db=db, financial_business_id=financial_business_id, for_update=True)
+    date_from = closed_until
+    if date_from is None:
+        statement = select(func.min(FinancialTransaction.date)).where(
+            FinancialTransaction.financial_business_id == financial_business_id
+        )
+        first_date = (await db.execute(statement)).scalars().one()
+        last_month = get_month_start(until - timedelta(days=1))
+        date_from = min(get_month_start(first_date), last_month) if first_date else last_month
+
+    if date_from >= until:
+        return list()
+
+    opening_balance = (
+        await get_opening_balance(
+            db=db, financial_business_id=financial_business_id,
+            moment=date_from, closed_until=closed_until
+        )
+    )
+    periods = (
+        await aggregate_months(
+            db=db, financial_business_id=financial_business_id,
+            date_from=date_from, date_to=until, opening_balance=opening_balance
+        )
+    )
+
+    snapshots = [
+        FinancialPeriodSnapshot(
+            financial_business_id=financial_business_id,
+            period_start=period.period_start,
+            period_end=period.period_end,
+            opening_balance=period.opening_balance,
+            closing_balance=period.closing_balance,
+            accruals=period.accruals,
+            expenses=period.expenses,
+            category_totals=[
+                {
+                    'category_id': item.category_id,
+                    'transaction_type': item.transaction_type.value,
+                    'total': item.total
+                }
+                for item in period.category_totals
+            ],
+            tag_totals=[item._asdict() for item in period.tag_totals]
+        )
+        for period in periods
+    ]
+    db.add_all(snapshots)
+    await db.execute(
+        update(FinancialBusiness)
+        .where(FinancialBusiness.id == financial_business_id)
+        .values(closed_until=until)
+    )
+    return snapshots
+
+
+async def get_financial_report(
+        db: scoped_session, financial_business_id: int,
+        date_from: datetime, date_to: datetime
+) -> List[PeriodTotals]:
+    """
+    Monthly totals from the month of `date_from` to the month of `date_to`:
+    closed months are read from snapshots, only open months are aggregated
+    """
+    date_from = get_month_start(date_from)
+    date_to = get_next_month(get_month_start(date_to))
+    closed_until = await get_closed_until(db=db, financial_business_id=financial_business_id)
+
+    periods = list()
+    live_from = date_from
+    if closed_until is not None and closed_until > date_from:
+        statement = (
+            select(FinancialPeriodSnapshot)
+            .where(
+                and_(
+                    FinancialPeriodSnapshot.financial_business_id == financial_business_id,
+                    FinancialPeriodSnapshot.period_start >= date_from,
+                    FinancialPeriodSnapshot.period_start < date_to
+                )
+            )
+            .order_by(FinancialPeriodSnapshot.period_start)
+        )
+        snapshots = (await db.execute(statement)).scalars().all()
+        periods.extend(snapshot_to_totals(snapshot) for snapshot in snapshots)
+        live_from = closed_until
+
+    if live_from < date_to:
+        opening_balance = (
+            await get_opening_balance(
+                db=db, financial_business_id=financial_business_id,
+                moment=live_from, closed_until=closed_until
+            )
+        )
+        periods.extend(
+            await aggregate_months(
+                db=db, financial_business_id=financial_business_id,
+                date_from=live_from, date_to=date_to, opening_balance=opening_balance
+            )
+        )
+
+    return periods
@@ -3,11 +3,17 @@ import strawberry
 from strawberry.types import Info
 from services.finance.schema import (
     GetHistoryTransactionsInputData, HistoryTransactionsNode,
-    GetFinancialTagsInputData, FinancialTagsNode
+    GetFinancialTagsInputData, FinancialTagsNode,
+    GetFinanceAnalyticsInputData, FinanceAnalyticsNode,
+    GetBudgetStatusesInputData, BudgetStatusesNode,
+    GetFinancialReportInputData, FinancialReportNode
 )
 from services.finance.resolvers import (
     get_history_transactions_resolver,
-    get_financial_tags_resolver
+    get_financial_tags_resolver,
+    get_finance_analytics_resolver,
+    get_budget_statuses_resolver,
+    get_financial_report_resolver
 )
 
 
@@ -24,3 +30,21 @@ class Query:
             self, info: Info, input_data: GetFinancialTagsInputData
     ) -> FinancialTagsNode:
         return await get_financial_tags_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_finance_analytics(
+            self, info: Info, input_data: GetFinanceAnalyticsInputData
+    ) -> FinanceAnalyticsNode:
+        return await get_finance_analytics_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_budget_statuses(
+            self, info: Info, input_data: GetBudgetStatusesInputData
+    ) -> BudgetStatusesNode:
+        return await get_budget_statuses_resolver(info=info, input_data=input_data)
+
+    @AuthenticationRequiredField()
+    async def get_financial_report(
+            self, info: Info, input_data: GetFinancialReportInputData
+    ) -> FinancialReportNode:
+        return await get_financial_report_resolver(info=info, input_data=input_data)
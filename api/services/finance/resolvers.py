@@ -11,36 +11,83 @@ from services.finance.schema import (
     UpdateFinancialTagInputData, UpdateFinancialTagNode, UpdateFinancialTagErrorNode,
     DeleteFinancialTagInputData, DeleteFinancialTagNode, DeleteFinancialTagErrorNode,
     GetHistoryTransactionsInputData, HistoryTransactionsNode,
-    GetFinancialTagsInputData, FinancialTagsNode
-)
-from services.business.work_with_db import (
-    check_user_that_he_is_owner,
+    GetFinancialTagsInputData, FinancialTagsNode,
+    GetFinanceAnalyticsInputData, FinanceAnalyticsNode, FinanceAnalyticsErrorNode,
+    CreateTransactionExportInputData, CreateTransactionExportNode, CreateTransactionExportErrorNode,
+    ResumeTransactionExportInputData, ResumeTransactionExportNode, ResumeTransactionExportErrorNode,
+    CreateCategoryBudgetInputData, CreateCategoryBudgetNode, CreateCategoryBudgetErrorNode,
+    UpdateCategoryBudgetInputData, UpdateCategoryBudgetNode, UpdateCategoryBudgetErrorNode,
+    DeleteCategoryBudgetInputData, DeleteCategoryBudgetNode, DeleteCategoryBudgetErrorNode,
+    GetBudgetStatusesInputData, BudgetStatusesNode,
+    CloseFinancialPeriodInputData, CloseFinancialPeriodNode, CloseFinancialPeriodErrorNode,
+    GetFinancialReportInputData, FinancialReportNode, FinancialReportErrorNode
 )
+from services.business.permissions import check_user_permission
+from services.business.enums import PermissionResource, PermissionAction
 from services.finance.work_with_db import (
     check_belongs_to_user_tag,
     get_related_transactions,
-    get_tags_of_business
+    get_tags_of_business,
+    check_expense_category_of_business,
+    check_budget_exists,
+    check_hash_id_exists
 )
 from services.finance.models import (
-    FinancialTransaction, TransactionTag, FinancialTag
+    FinancialTransaction, TransactionTag, FinancialTag, CategoryBudget
+)
+from services.finance.enums import ExportCompression, TransactionType
+from services.finance.export import (
+    run_transaction_export_job,
+    export_is_available
+)
+from services.finance.analytics import (
+    get_finance_analytics,
+    invalidate_finance_analytics,
+    analytics_is_available
+)
+from services.finance.budgets import (
+    record_budget_spend,
+    publish_budget_alerts,
+    seed_budget_spend,
+    get_budget_statuses
+)
+from services.finance.periods import (
+    get_closed_until,
+    get_month_start,
+    get_next_month,
+    close_financial_periods,
+    get_financial_report,
+    snapshot_to_totals
 )
+from services.finance.partitions import ensure_transaction_partition, is_archived_month
+from services.idempotency import ReplayNode
+from services.config import get_settings
+from services.jobs.models import BackgroundJob
+from services.jobs.enums import JobKind, JobStatus
+from services.jobs.work_with_db import get_job_of_user
+from services.jobs.runner import start_job
+from datetime import datetime
 import secrets
 
 
-async def get_hash_id_for_transaction(db) -> str:
+async def get_hash_id_for_transaction(db, date: datetime) -> str:
     hash_id = secrets.token_hex(nbytes=20)
-    while (
-            await get_objects_by_field(
-                db=db, model=FinancialTransaction,
-                field=FinancialTransaction.hash_id,
-                value=hash_id
-            )
-    ):
+    while await check_hash_id_exists(db=db, hash_id=hash_id, date=date):
         hash_id = secrets.token_hex(nbytes=20)
 
     return hash_id
 
 
+create_money_movement_replay = ReplayNode(
+    node=CreateMoneyMovementNode,
+    flag='created',
+    field='transaction',
+    model=FinancialTransaction,
+    error=CreateMoneyMovementErrorNode,
+    error_code=CreateMoneyMovementErrorNode.CreateMoneyMovementErrorCode
+)
+
+
 async def create_money_movement_resolver(
         info: Info, input_data: CreateMoneyMovementInputData
 ) -> CreateMoneyMovementNode:
@@ -54,18 +101,38 @@ async def create_money_movement_resolver(
         True if instance.expense_category_id or instance.accrual_category_id else False
     )
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.CREATE,
             financial_business_id=instance.financial_business_id
         )
     )
 
-    if necessary_points_exists and user_is_owner_business:
-        hash_id = await get_hash_id_for_transaction(db=context.db)
+    closed_until = (
+        await get_closed_until(
+            db=context.db,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+    period_is_open = closed_until is None or instance.date >= closed_until
+    period_is_archived = (
+        is_archived_month(
+            moment=instance.date,
+            retention_months=get_settings().transaction_partitions_retention_months
+        )
+    )
+    partition_is_ready = (
+        necessary_points_exists and user_is_owner_business and period_is_open and not period_is_archived
+        and await ensure_transaction_partition(moment=instance.date)
+    )
+
+    if partition_is_ready:
+        hash_id = await get_hash_id_for_transaction(db=context.db, date=instance.date)
         new_transaction = FinancialTransaction(
             financial_business_id=instance.financial_business_id,
-            hash_id=hash_id
+            hash_id=hash_id,
+            date=instance.date
         )
         context.db.add(new_transaction)
         await context.db.commit()
@@ -74,6 +141,7 @@ async def create_money_movement_resolver(
             for tag_id in instance.tags:
                 new_transaction_tag = TransactionTag(
                     transaction_hash_id=hash_id,
+                    transaction_date=instance.date,
                     tag_id=tag_id
                 )
                 context.db.add(new_transaction_tag)
@@ -86,7 +154,22 @@ async def create_money_movement_resolver(
                 exclude={'financial_business_id', 'tags'}
             )
         )
+
+        budget_alerts = list()
+        if instance.transaction_type is TransactionType.EXPENSE and instance.expense_category_id:
+            budget_alerts = (
+                await record_budget_spend(
+                    db=context.db,
+                    financial_business_id=instance.financial_business_id,
+                    expense_category_id=instance.expense_category_id,
+                    amount=instance.amount,
+                    moment=instance.date
+                )
+            )
+
         await context.db.commit()
+        invalidate_finance_analytics(financial_business_id=instance.financial_business_id)
+        publish_budget_alerts(alerts=budget_alerts)
 
         transaction = (
             await get_object_by_id(
@@ -108,6 +191,24 @@ async def create_money_movement_resolver(
             messsage="User is not owner business"
         )
 
+    elif not period_is_open:
+        error = CreateMoneyMovementErrorNode(
+            code=CreateMoneyMovementErrorNode.CreateMoneyMovementErrorCode.PERIOD_IS_CLOSED,
+            message="Period of the transaction is closed"
+        )
+
+    elif period_is_archived:
+        error = CreateMoneyMovementErrorNode(
+            code=CreateMoneyMovementErrorNode.CreateMoneyMovementErrorCode.PERIOD_IS_ARCHIVED,
+            message="Transactions of the period are archived"
+        )
+
+    else:
+        error = CreateMoneyMovementErrorNode(
+            code=CreateMoneyMovementErrorNode.CreateMoneyMovementErrorCode.NOT_CREATED,
+            message="Transaction is not created, try again later"
+        )
+
     return CreateMoneyMovementNode(created=created, transaction=transaction, error=error)
 
 
@@ -121,9 +222,10 @@ async def create_financial_tag_resolver(
     error = None
 
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.CREATE,
             financial_business_id=instance.financial_business_id
         )
     )
@@ -250,9 +352,10 @@ async def get_history_transactions_resolver(
     related_transactions = list()
 
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
             financial_business_id=instance.financial_business_id
         )
     )
@@ -277,9 +380,10 @@ async def get_financial_tags_resolver(
     related_tags = list()
 
     user_is_owner_business = (
-        await check_user_that_he_is_owner(
+        await check_user_permission(
             db=context.db,
             user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
             financial_business_id=instance.financial_business_id
         )
     )
@@ -293,3 +397,466 @@ async def get_financial_tags_resolver(
         )
 
     return FinancialTagsNode(tags=related_tags)
+
+
+async def create_transaction_export_resolver(
+        info: Info, input_data: CreateTransactionExportInputData
+) -> CreateTransactionExportNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    created = False
+    job = None
+    error = None
+    compression = instance.compression or ExportCompression.GZIP
+
+    user_is_owner_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+
+    format_is_available = export_is_available(file_format=instance.file_format, compression=compression)
+
+    if user_is_owner_business and format_is_available:
+        new_job = BackgroundJob(
+            user_id=context.user.id,
+            kind=JobKind.TRANSACTION_EXPORT,
+            parameters={
+                'financial_business_id': instance.financial_business_id,
+                'file_format': instance.file_format.value,
+                'compression': compression.value
+            },
+            # The default is the start of the worker, the job would look stale
+            created_at=datetime.now(),
+            updated_at=datetime.now()
+        )
+        context.db.add(new_job)
+        await context.db.commit()
+        start_job(job_id=new_job.id, handler=run_transaction_export_job)
+
+        job = new_job
+        created = True
+
+    elif not user_is_owner_business:
+        error = CreateTransactionExportErrorNode(
+            code=CreateTransactionExportErrorNode.CreateTransactionExportErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    elif not format_is_available:
+        error = CreateTransactionExportErrorNode(
+            code=CreateTransactionExportErrorNode.CreateTransactionExportErrorCode.FORMAT_IS_NOT_AVAILABLE,
+            message="Format or compression is not available on the server"
+        )
+
+    return CreateTransactionExportNode(created=created, job=job, error=error)
+
+
+async def resume_transaction_export_resolver(
+        info: Info, input_data: ResumeTransactionExportInputData
+) -> ResumeTransactionExportNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    resumed = False
+    job = None
+    error = None
+
+    job_of_user = (
+        await get_job_of_user(
+            db=context.db,
+            job_id=instance.job_id,
+            user_id=context.user.id,
+            kind=JobKind.TRANSACTION_EXPORT
+        )
+    )
+
+    if job_of_user and job_of_user.status is JobStatus.FAILED:
+        job_of_user.status = JobStatus.PENDING
+        # Not stale for the job watchers until the job is started
+        job_of_user.updated_at = datetime.now()
+        await context.db.commit()
+        start_job(job_id=job_of_user.id, handler=run_transaction_export_job)
+
+        job = job_of_user
+        resumed = True
+
+    elif not job_of_user:
+        error = ResumeTransactionExportErrorNode(
+            code=ResumeTransactionExportErrorNode.ResumeTransactionExportErrorCode.JOB_NOT_FOUND,
+            message="Job not found"
+        )
+
+    else:
+        error = ResumeTransactionExportErrorNode(
+            code=ResumeTransactionExportErrorNode.ResumeTransactionExportErrorCode.JOB_IS_NOT_FAILED,
+            message="Only failed job can be resumed"
+        )
+
+    return ResumeTransactionExportNode(resumed=resumed, job=job, error=error)
+
+
+async def get_finance_analytics_resolver(
+        info: Info, input_data: GetFinanceAnalyticsInputData
+) -> FinanceAnalyticsNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    analytics = None
+    error = None
+
+    user_is_owner_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+
+    if user_is_owner_business and analytics_is_available():
+        analytics = (
+            await get_finance_analytics(
+                db=context.db,
+                financial_business_id=instance.financial_business_id,
+                horizon=instance.horizon_days or 30
+            )
+        )
+
+    elif not user_is_owner_business:
+        error = FinanceAnalyticsErrorNode(
+            code=FinanceAnalyticsErrorNode.FinanceAnalyticsErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    else:
+        error = FinanceAnalyticsErrorNode(
+            code=FinanceAnalyticsErrorNode.FinanceAnalyticsErrorCode.ANALYTICS_IS_NOT_AVAILABLE,
+            message="Analytics is not available on the server"
+        )
+
+    if analytics is None:
+        return FinanceAnalyticsNode(
+            balance=None, forecast=None, weekday_profile=None,
+            category_trends=None, anomalies=None, error=error
+        )
+
+    return FinanceAnalyticsNode(
+        balance=analytics.balance,
+        forecast=analytics.forecast,
+        weekday_profile=analytics.weekday_profile,
+        category_trends=analytics.category_trends,
+        anomalies=analytics.anomalies,
+        error=error
+    )
+
+
+async def create_category_budget_resolver(
+        info: Info, input_data: CreateCategoryBudgetInputData
+) -> CreateCategoryBudgetNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    created = False
+    budget = None
+    error = None
+
+    user_is_owner_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.CREATE,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+    category_of_business = (
+        await check_expense_category_of_business(
+            db=context.db,
+            expense_category_id=instance.expense_category_id,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+    budget_exists = (
+        await check_budget_exists(
+            db=context.db,
+            expense_category_id=instance.expense_category_id,
+            period=instance.period
+        )
+    )
+
+    limit_is_positive = instance.limit_amount > 0
+
+    if user_is_owner_business and category_of_business and not budget_exists and limit_is_positive:
+        new_budget = CategoryBudget(
+            financial_business_id=instance.financial_business_id,
+            expense_category_id=instance.expense_category_id,
+            period=instance.period,
+            limit_amount=instance.limit_amount
+        )
+        context.db.add(new_budget)
+        await context.db.flush()
+        await seed_budget_spend(db=context.db, budget=new_budget)
+        await context.db.commit()
+
+        budget = new_budget
+        created = True
+
+    elif not user_is_owner_business:
+        error = CreateCategoryBudgetErrorNode(
+            code=CreateCategoryBudgetErrorNode.CreateCategoryBudgetErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    elif not category_of_business:
+        error = CreateCategoryBudgetErrorNode(
+            code=CreateCategoryBudgetErrorNode.CreateCategoryBudgetErrorCode.CATEGORY_NOT_FOUND,
+            message="Expense category not found in financial business"
+        )
+
+    elif budget_exists:
+        error = CreateCategoryBudgetErrorNode(
+            code=CreateCategoryBudgetErrorNode.CreateCategoryBudgetErrorCode.BUDGET_EXISTS,
+            message="Budget of category for the period exists"
+        )
+
+    elif not limit_is_positive:
+        error = CreateCategoryBudgetErrorNode(
+            code=CreateCategoryBudgetErrorNode.CreateCategoryBudgetErrorCode.LIMIT_IS_NOT_POSITIVE,
+            message="Limit of budget must be positive"
+        )
+
+    return CreateCategoryBudgetNode(created=created, budget=budget, error=error)
+
+
+async def update_category_budget_resolver(
+        info: Info, input_data: UpdateCategoryBudgetInputData
+) -> UpdateCategoryBudgetNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    updated = False
+    budget = None
+    error = None
+
+    budget_of_business = (
+        await get_object_by_id(
+            db=context.db,
+            model=CategoryBudget,
+            object_id=instance.budget_id
+        )
+    )
+    user_is_owner_business = budget_of_business is not None and (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.UPDATE,
+            financial_business_id=budget_of_business.financial_business_id
+        )
+    )
+
+    limit_is_positive = instance.limit_amount > 0
+
+    if user_is_owner_business and limit_is_positive:
+        budget_of_business.limit_amount = instance.limit_amount
+        await context.db.commit()
+
+        budget = budget_of_business
+        updated = True
+
+    elif budget_of_business is None:
+        error = UpdateCategoryBudgetErrorNode(
+            code=UpdateCategoryBudgetErrorNode.UpdateCategoryBudgetErrorCode.BUDGET_NOT_FOUND,
+            message="Budget not found"
+        )
+
+    elif not user_is_owner_business:
+        error = UpdateCategoryBudgetErrorNode(
+            code=UpdateCategoryBudgetErrorNode.UpdateCategoryBudgetErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    else:
+        error = UpdateCategoryBudgetErrorNode(
+            code=UpdateCategoryBudgetErrorNode.UpdateCategoryBudgetErrorCode.LIMIT_IS_NOT_POSITIVE,
+            message="Limit of budget must be positive"
+        )
+
+    return UpdateCategoryBudgetNode(updated=updated, budget=budget, error=error)
+
+
+async def delete_category_budget_resolver(
+        info: Info, input_data: DeleteCategoryBudgetInputData
+) -> DeleteCategoryBudgetNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    deleted = False
+    error = None
+
+    budget_of_business = (
+        await get_object_by_id(
+            db=context.db,
+            model=CategoryBudget,
+            object_id=instance.budget_id
+        )
+    )
+    user_is_owner_business = budget_of_business is not None and (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.DELETE,
+            financial_business_id=budget_of_business.financial_business_id
+        )
+    )
+
+    if user_is_owner_business:
+        deleted = (
+            await delete_from_database(
+                db=context.db, model=CategoryBudget,
+                object_id=instance.budget_id
+            )
+        )
+        await context.db.commit()
+
+    elif budget_of_business is None:
+        error = DeleteCategoryBudgetErrorNode(
+            code=DeleteCategoryBudgetErrorNode.DeleteCategoryBudgetErrorCode.BUDGET_NOT_FOUND,
+            message="Budget not found"
+        )
+
+    else:
+        error = DeleteCategoryBudgetErrorNode(
+            code=DeleteCategoryBudgetErrorNode.DeleteCategoryBudgetErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    return DeleteCategoryBudgetNode(deleted=deleted, error=error)
+
+
+async def get_budget_statuses_resolver(
+        info: Info, input_data: GetBudgetStatusesInputData
+) -> BudgetStatusesNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    budgets = list()
+
+    user_is_owner_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+
+    if user_is_owner_business:
+        budgets = (
+            await get_budget_statuses(
+                db=context.db,
+                financial_business_id=instance.financial_business_id
+            )
+        )
+
+    return BudgetStatusesNode(budgets=budgets)
+
+
+async def close_financial_period_resolver(
+        info: Info, input_data: CloseFinancialPeriodInputData
+) -> CloseFinancialPeriodNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    closed = False
+    periods = list()
+    error = None
+
+    user_is_owner_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.UPDATE,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+    until = get_next_month(get_month_start(datetime.combine(instance.month, datetime.min.time())))
+    period_is_finished = until <= get_month_start(datetime.now())
+    closed_until = (
+        await get_closed_until(
+            db=context.db,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+    period_is_open = closed_until is None or closed_until < until
+
+    if user_is_owner_business and period_is_finished and period_is_open:
+        snapshots = (
+            await close_financial_periods(
+                db=context.db,
+                financial_business_id=instance.financial_business_id,
+                until=until
+            )
+        )
+        await context.db.commit()
+
+        periods = [snapshot_to_totals(snapshot) for snapshot in snapshots]
+        closed = True
+
+    elif not user_is_owner_business:
+        error = CloseFinancialPeriodErrorNode(
+            code=CloseFinancialPeriodErrorNode.CloseFinancialPeriodErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    elif not period_is_finished:
+        error = CloseFinancialPeriodErrorNode(
+            code=CloseFinancialPeriodErrorNode.CloseFinancialPeriodErrorCode.PERIOD_IS_NOT_FINISHED,
+            message="Only finished months can be closed"
+        )
+
+    elif not period_is_open:
+        error = CloseFinancialPeriodErrorNode(
+            code=CloseFinancialPeriodErrorNode.CloseFinancialPeriodErrorCode.PERIOD_IS_CLOSED,
+            message="Month is already closed"
+        )
+
+    return CloseFinancialPeriodNode(closed=closed, periods=periods, error=error)
+
+
+async def get_financial_report_resolver(
+        info: Info, input_data: GetFinancialReportInputData
+) -> FinancialReportNode:
+    instance = input_data.to_pydantic()
+    context = info.context
+    periods = list()
+    error = None
+
+    user_is_owner_business = (
+        await check_user_permission(
+            db=context.db,
+            user_id=context.user.id,
+            resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+            financial_business_id=instance.financial_business_id
+        )
+    )
+    date_range_is_correct = instance.date_from <= instance.date_to
+
+    if user_is_owner_business and date_range_is_correct:
+        periods = (
+            await get_financial_report(
+                db=context.db,
+                financial_business_id=instance.financial_business_id,
+                date_from=datetime.combine(instance.date_from, datetime.min.time()),
+                date_to=datetime.combine(instance.date_to, datetime.min.time())
+            )
+        )
+
+    elif not user_is_owner_business:
+        error = FinancialReportErrorNode(
+            code=FinancialReportErrorNode.FinancialReportErrorCode.USER_IS_NOT_OWNER_BUSINESS,
+            message="User is not owner business"
+        )
+
+    else:
+        error = FinancialReportErrorNode(
+            code=FinancialReportErrorNode.FinancialReportErrorCode.WRONG_DATE_RANGE,
+            message="date_from must be before date_to"
+        )
+
+    return FinancialReportNode(periods=periods, error=error)
@@ -0,0 +1,116 @@
+from starlette.requests import Request
+from starlette.responses import Response, JSONResponse, StreamingResponse, FileResponse
+from services.authorization import authenticate_request
+from services.business.permissions import check_user_permission
+from services.business.enums import PermissionResource, PermissionAction
+from services.database import AsyncSessionLocal
+from services.config import get_settings
+from services.finance.enums import ExportFormat, ExportCompression
+from services.finance.export import (
+    stream_transaction_export,
+    get_export_next_cursor,
+    decode_export_cursor,
+    export_is_available,
+    FILE_EXTENSIONS,
+    MEDIA_TYPES
+)
+from services.jobs.work_with_db import get_job_of_user
+import os
+
+
+async def export_transactions_endpoint(request: Request) -> Response:
+    """
+    GET /finance/export?financial_business_id=1&file_format=csv&compression=gzip
+
+    Streams all transactions of the financial business.
+    Large accounts can be exported by parts with `limit`: the header
+    `X-Export-Next-Cursor` of the response is passed as `after` for the next part.
+    """
+    user = await authenticate_request(request=request)
+    if user is None:
+        return JSONResponse({'error': 'Token is invalid'}, status_code=401)
+
+    params = request.query_params
+    try:
+        financial_business_id = int(params['financial_business_id'])
+        file_format = ExportFormat(params.get('file_format', ExportFormat.CSV.value))
+        compression = ExportCompression(params.get('compression', ExportCompression.GZIP.value))
+        limit = int(params['limit']) if params.get('limit') else None
+        after = params.get('after') or None
+        if after:
+            decode_export_cursor(after)
+    except (KeyError, ValueError):
+        return JSONResponse({'error': 'Wrong parameters'}, status_code=400)
+
+    if not export_is_available(file_format=file_format, compression=compression):
+        return JSONResponse({'error': 'Format or compression is not available'}, status_code=400)
+
+    # The session is closed by the stream, until the response is returned it is closed here
+    db = AsyncSessionLocal()
+    try:
+        user_is_owner_business = (
+            await check_user_permission(
+                db=db,
+                user_id=user.id,
+                resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+                financial_business_id=financial_business_id
+            )
+        )
+        if not user_is_owner_business:
+            await db.close()
+            return JSONResponse({'error': 'User is not owner business'}, status_code=403)
+
+        file_name = f"transactions_{financial_business_id}.{FILE_EXTENSIONS[(file_format, compression)]}"
+        headers = {'Content-Disposition': f'attachment; filename="{file_name}"'}
+        if limit:
+            next_cursor = (
+                await get_export_next_cursor(
+                    db=db, financial_business_id=financial_business_id,
+                    after=after, limit=limit
+                )
+            )
+            if next_cursor:
+                headers['X-Export-Next-Cursor'] = next_cursor
+    except BaseException:
+        await db.close()
+        raise
+
+    async def content():
+        try:
+            async for chunk in stream_transaction_export(
+                    db=db, financial_business_id=financial_business_id,
+                    file_format=file_format, compression=compression,
+                    after=after, limit=limit
+            ):
+                if chunk:
+                    yield chunk
+        finally:
+            await db.close()
+
+    media_type = 'application/vnd.apache.parquet'
+    if file_format is ExportFormat.CSV:
+        media_type = MEDIA_TYPES[compression]
+
+    return StreamingResponse(content(), media_type=media_type, headers=headers)
+
+
+async def download_export_file_endpoint(request: Request) -> Response:
+    """
+    GET /finance/export/{job_id}/{file_name} - file of finished part of export job
+    """
+    user = await authenticate_request(request=request)
+    if user is None:
+        return JSONResponse({'error': 'Token is invalid'}, status_code=401)
+
+    settings = get_settings()
+    file_name = request.path_params['file_name']
+    db = AsyncSessionLocal()
+    try:
+        job = await get_job_of_user(db=db, job_id=request.path_params['job_id'], user_id=user.id)
+    finally:
+        await db.close()
+
+    if job is None or file_name not in job.result:
+        return JSONResponse({'error': 'File not found'}, status_code=404)
+
+    return FileResponse(os.path.join(settings.export_dir, file_name), filename=file_name)
@@ -3,9 +3,12 @@ from typing import Optional, List
 
 import strawberry
 from services.schema import ErrorNode
-from pydantic import BaseModel, constr
-from datetime import datetime
-from services.finance.enums import TransactionType, ColorActions
+from pydantic import BaseModel, constr, conint
+from datetime import datetime, date
+from services.finance.enums import (
+    TransactionType, ColorActions, ExportFormat, ExportCompression, BudgetPeriod, BudgetAlertLevel
+)
+from services.jobs.schema import JobNode
 
 
 @strawberry.type
@@ -55,6 +58,90 @@ class FinanceAccount:
     transactions: Optional[List[TransactionNode]]
 
 
+@strawberry.type
+class ForecastPointNode:
+    date: date
+    balance: float
+    lower: float
+    upper: float
+
+
+@strawberry.type
+class CategoryTrendNode:
+    category_id: int
+    monthly_totals: List[float]
+    moving_average: List[float]
+    slope: float
+
+
+@strawberry.type
+class SpendingAnomalyNode:
+    transaction_id: int
+    date: date
+    amount: float
+    category_id: int
+    z_score: float
+
+
+@strawberry.type
+class CategoryBudgetNode:
+    id: int
+    financial_business_id: int
+    expense_category_id: int
+    period: BudgetPeriod
+    limit_amount: float
+
+
+@strawberry.type
+class BudgetStatusNode:
+    budget_id: int
+    expense_category_id: int
+    period: BudgetPeriod
+    period_start: datetime
+    limit_amount: float
+    spent: float
+    level: Optional[BudgetAlertLevel]
+
+
+@strawberry.type
+class BudgetAlertNode:
+    budget_id: int
+    financial_business_id: int
+    expense_category_id: int
+    period: BudgetPeriod
+    period_start: datetime
+    level: BudgetAlertLevel
+    limit_amount: float
+    spent: float
+
+
+@strawberry.type
+class CategoryTotalNode:
+    category_id: Optional[int]
+    transaction_type: TransactionType
+    total: float
+
+
+@strawberry.type
+class TagTotalNode:
+    tag_id: int
+    accruals: float
+    expenses: float
+
+
+@strawberry.type
+class FinancialPeriodNode:
+    period_start: datetime
+    period_end: datetime
+    closed: bool
+    opening_balance: float
+    closing_balance: float
+    accruals: float
+    expenses: float
+    category_totals: List[CategoryTotalNode]
+    tag_totals: List[TagTotalNode]
+
+
 @strawberry.type
 class CreateMoneyMovementErrorNode(ErrorNode):
     @strawberry.enum
@@ -62,6 +149,9 @@ class CreateMoneyMovementErrorNode(ErrorNode):
         NOT_CREATED = 'not_created'
         EXPENSE_OR_ACCRUAL_IS_EMPTY = 'expense_or_accrual_is_empty'
         USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        PERIOD_IS_CLOSED = 'period_is_closed'
+        PERIOD_IS_ARCHIVED = 'period_is_archived'
+        IDEMPOTENCY_KEY_IS_TOO_LONG = 'idempotency_key_is_too_long'
 
     code: CreateMoneyMovementErrorCode
 
@@ -97,6 +187,90 @@ class DeleteFinancialTagErrorNode(ErrorNode):
     code: DeleteFinancialTagErrorCode
 
 
+@strawberry.type
+class CreateTransactionExportErrorNode(ErrorNode):
+    @strawberry.enum
+    class CreateTransactionExportErrorCode(enum.Enum):
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        FORMAT_IS_NOT_AVAILABLE = 'format_is_not_available'
+
+    code: CreateTransactionExportErrorCode
+
+
+@strawberry.type
+class ResumeTransactionExportErrorNode(ErrorNode):
+    @strawberry.enum
+    class ResumeTransactionExportErrorCode(enum.Enum):
+        JOB_NOT_FOUND = 'job_not_found'
+        JOB_IS_NOT_FAILED = 'job_is_not_failed'
+
+    code: ResumeTransactionExportErrorCode
+
+
+@strawberry.type
+class FinanceAnalyticsErrorNode(ErrorNode):
+    @strawberry.enum
+    class FinanceAnalyticsErrorCode(enum.Enum):
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        ANALYTICS_IS_NOT_AVAILABLE = 'analytics_is_not_available'
+
+    code: FinanceAnalyticsErrorCode
+
+
+@strawberry.type
+class CreateCategoryBudgetErrorNode(ErrorNode):
+    @strawberry.enum
+    class CreateCategoryBudgetErrorCode(enum.Enum):
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        CATEGORY_NOT_FOUND = 'category_not_found'
+        BUDGET_EXISTS = 'budget_exists'
+        LIMIT_IS_NOT_POSITIVE = 'limit_is_not_positive'
+
+    code: CreateCategoryBudgetErrorCode
+
+
+@strawberry.type
+class UpdateCategoryBudgetErrorNode(ErrorNode):
+    @strawberry.enum
+    class UpdateCategoryBudgetErrorCode(enum.Enum):
+        BUDGET_NOT_FOUND = 'budget_not_found'
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        LIMIT_IS_NOT_POSITIVE = 'limit_is_not_positive'
+
+    code: UpdateCategoryBudgetErrorCode
+
+
+@strawberry.type
+class DeleteCategoryBudgetErrorNode(ErrorNode):
+    @strawberry.enum
+    class DeleteCategoryBudgetErrorCode(enum.Enum):
+        BUDGET_NOT_FOUND = 'budget_not_found'
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+
+    code: DeleteCategoryBudgetErrorCode
+
+
+@strawberry.type
+class CloseFinancialPeriodErrorNode(ErrorNode):
+    @strawberry.enum
+    class CloseFinancialPeriodErrorCode(enum.Enum):
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        PERIOD_IS_NOT_FINISHED = 'period_is_not_finished'
+        PERIOD_IS_CLOSED = 'period_is_closed'
+
+    code: CloseFinancialPeriodErrorCode
+
+
+@strawberry.type
+class FinancialReportErrorNode(ErrorNode):
+    @strawberry.enum
+    class FinancialReportErrorCode(enum.Enum):
+        USER_IS_NOT_OWNER_BUSINESS = 'user_is_not_owner_business'
+        WRONG_DATE_RANGE = 'wrong_date_range'
+
+    code: FinancialReportErrorCode
+
+
 @strawberry.type
 class CreateMoneyMovementNode:
     created: bool
@@ -124,12 +298,74 @@ class DeleteFinancialTagNode:
     error: Optional[DeleteFinancialTagErrorNode]
 
 
+@strawberry.type
+class CreateTransactionExportNode:
+    created: bool
+    job: Optional[JobNode]
+    error: Optional[CreateTransactionExportErrorNode]
+
+
+@strawberry.type
+class ResumeTransactionExportNode:
+    resumed: bool
+    job: Optional[JobNode]
+    error: Optional[ResumeTransactionExportErrorNode]
+
+
 @strawberry.type
 class HistoryTransactionsNode:
     count: int
     transactions: List[Optional[TransactionNode]]
 
 
+@strawberry.type
+class FinanceAnalyticsNode:
+    balance: Optional[float]
+    forecast: Optional[List[ForecastPointNode]]
+    weekday_profile: Optional[List[float]]
+    category_trends: Optional[List[CategoryTrendNode]]
+    anomalies: Optional[List[SpendingAnomalyNode]]
+    error: Optional[FinanceAnalyticsErrorNode]
+
+
+@strawberry.type
+class CreateCategoryBudgetNode:
+    created: bool
+    budget: Optional[CategoryBudgetNode]
+    error: Optional[CreateCategoryBudgetErrorNode]
+
+
+@strawberry.type
+class UpdateCategoryBudgetNode:
+    updated: bool
+    budget: Optional[CategoryBudgetNode]
+    error: Optional[UpdateCategoryBudgetErrorNode]
+
+
+@strawberry.type
+class DeleteCategoryBudgetNode:
+    deleted: bool
+    error: Optional[DeleteCategoryBudgetErrorNode]
+
+
+@strawberry.type
+class BudgetStatusesNode:
+    budgets: List[BudgetStatusNode]
+
+
+@strawberry.type
+class CloseFinancialPeriodNode:
+    closed: bool
+    periods: List[FinancialPeriodNode]
+    error: Optional[CloseFinancialPeriodErrorNode]
+
+
+@strawberry.type
+class FinancialReportNode:
+    periods: List[FinancialPeriodNode]
+    error: Optional[FinancialReportErrorNode]
+
+
 @strawberry.type
 class FinancialTagsNode:
     tags: List[Optional[TagNode]]
@@ -169,6 +405,52 @@ class GetHistoryTransactionsData(BaseModel):
     marker_color: Optional[ColorActions]
 
 
+class CreateTransactionExportData(BaseModel):
+    financial_business_id: int
+    file_format: ExportFormat
+    compression: Optional[ExportCompression]
+
+
+class ResumeTransactionExportData(BaseModel):
+    job_id: int
+
+
+class GetFinanceAnalyticsData(BaseModel):
+    financial_business_id: int
+    horizon_days: Optional[conint(ge=1, le=365)]
+
+
+class CreateCategoryBudgetData(BaseModel):
+    financial_business_id: int
+    expense_category_id: int
+    period: BudgetPeriod
+    limit_amount: float
+
+
+class UpdateCategoryBudgetData(BaseModel):
+    budget_id: int
+    limit_amount: float
+
+
+class DeleteCategoryBudgetData(BaseModel):
+    budget_id: int
+
+
+class GetBudgetStatusesData(BaseModel):
+    financial_business_id: int
+
+
+class CloseFinancialPeriodData(BaseModel):
+    financial_business_id: int
+    month: date
+
+
+class GetFinancialReportData(BaseModel):
+    financial_business_id: int
+    date_from: date
+    date_to: date
+
+
 class GetFinancialTagsData(BaseModel):
     financial_business_id: Optional[int]
 
@@ -221,6 +503,79 @@ class GetHistoryTransactionsInputData:
     pass
 
 
+@strawberry.experimental.pydantic.input(model=CreateTransactionExportData, fields=[
+    "financial_business_id",
+    "file_format",
+    "compression"
+])
+class CreateTransactionExportInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=ResumeTransactionExportData, fields=[
+    "job_id"
+])
+class ResumeTransactionExportInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=GetFinanceAnalyticsData, fields=[
+    "financial_business_id",
+    "horizon_days"
+])
+class GetFinanceAnalyticsInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=CreateCategoryBudgetData, fields=[
+    "financial_business_id",
+    "expense_category_id",
+    "period",
+    "limit_amount"
+])
+class CreateCategoryBudgetInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=UpdateCategoryBudgetData, fields=[
+    "budget_id",
+    "limit_amount"
+])
+class UpdateCategoryBudgetInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=DeleteCategoryBudgetData, fields=[
+    "budget_id"
+])
+class DeleteCategoryBudgetInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=GetBudgetStatusesData, fields=[
+    "financial_business_id"
+])
+class GetBudgetStatusesInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=CloseFinancialPeriodData, fields=[
+    "financial_business_id",
+    "month"
+])
+class CloseFinancialPeriodInputData:
+    pass
+
+
+@strawberry.experimental.pydantic.input(model=GetFinancialReportData, fields=[
+    "financial_business_id",
+    "date_from",
+    "date_to"
+])
+class GetFinancialReportInputData:
+    pass
+
+
 @strawberry.experimental.pydantic.input(model=GetFinancialTagsData, fields=[
     "financial_business_id"
 ])
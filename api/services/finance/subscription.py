@@ -0,0 +1,37 @@
+from services.business.permissions import check_user_permission
+from services.business.enums import PermissionResource, PermissionAction
+from services.database import AsyncSessionLocal
+from services.finance.budgets import budget_alerts
+from services.finance.schema import BudgetAlertNode
+from strawberry.types import Info
+from typing import AsyncGenerator
+import strawberry
+
+
+@strawberry.type
+class Subscription:
+    @strawberry.subscription
+    async def budget_alerts(
+            self, info: Info, financial_business_id: int
+    ) -> AsyncGenerator[BudgetAlertNode, None]:
+        if not info.context.user:
+            raise ValueError(f"Token is invalid")
+
+        db = AsyncSessionLocal()
+        try:
+            user_is_owner_business = (
+                await check_user_permission(
+                    db=db,
+                    user_id=info.context.user.id,
+                    resource=PermissionResource.FINANCE, action=PermissionAction.READ,
+                    financial_business_id=financial_business_id
+                )
+            )
+        finally:
+            await db.close()
+
+        if not user_is_owner_business:
+            raise ValueError(f"User is not owner business")
+
+        async for alert in budget_alerts.subscribe(financial_business_id):
+            yield alert
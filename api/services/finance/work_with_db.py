@@ -1,10 +1,16 @@
 from services.finance.models import (
     FinancialTransaction,
-    FinancialTag
+    FinancialTag,
+    ExpenseCategories,
+    CategoryBudget
 )
+from services.finance.enums import BudgetPeriod
+from services.finance.partitions import add_months
+from services.config import get_settings
 from services.database import BaseModel
 from sqlalchemy import select, update, join, exists, and_
 from sqlalchemy.orm import scoped_session
+from datetime import datetime
 from typing import List, Optional, Any
 
 
@@ -23,23 +29,28 @@ async def check_belongs_to_user_tag(
 async def get_related_transactions(
         db: scoped_session, instance: Any
 ) -> Optional[List[FinancialTransaction]]:
+    """
+    Transactions are partitioned by month of `date`, so the range of dates
+    is always bounded: the last `history_transactions_default_months` months by default
+    """
+    settings = get_settings()
+    date_lte = instance.created_at_lte or datetime.now()
+    date_gte = instance.created_at_gte or add_months(
+        datetime(date_lte.year, date_lte.month, 1),
+        -settings.history_transactions_default_months
+    )
     statement = (
         select(FinancialTransaction)
         .where(
-            FinancialTransaction.id == instance.financial_business_id
+            and_(
+                FinancialTransaction.financial_business_id == instance.financial_business_id,
+                FinancialTransaction.date >= date_gte,
+                FinancialTransaction.date <= date_lte
+            )
         )
+        .order_by(FinancialTransaction.date.desc(), FinancialTransaction.id.desc())
     )
 
-    if instance.created_at_gte:
-        statement = statement.where(
-            FinancialTransaction.created_at >= instance.created_at_gte
-        )
-
-    if instance.created_at_lte:
-        statement = statement.where(
-            FinancialTransaction.created_at <= instance.created_at_lte
-        )
-
     if instance.amount_gte:
         statement = statement.where(
             FinancialTransaction.amount >= instance.amount_gte
@@ -47,21 +58,67 @@ async def get_related_transactions(
 
     if instance.amount_lte:
         statement = statement.where(
-            FinancialTransaction.amount <= instance.amount_gte
-        )
-
-    if instance.marker_color:
-        statement = statement.where(
-            FinancialTransaction.amount <= instance.amount_gte
+            FinancialTransaction.amount <= instance.amount_lte
         )
 
     result = (await db.execute(statement)).scalars().all()
     return result
 
 
+async def check_hash_id_exists(
+        db: scoped_session, hash_id: str, date: datetime
+) -> bool:
+    """
+    `hash_id` is unique together with `date`, the partition key
+    """
+    statement = (
+        exists(FinancialTransaction)
+        .where(
+            and_(
+                FinancialTransaction.hash_id == hash_id,
+                FinancialTransaction.date == date
+            )
+        )
+    ).select()
+    result = (await db.execute(statement)).scalars().one()
+    return result
+
+
 async def get_tags_of_business(
         db: scoped_session, financial_business_id: int
 ) -> Optional[List[FinancialTag]]:
     statement = select(FinancialTag).where(FinancialTag.financial_business_id == financial_business_id)
     result = (await db.execute(statement)).scalars().all()
     return result
+
+
+async def check_expense_category_of_business(
+        db: scoped_session, expense_category_id: int, financial_business_id: int
+) -> bool:
+    statement = (
+        exists(ExpenseCategories)
+        .where(
+            and_(
+                ExpenseCategories.id == expense_category_id,
+                ExpenseCategories.financial_business_id == financial_business_id
+            )
+        )
+    ).select()
+    result = (await db.execute(statement)).scalars().one()
+    return result
+
+
+async def check_budget_exists(
+        db: scoped_session, expense_category_id: int, period: BudgetPeriod
+) -> bool:
+    statement = (
+        exists(CategoryBudget)
+        .where(
+            and_(
+                CategoryBudget.expense_category_id == expense_category_id,
+                CategoryBudget.period == period
+            )
+        )
+    ).select()
+    result = (await db.execute(statement)).scalars().one()
+    return result
@@ -0,0 +1,192 @@
+from services.base.work_with_db import (
+    claim_idempotency_key,
+    get_idempotency_response,
+    store_idempotency_response,
+    release_idempotency_key
+)
+from services.work_with_db import get_object_by_id
+from services.config import get_settings
+from services.cache import TTLCache
+from strawberry.types import Info
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+
+settings = get_settings()
+stored_responses = TTLCache(ttl=settings.idempotency_cache_seconds)
+in_flight_requests: Dict[Tuple[int, str, str], asyncio.Future] = dict()
+
+
+class ReplayNode(NamedTuple):
+    """
+    How the response node of create mutation is stored and restored.
+
+    Only the flag, the id of created object and the error are stored,
+    the object is loaded again on replay so the response has its actual state
+    """
+    node: type
+    flag: str
+    field: str
+    model: type
+    error: type
+    error_code: type
+
+
+def get_key_error_node(replay: ReplayNode) -> Any:
+    return replay.node(**{
+        replay.flag: False,
+        replay.field: None,
+        'error': replay.error(
+            code=replay.error_code.IDEMPOTENCY_KEY_IS_TOO_LONG,
+            message=f"Idempotency key is longer than {settings.idempotency_key_max_length} characters"
+        )
+    })
+
+
+def dump_node(replay: ReplayNode, node: Any) -> dict:
+    created_object = getattr(node, replay.field)
+    error = node.error
+    return {
+        'flag': getattr(node, replay.flag),
+        'object_id': getattr(created_object, 'id', None),
+        'error': {'code': error.code.value, 'message': error.message} if error else None
+    }
+
+
+async def load_node(db, replay: ReplayNode, payload: dict) -> Any:
+    created_object = None
+    if payload['object_id'] is not None:
+        created_object = (
+            await get_object_by_id(
+                db=db, model=replay.model,
+                object_id=payload['object_id']
+            )
+        )
+
+    error = None
+    if payload['error']:
+        error = replay.error(
+            code=replay.error_code(payload['error']['code']),
+            message=payload['error']['message']
+        )
+
+    return replay.node(**{
+        replay.flag: payload['flag'],
+        replay.field: created_object,
+        'error': error
+    })
+
+
+async def wait_stored_response(db, user_id: int, operation: str, key: str) -> dict:
+    """
+    The same key is executed by another worker, wait until it saves the response
+    """
+    waited = 0.0
+    delay = 0.05
+    while waited < settings.idempotency_wait_seconds:
+        await asyncio.sleep(delay)
+        waited += delay
+        delay = min(delay * 2, 1.0)
+        response = await get_idempotency_response(db=db, user_id=user_id, operation=operation, key=key)
+        await db.commit()
+        if response is not None:
+            return response
+
+    raise ValueError("Request with the same idempotency key is still in progress")
+
+
+async def run_idempotent(
+        info: Info, operation: str, key: Optional[str],
+        execute: Callable[[], Awaitable[Any]], replay: ReplayNode
+) -> Any:
+    """
+    Execute create mutation at most once for the idempotency key of the user.
+
+    Replayed key returns the stored response without executing the resolver:
+    from the cache of the worker, from the request in flight of the worker
+    (single-flight) or from `idempotency_key` table for other workers.
+    A key longer than the column is rejected with an error of the node, nothing is executed
+    """
+    if not key:
+        return await execute()
+    if len(key) > settings.idempotency_key_max_length:
+        return get_key_error_node(replay=replay)
+
+    context = info.context
+    cache_key = (context.user.id, operation, key)
+
+    payload = stored_responses.get(cache_key)
+    if payload is not None:
+        return await load_node(db=context.db, replay=replay, payload=payload)
+
+    in_flight = in_flight_requests.get(cache_key)
+    if in_flight is not None:
+        payload = await asyncio.shield(in_flight)
+        if payload is None:
+            return await run_idempotent(info=info, operation=operation, key=key, execute=execute, replay=replay)
+        return await load_node(db=context.db, replay=replay, payload=payload)
+
+    future = asyncio.get_running_loop().create_future()
+    in_flight_requests[cache_key] = future
+    claimed = False
+    try:
+        claimed = (
+            await claim_idempotency_key(
+                db=context.db, user_id=context.user.id,
+                operation=operation, key=key,
+                lease_seconds=settings.idempotency_lease_seconds
+            )
+        )
+        await context.db.commit()
+
+        if claimed:
+            node = await execute()
+            payload = dump_node(replay=replay, node=node)
+            await store_idempotency_response(
+                db=context.db, user_id=context.user.id,
+                operation=operation, key=key, response=payload
+            )
+            await context.db.commit()
+        else:
+            payload = (
+                await get_idempotency_response(
+                    db=context.db, user_id=context.user.id,
+                    operation=operation, key=key
+                )
+            )
+            if payload is None:
+                payload = (
+                    await wait_stored_response(
+                        db=context.db, user_id=context.user.id,
+                        operation=operation, key=key
+                    )
+                )
+            node = await load_node(db=context.db, replay=replay, payload=payload)
+
+    # Also a cancelled request, e.g. on a disconnect of the client, releases its key
+    except BaseException as e:
+        logging.warning(f"Idempotent {operation} failed: {e!r}")
+        try:
+            await context.db.rollback()
+            if claimed:
+                await release_idempotency_key(
+                    db=context.db, user_id=context.user.id,
+                    operation=operation, key=key
+                )
+                await context.db.commit()
+        except Exception as release_error:
+            # The key is claimed again when its lease is over
+            logging.warning(f"Idempotency key of {operation} is not released: {release_error}")
+        raise
+
+    else:
+        stored_responses.set(cache_key, payload)
+        future.set_result(payload)
+
+    finally:
+        in_flight_requests.pop(cache_key, None)
+        # Requests of the same key waiting in this worker try to claim it themselves
+        if not future.done():
+            future.set_result(None)
+
+    return node
@@ -0,0 +1,27 @@
+import enum
+import strawberry
+
+
+@strawberry.enum
+class JobStatus(enum.Enum):
+    """
+    Status of background job
+
+    PENDING: Job is created and waits for the worker
+    RUNNING: Job is processed right now
+    DONE: Job is finished successfully
+    FAILED: Job is stopped with error, transaction exports can be resumed
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+@strawberry.enum
+class JobKind(enum.Enum):
+    """
+    All kinds of background jobs in the system are listed here
+    """
+    TRANSACTION_EXPORT = 'transaction_export'
+    CLIENT_IMPORT = 'client_import'
@@ -0,0 +1,40 @@
+from sqlalchemy import (
+    Column, Integer, ForeignKey, VARCHAR, Enum
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+from services.database import BaseModel
+from services.jobs.enums import JobStatus, JobKind
+
+
+class BackgroundJob(BaseModel):
+    __tablename__ = 'background_job'
+    __tableargs__ = {
+        'comment': "Table of long running jobs of users (exports, imports)"
+    }
+
+    user_id = Column(
+        Integer,
+        ForeignKey('user.id', ondelete='CASCADE'),
+        index=True
+    )
+    kind = Column(
+        Enum(JobKind, native_enum=False),
+        nullable=False
+    )
+    status = Column(
+        Enum(JobStatus, native_enum=False),
+        nullable=False,
+        default=JobStatus.PENDING
+    )
+    parameters = Column(JSONB, nullable=False, default=dict)
+    cursor = Column(VARCHAR(255), nullable=False, default="")
+    processed_rows = Column(Integer, nullable=False, default=0)
+    failed_rows = Column(Integer, nullable=False, default=0)
+    errors = Column(JSONB, nullable=False, default=list)
+    result = Column(JSONB, nullable=False, default=list)
+
+    owner = relationship("User", lazy='selectin', foreign_keys=[user_id])
+
+    def __repr__(self):
+        return f"BackgroundJob {self.kind} of UserID: {self.user_id} | ID: {self.id}"
@@ -0,0 +1,15 @@
+from services.authorization import AuthenticationRequiredField
+import strawberry
+from typing import Optional
+from strawberry.types import Info
+from services.jobs.schema import GetJobInputData, JobNode
+from services.jobs.resolvers import get_job_resolver
+
+
+@strawberry.type
+class Query:
+    @AuthenticationRequiredField()
+    async def get_job(
+            self, info: Info, input_data: GetJobInputData
+    ) -> Optional[JobNode]:
+        return await get_job_resolver(info=info, input_data=input_data)
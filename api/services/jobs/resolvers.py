@@ -0,0 +1,19 @@
+from strawberry.types import Info
+from services.jobs.schema import GetJobInputData, JobNode
+from services.jobs.work_with_db import get_job_of_user
+from typing import Optional
+
+
+async def get_job_resolver(
+        info: Info, input_data: GetJobInputData
+) -> Optional[JobNode]:
+    context = info.context
+    job = (
+        await get_job_of_user(
+            db=context.db,
+            job_id=input_data.job_id,
+            user_id=context.user.id
+        )
+    )
+
+    return job
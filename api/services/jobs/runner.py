@@ -0,0 +1,107 @@
+from services.database import AsyncSessionLocal
+from services.config import get_settings
+from services.jobs.enums import JobStatus, JobKind
+from services.jobs.models import BackgroundJob
+from services.jobs.work_with_db import update_job, append_job_error, touch_jobs, fail_stale_jobs
+from services.work_with_db import get_object_by_id
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+
+JobHandler = Callable[[AsyncSession, BackgroundJob], Awaitable[None]]
+
+running_jobs: Dict[int, asyncio.Task] = dict()
+job_watcher_task: Optional[asyncio.Task] = None
+
+
+def start_job(job_id: int, handler: JobHandler) -> None:
+    """
+    Run the handler of committed job in the background of the current worker.
+
+    Handler gets its own session (the request session is closed when
+    the response is sent) and is responsible for saving progress of the job,
+    so the job can be resumed from `BackgroundJob.cursor` after a failure.
+    """
+    if job_id in running_jobs:
+        return
+
+    task = asyncio.create_task(run_job(job_id=job_id, handler=handler))
+    running_jobs[job_id] = task
+    task.add_done_callback(lambda _: running_jobs.pop(job_id, None))
+
+
+async def run_job(job_id: int, handler: JobHandler) -> None:
+    db = AsyncSessionLocal()
+    try:
+        job = await get_object_by_id(db=db, model=BackgroundJob, object_id=job_id)
+        if job is None:
+            return
+
+        await update_job(db=db, job_id=job_id, status=JobStatus.RUNNING)
+        await db.commit()
+
+        await handler(db, job)
+
+        await update_job(db=db, job_id=job_id, status=JobStatus.DONE)
+        await db.commit()
+    except Exception as e:
+        logging.warning(f"Job {job_id} failed: {e}")
+        await db.rollback()
+        await append_job_error(db=db, job_id=job_id, message=str(e))
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def watch_jobs() -> None:
+    """
+    Jobs running in this worker are touched every `job_heartbeat_seconds`.
+    Pending and running jobs untouched for `job_stale_seconds` were left by
+    a stopped worker: they are failed, so exports can be resumed from their
+    cursor, and the uploaded files of imports are removed
+    """
+    settings = get_settings()
+    db = AsyncSessionLocal()
+    try:
+        if running_jobs:
+            await touch_jobs(db=db, job_ids=running_jobs.keys())
+        stale_jobs = (
+            await fail_stale_jobs(
+                db=db, stale_before=datetime.now() - timedelta(seconds=settings.job_stale_seconds),
+                message="Job was interrupted by a restart of the server"
+            )
+        )
+        await db.commit()
+    finally:
+        await db.close()
+
+    for job_id, kind, parameters in stale_jobs:
+        logging.warning(f"Job {job_id} was interrupted, it is failed")
+        if kind is JobKind.CLIENT_IMPORT:
+            path = os.path.join(settings.import_dir, parameters['file_name'])
+            if os.path.exists(path):
+                os.remove(path)
+
+
+async def run_job_watcher() -> None:
+    settings = get_settings()
+    while True:
+        try:
+            await watch_jobs()
+        except Exception as e:
+            logging.warning(f"Job watcher failed: {e}")
+        await asyncio.sleep(settings.job_heartbeat_seconds)
+
+
+async def start_job_watcher() -> None:
+    global job_watcher_task
+    if job_watcher_task is None or job_watcher_task.done():
+        job_watcher_task = asyncio.create_task(run_job_watcher())
+
+
+async def stop_job_watcher() -> None:
+    if job_watcher_task is not None:
+        job_watcher_task.cancel()
@@ -0,0 +1,24 @@
+from typing import Optional, List
+
+import strawberry
+from datetime import datetime
+from services.jobs.enums import JobStatus, JobKind
+
+
+@strawberry.type
+class JobNode:
+    id: int
+    kind: JobKind
+    status: JobStatus
+    created_at: datetime
+    updated_at: datetime
+    processed_rows: int
+    failed_rows: int
+    cursor: Optional[str]
+    errors: Optional[List[str]]
+    result: Optional[List[str]]
+
+
+@strawberry.input
+class GetJobInputData:
+    job_id: int
@@ -0,0 +1,79 @@
+from services.jobs.models import BackgroundJob
+from services.jobs.enums import JobStatus, JobKind
+from sqlalchemy import select, update, and_, func
+from sqlalchemy.orm import scoped_session
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+
+async def get_job_of_user(
+        db: scoped_session, job_id: int, user_id: int, kind: Optional[JobKind] = None
+) -> Optional[BackgroundJob]:
+    statement = select(BackgroundJob).where(
+        and_(
+            BackgroundJob.id == job_id,
+            BackgroundJob.user_id == user_id
+        )
+    )
+    if kind is not None:
+        statement = statement.where(BackgroundJob.kind == kind)
+    result = (await db.execute(statement)).scalars().all()
+    if result:
+        return result[0]
+    return None
+
+
+async def update_job(db: scoped_session, job_id: int, **values) -> None:
+    statement = (
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id)
+        .values(updated_at=datetime.now(), **values)
+    )
+    await db.execute(statement)
+
+
+async def append_job_error(db: scoped_session, job_id: int, message: str) -> None:
+    statement = (
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id)
+        .values(
+            status=JobStatus.FAILED,
+            errors=BackgroundJob.errors.op('||')(func.jsonb_build_array(message)),
+            updated_at=datetime.now()
+        )
+    )
+    await db.execute(statement)
+
+
+async def touch_jobs(db: scoped_session, job_ids: Iterable[int]) -> None:
+    statement = (
+        update(BackgroundJob)
+        .where(BackgroundJob.id.in_(list(job_ids)))
+        .values(updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(statement)
+
+
+async def fail_stale_jobs(db: scoped_session, stale_before: datetime, message: str) -> List[tuple]:
+    """
+    Pending and running jobs not updated since `stale_before` are failed,
+    returns their id, kind and parameters
+    """
+    statement = (
+        update(BackgroundJob)
+        .where(
+            and_(
+                BackgroundJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+                BackgroundJob.updated_at < stale_before
+            )
+        )
+        .values(
+            status=JobStatus.FAILED,
+            errors=BackgroundJob.errors.op('||')(func.jsonb_build_array(message)),
+            updated_at=datetime.now()
+        )
+        .returning(BackgroundJob.id, BackgroundJob.kind, BackgroundJob.parameters)
+        .execution_options(synchronize_session=False)
+    )
+    return (await db.execute(statement)).fetchall()
@@ -20,8 +20,8 @@ from strawberry import type as type_strawberry
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from services.database import get_db
-from services.base.models import User
-from services.base.work_with_db import get_user
+from services.base.tokens import Principal
+from services.authorization import authenticate_request
 
 from services.base.mutation import Mutation as MutationBase
 from services.business.mutation import Mutation as MutationBusiness
@@ -32,15 +32,26 @@ from services.base.query import Query as QueryBase
 from services.business.query import Query as QueryBusiness
 from services.event_calendar.query import Query as QueryEventCalendar
 from services.finance.query import Query as QueryFinance
-
-from services.config import get_settings
+from services.jobs.query import Query as QueryJobs
+
+from services.finance.subscription import Subscription as SubscriptionFinance
+
+from services.finance.routes import export_transactions_endpoint, download_export_file_endpoint
+from services.business.routes import import_clients_endpoint, scope_types_endpoint
+from services.business.reference import start_reference_poller, stop_reference_poller
+from services.business.permissions import start_permission_poller, stop_permission_poller
+from services.base.sweeper import start_sweeper, stop_sweeper
+from services.base.devices import start_device_flusher, stop_device_flusher
+from services.jobs.runner import start_job_watcher, stop_job_watcher
+from services.finance.partitions import start_partition_manager, stop_partition_manager
+from services.rate_limit import RateLimitMiddleware
+from services.overload import OverloadMiddleware, start_overload_controller, stop_overload_controller
+from services.metrics import metrics_endpoint
 
 import asyncio
 import pathlib
-import time
-import jwt
 
-# from services.settings_db.filling import filling_database_default_values
+from services.settings_db.filling import filling_database_default_values
 
 
 class Context(NamedTuple):
@@ -51,7 +62,7 @@ class Context(NamedTuple):
     request: Optional[Union[Request, WebSocket]]
     response: Optional[Response]
     db: Optional[AsyncSession]
-    user: Optional[User] = None
+    user: Optional[Principal] = None
 
 
 def get_graphiql_html() -> str:
@@ -117,34 +128,7 @@ class GraphQL(BaseGraphQL):
         and the user instance.
         """
         logging.warning(F"CONTEXT START")
-        user = None
-
-        headers = request.headers
-        token_is_present = headers.get('authorization', False)
-        if token_is_present:
-            db = get_db()
-            jwt_setting = get_settings()
-            jwt_token = token_is_present.replace('JWT ', '')
-            try:
-                decode_token = jwt.decode(jwt_token, jwt_setting.secret_key, algorithms=[jwt_setting.algorithm])
-                expire_jwt_token = decode_token.get('exp', False)
-                email = decode_token.get('email', False)
-                now = time.time()
-                required_parameters_are_correct = all(
-                    (
-                        email, expire_jwt_token, (now <= expire_jwt_token)
-                    )
-                )
-                logging.warning(f"{decode_token=}")
-                if required_parameters_are_correct:
-                    user_instance = await get_user(db=db, field=User.email, value=email)
-                    if user_instance:
-                        user = user_instance[0]
-            except (jwt.exceptions.DecodeError, jwt.exceptions.ExpiredSignatureError) as jwt_error:
-                logging.warning(jwt_error)
-                await db.rollback()
-
-            await db.close()
+        user = await authenticate_request(request=request)
 
         cnt = Context(
             request=request,
@@ -160,7 +144,8 @@ class Query(
     QueryBase,
     QueryBusiness,
     QueryEventCalendar,
-    QueryFinance
+    QueryFinance,
+    QueryJobs
 ):
     @field
     async def check(self) -> bool:
@@ -180,7 +165,9 @@ class Mutation(
 
 
 @type_strawberry
-class Subscription:
+class Subscription(
+    SubscriptionFinance
+):
     @subscription
     async def check(self) -> AsyncGenerator[bool, None]:
         try:
@@ -196,7 +183,12 @@ graphql_app = GraphQL(
 )
 
 routes = [
-    Route('/graphql', graphql_app)
+    Route('/graphql', graphql_app),
+    Route('/finance/export', export_transactions_endpoint, methods=['GET']),
+    Route('/finance/export/{job_id:int}/{file_name}', download_export_file_endpoint, methods=['GET']),
+    Route('/business/clients/import', import_clients_endpoint, methods=['POST']),
+    Route('/business/scope-types', scope_types_endpoint, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET'])
 ]
 
 middleware = [
@@ -205,15 +197,32 @@ middleware = [
         allow_origins=['*'],
         allow_headers=['*'],
         allow_methods=("DELETE", "GET", "OPTIONS", "PATCH", "POST", "PUT"),
-    )
+    ),
+    Middleware(OverloadMiddleware),
+    Middleware(RateLimitMiddleware)
 ]
 
 app = Starlette(
     routes=routes,
     on_startup=[
-        # filling_database_default_values
+        filling_database_default_values,
+        start_partition_manager,
+        start_reference_poller,
+        start_permission_poller,
+        start_sweeper,
+        start_device_flusher,
+        start_job_watcher,
+        start_overload_controller
+    ],
+    on_shutdown=[
+        stop_partition_manager,
+        stop_reference_poller,
+        stop_permission_poller,
+        stop_sweeper,
+        stop_device_flusher,
+        stop_job_watcher,
+        stop_overload_controller
     ],
-    on_shutdown=[],
     middleware=middleware
 )
 
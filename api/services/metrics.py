@@ -0,0 +1,76 @@
+from services.overload import get_overload_stats
+from services.admission import get_client_ip, get_header, is_trusted_proxy
+from services.base.passwords import password_pool
+from services.base.sweeper import get_sweeper_stats
+from services.base.devices import pending_devices
+from services.database import engine
+from services.config import get_settings
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Scope
+from typing import List
+import hmac
+import ipaddress
+
+
+def get_metrics_lines() -> List[str]:
+    """
+    Metrics of the worker in the text format of Prometheus
+    """
+    overload = get_overload_stats()
+    passwords = password_pool.stats()
+    sweeper = get_sweeper_stats()
+    pool = engine.sync_engine.pool
+
+    lines = [
+        f"gainsystem_overload_level {overload.level}",
+        f"gainsystem_event_loop_lag_seconds {overload.loop_lag_seconds:.6f}",
+        f"gainsystem_db_pool_wait_seconds {overload.pool_wait_seconds:.6f}",
+        f"gainsystem_db_pool_size {pool.size()}",
+        f"gainsystem_db_pool_checked_out {pool.checkedout()}",
+        f"gainsystem_db_pool_overflow {pool.overflow()}",
+    ]
+    lines.extend(
+        f'gainsystem_requests_shed_total{{priority="{priority.lower()}"}} {count}'
+        for priority, count in overload.shed.items()
+    )
+    lines.extend([
+        f"gainsystem_password_pool_queued {passwords.queued}",
+        f"gainsystem_password_pool_running {passwords.running}",
+        f"gainsystem_password_pool_completed_total {passwords.completed}",
+        f"gainsystem_sweeper_runs_total {sweeper.runs}",
+        f"gainsystem_sweeper_failed_runs_total {sweeper.failed_runs}",
+        f"gainsystem_pending_devices {len(pending_devices)}",
+    ])
+    return lines
+
+
+def is_internal_request(scope: Scope) -> bool:
+    """
+    Sent from a loopback or private address. A request forwarded by a proxy that is
+    not in `TRUSTED_PROXIES` is external, the address of the proxy tells nothing of its client
+    """
+    peer = scope['client'][0] if scope.get('client') else ''
+    if get_header(scope, b'x-forwarded-for') is not None and not is_trusted_proxy(peer):
+        return False
+    try:
+        ip = ipaddress.ip_address(get_client_ip(scope))
+    except ValueError:
+        return False
+    return ip.is_loopback or ip.is_private
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    GET /metrics - with `Authorization: Bearer <METRICS_TOKEN>` when the token is set,
+    otherwise only from loopback and private addresses
+    """
+    settings = get_settings()
+    if settings.metrics_token:
+        authorization = request.headers.get('authorization', '')
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {settings.metrics_token}".encode()):
+            return PlainTextResponse('Token is invalid', status_code=401)
+    elif not is_internal_request(request.scope):
+        return PlainTextResponse('Metrics are internal', status_code=403)
+
+    return PlainTextResponse('\n'.join(get_metrics_lines()) + '\n')
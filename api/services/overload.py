@@ -0,0 +1,165 @@
+from services.admission import (
+    AUTH_FIELDS, HEAVY_FIELDS, HEAVY_PATHS, NO_OPERATIONS, GraphQLOperations, read_graphql_operations
+)
+from services.database import engine
+from services.config import get_settings
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Dict, List, NamedTuple, Optional
+import asyncio
+import enum
+import logging
+import time
+
+
+class Priority(enum.IntEnum):
+    """
+    Requests of a priority below the level of the controller are shed
+    """
+    LOW = 1
+    NORMAL = 2
+    HIGH = 3
+
+
+class OverloadStats(NamedTuple):
+    level: int
+    loop_lag_seconds: float
+    pool_wait_seconds: float
+    shed: Dict[str, int]
+
+
+# 0 admits every request, 3 sheds every one but the metrics
+level = 0
+loop_lag = 0.0
+pool_wait = 0.0
+probe_started: Optional[float] = None
+shed: Dict[str, int] = {priority.name: 0 for priority in Priority}
+controller_tasks: List[asyncio.Task] = list()
+
+
+def get_pool_wait() -> float:
+    """
+    Wait of the last checkout of the probe, or of the one still waiting for a connection
+    """
+    if probe_started is not None:
+        return max(pool_wait, time.monotonic() - probe_started)
+    return pool_wait
+
+
+def update_level() -> None:
+    """
+    The level rises at once with the pressure and falls by one step a sample,
+    so shedding does not flap at the threshold
+    """
+    global level
+    settings = get_settings()
+    pressure = max(
+        loop_lag / settings.overload_loop_lag_seconds,
+        get_pool_wait() / settings.overload_pool_wait_seconds
+    )
+    target = 0 if pressure < 1 else 1 if pressure < 2 else 2 if pressure < 4 else 3
+    if target != level:
+        logging.warning(f"Overload level {level} -> {max(target, level - 1)}, {loop_lag=}, {pool_wait=}")
+    level = max(target, level - 1)
+
+
+async def sample_loop_lag() -> None:
+    global loop_lag
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(settings.overload_sample_seconds)
+        loop_lag = max(0.0, loop.time() - started - settings.overload_sample_seconds)
+        update_level()
+
+
+async def probe_pool_wait() -> None:
+    """
+    A connection is checked out and returned every sample, its wait is the one
+    of requests queued for the pool at the moment
+    """
+    global pool_wait, probe_started
+    settings = get_settings()
+    while True:
+        probe_started = time.monotonic()
+        try:
+            async with engine.connect():
+                pool_wait = time.monotonic() - probe_started
+        except Exception as e:
+            logging.warning(f"Pool probe failed: {e}")
+        probe_started = None
+        await asyncio.sleep(settings.overload_sample_seconds)
+
+
+def get_priority(scope: Scope, operations: GraphQLOperations) -> Priority:
+    """
+    Subscriptions, GraphiQL, exports, imports and analytics are shed first,
+    logins and mutations last. Fields selected through fragments count as top fields
+    """
+    if scope['type'] == 'websocket' or scope['path'].startswith(HEAVY_PATHS):
+        return Priority.LOW
+    if scope['path'] != '/graphql':
+        return Priority.NORMAL
+
+    if operations.fields & AUTH_FIELDS:
+        return Priority.HIGH
+    if not operations.types or 'subscription' in operations.types or operations.fields & HEAVY_FIELDS:
+        return Priority.LOW
+    if 'mutation' in operations.types:
+        return Priority.HIGH
+    return Priority.NORMAL
+
+
+def get_overload_stats() -> OverloadStats:
+    return OverloadStats(level=level, loop_lag_seconds=loop_lag, pool_wait_seconds=get_pool_wait(), shed=dict(shed))
+
+
+class OverloadMiddleware:
+    """
+    Fast 503 for requests of a priority below the level of the controller,
+    nothing is read from the request while the level is 0
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.settings = get_settings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+                not level or scope['type'] not in ('http', 'websocket')
+                or scope['path'] == '/metrics' or scope.get('method') == 'OPTIONS'
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        operations = NO_OPERATIONS
+        if scope['type'] == 'http' and scope['path'] == '/graphql':
+            operations, receive = await read_graphql_operations(scope=scope, receive=receive)
+
+        priority = get_priority(scope=scope, operations=operations)
+        if priority > level:
+            await self.app(scope, receive, send)
+            return
+
+        shed[priority.name] += 1
+        if scope['type'] == 'websocket':
+            # Try again later
+            await send({'type': 'websocket.close', 'code': 1013})
+            return
+        response = JSONResponse(
+            {'error': 'Service is overloaded'}, status_code=503,
+            headers={'Retry-After': str(self.settings.overload_retry_after_seconds)}
+        )
+        await response(scope, receive, send)
+
+
+async def start_overload_controller() -> None:
+    settings = get_settings()
+    if settings.overload_enabled and not controller_tasks:
+        controller_tasks.append(asyncio.create_task(sample_loop_lag()))
+        controller_tasks.append(asyncio.create_task(probe_pool_wait()))
+
+
+async def stop_overload_controller() -> None:
+    while controller_tasks:
+        controller_tasks.pop().cancel()
@@ -0,0 +1,34 @@
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Dict, Hashable, Set
+import asyncio
+import logging
+
+
+class PubSub:
+    """
+    In-process publish/subscribe for GraphQL subscriptions.
+
+    Messages are delivered only to subscribers of the same worker,
+    a slow subscriber loses messages instead of blocking the publisher
+    """
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[Hashable, Set[asyncio.Queue]] = defaultdict(set)
+
+    def publish(self, channel: Hashable, message: Any) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logging.warning(f"Subscriber of {channel} is full, message is dropped")
+
+    async def subscribe(self, channel: Hashable) -> AsyncGenerator[Any, None]:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[channel].add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+            if not self._subscribers[channel]:
+                self._subscribers.pop(channel, None)
@@ -0,0 +1,202 @@
+from services.admission import (
+    LOGIN_FIELDS, HEAVY_FIELDS, HEAVY_PATHS, NO_OPERATIONS, get_header, get_client_ip,
+    read_graphql_operations
+)
+from services.base.models import RateLimitBucket
+from services.base.tokens import decode_access_token
+from services.database import engine
+from services.config import get_settings
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Set
+import asyncio
+import jwt
+import logging
+import math
+import time
+
+
+class Limit(NamedTuple):
+    key: str
+    rate: float
+    burst: int
+
+
+class Admission(NamedTuple):
+    admitted: bool
+    # Time to wait before the request is served, or until it is worth retrying when it is rejected
+    wait_seconds: float
+
+
+class TokenBucket:
+    """
+    `burst` tokens refilled at `rate` per second. A token may be borrowed
+    up to `max_wait` seconds ahead, the request then waits for it instead of
+    being rejected
+    """
+    __slots__ = ('tokens', 'updated_at')
+
+    def __init__(self, burst: int, now: float):
+        self.tokens = float(burst)
+        self.updated_at = now
+
+    def take(self, rate: float, burst: int, max_wait: float, now: float) -> Admission:
+        level = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        if level - 1 < -max_wait * rate:
+            self.tokens = level
+            return Admission(admitted=False, wait_seconds=(1 - level) / rate)
+
+        self.tokens = level - 1
+        return Admission(admitted=True, wait_seconds=max(0.0, -self.tokens) / rate)
+
+
+class MemoryBucketStore:
+    """
+    Buckets of the worker, the least recently used ones are dropped above `max_size`
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+
+    async def take(self, limit: Limit, max_wait: float) -> Admission:
+        now = time.monotonic()
+        bucket = self._buckets.pop(limit.key, None)
+        if bucket is None:
+            bucket = TokenBucket(burst=limit.burst, now=now)
+        self._buckets[limit.key] = bucket
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+        return bucket.take(rate=limit.rate, burst=limit.burst, max_wait=max_wait, now=now)
+
+
+class PostgresBucketStore:
+    """
+    Buckets shared by the workers in the unlogged table `rate_limit_bucket`,
+    a bucket is refilled and taken by one upsert. A failure of the database
+    admits the request
+    """
+    async def take(self, limit: Limit, max_wait: float) -> Admission:
+        now = func.localtimestamp()
+        level = func.least(
+            limit.burst,
+            RateLimitBucket.tokens + func.extract('epoch', now - RateLimitBucket.updated_at) * limit.rate
+        )
+        statement = (
+            insert_postgresql(RateLimitBucket.__table__)
+            .values(key=limit.key, tokens=limit.burst - 1, created_at=now, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=[RateLimitBucket.key],
+                set_={'tokens': level - 1, 'updated_at': now},
+                where=level - 1 >= -max_wait * limit.rate
+            )
+            .returning(RateLimitBucket.tokens)
+        )
+        try:
+            async with engine.begin() as connection:
+                tokens = (await connection.execute(statement)).scalar()
+        except Exception as e:
+            logging.warning(f"Rate limit store failed: {e}")
+            return Admission(admitted=True, wait_seconds=0)
+
+        if tokens is None:
+            return Admission(admitted=False, wait_seconds=1 / limit.rate)
+        return Admission(admitted=True, wait_seconds=max(0.0, -tokens) / limit.rate)
+
+
+def get_bucket_store():
+    settings = get_settings()
+    if settings.rate_limit_store == 'memory':
+        return MemoryBucketStore(max_size=settings.rate_limit_buckets_size)
+    if settings.rate_limit_store == 'postgres':
+        return PostgresBucketStore()
+    raise ValueError(f"Unknown rate limit store {settings.rate_limit_store}")
+
+
+def get_principal_key(scope: Scope) -> Optional[str]:
+    """
+    Key of the user of a valid access token, only its signature is checked,
+    the version of the user is checked later by the request itself
+    """
+    authorization = get_header(scope, b'authorization')
+    if not authorization:
+        return None
+    try:
+        claims = decode_access_token(token=authorization.replace('JWT ', '')) or dict()
+    except jwt.exceptions.InvalidTokenError:
+        return None
+    if claims.get('sub'):
+        return f"user:{claims['sub']}"
+    if claims.get('email'):
+        return f"user:{claims['email']}"
+    return None
+
+
+def get_limits(scope: Scope, fields: Set[str]) -> List[Limit]:
+    """
+    Every request takes a token of its user or, without a valid token, of its IP.
+    Behind a reverse proxy its address must be in `TRUSTED_PROXIES`, otherwise
+    every client shares the buckets of the proxy.
+    Logins take one more token of the IP, heavy operations one more of the user
+    """
+    settings = get_settings()
+    ip = get_client_ip(scope)
+    principal = get_principal_key(scope)
+
+    if principal is None:
+        limits = [Limit(key=f"ip:{ip}", rate=settings.rate_limit_ip_rate, burst=settings.rate_limit_ip_burst)]
+    else:
+        limits = [Limit(key=principal, rate=settings.rate_limit_user_rate, burst=settings.rate_limit_user_burst)]
+
+    if fields & LOGIN_FIELDS:
+        limits.append(
+            Limit(key=f"login:{ip}", rate=settings.rate_limit_login_rate, burst=settings.rate_limit_login_burst)
+        )
+    if fields & HEAVY_FIELDS or scope['path'].startswith(HEAVY_PATHS):
+        limits.append(
+            Limit(
+                key=f"heavy:{principal or ip}",
+                rate=settings.rate_limit_heavy_rate, burst=settings.rate_limit_heavy_burst
+            )
+        )
+    return limits
+
+
+class RateLimitMiddleware:
+    """
+    Admission of HTTP requests by token buckets. A request over the limit waits
+    up to `rate_limit_max_wait_seconds` for its token, otherwise it is rejected
+    with 429 and `Retry-After`
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.settings = get_settings()
+        self.store = get_bucket_store()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not self.settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        operations = NO_OPERATIONS
+        if scope['path'] == '/graphql':
+            operations, receive = await read_graphql_operations(scope=scope, receive=receive)
+
+        wait_seconds = 0.0
+        for limit in get_limits(scope=scope, fields=operations.fields):
+            admission = await self.store.take(limit=limit, max_wait=self.settings.rate_limit_max_wait_seconds)
+            if not admission.admitted:
+                response = JSONResponse(
+                    {'error': 'Too many requests'}, status_code=429,
+                    headers={'Retry-After': str(math.ceil(admission.wait_seconds))}
+                )
+                await response(scope, receive, send)
+                return
+            wait_seconds = max(wait_seconds, admission.wait_seconds)
+
+        if wait_seconds:
+            await asyncio.sleep(wait_seconds)
+        await self.app(scope, receive, send)
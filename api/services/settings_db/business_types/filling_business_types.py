@@ -1,26 +1,37 @@
-from sqlalchemy import select, insert
-from services.database import get_db
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import scoped_session
 from services.business.models import ScopeTypeBusiness
+from datetime import datetime
+from typing import Dict, List
 import json
+import pathlib
 
-with open('services/settings_db/business_types/types.json', 'r', encoding='utf-8') as lib:
-    data = json.load(lib)
+TYPES_PATH = pathlib.Path(__file__).parent / 'types.json'
 
 
-async def filling_business_type():
-    db = get_db()
-    for element in data['types']:
-        statement = select(ScopeTypeBusiness).where(
-            ScopeTypeBusiness.name == element['name']
-        )
-        result = (await db.execute(statement)).scalars().all()
-        print('result', result)
-        if not result:
-            new_type = ScopeTypeBusiness(
-                name=element['name'],
-                description=element['description']
-            )
-            db.add(new_type)
+def read_business_types(content: bytes) -> List[Dict[str, str]]:
+    return [
+        {'name': element['name'], 'description': element['description']}
+        for element in json.loads(content)['types']
+    ]
 
-    await db.commit()
-    await db.close()
+
+async def filling_business_type(db: scoped_session, content: bytes) -> None:
+    """
+    Upsert of every type of the seed file in one statement,
+    types that are not in the file are kept
+    """
+    now = datetime.now()
+    statement = insert(ScopeTypeBusiness).values([
+        {**row, 'hide': False, 'created_at': now, 'updated_at': now}
+        for row in read_business_types(content)
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[ScopeTypeBusiness.name],
+        set_={
+            'description': statement.excluded.description,
+            'updated_at': statement.excluded.updated_at
+        },
+        where=ScopeTypeBusiness.description.is_distinct_from(statement.excluded.description)
+    )
+    await db.execute(statement)
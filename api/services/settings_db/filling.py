@@ -1,5 +1,84 @@
-from services.settings_db.business_types.filling_business_types import filling_business_type
+from services.settings_db.business_types.filling_business_types import filling_business_type, TYPES_PATH
+from services.business.models import ScopeTypeBusiness, ReferenceDataVersion
+from services.database import AsyncSessionLocal
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import scoped_session
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, NamedTuple
+import hashlib
+import logging
+import pathlib
 
+SEED_LOCK_KEY = 584213
 
-async def filling_database_default_values():
-    await filling_business_type()
+
+class Seed(NamedTuple):
+    name: str
+    path: pathlib.Path
+    fill: Callable[[scoped_session, bytes], Awaitable[None]]
+
+
+SEEDS = [
+    Seed(name=ScopeTypeBusiness.__tablename__, path=TYPES_PATH, fill=filling_business_type),
+]
+
+
+async def get_seed_hashes(db: scoped_session) -> Dict[str, str]:
+    statement = select(ReferenceDataVersion.name, ReferenceDataVersion.seed_hash)
+    return {name: seed_hash for name, seed_hash in (await db.execute(statement)).fetchall()}
+
+
+async def save_seed_hash(db: scoped_session, name: str, seed_hash: str) -> None:
+    now = datetime.now()
+    statement = insert(ReferenceDataVersion).values(
+        name=name, version=1, seed_hash=seed_hash, created_at=now, updated_at=now
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ReferenceDataVersion.name],
+        set_={'seed_hash': statement.excluded.seed_hash, 'updated_at': statement.excluded.updated_at}
+    )
+    await db.execute(statement)
+
+
+async def filling_database_default_values() -> None:
+    """
+    Seed files are applied only when their content hash differs from the stored one,
+    so a startup without changes of the files costs one query.
+
+    One worker seeds under the advisory lock, the others skip,
+    hashes are stored in the transaction of the upserts
+    """
+    contents = {seed.name: seed.path.read_bytes() for seed in SEEDS}
+    hashes = {name: hashlib.sha256(content).hexdigest() for name, content in contents.items()}
+
+    db = AsyncSessionLocal()
+    try:
+        stored = await get_seed_hashes(db=db)
+        if all(stored.get(seed.name) == hashes[seed.name] for seed in SEEDS):
+            await db.rollback()
+            return
+
+        locked = (
+            await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': SEED_LOCK_KEY})
+        ).scalar()
+        if not locked:
+            await db.rollback()
+            return
+
+        # Another worker could have finished before the lock was taken
+        stored = await get_seed_hashes(db=db)
+        seeded = list()
+        for seed in SEEDS:
+            if stored.get(seed.name) != hashes[seed.name]:
+                await seed.fill(db, contents[seed.name])
+                await save_seed_hash(db=db, name=seed.name, seed_hash=hashes[seed.name])
+                seeded.append(seed.name)
+        await db.commit()
+        if seeded:
+            logging.warning(f"Reference data is seeded: {seeded}")
+    except Exception as e:
+        logging.warning(f"Seeding of reference data failed: {e}")
+        await db.rollback()
+    finally:
+        await db.close()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from services.admission import get_operations
+from services.overload import Priority, get_priority
+
+SCOPE = {'type': 'http', 'path': '/graphql'}
+
+
+def test_fields_of_fragments_are_top_fields():
+    operations = get_operations(
+        'query { ...F } fragment F on Query { ... on Query { getFinanceAnalytics { total } } ...F }'
+    )
+    assert operations.fields == {'getFinanceAnalytics'}
+
+
+def test_heavy_query_in_fragment_is_low():
+    operations = get_operations('query { ...F } fragment F on Query { getFinanceAnalytics { total } }')
+    assert get_priority(scope=SCOPE, operations=operations) is Priority.LOW
+
+
+def test_login_in_inline_fragment_is_high():
+    operations = get_operations('mutation { ... on Mutation { authenticationUser { token } } }')
+    assert get_priority(scope=SCOPE, operations=operations) is Priority.HIGH
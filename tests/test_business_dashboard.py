@@ -0,0 +1,54 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from services.business.dashboard import business_dashboards, get_business_dashboard
+from services.business.models import Business
+from services.database import AsyncSessionLocal, engine
+from sqlalchemy import event, func, select
+import asyncio
+import pytest
+
+
+async def count_dashboard_statements():
+    """
+    Statements sent by an uncached and then a cached dashboard of one business
+    """
+    statements = list()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            business_id = (await db.execute(select(func.min(Business.id)))).scalar()
+            if business_id is None:
+                return None
+
+            business_dashboards.invalidate(business_id)
+            event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                dashboard = await get_business_dashboard(db=db, business_id=business_id)
+                uncached = len(statements)
+                await get_business_dashboard(db=db, business_id=business_id)
+                cached = len(statements) - uncached
+            finally:
+                event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+            return dashboard, uncached, cached
+    finally:
+        await engine.dispose()
+
+
+def test_dashboard_takes_one_statement():
+    try:
+        result = asyncio.run(count_dashboard_statements())
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"Database is unreachable: {e}")
+    if result is None:
+        pytest.skip('Database has no business')
+
+    dashboard, uncached, cached = result
+    assert dashboard is not None
+    assert uncached == 1
+    assert cached == 0